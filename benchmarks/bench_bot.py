@@ -0,0 +1,49 @@
+"""
+End-to-end message benchmark
+============================
+- ``bot.process_message``: ``Bot.process_message`` driven through the shell's ``BotRunner``
+  (output captured by ``CaptureProxy``) with a mix of group commands and plain chat, the
+  latter still passing through every command's ``can_process_msg``.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from harness import BENCH_ROOT, benchmark
+
+from plugins.DicePP.shell.bot_runner import BotRunner
+
+MESSAGES = [
+    ".r d20",
+    ".r 4d6k3+2 力量",
+    ".rh d100",
+    ".r 10d20cs>10",
+    ".help r",
+    ".bot",
+    "大家晚上好, 今天继续上次的团",
+    "[CQ:at,qq=10001] 你先走",
+    ".nn 阿尔伯特",
+    ".jrrp",
+]
+REPEAT = 20
+USERS = ["10001", "10002", "10003"]
+
+
+@benchmark("bot.process_message", ops=len(MESSAGES) * REPEAT)
+@asynccontextmanager
+async def process_message_case():
+    """Bot.process_message via BotRunner / CaptureProxy"""
+    session_dir = Path(BENCH_ROOT) / "shell_session"
+    os.makedirs(session_dir, exist_ok=True)
+    runner = BotRunner(session_dir)
+    await runner.start()
+
+    async def run():
+        for i in range(REPEAT):
+            for msg in MESSAGES:
+                await runner.send(USERS[i % len(USERS)], "测试用户", msg, group_id="bench_group")
+    try:
+        yield run
+    finally:
+        await runner.stop()
@@ -0,0 +1,58 @@
+"""
+Deck draw benchmark
+===================
+- ``deck.draw``: ``Deck.draw`` on a nested generator deck (ROLL and DRAW in every level)
+  among DISTRACTOR_DECKS unrelated decks, formatted with a real bot's localization helper.
+  Half of the draws take several non-repeating items at once.
+"""
+
+from contextlib import asynccontextmanager
+from typing import List
+
+from harness import benchmark, start_bot
+
+from module.deck.deck_command import Deck, DeckItem, index_decks
+
+DEPTH = 4
+DISTRACTOR_DECKS = 200
+DRAWS = 2_000
+
+
+def build_decks() -> List[Deck]:
+    decks: List[Deck] = []
+    for level in range(DEPTH):
+        deck = Deck(f"生成器{level}", "")
+        if level + 1 < DEPTH:
+            deck.add_item(DeckItem(f"第{level}层: 力量ROLL(3d6) 敏捷ROLL(4d6k3) DRAW(生成器{level + 1}, 1)", weight=3))
+            deck.add_item(DeckItem(f"第{level}层分支 ROLL(1d20+5) DRAW(生成器{level + 1}, 1d2)", weight=1))
+        else:
+            deck.add_item(DeckItem("终点 ROLL(2d8+3)", weight=1))
+        for i in range(20):
+            deck.add_item(DeckItem(f"普通条目{level}-{i}", weight=1, redraw=False))
+        decks.append(deck)
+    for i in range(DISTRACTOR_DECKS):
+        deck = Deck(f"无关牌库{i}", "")
+        deck.add_item(DeckItem(f"无关条目{i}"))
+        decks.append(deck)
+    deck_index = index_decks(decks)
+    for deck in decks:
+        for item in deck.items:
+            assert item.compile(deck_index) is None
+    return decks
+
+
+@benchmark("deck.draw", ops=DRAWS)
+@asynccontextmanager
+async def deck_draw_case():
+    """Deck.draw on a nested generator deck"""
+    bot = await start_bot("bench_deck")
+    decks = build_decks()
+    top = decks[0]
+
+    def run():
+        for i in range(DRAWS):
+            top.draw(1 if i % 2 else 3, decks, bot.loc_helper)
+    try:
+        yield run
+    finally:
+        await bot.shutdown_async()
@@ -0,0 +1,86 @@
+"""
+Log record benchmarks
+=====================
+- ``log.append_record``: ``LogRepository.add_record`` (one insert + commit per message,
+  as recorded while a log is on).
+- ``log.export``: ``LogExporter`` writing TXT + DOCX from ``iter_records_raw`` batches of an
+  EXPORT_RECORDS-record session.
+"""
+
+import os
+import shutil
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import aiosqlite
+
+from harness import BENCH_ROOT, benchmark
+
+from core.data import LogRepository
+from core.data.models import LogRecord, LogSession
+from module.common.log_export import LogExporter
+
+APPENDS = 500
+EXPORT_RECORDS = 2_000
+USERS = ["10001", "10002", "10003", "10004"]
+START = datetime(2024, 1, 1, 20, 0, 0)
+
+
+async def _open_repo(name: str):
+    db = await aiosqlite.connect(os.path.join(BENCH_ROOT, f"{name}.db"))
+    await db.execute("PRAGMA foreign_keys=ON;")
+    repo = LogRepository(db)
+    await repo._ensure_table()
+    await repo.save_session(LogSession(id=name, group_id="g1", name=name, recording=True,
+                                       created_at=START, updated_at=START))
+    return db, repo
+
+
+def _record(log_id: str, i: int) -> LogRecord:
+    user_id = USERS[i % len(USERS)]
+    content = f".r 1d20+{i % 5} 攻击" if i % 6 == 0 else f"第{i}条发言[CQ:at,qq={USERS[(i + 1) % len(USERS)]}] 继续前进"
+    return LogRecord(log_id=log_id, time=START + timedelta(seconds=i), user_id=user_id,
+                     nickname=f"PC{user_id[-1]}", content=content, source="user", message_id=str(i))
+
+
+@benchmark("log.append_record", ops=APPENDS)
+@asynccontextmanager
+async def append_record_case():
+    """LogRepository.add_record"""
+    db, repo = await _open_repo("bench_log_append")
+
+    async def run():
+        for i in range(APPENDS):
+            await repo.add_record(_record("bench_log_append", i))
+    try:
+        yield run
+    finally:
+        await db.close()
+
+
+@benchmark("log.export", ops=EXPORT_RECORDS)
+@asynccontextmanager
+async def export_case():
+    """LogExporter TXT + DOCX export"""
+    log_id = "bench_log_export"
+    db, repo = await _open_repo(log_id)
+    for i in range(EXPORT_RECORDS):
+        await repo.add_record(_record(log_id, i))
+    logs_dir = os.path.join(BENCH_ROOT, "log_export")
+
+    async def resolve_nickname(uid: str):
+        return None
+
+    async def run():
+        shutil.rmtree(logs_dir, ignore_errors=True)
+        os.makedirs(logs_dir)
+        exporter = LogExporter(
+            group_id="g1", bot_account="99999", start_time=START.strftime("%Y/%m/%d %H:%M:%S"),
+            logs_dir=logs_dir, display_name_base=log_id, color_for=lambda uid: "FF0000",
+            resolve_nickname=resolve_nickname,
+        )
+        await exporter.run(repo.iter_records_raw(log_id), total=EXPORT_RECORDS)
+    try:
+        yield run
+    finally:
+        await db.close()
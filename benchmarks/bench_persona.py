@@ -0,0 +1,80 @@
+"""
+Persona group history benchmarks
+================================
+- ``persona.add_group_conversation``: appends (insert + per-group trim in one transaction)
+  spread over GROUPS groups.
+- ``persona.get_group_conversations``: reads of warm groups served from the ring buffer.
+- ``persona.get_group_conversations_sql``: the same reads with the ring buffer disabled,
+  i.e. the pushed-down SQL path.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+import aiosqlite
+
+from harness import BENCH_ROOT, benchmark
+
+from module.persona.data.store import PersonaDataStore
+
+GROUPS = 20
+MESSAGES = 1_000
+READS = 1_000
+MAX_MESSAGES = 40
+
+
+async def _open_store(name: str, **kwargs):
+    db = await aiosqlite.connect(os.path.join(BENCH_ROOT, f"{name}.db"))
+    store = PersonaDataStore(db, group_max_messages=MAX_MESSAGES, **kwargs)
+    await store.ensure_tables()
+    return db, store
+
+
+async def _fill(store: PersonaDataStore, count: int) -> None:
+    for i in range(count):
+        await store.add_group_conversation(
+            f"group{i % GROUPS}", f"user{i % 7}", "user", f"第{i}条消息, 今天跑团进行到哪里了?", f"玩家{i % 7}"
+        )
+
+
+@benchmark("persona.add_group_conversation", ops=MESSAGES)
+@asynccontextmanager
+async def add_group_conversation_case():
+    """PersonaDataStore.add_group_conversation"""
+    db, store = await _open_store("bench_persona_add")
+
+    async def run():
+        await _fill(store, MESSAGES)
+    try:
+        yield run
+    finally:
+        await db.close()
+
+
+def _read_case(name: str, **store_kwargs):
+    @asynccontextmanager
+    async def case():
+        db, store = await _open_store(name, **store_kwargs)
+        await _fill(store, GROUPS * MAX_MESSAGES)
+        since = store._wall_now() - timedelta(hours=1)
+
+        async def run():
+            for i in range(READS):
+                group_id = f"group{i % GROUPS}"
+                if i % 2:
+                    await store.get_group_conversations(group_id, max_rows=20)
+                else:
+                    await store.get_group_conversations(group_id, since=since)
+        try:
+            yield run
+        finally:
+            await db.close()
+    return case
+
+
+benchmark("persona.get_group_conversations", ops=READS,
+          description="PersonaDataStore.get_group_conversations (ring buffer)")(_read_case("bench_persona_get"))
+benchmark("persona.get_group_conversations_sql", ops=READS,
+          description="PersonaDataStore.get_group_conversations (SQL)")(
+    _read_case("bench_persona_get_sql", group_history_cache_groups=0))
@@ -0,0 +1,72 @@
+"""
+Query search benchmark
+======================
+- ``query.search_item``: ``QueryCommand.search_item`` against a synthetic ROWS-row
+  database (name, english name, source, category and tag lookups, exact and fuzzy).
+"""
+
+import os
+import random
+import sqlite3
+from contextlib import asynccontextmanager
+
+from harness import BENCH_ROOT, SEED, benchmark, start_bot
+
+from module.query.query_command import QueryCommand
+
+DB_NAME = "BENCHQUERY"
+ROWS = 5_000
+SOURCES = ["PHB", "DMG", "MM", "XGE", "TCE"]
+CATEGORIES = ["法术", "物品", "怪物", "专长", "职业"]
+TAGS = ["火焰", "寒冷", "力场", "治疗", "召唤", "护甲", "武器"]
+
+# (关键词列表, search_mode)
+QUERIES = [
+    (["物品1234"], 0),
+    (["Item 42"], 0),
+    (["火球"], 0),
+    (["#PHB", "火球"], 0),
+    (["&怪物", "巨龙"], 0),
+    (["#火焰", "巨龙/火球"], 0),
+    (["治疗", "物品12"], 1),
+    (["不存在的条目"], 0),
+]
+REPEAT = 10
+
+
+def _fill_database(path: str) -> None:
+    rng = random.Random(SEED)
+    rows = []
+    for i in range(ROWS):
+        prefix = {0: "火球", 1: "巨龙"}.get(i % 40, "物品")
+        rows.append((
+            f"{prefix}{i}", f"Item {i}", rng.choice(SOURCES), rng.choice(CATEGORIES),
+            " ".join(rng.sample(TAGS, 2)), f"条目{i}的描述文本, 包含{rng.choice(TAGS)}相关效果。" * 4,
+        ))
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO data VALUES(?,?,?,?,?,?)", rows)
+    conn.executemany("INSERT INTO redirect VALUES(?,?)", [(f"别名{i}", f"物品{i}") for i in range(0, ROWS, 50)])
+    conn.commit()
+    conn.close()
+
+
+@benchmark("query.search_item", ops=len(QUERIES) * REPEAT)
+@asynccontextmanager
+async def search_item_case():
+    """QueryCommand.search_item on a synthetic database"""
+    bot = await start_bot("bench_query")
+    db_path = os.path.join(BENCH_ROOT, f"{DB_NAME}.db")
+    await bot.db.query.create_empty_database(db_path)
+    _fill_database(db_path)
+    await bot.db.query.connect_path(db_path)
+    query_cmd = QueryCommand(bot)
+
+    async def run():
+        for _ in range(REPEAT):
+            for keywords, mode in QUERIES:
+                await query_cmd.search_item(DB_NAME, keywords, search_mode=mode)
+    try:
+        yield run
+    finally:
+        await bot.db.query.disconnect_database(DB_NAME)
+        await bot.shutdown_async()
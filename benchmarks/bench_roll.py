@@ -0,0 +1,52 @@
+"""
+Roll expression benchmarks
+==========================
+- ``roll.exec_roll_exp``: every expression of CORPUS (the valid categories of
+  scripts/capture_baseline.py) through ``exec_roll_exp``.
+- ``roll.get_roll_exp_result``: distribution sampling used by ``.rexp`` on a few
+  expressions with different value ranges (and thus different adaptive sample counts).
+"""
+
+from contextlib import asynccontextmanager
+from typing import List
+
+from harness import benchmark
+
+from module.roll import exec_roll_exp
+from module.roll.roll_dice_command import get_roll_exp_result
+
+CORPUS: List[str] = [
+    # arithmetic
+    "1+1", "5-3", "3*4", "10/3", "1+2*2", "(1+2)*3", "2*(3+4)", "-1",
+    # dice
+    "1D20", "D20", "3D6", "1D100", "1D20+5", "2D6*2", "1D20/2", "1D20+1D6", "(1D20+5)*2", "D20+D20",
+    # modifier
+    "2D20K1", "2D20KL1", "4D6K3", "4D20K2KL1", "4D20R<10", "4D20R>=18", "4D20X>18", "4D20XO>18",
+    "10D20CS>10", "10D20CS<=5", "1D20M5", "1D20P10", "5+10D20CS>10+5", "10D20KL5CS>10",
+    # localization
+    "D20优势", "D20劣势+1", "D20+2抗性", "2D4+D20易伤",
+]
+REPEAT = 100
+
+REXP_CORPUS: List[str] = ["1D20", "3D6+2", "4D6K3", "10D20CS>10"]
+
+
+@benchmark("roll.exec_roll_exp", ops=len(CORPUS) * REPEAT)
+@asynccontextmanager
+async def exec_roll_exp_case():
+    """exec_roll_exp on the mixed expression corpus"""
+    def run():
+        for _ in range(REPEAT):
+            for exp in CORPUS:
+                exec_roll_exp(exp)
+    yield run
+
+
+@benchmark("roll.get_roll_exp_result", ops=len(REXP_CORPUS))
+@asynccontextmanager
+async def get_roll_exp_result_case():
+    """.rexp distribution sampling"""
+    async def run():
+        for exp in REXP_CORPUS:
+            await get_roll_exp_result(exp)
+    yield run
@@ -0,0 +1,200 @@
+"""
+Micro-benchmark harness for DicePP hot paths
+=============================================
+Shared plumbing for the ``bench_*.py`` modules in this directory: path/environment setup,
+the ``@benchmark`` registry, timing (fixed seed, warmup excluded, best of RUNS) and the
+JSON baseline comparison used by ``run_benchmarks.py``.
+
+Each benchmark is an async context manager factory: code before ``yield`` is setup (not
+timed), the yielded callable (sync or async) is one timed run doing ``ops`` operations, code
+after ``yield`` is teardown.
+
+The fastest timed run is kept rather than the median: on a shared machine, noise only ever
+makes a run slower, so the minimum is the most repeatable statistic.  Timings are stored both
+as seconds per operation and relative to a fixed pure-Python calibration loop measured right
+before each timed run; regressions are judged on the relative value, which keeps a committed
+baseline usable across machines of different speed.
+"""
+
+import inspect
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# ---------------------------------------------------------------------------
+# Path / environment setup – must run before any DicePP import
+# ---------------------------------------------------------------------------
+_REPO_ROOT = Path(__file__).parent.parent
+_SRC = _REPO_ROOT / "src"
+for _path in (_SRC / "plugins" / "DicePP", _SRC):
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+# 基准测试使用独立的临时项目目录, 不读取也不污染仓库中的 config/ data/ content/
+BENCH_ROOT = tempfile.mkdtemp(prefix="dicepp-bench-")
+os.environ["DICEPP_APP_DIR"] = BENCH_ROOT
+os.environ["DICEPP_PROJECT_ROOT"] = BENCH_ROOT
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+SEED = 20240101
+RUNS = int(os.environ.get("BENCH_RUNS", "5"))  # timed runs per benchmark (plus one warmup)
+THRESHOLD = float(os.environ.get("BENCH_REGRESSION_THRESHOLD", "30"))  # allowed slowdown in percent
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+CALIBRATION_LOOPS = 200_000
+CALIBRATION_RUNS = 5
+
+CaseFactory = Callable[[], AbstractAsyncContextManager]
+
+
+@dataclass
+class BenchSpec:
+    name: str
+    factory: CaseFactory
+    ops: int
+    description: str
+
+
+@dataclass
+class BenchResult:
+    name: str
+    ops: int
+    per_op: float  # seconds per operation (fastest run)
+    relative: float  # per_op / calibration, best run
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ops": self.ops, "per_op_us": round(self.per_op * 1e6, 3), "relative": float(f"{self.relative:.6g}")}
+
+
+REGISTRY: Dict[str, BenchSpec] = {}
+
+
+def benchmark(name: str, ops: int, description: str = ""):
+    """注册一个基准测试, 被装饰的函数须是 async context manager 工厂 (见模块说明)"""
+    def decorator(factory: CaseFactory) -> CaseFactory:
+        assert name not in REGISTRY, f"duplicate benchmark {name}"
+        REGISTRY[name] = BenchSpec(name, factory, ops, description or (factory.__doc__ or "").strip())
+        return factory
+    return decorator
+
+
+def cleanup() -> None:
+    shutil.rmtree(BENCH_ROOT, ignore_errors=True)
+
+
+async def start_bot(account: str):
+    """在临时项目目录中启动一个不运行定时任务的 Bot"""
+    from core.bot import Bot
+    bot = Bot(account, no_tick=True)
+    await bot.delay_init_command()
+    return bot
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+def _calibration_loop() -> None:
+    total = 0
+    items: Dict[int, int] = {}
+    for i in range(CALIBRATION_LOOPS):
+        total += i % 7
+        items[i & 1023] = total
+    assert items
+
+
+def calibrate(runs: int = CALIBRATION_RUNS) -> float:
+    """固定的纯 Python 工作量的耗时, 作为比较不同机器结果时的单位"""
+    times: List[float] = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        _calibration_loop()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+async def measure(spec: BenchSpec, runs: int = RUNS) -> BenchResult:
+    times: List[float] = []
+    ratios: List[float] = []
+    async with spec.factory() as run:
+        is_async = inspect.iscoroutinefunction(run)
+        for i in range(runs + 1):
+            # 紧挨着每次运行校准, 同一时刻的机器负载在比值中大致抵消
+            calibration = calibrate()
+            random.seed(SEED)
+            t0 = time.perf_counter()
+            if is_async:
+                await run()
+            else:
+                run()
+            if i > 0:  # skip warmup
+                times.append(time.perf_counter() - t0)
+                ratios.append(times[-1] / calibration)
+    return BenchResult(spec.name, spec.ops, min(times) / spec.ops, min(ratios) / spec.ops)
+
+
+async def run_all(selected: List[BenchSpec], runs: int = RUNS) -> Dict[str, BenchResult]:
+    results: Dict[str, BenchResult] = {}
+    for spec in selected:
+        results[spec.name] = await measure(spec, runs)
+        print(f"  {spec.name:<40} {results[spec.name].per_op * 1e6:>12.2f} us/op", flush=True)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------------------------
+@dataclass
+class Comparison:
+    name: str
+    current: BenchResult
+    baseline: Optional[Dict[str, Any]]
+
+    @property
+    def change(self) -> Optional[float]:
+        """相对基线的变化百分比, 正数代表变慢"""
+        if not self.baseline or not self.baseline.get("relative"):
+            return None
+        return (self.current.relative / self.baseline["relative"] - 1) * 100
+
+    def is_regression(self, threshold: float) -> bool:
+        change = self.change
+        return change is not None and change > threshold
+
+
+def compare(results: Dict[str, BenchResult], baseline: Dict[str, Any]) -> List[Comparison]:
+    entries = baseline.get("benchmarks", {})
+    return [Comparison(name, result, entries.get(name)) for name, result in results.items()]
+
+
+def load_baseline(path: Path = BASELINE_PATH) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, BenchResult], path: Path = BASELINE_PATH,
+                  previous: Optional[Dict[str, Any]] = None) -> None:
+    """写入基线; 只更新本次运行过的条目, 保留其余条目"""
+    entries = dict((previous or {}).get("benchmarks", {}))
+    entries.update({name: result.to_dict() for name, result in results.items()})
+    data = {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "seed": SEED,
+        "runs": RUNS,
+        "benchmarks": dict(sorted(entries.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark suite for DicePP hot paths
+==========================================
+Runs the benchmarks registered in ``bench_*.py`` (end-to-end ``Bot.process_message``, roll
+expressions, ``.rexp`` sampling, query search, deck draw, persona group history, log append
+and export) and compares them with ``benchmarks/baseline.json``.
+
+Usage
+-----
+Run from the project root (with the virtualenv active):
+
+    python benchmarks/run_benchmarks.py                    # compare with the baseline
+    python benchmarks/run_benchmarks.py -k roll -k deck    # only benchmarks whose name contains "roll" or "deck"
+    python benchmarks/run_benchmarks.py --update-baseline  # record the current results as the baseline
+    python benchmarks/run_benchmarks.py --list
+
+Regression Detection
+--------------------
+A benchmark regresses when its calibrated time is more than THRESHOLD percent slower than the
+baseline (default 30, override with ``--threshold`` or BENCH_REGRESSION_THRESHOLD).  Any
+regression makes the script exit with status 1, so it can gate a CI job.  Benchmarks missing
+from the baseline are reported as NEW and do not fail the run.
+
+Notes
+-----
+- Every timed run starts from ``random.seed(SEED)``; synthetic data uses its own seeded RNG.
+- All bots and databases live in a temporary project directory removed at exit.
+- Each benchmark runs once as warmup, then RUNS timed runs (BENCH_RUNS, default 5); the
+  fastest run is reported.
+- Times are divided by a fixed calibration loop measured in the same process before being
+  compared, so the committed baseline tolerates moderately faster or slower machines.  For a
+  tight gate, regenerate the baseline on the machine that runs the comparison.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Dict, List
+
+import harness
+from harness import REGISTRY, BenchResult, compare, load_baseline, run_all, save_baseline
+
+# 导入即注册
+import bench_bot  # noqa: F401
+import bench_deck  # noqa: F401
+import bench_log  # noqa: F401
+import bench_persona  # noqa: F401
+import bench_query  # noqa: F401
+import bench_roll  # noqa: F401
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="DicePP micro-benchmarks")
+    parser.add_argument("-k", dest="keywords", action="append", default=[],
+                        help="only run benchmarks whose name contains this string (repeatable)")
+    parser.add_argument("--threshold", type=float, default=harness.THRESHOLD,
+                        help="allowed slowdown in percent before a benchmark counts as a regression")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results to the baseline file")
+    parser.add_argument("--output", help="also write the results of this run to a JSON file")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    return parser.parse_args(argv)
+
+
+def _report(results: Dict[str, BenchResult], baseline: dict, threshold: float) -> bool:
+    ok = True
+    print(f"\n{'='*86}")
+    print(f"  {'Benchmark':<40} {'us/op':>10} {'base us/op':>12} {'change':>9}  verdict")
+    print(f"{'='*86}")
+    for item in compare(results, baseline):
+        base_us = f"{item.baseline['per_op_us']:.2f}" if item.baseline else "-"
+        change = item.change
+        if change is None:
+            verdict, change_str = "NEW", "-"
+        else:
+            change_str = f"{change:+.1f}%"
+            verdict = "REGRESSION" if item.is_regression(threshold) else "ok"
+            ok = ok and verdict == "ok"
+        print(f"  {item.name:<40} {item.current.per_op * 1e6:>10.2f} {base_us:>12} {change_str:>9}  {verdict}")
+    print(f"{'='*86}")
+    print(f"  {'PASS' if ok else 'REGRESSION DETECTED'} (threshold {threshold:.0f}%)")
+    print(f"{'='*86}\n")
+    return ok
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    selected = [spec for name, spec in REGISTRY.items() if not args.keywords or any(k in name for k in args.keywords)]
+    if args.list:
+        for spec in REGISTRY.values():
+            print(f"{spec.name:<40} {spec.description}")
+        return 0
+    if not selected:
+        print("no benchmark matches", args.keywords)
+        return 1
+
+    print(f"Running {len(selected)} benchmarks (runs={harness.RUNS}, seed={harness.SEED})")
+    results = asyncio.run(run_all(selected))
+    baseline = load_baseline()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({name: result.to_dict() for name, result in results.items()}, f, ensure_ascii=False, indent=2)
+    if args.update_baseline:
+        save_baseline(results, previous=baseline)
+        print(f"baseline written to {harness.BASELINE_PATH}")
+        return 0
+    return 0 if _report(results, baseline, args.threshold) else 1
+
+
+if __name__ == "__main__":
+    try:
+        code = main(sys.argv[1:])
+    finally:
+        harness.cleanup()
+    sys.exit(code)
@@ -44,9 +44,10 @@ _group_folder_cache: Dict[str, Dict[str, Optional[str]]] = {}
 
 def convert_group_info(nb_group_info: Dict) -> GroupInfo:
     res = GroupInfo(group_id=str(nb_group_info["group_id"]))
-    res.group_name = nb_group_info["group_name"]
-    res.member_count = nb_group_info["member_count"]
-    res.max_member_count = nb_group_info["max_member_count"]
+    res.group_name = nb_group_info.get("group_name", "")
+    # 部分 OneBot 实现的群列表不返回成员数, 由 Bot.update_group_info_all 单独查询
+    res.member_count = nb_group_info.get("member_count") or 0
+    res.max_member_count = nb_group_info.get("max_member_count") or 0
     return res
 
 
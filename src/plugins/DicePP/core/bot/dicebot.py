@@ -2,11 +2,13 @@ import os
 import asyncio
 import datetime
 import random
-from typing import List, Optional, Dict, Callable, Union, Set, Awaitable
+from typing import List, Optional, Dict, Callable, Set, Awaitable
 from random import choice
 
 from utils.logger import dice_log, get_exception_info
-from utils.time import str_to_datetime, get_current_date_str, get_current_date_raw, int_to_datetime
+from utils.time import str_to_datetime, get_current_date_str, get_current_date_raw
+from utils.cq_code import image_payload_cache
+from core.bot.scheduler import TickScheduler, PeriodicJob, JobFunc, TICK_INTERVAL_FIVE_MINUTES, TICK_INTERVAL_HOUR
 from core.localization import LocalizationManager, LOC_GROUP_ONLY_NOTICE, LOC_PERMISSION_DENIED_NOTICE, LOC_FRIEND_ADD_NOTICE, LOC_GROUP_EXPIRE_WARNING
 from core.config import Paths
 from core.config.loader import ConfigLoader, ConfigValidationError
@@ -17,8 +19,11 @@ from core.communication import RequestData, FriendRequestData, JoinGroupRequestD
 from core.communication import NoticeData, FriendAddNoticeData, GroupIncreaseNoticeData
 from core.communication import GroupInfo
 from core.data import BotDatabase
-from core.data.models import UserStat, GroupStat, MetaStat, BotControl, UserNickname
-from core.statistics import MetaStatInfo, GroupStatInfo, UserStatInfo
+from core.data.models import GroupStat, MetaStat, BotControl, UserNickname
+from core.statistics import MetaStatInfo, GroupStatInfo
+from core.statistics.counter import StatCounterBuffer, STAT_ENTITY_META, STAT_ENTITY_USER, STAT_ENTITY_GROUP, \
+    STAT_META_ID, STAT_METRIC_MSG, STAT_METRIC_ROLL, STAT_METRIC_CMD_PREFIX, STAT_COUNTER_DETAIL_DAYS, \
+    STAT_FLUSH_INTERVAL, cmd_metric, date_to_day
 
 import shutil
 
@@ -35,6 +40,8 @@ except ImportError:
 
 NICKNAME_ERROR = "UNDEF_NAME"
 
+GROUP_INFO_FETCH_CONCURRENCY = 8  # 刷新群信息时同时向 OneBot 查询的群数量上限
+
 
 # noinspection PyBroadException
 class Bot:
@@ -49,6 +56,7 @@ class Bot:
         import core.command as command
         import module  # 加载各 module 子包以注册命令、本地化键等，需尽早 import
         from module.dice_hub import HubManager
+        from module.initiative import CombatStateService
         from adapter import ClientProxy
         self.account: str = account
         self.proxy: Optional[ClientProxy] = None
@@ -57,12 +65,16 @@ class Bot:
         Paths.ensure_dirs()
         self.fix_data()
         self.db = BotDatabase(self.account)
+        self.stat_buffer = StatCounterBuffer()
         self.hub_manager = HubManager(self)
+        self.combat_state = CombatStateService(self)
 
         # New config system: ConfigLoader + PersonaLoader
         self._cfg_loader = ConfigLoader(account=account)
         self._persona_loader = PersonaLoader()
         self.config: BotConfig = self._cfg_loader.load()
+        image_payload_cache.configure(max_bytes=self.config.image.cache_max_mb * 1024 * 1024,
+                                      send_mode=self.config.image.send_mode)
 
         # LocalizationManager now takes a PersonaLoader; no file paths needed
         self.loc_helper = LocalizationManager(persona_loader=self._persona_loader)
@@ -70,7 +82,7 @@ class Bot:
         self.command_dict: Dict[str, command.UserCommandBase] = {}
 
         self.tick_task: Optional[asyncio.Task] = None
-        self.todo_tasks: Dict[Union[Callable, asyncio.Task], Dict] = {}
+        self.scheduler = TickScheduler(self.dispatch_bot_commands)
         self._no_tick: bool = no_tick
 
         # Some packaged runs may receive events before on_bot_connect completes.
@@ -82,6 +94,7 @@ class Bot:
         # 设计意图：adapter 层发送群/私聊消息后，允许各模块订阅并记录。
         # 长期路径：引入轻量级事件总线彻底解耦。
         self._post_send_hooks: List[Callable[[str, str, str, str, str], Awaitable[None]]] = []
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
 
         self.start_up(readonly=readonly)
 
@@ -110,6 +123,20 @@ class Bot:
 
         return unregister
 
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None]]) -> Callable[[], None]:
+        """注册关闭前回调（在数据库关闭之前执行，用于写回缓存等）
+
+        返回注销函数，调用即可移除该 hook。
+        """
+        if hook not in self._shutdown_hooks:
+            self._shutdown_hooks.append(hook)
+
+        def unregister() -> None:
+            if hook in self._shutdown_hooks:
+                self._shutdown_hooks.remove(hook)
+
+        return unregister
+
     def start_up(self, readonly: bool = False):
         self.register_command()
         # Apply persona overrides after commands have registered their loc keys
@@ -117,20 +144,52 @@ class Bot:
 
     def register_task(self, task: Callable, is_async: bool = True, timeout: float = 10, timeout_callback: Optional[Callable] = None):
         """
+        注册一次性任务, tick_loop 启动后立即在独立的协程中运行
         Args:
             task: 等待执行的任务, 必须没有参数, 必须返回 List[BotCommandBase]
             is_async: task是否已经是异步函数, 如不是, 将会在其他线程上运行task; 若为同步函数, timeout必须为0
             timeout: 超时时间, 单位秒, 为0代表不会超时
             timeout_callback: 超时后调用的回调函数, 必须为同步函数, 同样也应该返回 List[BotCommandBase]
         """
-        assert is_async or timeout == 0
-        self.todo_tasks[task] = {"init": False, "is_async": is_async, "timeout": timeout, "callback": timeout_callback}
+        self.scheduler.run_once(task, is_async, timeout, timeout_callback)
 
-    async def tick_loop(self):
-        from core.command import BotCommandBase
-        loop = asyncio.get_event_loop()
-        time_counter = [loop.time()] * 2
+    def register_periodic_job(self, name: str, func: JobFunc, interval: float, timeout: float = 0, **kwargs) -> PeriodicJob:
+        """
+        注册周期任务, 每 interval 秒在独立的协程中运行一次, 上一次运行未结束时跳过
+        Args:
+            name: 任务名, 同名任务会被替换
+            func: 无参数的异步函数, 返回 List[BotCommandBase] 或 None
+            interval: 运行间隔, 单位秒
+            timeout: 单次运行的超时时间, 为0代表不会超时
+            kwargs: 见 PeriodicJob (jitter, initial_delay)
+        """
+        return self.scheduler.add_job(name, func, interval, timeout=timeout, **kwargs)
+
+    async def dispatch_bot_commands(self, bot_commands: List) -> None:
+        """执行定时任务与异步任务返回的指令"""
+        if self.proxy:
+            for command in bot_commands:
+                await self.proxy.process_bot_command(command)
+
+    def _register_command_ticks(self) -> None:
+        from core.command import UserCommandBase
+        for command in self.command_dict.values():
+            if type(command).tick is UserCommandBase.tick or command.tick_interval <= 0:
+                continue
+
+            def make_tick(cmd: UserCommandBase):
+                async def tick():
+                    res = cmd.tick()
+                    if asyncio.iscoroutine(res):
+                        res = await res
+                    return res
+                tick.__name__ = f"tick_{type(cmd).__name__}"
+                return tick
 
+            self.register_periodic_job(f"tick:{command.readable_name}", make_tick(command), command.tick_interval)
+
+    async def tick_loop(self):
+        """启动定时任务调度器并一直等待; 每个周期任务在独立的协程中运行, 取消本协程时停止所有任务"""
         _meta_stat_row = await self.db.meta_stat.get("meta")
         if _meta_stat_row and _meta_stat_row.data:
             meta_stat = MetaStatInfo()
@@ -142,96 +201,26 @@ class Bot:
             meta_stat = MetaStatInfo()
         meta_stat.update(is_first_time=True)
 
-        while True:
-            loop_begin_time = loop.time()
-            bot_commands: List[BotCommandBase] = []
-            try:
-                # tick each command
-                for command in self.command_dict.values():
-                    try:
-                        bot_commands += command.tick()
-                    except (AttributeError, TypeError, KeyError, RuntimeError):
-                        dice_log(str(self.handle_exception(f"Tick: {command.readable_name} CODE110")[0]))
-
-                if loop_begin_time - time_counter[0] > 60 * 5:  # 5分钟执行一次
-                    # 更新在线时间并尝试每日更新
-                    if meta_stat.update():
-                        await self.tick_daily(bot_commands)
-                    # 保存 meta_stat 到数据库
-                    await self.db.meta_stat.upsert(MetaStat(key="meta", data=meta_stat.serialize()))
-                    # 内存监控检查
-                    await self._check_memory_and_handle()
-                    # 更新计时器
-                    time_counter[0] = loop_begin_time
-
-                if loop_begin_time - time_counter[1] > 3600 * 4:  # 4小时执行一次
-                    # 更新群信息
-                    async def update_group_info():
-                        await self.update_group_info_all()
-                        return []
-                    self.register_task(update_group_info, timeout=3600)
-                    # 更新计时器
-                    time_counter[1] = loop_begin_time
-
-                if self.todo_tasks:
-                    free_time = max(loop_begin_time + 1 - loop.time(), 0.25)
-                    await self.process_async_task(bot_commands, free_time, loop)
+        async def tick_online():
+            bot_commands = []
+            # 更新在线时间并尝试每日更新
+            if meta_stat.update():
+                await self.tick_daily(bot_commands)
+            # 保存 meta_stat 到数据库
+            await self.db.meta_stat.upsert(MetaStat(key="meta", data=meta_stat.serialize()))
+            # 内存监控检查
+            await self._check_memory_and_handle()
+            return bot_commands
 
-                if self.proxy:
-                    for command in bot_commands:
-                        await self.proxy.process_bot_command(command)
-            except (AttributeError, TypeError, KeyError, RuntimeError):
-                bot_commands += self.handle_exception(f"Tick Loop: CODE113")
-
-            # 最多每秒执行一次循环
-            free_time = max(loop_begin_time + 1 - loop.time(), 0)
-            await asyncio.sleep(free_time)
-
-    async def process_async_task(self, bot_commands, free_time: float, loop):
-        init_task = [(task, info) for task, info in self.todo_tasks.items() if not info["init"]]
-        for func, info in init_task:
-            func: Callable
-            del self.todo_tasks[func]
-            if not info["is_async"]:
-                dice_log(f"[Async Task] Init Sync: {func.__name__}")
-
-                async def task_wrapper():
-                    future = loop.run_in_executor(None, func)
-                    await future
-                    return future.result()
-
-                task: asyncio.Task = asyncio.create_task(task_wrapper())
-            else:
-                dice_log(f"[Async Task] Init Async: {func.__name__}")
-                task: asyncio.Task = asyncio.create_task(func())
-            info["init"] = True
-            self.todo_tasks[task] = info
-
-        dice_log(f"[Async Task] Try: "
-                 f"{[(task.get_coro().cr_code.co_name, self.todo_tasks[task]['timeout']) for task in self.todo_tasks.keys()]}"
-                 f" for {free_time} s")
-        try:
-            done_tasks, pending_tasks = await asyncio.wait(self.todo_tasks.keys(), timeout=free_time)
-            task: asyncio.Task
-            for task in done_tasks:
-                try:
-                    bot_commands += task.result()
-                except (AttributeError, TypeError, RuntimeError):
-                    dice_log(str(self.handle_exception(f"Async Task: CODE114")[0]))
-                del self.todo_tasks[task]
-                dice_log(f"[Async Task] Finish {task.get_coro().cr_code.co_name}")
-            for task in pending_tasks:
-                if self.todo_tasks[task]["timeout"] > 0:
-                    self.todo_tasks[task]["timeout"] -= free_time
-                    if self.todo_tasks[task]["timeout"] < 0:
-                        dice_log(f"[Async Task] Timeout: {task.get_coro().cr_code.co_name}")
-                        if self.todo_tasks[task]["callback"]:
-                            dice_log(f"[Async Task] Timeout callback: {self.todo_tasks[task]['callback'].__name__}")
-                            bot_commands += self.todo_tasks[task]["callback"]()
-                        task.cancel()
-                        del self.todo_tasks[task]
-        except (AttributeError, TypeError, KeyError, RuntimeError):
-            dice_log(str(self.handle_exception(f"Async Task: CODE112")[0]))
+        async def update_group_info():
+            await self.update_group_info_all()
+            return []
+
+        self._register_command_ticks()
+        self.register_periodic_job("stat_flush", self.flush_stat, STAT_FLUSH_INTERVAL)
+        self.register_periodic_job("online", tick_online, TICK_INTERVAL_FIVE_MINUTES)
+        self.register_periodic_job("update_group_info", update_group_info, 4 * TICK_INTERVAL_HOUR, timeout=TICK_INTERVAL_HOUR)
+        await self.scheduler.run()
 
     async def _check_memory_and_handle(self) -> None:
         """内存监控：检查内存使用情况，必要时发送警告或触发重启"""
@@ -282,37 +271,24 @@ class Bot:
         except (AttributeError, TypeError, KeyError):
             return None
 
+    async def flush_stat(self) -> None:
+        """将内存中累加的统计计数写入数据库, 失败时计数保留到下次写入"""
+        if not len(self.stat_buffer):
+            return
+        try:
+            await self.stat_buffer.flush(self.db.stat_counter)
+        except Exception as e:
+            dice_log(f"[Stat] 写入统计 DB 失败: {e}")
+
     async def tick_daily(self, bot_commands):
-        # 更新用户统计
-        user_stat_rows = await self.db.user_stat.list_all()
-        user_updates = []
-        for user_stat_row in user_stat_rows:
-            if user_stat_row.data:
-                user_stat = UserStatInfo()
-                try:
-                    user_stat.deserialize(user_stat_row.data)
-                except Exception:
-                    user_stat = UserStatInfo()
-                user_stat.daily_update()
-                user_updates.append(
-                    UserStat(user_id=user_stat_row.user_id, data=user_stat.serialize())
-                )
-        await self.db.user_stat.upsert_many(user_updates)
-        # 更新群聊统计
-        group_stat_rows = await self.db.group_stat.list_all()
-        group_updates = []
-        for group_stat_row in group_stat_rows:
-            if group_stat_row.data:
-                group_stat = GroupStatInfo()
-                try:
-                    group_stat.deserialize(group_stat_row.data)
-                except Exception:
-                    group_stat = GroupStatInfo()
-                group_stat.daily_update()
-                group_updates.append(
-                    GroupStat(group_id=group_stat_row.group_id, data=group_stat.serialize())
-                )
-        await self.db.group_stat.upsert_many(group_updates)
+        # 统计按天记录, 不需要改写每个用户和群的数据; 只把超出保留天数的逐日计数折叠起来.
+        # 每个实体最后一次用指令的那天不折叠, 过期清理依据它判断活跃, 有效期可以长于保留天数
+        await self.flush_stat()
+        try:
+            detail_begin = get_current_date_raw().date() - datetime.timedelta(days=STAT_COUNTER_DETAIL_DAYS)
+            await self.db.stat_counter.rollup_before(date_to_day(detail_begin), keep_latest_prefix=STAT_METRIC_CMD_PREFIX)
+        except Exception as e:
+            dice_log(f"[Stat] 折叠早期统计失败: {e}")
 
         # 尝试清理过期群聊和过期用户信息
         async def clear_expired_data():
@@ -366,10 +342,16 @@ class Bot:
         shutdown的异步版本
         销毁bot对象时触发, 可能是bot断连, 或关闭应用导致的
         """
-        await self.db.close()
-
+        for hook in list(self._shutdown_hooks):
+            try:
+                await hook()
+            except Exception as e:
+                dice_log(f"[Bot] [Shutdown] 关闭回调执行失败: {e}")
         if self.tick_task:
             self.tick_task.cancel()
+        self.scheduler.stop()
+        await self.flush_stat()
+        await self.db.close()
         # 注意如果保存时文件不存在会用当前值写入default, 如果在读取自定义设置后删掉文件再保存, 就会得到一个不是默认的default sheet
         # config is read-only at runtime; hot-reload is triggered via .reload command
 
@@ -537,27 +519,6 @@ class Bot:
 
         bot_commands: List[BotCommandBase] = []
 
-        # 统计信息 —— 从 SQLite 读取，失败则创建默认值
-        _meta_stat_row = await self.db.meta_stat.get("meta")
-        if _meta_stat_row and _meta_stat_row.data:
-            meta_stat = MetaStatInfo()
-            try:
-                meta_stat.deserialize(_meta_stat_row.data)
-            except Exception:
-                meta_stat = MetaStatInfo()
-        else:
-            meta_stat = MetaStatInfo()
-
-        _user_stat_row = await self.db.user_stat.get(meta.user_id)
-        if _user_stat_row and _user_stat_row.data:
-            user_stat = UserStatInfo()
-            try:
-                user_stat.deserialize(_user_stat_row.data)
-            except Exception:
-                user_stat = UserStatInfo()
-        else:
-            user_stat = UserStatInfo()
-
         # 修改meta的permission参数
         # 4:骰主 3:骰管理 2:群主 1:群管理 0:普通人 -1:黑名单
         if meta.user_id in self.config.master:
@@ -572,23 +533,11 @@ class Bot:
                     meta.permission = 1
                 else: #elif meta.sender.role == "member": # 群员，或普通人
                     meta.permission = 0
-        # 群内资料同步 —— 从 SQLite 读取
+        # 统计收到的消息数量, 计数先累加在内存中, 由 tick_loop 定期写入数据库
+        stat_entities = [(STAT_ENTITY_META, STAT_META_ID), (STAT_ENTITY_USER, meta.user_id)]
         if meta.group_id:
-            _group_stat_row = await self.db.group_stat.get(meta.group_id)
-            if _group_stat_row and _group_stat_row.data:
-                group_stat = GroupStatInfo()
-                try:
-                    group_stat.deserialize(_group_stat_row.data)
-                except Exception:
-                    group_stat = GroupStatInfo()
-            else:
-                group_stat = GroupStatInfo()
-        else:
-            group_stat = GroupStatInfo()
-        # 统计收到的消息数量
-        meta_stat.msg.inc()
-        group_stat.msg.inc()
-        user_stat.msg.inc()
+            stat_entities.append((STAT_ENTITY_GROUP, meta.group_id))
+        self.stat_buffer.inc_entities(stat_entities, STAT_METRIC_MSG)
 
         # 处理分行指令
         command_split: str = self.config.command_split
@@ -641,9 +590,7 @@ class Bot:
 
                 # 统计处理的指令情况
                 if command.flag and res_commands:
-                    meta_stat.cmd.record(command)
-                    user_stat.cmd.record(command)
-                    group_stat.cmd.record(command)
+                    self.stat_buffer.inc_entities(stat_entities, cmd_metric(command.flag))
 
                 if not should_pass:  # 已经处理过, 不需要再传递给后面的指令
                     break
@@ -666,15 +613,6 @@ class Bot:
             # 处理指令
             await self.proxy.process_bot_command_list(bot_commands)
 
-        # 将统计数据写回 SQLite
-        try:
-            await self.db.user_stat.upsert(UserStat(user_id=meta.user_id, data=user_stat.serialize()))
-            await self.db.meta_stat.upsert(MetaStat(key="meta", data=meta_stat.serialize()))
-            if meta.group_id:
-                await self.db.group_stat.upsert(GroupStat(group_id=meta.group_id, data=group_stat.serialize()))
-        except Exception as _exc:
-            dice_log(f"[Stat] 写入统计 DB 失败: {_exc}")
-
         return bot_commands
 
     def process_request(self, data: RequestData) -> Optional[bool]:
@@ -767,6 +705,26 @@ class Bot:
             return _nick_row.nickname
         return NICKNAME_ERROR
 
+    async def get_nicknames(self, user_ids: List[str], group_id: str = "") -> Dict[str, str]:
+        """
+        批量获取用户昵称, 优先级与 get_nickname 相同, 一次查询完成
+        Args:
+            user_ids: 账号列表
+            group_id: 群号, 为空代表默认
+        Returns:
+            账号 -> 昵称, 找不到时为 NICKNAME_ERROR
+        """
+        if not group_id:
+            group_id = "default"
+        priority = [group_id, "default", "origin"]
+        rows = await self.db.nickname.list_in("user_id", user_ids, group_id=priority)
+        best: Dict[str, tuple] = {}
+        for row in rows:
+            rank = priority.index(row.group_id)
+            if row.user_id not in best or rank < best[row.user_id][0]:
+                best[row.user_id] = (rank, row.nickname)
+        return {uid: best[uid][1] if uid in best else NICKNAME_ERROR for uid in user_ids}
+
     async def update_nickname(self, user_id: str, group_id: str = "", nickname: str = ""):
         """
         更新昵称
@@ -782,39 +740,57 @@ class Bot:
             await self.db.nickname.upsert(UserNickname(user_id=user_id, group_id=group_id, nickname=nickname))
 
     async def update_group_info_all(self) -> List[GroupInfo]:
+        """
+        刷新所有群的群名与成员数: 批量读取 group_stat, 在内存中合并后一次写回; 已退出的群成员数记为-1
+        """
         if not self.proxy:
             return []
         group_info_list: List[GroupInfo] = await self.proxy.get_group_list()
-        group_stat_rows = await self.db.group_stat.list_all()
-        all_group_id = set(row.group_id for row in group_stat_rows)
-        valid_group_id = set((info.group_id for info in group_info_list))
-        for info in group_info_list:
-            _row = await self.db.group_stat.get(info.group_id)
+        await self._fill_group_member_count(group_info_list)
+        info_dict: Dict[str, GroupInfo] = {info.group_id: info for info in group_info_list}
+        known_group_id = [row["group_id"] for row in await self.db.group_stat.list_projection([])]
+        all_group_id = list(info_dict) + [group_id for group_id in known_group_id if group_id not in info_dict]
+        group_rows = {row.group_id: row for row in await self.db.group_stat.list_in("group_id", all_group_id)}
+
+        group_updates = []
+        for group_id in all_group_id:
+            group_stat = GroupStatInfo()
+            _row = group_rows.get(group_id)
             if _row and _row.data:
-                group_stat = GroupStatInfo()
                 try:
                     group_stat.deserialize(_row.data)
                 except Exception:
                     group_stat = GroupStatInfo()
+            info = info_dict.get(group_id)
+            if info:
+                group_stat.meta.update(info.group_name, info.member_count, info.max_member_count)
+            elif group_stat.meta.member_count == -1 and group_stat.meta.max_member == -1:
+                continue
             else:
-                group_stat = GroupStatInfo()
-            group_stat.meta.update(info.group_name, info.member_count, info.max_member_count)
-            await self.db.group_stat.upsert(GroupStat(group_id=info.group_id, data=group_stat.serialize()))
-        for group_id in all_group_id.difference(valid_group_id):
-            _row = await self.db.group_stat.get(group_id)
-            if _row and _row.data:
-                group_stat = GroupStatInfo()
+                group_stat.meta.member_count = -1
+                group_stat.meta.max_member = -1
+            group_updates.append(GroupStat(group_id=group_id, data=group_stat.serialize()))
+        await self.db.group_stat.upsert_many(group_updates)
+        return group_info_list
+
+    async def _fill_group_member_count(self, group_info_list: List[GroupInfo]) -> None:
+        """部分 OneBot 实现的群列表不包含成员数, 对这些群单独查询群信息, 同时进行的查询不超过 GROUP_INFO_FETCH_CONCURRENCY 个"""
+        missing = [info for info in group_info_list if info.member_count <= 0]
+        if not missing:
+            return
+        semaphore = asyncio.Semaphore(GROUP_INFO_FETCH_CONCURRENCY)
+
+        async def fetch(info: GroupInfo):
+            async with semaphore:
                 try:
-                    group_stat.deserialize(_row.data)
-                except Exception:
-                    group_stat = GroupStatInfo()
-            else:
-                group_stat = GroupStatInfo()
-            group_stat.meta.member_count = -1
-            group_stat.meta.max_member = -1
-            await self.db.group_stat.upsert(GroupStat(group_id=group_id, data=group_stat.serialize()))
+                    detail = await self.proxy.get_group_info(info.group_id)
+                except Exception as e:
+                    dice_log(f"[GroupInfo] 获取群{info.group_id}信息失败: {e}")
+                    return
+            info.member_count, info.max_member_count = detail.member_count, detail.max_member_count
+            info.group_name = detail.group_name or info.group_name
 
-        return group_info_list
+        await asyncio.gather(*(fetch(info) for info in missing))
 
     def fix_data(self):
         pass
@@ -832,85 +808,63 @@ class Bot:
         if not is_data_expire:
             return []
         result_commands: List[BotCommandBase] = []
-        index = 0
 
         white_list_group: List[str] = self.config.white_list_group
         white_list_user: List[str] = self.config.white_list_user
 
-        # 清理过期用户信息
-        user_stat_rows = await self.db.user_stat.list_all()
-        all_user_id: Set[str] = set(row.user_id for row in user_stat_rows)
+        # 清理过期用户信息, 活跃情况由统计计数判断: 有效期内用过指令或累计掷骰超过200次
+        await self.flush_stat()
+        stat_counter = self.db.stat_counter
+        user_expire_begin = date_to_day(cur_date.date() - datetime.timedelta(days=user_expire_day))
+        user_last_cmd_day = await stat_counter.last_active_day(STAT_ENTITY_USER, STAT_METRIC_CMD_PREFIX)
+        user_roll_total = await stat_counter.sum_by_entity(STAT_ENTITY_USER, STAT_METRIC_ROLL)
+        all_user_id: Set[str] = set(await stat_counter.list_entities(STAT_ENTITY_USER))
+        all_user_id.update(row["user_id"] for row in await self.db.user_stat.list_projection([]))
         invalid_user_id = []
         for user_id in all_user_id:
-            is_valid = False
             if user_id in white_list_user:
                 continue
-            _row = await self.db.user_stat.get(user_id)
-            if not _row or not _row.data:
-                invalid_user_id.append(user_id)
+            if user_roll_total.get(user_id, 0) > 200 or user_last_cmd_day.get(user_id, 0) > user_expire_begin:
                 continue
-            user_stat = UserStatInfo()
-            try:
-                user_stat.deserialize(_row.data)
-            except Exception:
-                invalid_user_id.append(user_id)
-                continue
-            if user_stat.roll.times.total_val > 200:
-                is_valid = True
-            for flag in user_stat.cmd.flag_dict.keys():
-                flag_date = int_to_datetime(user_stat.cmd.flag_dict[flag].update_time)
-                if cur_date - flag_date < datetime.timedelta(days=user_expire_day):
-                    is_valid = True
-                    break
-            if not is_valid:
-                invalid_user_id.append(user_id)
-            index += 1
-            if index % 500 == 0:
-                await asyncio.sleep(0)
-        for user_id in invalid_user_id:
-            await self.db.user_stat.delete(user_id)
-
-        # 清理过期群聊消息
-        group_stat_rows = await self.db.group_stat.list_all()
-        all_group_id: Set[str] = set(row.group_id for row in group_stat_rows)
+            invalid_user_id.append(user_id)
+        await self.db.user_stat.delete_many([(user_id,) for user_id in invalid_user_id])
+        await stat_counter.delete_entities(STAT_ENTITY_USER, invalid_user_id)
+
+        # 清理过期群聊消息, 群信息与提醒次数仍保存在 group_stat 中
+        group_expire_begin = date_to_day(cur_date.date() - datetime.timedelta(days=group_expire_day))
+        group_last_cmd_day = await stat_counter.last_active_day(STAT_ENTITY_GROUP, STAT_METRIC_CMD_PREFIX)
+        all_group_id: Set[str] = set(await stat_counter.list_entities(STAT_ENTITY_GROUP))
+        all_group_id.update(row["group_id"] for row in await self.db.group_stat.list_projection([]))
+        inactive_group_id = [group_id for group_id in all_group_id if group_id not in white_list_group
+                             and group_last_cmd_day.get(group_id, 0) <= group_expire_begin]
+        group_rows = {row.group_id: row for row in await self.db.group_stat.list_in("group_id", inactive_group_id)}
         invalid_group_id = []
         warning_group_id = []
-        for group_id in all_group_id:
-            is_valid = False
-            if group_id in white_list_group:
-                continue
-            _row = await self.db.group_stat.get(group_id)
-            if not _row or not _row.data:
-                invalid_group_id.append(group_id)
-                continue
+        warning_updates = []
+        for group_id in inactive_group_id:
             group_stat = GroupStatInfo()
-            try:
-                group_stat.deserialize(_row.data)
-            except Exception:
-                invalid_group_id.append(group_id)
-                continue
-            for flag in group_stat.cmd.flag_dict.keys():
-                flag_date = int_to_datetime(group_stat.cmd.flag_dict[flag].update_time)
-                if cur_date - flag_date < datetime.timedelta(days=group_expire_day):
-                    is_valid = True
-                    break
-            if not is_valid and group_stat.meta.warn_time < group_expire_time:
-                is_valid = True
+            _row = group_rows.get(group_id)
+            if _row and _row.data:
+                try:
+                    group_stat.deserialize(_row.data)
+                except Exception:
+                    invalid_group_id.append(group_id)
+                    continue
+            if group_stat.meta.warn_time < group_expire_time:
                 group_stat.meta.warn_time += 1
                 if group_stat.meta.member_count > 0:
                     result_commands.append(BotDelayCommand(self.account, seconds=random.random() * 10 + 2))
                     result_commands.append(BotSendMsgCommand(self.account, group_expire_warn, [GroupMessagePort(group_id)]))
                     warning_group_id.append(group_id)
-                await self.db.group_stat.upsert(GroupStat(group_id=group_id, data=group_stat.serialize()))
-            if not is_valid:
+                warning_updates.append(GroupStat(group_id=group_id, data=group_stat.serialize()))
+            else:
                 invalid_group_id.append(group_id)
-            index += 1
-            if index % 500 == 0:
-                await asyncio.sleep(0)
+        await self.db.group_stat.upsert_many(warning_updates)
         for group_id in invalid_group_id:
             result_commands.append(BotDelayCommand(self.account, seconds=random.random() * 10 + 2))
             result_commands.append(BotLeaveGroupCommand(self.account, group_id))
-            await self.db.group_stat.delete(group_id)
+        await self.db.group_stat.delete_many([(group_id,) for group_id in invalid_group_id])
+        await stat_counter.delete_entities(STAT_ENTITY_GROUP, invalid_group_id)
 
         # 给Master汇报清理情况
         if self.get_master_ids():
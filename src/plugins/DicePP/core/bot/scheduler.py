@@ -0,0 +1,225 @@
+"""
+定时任务调度
+
+每个周期任务在独立的协程中按自己的间隔运行, 某个任务耗时过长不会拖慢其他任务.
+同一任务上一次运行尚未结束时跳过本次运行 (防止堆积), 并记录每个任务的运行次数、耗时与错误.
+一次性任务 (Bot.register_task) 也由调度器直接启动, 不再每秒轮询.
+"""
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from utils.logger import dice_log, get_exception_info
+
+# 常用的 tick 间隔 (秒)
+TICK_INTERVAL_SECOND = 1
+TICK_INTERVAL_MINUTE = 60
+TICK_INTERVAL_FIVE_MINUTES = 5 * 60
+TICK_INTERVAL_HOUR = 3600
+
+DEFAULT_JITTER = 0.1  # 每次等待时额外随机增加 0~jitter*interval 秒, 避免多个任务总在同一时刻运行
+
+# 周期任务: 无参数的异步函数, 返回需要执行的 BotCommand 列表 (或 None)
+JobFunc = Callable[[], Awaitable[Optional[List[Any]]]]
+
+
+class PeriodicJob:
+    def __init__(self, name: str, func: JobFunc, interval: float, jitter: float = DEFAULT_JITTER,
+                 timeout: float = 0, initial_delay: Optional[float] = None):
+        """
+        Args:
+            name: 任务名, 同名任务会被替换
+            func: 任务函数
+            interval: 运行间隔, 单位秒
+            jitter: 随机延迟占间隔的比例
+            timeout: 单次运行的超时时间, 超时后取消本次运行, 为0代表不会超时
+            initial_delay: 启动后第一次运行前的等待时间, 默认为一个间隔
+        """
+        assert interval > 0
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.initial_delay = interval if initial_delay is None else initial_delay
+
+        self.loop_task: Optional[asyncio.Task] = None
+        self.run_task: Optional[asyncio.Task] = None
+
+        self.runs: int = 0
+        self.failures: int = 0
+        self.timeouts: int = 0
+        self.skipped: int = 0
+        self.last_duration: float = 0
+        self.max_duration: float = 0
+        self.total_duration: float = 0
+        self.last_run_time: float = 0  # time.time()
+        self.last_error: str = ""
+
+    @property
+    def is_running(self) -> bool:
+        return self.run_task is not None and not self.run_task.done()
+
+    def next_delay(self, first: bool = False) -> float:
+        delay = self.initial_delay if first else self.interval
+        return delay + random.random() * self.jitter * self.interval
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "skipped": self.skipped,
+            "running": self.is_running,
+            "last_duration": self.last_duration,
+            "max_duration": self.max_duration,
+            "avg_duration": self.total_duration / self.runs if self.runs else 0,
+            "last_run_time": self.last_run_time,
+            "last_error": self.last_error,
+        }
+
+
+class TickScheduler:
+    def __init__(self, dispatch: Callable[[List[Any]], Awaitable[None]]):
+        """
+        Args:
+            dispatch: 处理任务返回的 BotCommand 列表
+        """
+        self._dispatch = dispatch
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._running: bool = False
+        self._pending_once: List[Callable[[], Awaitable[None]]] = []
+        self._once_tasks: Set[asyncio.Task] = set()
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def add_job(self, name: str, func: JobFunc, interval: float, jitter: float = DEFAULT_JITTER,
+                timeout: float = 0, initial_delay: Optional[float] = None) -> PeriodicJob:
+        """注册周期任务, 调度器已启动时立即开始计时"""
+        self.remove_job(name)
+        job = PeriodicJob(name, func, interval, jitter, timeout, initial_delay)
+        self.jobs[name] = job
+        if self._running:
+            job.loop_task = asyncio.create_task(self._job_loop(job))
+        return job
+
+    def remove_job(self, name: str) -> None:
+        job = self.jobs.pop(name, None)
+        if job and job.loop_task:
+            job.loop_task.cancel()
+
+    def run_once(self, func: Callable, is_async: bool = True, timeout: float = 0,
+                 timeout_callback: Optional[Callable[[], List[Any]]] = None) -> None:
+        """
+        运行一次性任务, 调度器未启动时等到启动后再运行
+        Args:
+            func: 必须没有参数, 必须返回 List[BotCommandBase]
+            is_async: func是否是异步函数, 如不是, 将会在其他线程上运行; 若为同步函数, timeout必须为0
+            timeout: 超时时间, 单位秒, 为0代表不会超时
+            timeout_callback: 超时后调用的回调函数, 必须为同步函数, 同样也应该返回 List[BotCommandBase]
+        """
+        assert is_async or timeout == 0
+
+        async def runner():
+            name = func.__name__
+            dice_log(f"[Async Task] Init {'Async' if is_async else 'Sync'}: {name}")
+            try:
+                if is_async:
+                    awaitable = func()
+                else:
+                    awaitable = asyncio.get_running_loop().run_in_executor(None, func)
+                result = await (asyncio.wait_for(awaitable, timeout) if timeout > 0 else awaitable)
+            except asyncio.TimeoutError:
+                dice_log(f"[Async Task] Timeout: {name}")
+                result = timeout_callback() if timeout_callback else []
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                dice_log(f"[Async Task] Error: {name} CODE114\n" + "\n".join(get_exception_info()[-8:]))
+                return
+            dice_log(f"[Async Task] Finish {name}")
+            await self._dispatch(result or [])
+
+        if self._running:
+            self._spawn_once(runner)
+        else:
+            self._pending_once.append(runner)
+
+    def _spawn_once(self, runner: Callable[[], Awaitable[None]]) -> None:
+        task = asyncio.create_task(runner())
+        self._once_tasks.add(task)
+        task.add_done_callback(self._once_tasks.discard)
+
+    async def run(self) -> None:
+        """启动所有任务并一直等待, 直到被取消; 取消时停止所有任务"""
+        self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.stop()
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        for job in self.jobs.values():
+            job.loop_task = asyncio.create_task(self._job_loop(job))
+        pending, self._pending_once = self._pending_once, []
+        for runner in pending:
+            self._spawn_once(runner)
+
+    def stop(self) -> None:
+        """取消所有周期任务 (包括正在进行的运行) 与一次性任务, 已注册的周期任务保留, 再次启动时重新计时"""
+        self._running = False
+        for job in self.jobs.values():
+            for task in (job.loop_task, job.run_task):
+                if task and not task.done():
+                    task.cancel()
+            job.loop_task = job.run_task = None
+        for task in list(self._once_tasks):
+            task.cancel()
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: job.get_metrics() for name, job in self.jobs.items()}
+
+    async def _job_loop(self, job: PeriodicJob) -> None:
+        first = True
+        while True:
+            await asyncio.sleep(job.next_delay(first))
+            first = False
+            if job.is_running:  # 上一次运行尚未结束
+                job.skipped += 1
+                continue
+            job.run_task = asyncio.create_task(self._run_job(job))
+
+    async def _run_job(self, job: PeriodicJob) -> None:
+        start = time.perf_counter()
+        job.last_run_time = time.time()
+        result = None
+        try:
+            result = await (asyncio.wait_for(job.func(), job.timeout) if job.timeout > 0 else job.func())
+        except asyncio.TimeoutError:
+            job.timeouts += 1
+            job.last_error = f"timeout after {job.timeout}s"
+            dice_log(f"[Scheduler] Timeout: {job.name}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = repr(e)
+            dice_log(f"[Scheduler] Error: {job.name} CODE110\n" + "\n".join(get_exception_info()[-8:]))
+        finally:
+            duration = time.perf_counter() - start
+            job.runs += 1
+            job.last_duration = duration
+            job.max_duration = max(job.max_duration, duration)
+            job.total_duration += duration
+        if result:
+            try:
+                await self._dispatch(result)
+            except Exception:
+                dice_log(f"[Scheduler] Dispatch Error: {job.name} CODE113\n" + "\n".join(get_exception_info()[-8:]))
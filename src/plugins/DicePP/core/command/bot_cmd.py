@@ -1,8 +1,8 @@
 import abc
-import re
 from typing import List
 
 from core.communication import MessagePort
+from utils.cq_code import mask_base64_images
 
 from nonebot.adapters.onebot.v11 import Message as CQMessage
 
@@ -26,10 +26,7 @@ class BotSendMsgCommand(BotCommandBase):
         self.targets = targets
 
     def __str__(self):
-        def handle_base64img(match):  # 如果是base64编码就不要显示了
-            return "[CQ:image,file=base64:...]"
-
-        processed_msg = re.sub(r"\[CQ:image,file=base64:.*]", handle_base64img, self.msg)
+        processed_msg = mask_base64_images(self.msg)  # 如果是base64编码就不要显示了
         s = f"Bot \033[0;37m{self.bot_id}\033[0m send message \033[0;33m{processed_msg}\033[0m to "
         s += '\n\t'.join([str(target) for target in self.targets])
         return s
@@ -77,10 +74,7 @@ class BotSendForwardMsgCommand(BotCommandBase):
             self.msg_json_list.append({"type": "node","data": {"name": name,"uin": int(bot_id),"content": CQMessage(sub_msg)}})
 
     def __str__(self):
-        def handle_base64img(match):  # 如果是base64编码就不要显示了
-            return "[CQ:image,file=base64:...]"
-
-        processed_msg = re.sub(r"\[CQ:image,file=base64:.*]", handle_base64img, "\n".join([("|" + msg.splitlines()[0] + "...") for msg in self.msg]))
+        processed_msg = mask_base64_images("\n".join([("|" + msg.splitlines()[0] + "...") for msg in self.msg]))
         s = f"Bot \033[0;37m{self.bot_id}\033[0m send message \033[0;33m{processed_msg}\033[0m to "
         s += '\n\t'.join([str(target) for target in self.targets])
         return s
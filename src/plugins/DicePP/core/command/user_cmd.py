@@ -20,6 +20,8 @@ class UserCommandBase(metaclass=abc.ABCMeta):
     group_only: bool = False
     permission_require: int = 0
 
+    tick_interval: float = 1  # tick 的调用间隔, 单位秒; 为0时不调用 tick. 常用值见 core.bot.scheduler 中的 TICK_INTERVAL_*
+
     def __init__(self, bot: Bot):
         """
         Args:
@@ -33,7 +35,11 @@ class UserCommandBase(metaclass=abc.ABCMeta):
         return []
 
     def tick(self) -> List[BotCommandBase]:
-        """每秒调用一次的方法"""
+        """
+        每 tick_interval 秒调用一次的方法, 也可以定义为异步方法. 每个指令的 tick 在独立的协程中运行,
+        上一次调用尚未结束时跳过本次调用. 没有重写 tick 的指令不会被调度
+        需要更多周期任务时可以在 delay_init 中调用 self.bot.register_periodic_job
+        """
         return []
 
     def tick_daily(self) -> List[BotCommandBase]:
@@ -1,15 +1,43 @@
 import html
+import re
+from functools import lru_cache
 
-from zhconv import convert
-from utils.string import to_english_str
+from utils.string import FULLWIDTH_TO_ASCII
+
+# zhconv 简体转换表中的词条都含有汉字, 或是直角引号「」『』｢｣; 不含这些字符的消息无需转换
+_ZH_CONVERTIBLE_RE = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0003134f「」『』｢｣]")
+
+# 指令等短消息重复率高, 缓存其预处理结果
+PREPROCESS_CACHE_MAX_LEN = 64
+PREPROCESS_CACHE_SIZE = 2048
+
+
+def _normalize(msg_str: str) -> str:
+    if msg_str.isascii():
+        # 纯 ASCII: 没有全角字符, 也没有需要简繁转换的字
+        msg_str = msg_str.lower().strip()
+        if "&" not in msg_str:
+            return msg_str
+        msg_str = html.unescape(msg_str)
+        if msg_str.isascii():
+            return msg_str
+    else:
+        msg_str = msg_str.translate(FULLWIDTH_TO_ASCII).lower().strip()  # 转换中文标点, 转换小写, 去掉前后空格
+        if "&" in msg_str:
+            msg_str = html.unescape(msg_str)  # html实体转义: &#36; -> $
+    if _ZH_CONVERTIBLE_RE.search(msg_str):
+        from zhconv import convert  # 首次遇到中文时才加载转换表
+        msg_str = convert(msg_str, 'zh-cn')  # 转换简体处理
+    return msg_str
+
+
+_normalize_cached = lru_cache(maxsize=PREPROCESS_CACHE_SIZE)(_normalize)
 
 
 def preprocess_msg(msg_str: str) -> str:
     """
-    预处理消息字符串
+    预处理消息字符串: 转换中文标点与全角字符, 转换小写, 去掉前后空格, html实体转义, 转换简体
     """
-    msg_str = to_english_str(msg_str)  # 转换中文标点
-    msg_str = msg_str.lower().strip()  # 转换小写, 去掉前后空格
-    msg_str = html.unescape(msg_str)   # html实体转义: &#36; -> $
-    msg_str = convert(msg_str, 'zh-cn')# 转换简体处理
-    return msg_str
+    if len(msg_str) <= PREPROCESS_CACHE_MAX_LEN:
+        return _normalize_cached(msg_str)
+    return _normalize(msg_str)
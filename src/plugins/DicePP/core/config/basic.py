@@ -17,6 +17,7 @@ class Paths:
     DATA_DIR:      Path = PROJECT_ROOT / "data"
     DATA_BOTS_DIR: Path = DATA_DIR / "bots"
     LOCAL_IMG_DIR: Path = DATA_DIR / "local_images"
+    DATA_CACHE_DIR: Path = DATA_DIR / "cache"  # 可随时删除的编译缓存
 
     CONTENT_DIR:         Path = PROJECT_ROOT / "content"
     CONTENT_QUERIES_DIR: Path = CONTENT_DIR / "queries"
@@ -75,7 +75,13 @@ class PersonaConfig(BaseModel):
     auxiliary_model: str = "gpt-4o-mini"
     
     max_concurrent_requests: int = 2
+    auxiliary_max_concurrent_requests: int = 0  # 辅助模型独立并发池大小，0 表示与 max_concurrent_requests 相同
     timeout: int = 30
+
+    # ── 流式回复：对话回复按句/段分条发出，首条更早送达
+    stream_enabled: bool = False
+    stream_min_gap_seconds: float = 1.5   # 相邻两条的最小间隔，间隔内到达的句子合并发送
+    stream_min_segment_chars: int = 12    # 不足该字数的句子与后文合并
     timezone: str = "Asia/Shanghai"
 
     # ── Phase 3: 短期记忆限制
@@ -100,6 +106,11 @@ class PersonaConfig(BaseModel):
         default=180,
         description="单条消息 token 上限（基于字符统计的估算值，超长先截断）",
     )
+    group_history_cache_groups: int = Field(
+        default=256,
+        ge=0,
+        description="进程内缓存最近群聊历史的群数量上限（0 表示禁用，每轮直接查询数据库）",
+    )
     search_chat_history_max_chars: int = Field(
         default=180,
         description="search_chat_history 工具返回内容的最大字符数（超出截断）",
@@ -122,6 +133,41 @@ class PersonaConfig(BaseModel):
     
     game_enabled: bool = True
     scoring_interval: int = 5
+    # ── 后台互动队列：好感度衰减、批量评分与画像合并移出回复路径
+    background_interaction_enabled: bool = Field(
+        default=True,
+        description="是否将每轮对话后的关系更新/批量评分放入后台队列（关闭则在回复前同步执行）",
+    )
+    interaction_queue_max_pending: int = Field(
+        default=512,
+        ge=1,
+        description="后台互动队列最多挂起的 (用户, 群) 数，满时回退为同步执行",
+    )
+    interaction_queue_max_retries: int = Field(
+        default=2,
+        ge=0,
+        description="后台互动任务失败后的最大重试次数",
+    )
+    interaction_queue_retry_delay_seconds: float = Field(
+        default=2.0,
+        ge=0,
+        description="后台互动任务首次重试的延迟秒数（之后按 2 倍递增）",
+    )
+    state_cache_entries: int = Field(
+        default=2048,
+        ge=0,
+        description="进程内缓存的关系/画像条数上限（0 表示禁用，每次更新立即写库）",
+    )
+    state_write_back_interval_seconds: float = Field(
+        default=30.0,
+        ge=0,
+        description="缓存中的关系/画像定时写回数据库的间隔秒数（关闭时也会写回）",
+    )
+    shutdown_drain_timeout_seconds: float = Field(
+        default=10.0,
+        ge=0,
+        description="关闭时等待后台互动队列处理完毕的最长秒数",
+    )
     # ── Phase 2: 好感度时间衰减
     decay_enabled: bool = True
     decay_grace_period_hours: int = 8
@@ -290,6 +336,12 @@ class ModeConfig(BaseModel):
     default: str = "DND5E2024"
 
 
+class ImageConfig(BaseModel):
+    # 本地图片发送方式: base64 内联发送; file 发送 file:// 路径 (OneBot 实现须能访问骰娘所在的文件系统)
+    send_mode: str = "base64"
+    cache_max_mb: int = 64  # 已编码图片缓存的上限 (MB), 0 表示不缓存
+
+
 class BotConfig(BaseModel):
     """Top-level configuration model for a single Bot instance."""
 
@@ -331,3 +383,4 @@ class BotConfig(BaseModel):
     query: QueryConfig = Field(default_factory=QueryConfig)
     log: LogConfig = Field(default_factory=LogConfig)
     mode: ModeConfig = Field(default_factory=ModeConfig)
+    image: ImageConfig = Field(default_factory=ImageConfig)
@@ -3,6 +3,7 @@ from core.data.json_object import JsonObject, custom_json_object
 from core.data.database import BotDatabase
 from core.data.repository import Repository
 from core.data.log_repository import LogRepository
+from core.data.stat_counter_repository import StatCounterRepository
 from core.data.models import (
     UserKarma,
     InitEntity,
@@ -20,6 +21,7 @@ __all__ = [
     "BotDatabase",
     "Repository",
     "LogRepository",
+    "StatCounterRepository",
     "UserKarma",
     "InitEntity",
     "InitList",
@@ -1,12 +1,13 @@
 import os
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 
 import aiosqlite
 
 from core.config.basic import Paths
 from core.data.migrations import MigrationExecutionError, MigrationRunner, default_registry
-from .repository import Repository
+from .repository import Projections, Repository, WriteHook
 from .log_repository import LogRepository
+from .stat_counter_repository import StatCounterRepository
 from .query_store import QueryStore
 from .models import (
     UserKarma,
@@ -26,6 +27,15 @@ from .models import (
     UserFavor,
 )
 
+# characters_dnd 的生命值投影列，生命值列表 / 先攻查看只需读这些列；列由 v3 迁移创建
+CHARACTERS_DND_PROJECTIONS: Projections = {
+    "hp_cur": lambda char: char.hp_info.hp_cur,
+    "hp_max": lambda char: char.hp_info.hp_max,
+    "hp_temp": lambda char: char.hp_info.hp_temp,
+    "hp_alive": lambda char: int(char.hp_info.is_alive),
+    "is_init": lambda char: int(char.is_init),
+}
+
 
 class BotDatabase:
     def __init__(self, bot_id: str):
@@ -50,11 +60,33 @@ class BotDatabase:
         self._user_stat: Optional[Repository[UserStat]] = None
         self._group_stat: Optional[Repository[GroupStat]] = None
         self._meta_stat: Optional[Repository[MetaStat]] = None
+        self._stat_counter: Optional[StatCounterRepository] = None
         self._npc_health: Optional[Repository[NPCHealth]] = None
         self._variable: Optional[Repository[UserVariable]] = None
         self._favor: Optional[Repository[UserFavor]] = None
         self.query: QueryStore = QueryStore()
         self._migration_runner: Optional[MigrationRunner] = None
+        # 表名 -> 写入钩子列表，连接前即可注册，重连后依然有效
+        self._write_hooks: Dict[str, List[WriteHook]] = {}
+
+    def add_write_hook(self, table_name: str, hook: WriteHook) -> Callable[[], None]:
+        """
+        注册表写入钩子：通过 Repository 写入或删除记录后以主键调用，返回取消注册的函数。
+        钩子在事件循环上同步执行，只应做缓存失效之类的轻量工作。
+        """
+        hooks = self._write_hooks.setdefault(table_name, [])
+        hooks.append(hook)
+
+        def _unregister() -> None:
+            try:
+                hooks.remove(hook)
+            except ValueError:
+                pass
+
+        return _unregister
+
+    def _hooks_for(self, table_name: str) -> List[WriteHook]:
+        return self._write_hooks.setdefault(table_name, [])
 
     @property
     def karma(self) -> Repository[UserKarma]:
@@ -134,6 +166,12 @@ class BotDatabase:
             raise RuntimeError("Database not connected. Call connect() first.")
         return self._meta_stat
 
+    @property
+    def stat_counter(self) -> StatCounterRepository:
+        if self._stat_counter is None:
+            raise RuntimeError("Database not connected. Call connect() first.")
+        return self._stat_counter
+
     @property
     def npc_health(self) -> Repository[NPCHealth]:
         if self._npc_health is None:
@@ -197,6 +235,7 @@ class BotDatabase:
         self._user_stat = None
         self._group_stat = None
         self._meta_stat = None
+        self._stat_counter = None
         self._npc_health = None
         self._variable = None
         self._favor = None
@@ -256,63 +295,70 @@ class BotDatabase:
 
     async def _init_repositories(self) -> None:
         self._karma = Repository[UserKarma](
-            self._db, UserKarma, "karma", ["user_id", "group_id"]
+            self._db, UserKarma, "karma", ["user_id", "group_id"], write_hooks=self._hooks_for("karma")
         )
 
         self._initiative = Repository[InitList](
-            self._db, InitList, "initiative", ["group_id"]
+            self._db, InitList, "initiative", ["group_id"], write_hooks=self._hooks_for("initiative")
         )
 
         self._characters_dnd = Repository[DNDCharacter](
-            self._db, DNDCharacter, "characters_dnd", ["group_id", "user_id"]
+            self._db,
+            DNDCharacter,
+            "characters_dnd",
+            ["group_id", "user_id"],
+            write_hooks=self._hooks_for("characters_dnd"),
+            projections=CHARACTERS_DND_PROJECTIONS,
         )
 
         self._log = LogRepository(self._log_db)
 
         self._nickname = Repository[UserNickname](
-            self._db, UserNickname, "nickname", ["user_id", "group_id"]
+            self._db, UserNickname, "nickname", ["user_id", "group_id"], write_hooks=self._hooks_for("nickname")
         )
 
         self._group_config = Repository[GroupConfig](
-            self._db, GroupConfig, "group_config", ["group_id"]
+            self._db, GroupConfig, "group_config", ["group_id"], write_hooks=self._hooks_for("group_config")
         )
 
         self._group_activate = Repository[GroupActivate](
-            self._db, GroupActivate, "group_activate", ["group_id"]
+            self._db, GroupActivate, "group_activate", ["group_id"], write_hooks=self._hooks_for("group_activate")
         )
 
         self._group_welcome = Repository[GroupWelcome](
-            self._db, GroupWelcome, "group_welcome", ["group_id"]
+            self._db, GroupWelcome, "group_welcome", ["group_id"], write_hooks=self._hooks_for("group_welcome")
         )
 
         self._chat_record = Repository[ChatRecord](
-            self._db, ChatRecord, "chat_record", ["group_id", "user_id", "time"]
+            self._db, ChatRecord, "chat_record", ["group_id", "user_id", "time"], write_hooks=self._hooks_for("chat_record")
         )
 
         self._bot_control = Repository[BotControl](
-            self._db, BotControl, "bot_control", ["key"]
+            self._db, BotControl, "bot_control", ["key"], write_hooks=self._hooks_for("bot_control")
         )
 
         self._user_stat = Repository[UserStat](
-            self._db, UserStat, "user_stat", ["user_id"]
+            self._db, UserStat, "user_stat", ["user_id"], write_hooks=self._hooks_for("user_stat")
         )
 
         self._group_stat = Repository[GroupStat](
-            self._db, GroupStat, "group_stat", ["group_id"]
+            self._db, GroupStat, "group_stat", ["group_id"], write_hooks=self._hooks_for("group_stat")
         )
 
         self._meta_stat = Repository[MetaStat](
-            self._db, MetaStat, "meta_stat", ["key"]
+            self._db, MetaStat, "meta_stat", ["key"], write_hooks=self._hooks_for("meta_stat")
         )
 
+        self._stat_counter = StatCounterRepository(self._db)
+
         self._npc_health = Repository[NPCHealth](
-            self._db, NPCHealth, "npc_health", ["group_id", "name"]
+            self._db, NPCHealth, "npc_health", ["group_id", "name"], write_hooks=self._hooks_for("npc_health")
         )
 
         self._variable = Repository[UserVariable](
-            self._db, UserVariable, "variable", ["user_id", "group_id", "name"]
+            self._db, UserVariable, "variable", ["user_id", "group_id", "name"], write_hooks=self._hooks_for("variable")
         )
 
         self._favor = Repository[UserFavor](
-            self._db, UserFavor, "favor", ["user_id", "group_id"]
+            self._db, UserFavor, "favor", ["user_id", "group_id"], write_hooks=self._hooks_for("favor")
         )
\ No newline at end of file
@@ -1,6 +1,6 @@
 import aiosqlite
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from .models import LogSession, LogRecord
 
@@ -172,6 +172,43 @@ class LogRepository:
             for row in rows
         ]
 
+    async def count_records(self, log_id: str) -> int:
+        cursor = await self._db.execute("SELECT COUNT(*) FROM records WHERE log_id=?", (log_id,))
+        row = await cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    async def iter_records_raw(self, log_id: str, batch_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """按 id 升序分批读取记录（键集分页），用于导出等需要遍历整个日志的场景
+
+        与 ``get_records`` 不同，不构造 ``LogRecord``、不解析时间字符串，
+        每批返回与旧版 ``fetch_records`` 相同结构的 dict 列表，内存占用只与 batch_size 有关。
+        """
+        last_id = 0
+        while True:
+            cursor = await self._db.execute(
+                "SELECT id, time, user_id, nickname, content, source, message_id FROM records "
+                "WHERE log_id=? AND id>? ORDER BY id ASC LIMIT ?",
+                (log_id, last_id, batch_size),
+            )
+            rows = await cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [
+                {
+                    "id": row[0],
+                    "time": row[1],
+                    "user_id": row[2],
+                    "nickname": row[3] or "",
+                    "content": row[4],
+                    "source": row[5],
+                    "message_id": row[6],
+                }
+                for row in rows
+            ]
+            if len(rows) < batch_size:
+                return
+
     async def delete_session(self, log_id: str) -> bool:
         """删除会话及其所有记录（外键 CASCADE 自动处理 records）"""
         cursor = await self._db.execute("DELETE FROM logs WHERE id = ?", (log_id,))
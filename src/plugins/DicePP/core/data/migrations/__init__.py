@@ -6,6 +6,8 @@ from .registry import MigrationRegistry, MigrationRegistryError, build_registry
 from .runner import MigrationExecutionError, MigrationRunResult, MigrationRunner
 from .v1_baseline import BaselineMigrationV1
 from .v2_hub_config import HubConfigMigrationV2
+from .v3_characters_dnd_projection import CharactersDndProjectionMigrationV3
+from .v4_stat_counter import StatCounterMigrationV4
 
 
 def default_registry() -> MigrationRegistry:
@@ -13,6 +15,8 @@ def default_registry() -> MigrationRegistry:
         [
             BaselineMigrationV1(),
             HubConfigMigrationV2(),
+            CharactersDndProjectionMigrationV3(),
+            StatCounterMigrationV4(),
         ]
     )
 
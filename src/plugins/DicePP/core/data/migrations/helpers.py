@@ -19,3 +19,9 @@ async def index_exists(db: aiosqlite.Connection, index_name: str) -> bool:
     )
     row = await cursor.fetchone()
     return row is not None
+
+
+async def column_exists(db: aiosqlite.Connection, table_name: str, column_name: str) -> bool:
+    cursor = await db.execute(f"PRAGMA table_info({table_name})")
+    rows = await cursor.fetchall()
+    return any(row[1] == column_name for row in rows)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from .base import Migration, MigrationContext
+from .helpers import column_exists, index_exists, table_exists
+
+# 列名 -> 回填时在 data JSON 中的路径；与 BotDatabase 中 characters_dnd 的投影保持一致
+CHARACTERS_DND_PROJECTION_COLUMNS = {
+    "hp_cur": "$.hp_info.hp_cur",
+    "hp_max": "$.hp_info.hp_max",
+    "hp_temp": "$.hp_info.hp_temp",
+    "hp_alive": "$.hp_info.is_alive",
+    "is_init": "$.is_init",
+}
+
+
+class CharactersDndProjectionMigrationV3(Migration):
+    def __init__(self) -> None:
+        super().__init__(
+            version=3,
+            name="v3_characters_dnd_projection",
+            description="Add HP projection columns to characters_dnd and backfill them from data.",
+        )
+
+    async def up(self, ctx: MigrationContext) -> None:
+        if not await table_exists(ctx.db, "characters_dnd"):
+            return
+        for column in CHARACTERS_DND_PROJECTION_COLUMNS:
+            if not await column_exists(ctx.db, "characters_dnd", column):
+                await ctx.db.execute(
+                    f"ALTER TABLE characters_dnd ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0"
+                )
+        assignments = ", ".join(
+            f"{column} = COALESCE(json_extract(data, '{path}'), {1 if column == 'hp_alive' else 0})"
+            for column, path in CHARACTERS_DND_PROJECTION_COLUMNS.items()
+        )
+        await ctx.db.execute(f"UPDATE characters_dnd SET {assignments}")
+        if not await index_exists(ctx.db, "idx_characters_dnd_group_init"):
+            await ctx.db.execute(
+                "CREATE INDEX idx_characters_dnd_group_init ON characters_dnd(group_id, is_init)"
+            )
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import datetime
+import json
+from typing import Dict, List, Optional, Tuple
+
+from .base import Migration, MigrationContext
+from .helpers import index_exists, table_exists
+
+# 旧统计表 -> (实体类型, 主键列)
+STAT_BLOB_TABLES = {
+    "meta_stat": ("meta", "key"),
+    "user_stat": ("user", "user_id"),
+    "group_stat": ("group", "group_id"),
+}
+
+
+def _day_of(timestamp: int, offset: int = 0) -> int:
+    from utils.time import int_to_datetime
+    date = int_to_datetime(timestamp).date() + datetime.timedelta(days=offset)
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def _split_element(cur: int, last: int, total: int, update_time: int,
+                   own_update_time: bool = True) -> List[Tuple[int, int]]:
+    """
+    把 今日/昨日/累计 三个值拆成 (日期, 计数), 不能确定日期的部分记在 0 (已折叠) 上.
+    每日更新只移动 今日/昨日, 不改 update_time, 所以 update_time 当天的计数:
+    今日非 0 时就是今日; 今日为 0 而昨日非 0 时是昨日 (只经过了一次每日更新);
+    两者都为 0 时已无法得知具体数量, 但 own_update_time 为真 (update_time 是该计数自己的最后一次累加) 时
+    至少有一次发生在当天. 保证留下 update_time 当天的行, 否则按日期判断的最后活跃时间会丢失
+    """
+    if not update_time:
+        return [(0, total)]
+    day = _day_of(update_time)
+    if cur:
+        return [(day, cur), (_day_of(update_time, -1), last), (0, max(total - cur - last, 0))]
+    if last:
+        return [(day, last), (0, max(total - last, 0))]
+    if own_update_time and total:
+        return [(day, 1), (0, total - 1)]
+    return [(0, total)]
+
+
+def _legacy_counter_fields(entity_type: str, data: str) -> Optional[Tuple[str, str, Optional[str]]]:
+    """从旧版统计数据中取出 消息/指令/掷骰 计数字段 (全局统计没有掷骰), 不含计数的新版本返回 None"""
+    from core.statistics.basic_stat import (
+        is_legacy_stat_format, split_stat_fields, STAT_FIELD_SEP, LEGACY_COUNTER_FORMAT_VERSION, LEGACY_COUNTER_FIELD_NUM,
+    )
+    if is_legacy_stat_format(data):
+        json_dict: dict = json.loads(data)
+        return json_dict["msg"], json_dict["cmd"], json_dict.get("roll")
+    if not data.startswith(LEGACY_COUNTER_FORMAT_VERSION + STAT_FIELD_SEP):
+        return None
+    msg_str, cmd_str, roll_str, _ = split_stat_fields(data, LEGACY_COUNTER_FIELD_NUM, LEGACY_COUNTER_FORMAT_VERSION)
+    return msg_str, cmd_str, None if entity_type == "meta" else roll_str
+
+
+def _stat_counter_rows(entity_type: str, entity_id: str, data: str) -> List[Tuple[str, str, str, int, int]]:
+    from core.statistics import StatElementBase, UserCommandStatInfo, RollStatInfo
+    fields = _legacy_counter_fields(entity_type, data)
+    if fields is None:
+        return []
+    msg_str, cmd_str, roll_str = fields
+
+    counts: Dict[Tuple[str, int], int] = {}
+
+    def add(metric: str, cur: int, last: int, total: int, update_time: int, own_update_time: bool = True) -> None:
+        for day, value in _split_element(cur, last, total, update_time, own_update_time):
+            if value > 0:
+                counts[(metric, day)] = counts.get((metric, day), 0) + value
+
+    def add_element(metric: str, elem) -> None:
+        add(metric, elem.cur_day_val, elem.last_day_val, elem.total_val, elem.update_time)
+
+    msg = StatElementBase()
+    msg.deserialize(msg_str)
+    add_element("msg", msg)
+    cmd = UserCommandStatInfo()
+    cmd.deserialize(cmd_str)
+    for flag, elem in cmd.flag_dict.items():
+        add_element(f"cmd:{flag}", elem)
+    if roll_str is not None:
+        roll = RollStatInfo()
+        roll.deserialize(roll_str)
+        add_element("roll", roll.times)
+        d20 = roll.d20
+        for index in range(20):
+            add(f"d20:{index + 1}", d20.cur_list[index], d20.last_list[index], d20.total_list[index],
+                roll.times.update_time, own_update_time=False)
+    return [(entity_type, entity_id, metric, day, value) for (metric, day), value in counts.items()]
+
+
+class StatCounterMigrationV4(Migration):
+    def __init__(self) -> None:
+        super().__init__(
+            version=4,
+            name="v4_stat_counter",
+            description="Add per-day stat_counter table and backfill it from user/group/meta stat blobs.",
+        )
+
+    async def up(self, ctx: MigrationContext) -> None:
+        await ctx.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stat_counter (
+                entity_type TEXT NOT NULL,
+                entity_id TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (entity_type, entity_id, metric, day)
+            ) WITHOUT ROWID
+            """
+        )
+        if not await index_exists(ctx.db, "idx_stat_counter_day"):
+            await ctx.db.execute("CREATE INDEX idx_stat_counter_day ON stat_counter(day)")
+
+        for table, (entity_type, key_column) in STAT_BLOB_TABLES.items():
+            if not await table_exists(ctx.db, table):
+                continue
+            cursor = await ctx.db.execute(f"SELECT {key_column}, json_extract(data, '$.data') FROM {table}")
+            rows = []
+            for entity_id, data in await cursor.fetchall():
+                if not data:
+                    continue
+                try:
+                    rows.extend(_stat_counter_rows(entity_type, "" if entity_type == "meta" else entity_id, data))
+                except Exception:  # 损坏的旧统计数据直接跳过, 与运行时读取失败时的处理一致
+                    continue
+            await ctx.db.executemany(
+                """
+                INSERT INTO stat_counter (entity_type, entity_id, metric, day, value)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(entity_type, entity_id, metric, day) DO UPDATE SET
+                    value = value + excluded.value
+                """,
+                rows,
+            )
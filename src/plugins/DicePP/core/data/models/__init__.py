@@ -5,7 +5,7 @@ from .character import (
     # 数据模型
     HPInfo, AbilityInfo, SpellInfo, MoneyInfo, DNDCharacter,
     # 常量
-    CHAR_INFO_KEY_HP, CHAR_INFO_KEY_HP_DICE,
+    CHAR_INFO_KEY_HP, CHAR_INFO_KEY_HP_DICE, HP_PROJECTION_FIELDS,
     CHAR_INFO_KEY_NAME, CHAR_INFO_KEY_LEVEL, CHAR_INFO_KEY_ABILITY,
     CHAR_INFO_KEY_PROF, CHAR_INFO_KEY_EXT,
     ABILITY_LIST, ABILITY_NUM,
@@ -60,6 +60,7 @@ __all__ = [
     # 角色常量
     "CHAR_INFO_KEY_HP",
     "CHAR_INFO_KEY_HP_DICE",
+    "HP_PROJECTION_FIELDS",
     "CHAR_INFO_KEY_NAME",
     "CHAR_INFO_KEY_LEVEL",
     "CHAR_INFO_KEY_ABILITY",
@@ -7,7 +7,7 @@
 
 DND5E 角色相关常量定义在 module/character/dnd5e/constants.py
 """
-from typing import List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -19,6 +19,9 @@ from pydantic import BaseModel, Field
 CHAR_INFO_KEY_HP = "$生命值$"
 CHAR_INFO_KEY_HP_DICE = "$生命骰$"
 
+# HPInfo.from_projection 需要的 characters_dnd 投影列
+HP_PROJECTION_FIELDS = ["hp_cur", "hp_max", "hp_temp", "hp_alive"]
+
 
 class HPInfo(BaseModel):
     """HP信息"""
@@ -55,6 +58,17 @@ class HPInfo(BaseModel):
         self.hp_dice_num = hp_dice_num
         self.hp_dice_max = hp_dice_max
 
+    @classmethod
+    def from_projection(cls, row: Dict[str, Any]) -> "HPInfo":
+        """由 characters_dnd 投影列 (hp_cur / hp_max / hp_temp / hp_alive) 构造，仅用于展示"""
+        return cls(
+            is_init=True,
+            is_alive=bool(row.get("hp_alive", 1)),
+            hp_cur=row.get("hp_cur", 0),
+            hp_max=row.get("hp_max", 0),
+            hp_temp=row.get("hp_temp", 0),
+        )
+
     def is_record_normal(self) -> bool:
         """当前是否正常记录生命值 (拥有hp, 而不是单纯记录受损hp)"""
         return self.hp_cur > 0 or (self.hp_cur == 0 and not self.is_alive)
@@ -1,11 +1,20 @@
 import aiosqlite
 from datetime import datetime
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Sequence
+from typing import Any, Callable, Dict, Generic, List, Optional, Type, TypeVar, Sequence
 
 from pydantic import BaseModel
 
 T = TypeVar("T", bound=BaseModel)
 
+# 写入钩子：参数为被写入/删除记录的主键 {key_field: value}
+WriteHook = Callable[[Dict[str, Any]], None]
+
+# 投影列：列名 -> 从模型提取列值的函数，保存时与 data 一并写入独立列，供 list_projection 窄查询
+Projections = Dict[str, Callable[[Any], Any]]
+
+# SQLite 默认单条语句最多 999 个绑定参数，IN (...) 查询按此分块
+IN_QUERY_CHUNK = 500
+
 
 class Repository(Generic[T]):
     def __init__(
@@ -14,19 +23,47 @@ class Repository(Generic[T]):
         model_class: Type[T],
         table_name: str,
         key_fields: List[str],
+        write_hooks: Optional[List[WriteHook]] = None,
+        projections: Optional[Projections] = None,
     ):
         self._db = db
         self._model_class = model_class
         self._table_name = table_name
         self._key_fields = key_fields
+        # 由 BotDatabase 按表名共享，重连后新建的 Repository 仍沿用同一组钩子
+        self._write_hooks: List[WriteHook] = write_hooks if write_hooks is not None else []
+        # 投影列需由迁移预先建好，列名与此处的键一致
+        self._projections: Projections = dict(projections) if projections else {}
+
+    def _notify_write(self, key_values: Sequence[Any]) -> None:
+        if not self._write_hooks:
+            return
+        keys = dict(zip(self._key_fields, key_values))
+        for hook in list(self._write_hooks):
+            hook(keys)
+
+    def _project(self, item: T) -> List[Any]:
+        return [extract(item) for extract in self._projections.values()]
+
+    def _upsert_sql(self) -> str:
+        """INSERT ... ON CONFLICT DO UPDATE，列顺序为 主键、投影列、data、updated_at"""
+        columns = [*self._key_fields, *self._projections, "data", "updated_at"]
+        updates = [f"{col} = excluded.{col}" for col in [*self._projections, "data", "updated_at"]]
+        return f"""
+            INSERT INTO {self._table_name} ({", ".join(columns)})
+            VALUES ({", ".join(["?"] * len(columns))})
+            ON CONFLICT({", ".join(self._key_fields)}) DO UPDATE SET
+                {", ".join(updates)}
+            """
 
     async def _ensure_table(self) -> None:
         key_cols = ", ".join([f"{k} TEXT" for k in self._key_fields])
+        projection_cols = "".join([f"{col} INTEGER NOT NULL DEFAULT 0, " for col in self._projections])
         await self._db.execute(
             f"""
             CREATE TABLE IF NOT EXISTS {self._table_name} (
                 {key_cols},
-                data TEXT NOT NULL,
+                {projection_cols}data TEXT NOT NULL,
                 updated_at TEXT NOT NULL,
                 PRIMARY KEY ({", ".join(self._key_fields)})
             )
@@ -65,46 +102,30 @@ class Repository(Generic[T]):
         if not items:
             return
 
-        columns = ", ".join(self._key_fields)
-        placeholders = ", ".join(["?"] * len(self._key_fields))
-
         # ON CONFLICT({keys}) DO UPDATE 语义保持与单条 save 一致
-        sql = f"""
-        INSERT INTO {self._table_name} ({columns}, data, updated_at)
-        VALUES ({placeholders}, ?, ?)
-        ON CONFLICT({", ".join(self._key_fields)}) DO UPDATE SET
-            data = excluded.data,
-            updated_at = excluded.updated_at
-        """
-
         now = datetime.now().isoformat()
         values = []
         for item in items:
             key_values = [getattr(item, field) for field in self._key_fields]
             data_json = item.model_dump_json()
-            values.append((*key_values, data_json, now))
+            values.append((*key_values, *self._project(item), data_json, now))
 
-        await self._db.executemany(sql, values)
+        await self._db.executemany(self._upsert_sql(), values)
         await self._db.commit()
+        for value in values:
+            self._notify_write(value[:len(self._key_fields)])
 
     async def save(self, item: T) -> None:
         key_values = [getattr(item, field) for field in self._key_fields]
         data_json = item.model_dump_json()
         updated_at = datetime.now().isoformat()
 
-        columns = ", ".join(self._key_fields)
-        placeholders = ", ".join(["?"] * len(self._key_fields))
         await self._db.execute(
-            f"""
-            INSERT INTO {self._table_name} ({columns}, data, updated_at)
-            VALUES ({placeholders}, ?, ?)
-            ON CONFLICT({columns}) DO UPDATE SET
-                data = excluded.data,
-                updated_at = excluded.updated_at
-            """,
-            (*key_values, data_json, updated_at),
+            self._upsert_sql(),
+            (*key_values, *self._project(item), data_json, updated_at),
         )
         await self._db.commit()
+        self._notify_write(key_values)
 
     async def delete(self, *keys: str) -> bool:
         if len(keys) != len(self._key_fields):
@@ -118,8 +139,27 @@ class Repository(Generic[T]):
             keys,
         )
         await self._db.commit()
+        self._notify_write(keys)
         return cursor.rowcount > 0
 
+    async def delete_many(self, keys_list: List[Sequence[str]]) -> None:
+        """批量删除：一次事务内删除多条记录"""
+        if not keys_list:
+            return
+        for keys in keys_list:
+            if len(keys) != len(self._key_fields):
+                raise ValueError(
+                    f"Expected {len(self._key_fields)} keys, got {len(keys)}"
+                )
+        where_clause = " AND ".join([f"{field} = ?" for field in self._key_fields])
+        await self._db.executemany(
+            f"DELETE FROM {self._table_name} WHERE {where_clause}",
+            [tuple(keys) for keys in keys_list],
+        )
+        await self._db.commit()
+        for keys in keys_list:
+            self._notify_write(keys)
+
     async def list_all(self) -> List[T]:
         cursor = await self._db.execute(
             f"SELECT data FROM {self._table_name}"
@@ -153,6 +193,70 @@ class Repository(Generic[T]):
         rows = await cursor.fetchall()
         return [self._model_class.model_validate_json(row[0]) for row in rows]
 
+    async def list_in(self, field: str, values: Sequence[str], **filters: Any) -> List[T]:
+        """
+        批量读取 field 取值在 values 中的记录，values 较多时分块查询。
+        filters 的值可以是单个值或值序列（序列对应 IN 条件）。
+
+        例如：list_in("user_id", ["1", "2"], group_id=["g1", "default"])
+        """
+        values = list(dict.fromkeys(values))
+        if not values:
+            return []
+        where_clauses = []
+        params: List[Any] = []
+        for f_name, f_value in filters.items():
+            if isinstance(f_value, (list, tuple, set)):
+                f_value = list(f_value)
+                where_clauses.append(f"{f_name} IN ({', '.join(['?'] * len(f_value))})")
+                params.extend(f_value)
+            else:
+                where_clauses.append(f"{f_name} = ?")
+                params.append(f_value)
+        result: List[T] = []
+        for start in range(0, len(values), IN_QUERY_CHUNK):
+            chunk = values[start:start + IN_QUERY_CHUNK]
+            clauses = [f"{field} IN ({', '.join(['?'] * len(chunk))})"] + where_clauses
+            cursor = await self._db.execute(
+                f"SELECT data FROM {self._table_name} WHERE {' AND '.join(clauses)}",
+                [*chunk, *params],
+            )
+            rows = await cursor.fetchall()
+            result.extend(self._model_class.model_validate_json(row[0]) for row in rows)
+        return result
+
+    async def list_projection(self, fields: Sequence[str], **filters: Any) -> List[Dict[str, Any]]:
+        """
+        只读取主键与指定投影列，不解析 data，适合只需要少量字段的批量展示。
+        filters 可使用主键或投影列，值可以是单个值或值序列（序列对应 IN 条件）。
+
+        例如：list_projection(["hp_cur", "hp_max"], group_id="12345", is_init=1)
+        """
+        allowed = {*self._key_fields, *self._projections}
+        unknown = [f for f in [*fields, *filters] if f not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown projection fields for {self._table_name}: {unknown}")
+        columns = list(dict.fromkeys([*self._key_fields, *fields]))
+        where_clauses = []
+        params: List[Any] = []
+        for f_name, f_value in filters.items():
+            if isinstance(f_value, (list, tuple, set)):
+                f_value = list(f_value)
+                if not f_value:
+                    return []
+                where_clauses.append(f"{f_name} IN ({', '.join(['?'] * len(f_value))})")
+                params.extend(f_value)
+            else:
+                where_clauses.append(f"{f_name} = ?")
+                params.append(f_value)
+        where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ""
+        cursor = await self._db.execute(
+            f"SELECT {', '.join(columns)} FROM {self._table_name} {where_clause}",
+            params,
+        )
+        rows = await cursor.fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
     async def list_key_values_by(self, key_field: str, **filters: str) -> List[str]:
         """
         列出满足过滤条件的所有记录中，指定 key 字段的值列表。
@@ -0,0 +1,137 @@
+"""
+统计计数表 stat_counter 的读写
+
+每行是一个实体 (用户/群聊/全局) 某项指标在某一天的计数, 主键为 (entity_type, entity_id, metric, day).
+day 为 yyyymmdd 格式的整数, 0 表示已折叠的更早数据 (见 rollup_before).
+表由 v4 迁移创建.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiosqlite
+
+from .repository import IN_QUERY_CHUNK
+
+# (entity_type, entity_id, metric, day, value)
+CounterRow = Tuple[str, str, str, int, int]
+
+
+class StatCounterRepository:
+    def __init__(self, db: aiosqlite.Connection):
+        self._db = db
+
+    async def increment_many(self, rows: Iterable[CounterRow]) -> None:
+        """批量累加计数, 不存在的行会被创建"""
+        rows = list(rows)
+        if not rows:
+            return
+        await self._db.executemany(
+            """
+            INSERT INTO stat_counter (entity_type, entity_id, metric, day, value)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(entity_type, entity_id, metric, day) DO UPDATE SET
+                value = value + excluded.value
+            """,
+            rows,
+        )
+        await self._db.commit()
+
+    @staticmethod
+    def _range_condition(day_from: Optional[int], day_to: Optional[int]) -> Tuple[str, List[int]]:
+        clauses, params = [], []
+        if day_from is not None:
+            clauses.append("day >= ?")
+            params.append(day_from)
+        if day_to is not None:
+            clauses.append("day <= ?")
+            params.append(day_to)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    async def sum_by_metric(self, entity_type: str, entity_id: Optional[str] = None,
+                            day_from: Optional[int] = None, day_to: Optional[int] = None) -> Dict[str, int]:
+        """
+        按指标汇总 [day_from, day_to] 内的计数 (边界为 None 表示不限).
+        entity_id 为 None 时汇总该类型的所有实体
+        """
+        sql = "SELECT metric, SUM(value) FROM stat_counter WHERE entity_type = ?"
+        params: List = [entity_type]
+        if entity_id is not None:
+            sql += " AND entity_id = ?"
+            params.append(entity_id)
+        range_sql, range_params = self._range_condition(day_from, day_to)
+        cursor = await self._db.execute(sql + range_sql + " GROUP BY metric", params + range_params)
+        return {metric: int(value) for metric, value in await cursor.fetchall()}
+
+    async def sum_by_entity(self, entity_type: str, metric: str,
+                            day_from: Optional[int] = None, day_to: Optional[int] = None) -> Dict[str, int]:
+        """按实体汇总某项指标在 [day_from, day_to] 内的计数"""
+        range_sql, range_params = self._range_condition(day_from, day_to)
+        cursor = await self._db.execute(
+            "SELECT entity_id, SUM(value) FROM stat_counter WHERE entity_type = ? AND metric = ?"
+            + range_sql + " GROUP BY entity_id",
+            [entity_type, metric] + range_params,
+        )
+        return {entity_id: int(value) for entity_id, value in await cursor.fetchall()}
+
+    async def sum_by_entity_metric(self, entity_type: str, day_from: Optional[int] = None,
+                                   day_to: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """按实体与指标汇总 [day_from, day_to] 内的计数, 返回 实体ID -> 指标 -> 计数"""
+        range_sql, range_params = self._range_condition(day_from, day_to)
+        cursor = await self._db.execute(
+            "SELECT entity_id, metric, SUM(value) FROM stat_counter WHERE entity_type = ?"
+            + range_sql + " GROUP BY entity_id, metric",
+            [entity_type] + range_params,
+        )
+        result: Dict[str, Dict[str, int]] = {}
+        for entity_id, metric, value in await cursor.fetchall():
+            result.setdefault(entity_id, {})[metric] = int(value)
+        return result
+
+    async def last_active_day(self, entity_type: str, metric_prefix: str) -> Dict[str, int]:
+        """返回每个实体最近一次有 metric_prefix 开头 (不含通配符) 的指标计数的日期, 只有折叠数据的实体为 0"""
+        cursor = await self._db.execute(
+            "SELECT entity_id, MAX(day) FROM stat_counter WHERE entity_type = ? AND metric LIKE ? GROUP BY entity_id",
+            (entity_type, metric_prefix + "%"),
+        )
+        return {entity_id: int(day) for entity_id, day in await cursor.fetchall()}
+
+    async def list_entities(self, entity_type: str) -> List[str]:
+        cursor = await self._db.execute(
+            "SELECT DISTINCT entity_id FROM stat_counter WHERE entity_type = ?", (entity_type,)
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+    async def delete_entities(self, entity_type: str, entity_ids: Sequence[str]) -> None:
+        for start in range(0, len(entity_ids), IN_QUERY_CHUNK):
+            chunk = list(entity_ids[start:start + IN_QUERY_CHUNK])
+            await self._db.execute(
+                f"DELETE FROM stat_counter WHERE entity_type = ? AND entity_id IN ({','.join('?' * len(chunk))})",
+                [entity_type] + chunk,
+            )
+        await self._db.commit()
+
+    async def rollup_before(self, day: int, keep_latest_prefix: Optional[str] = None) -> int:
+        """
+        将 day 之前 (不含) 的逐日计数折叠进 day=0 的行, 返回被折叠的行数. 依赖 day 上的索引, 不扫描全表.
+        keep_latest_prefix 不为空时, 每个实体最近一天的该前缀指标不折叠, 使 last_active_day 仍能返回真实日期
+        """
+        condition, params = "day > 0 AND day < ?", [day]
+        if keep_latest_prefix:
+            condition += """ AND NOT (metric LIKE ? AND day = (
+                SELECT MAX(latest.day) FROM stat_counter AS latest
+                WHERE latest.entity_type = stat_counter.entity_type AND latest.entity_id = stat_counter.entity_id
+                AND latest.metric LIKE ?))"""
+            params += [keep_latest_prefix + "%"] * 2
+        await self._db.execute(
+            f"""
+            INSERT INTO stat_counter (entity_type, entity_id, metric, day, value)
+            SELECT entity_type, entity_id, metric, 0, SUM(value) FROM stat_counter
+            WHERE {condition}
+            GROUP BY entity_type, entity_id, metric
+            ON CONFLICT(entity_type, entity_id, metric, day) DO UPDATE SET
+                value = value + excluded.value
+            """,
+            params,
+        )
+        cursor = await self._db.execute(f"DELETE FROM stat_counter WHERE {condition}", params)
+        await self._db.commit()
+        return cursor.rowcount
@@ -3,7 +3,7 @@ import random
 
 from core.config.basic import Paths
 from utils.logger import dice_log
-from utils.cq_code import get_cq_image
+from utils.cq_code import get_cq_image_by_path
 
 
 class LocalizationText:
@@ -26,8 +26,9 @@ class LocalizationText:
         def replace_image_code(match):
             key = match.group(1)
             file_path = Paths.LOCAL_IMG_DIR / key
-            if file_path.exists():
-                return get_cq_image(file_path.read_bytes())
+            cq_image = get_cq_image_by_path(file_path)
+            if cq_image is not None:
+                return cq_image
             else:
                 dice_log(f"[LocalImage] 找不到图片 {file_path}")
                 return match.group(0)
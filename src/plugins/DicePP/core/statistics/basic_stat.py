@@ -1,12 +1,48 @@
 import json
 import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from core.data import JsonObject, custom_json_object
 
-from utils.time import get_current_date_int, get_current_date_raw, int_to_datetime, datetime_to_int
+from utils.time import get_current_date_int, get_current_date_raw, int_to_datetime
 
+# 统计数据的紧凑格式: 以版本号开头, 各字段按固定顺序以 STAT_FIELD_SEP 分隔, 字段内部沿用各统计元素自身的格式.
+# 旧版本以 json 保存 (以 "{" 开头), 反序列化时仍然兼容, 下次写回时转为紧凑格式
+STAT_FORMAT_VERSION = "3"
+STAT_FIELD_SEP = ";"
+# 版本 2 在元信息前还有 消息/指令/掷骰 计数字段, 计数已由 v4 迁移转存到 stat_counter 表, 读取时跳过
+LEGACY_COUNTER_FORMAT_VERSION = "2"
+LEGACY_COUNTER_FIELD_NUM = 4
 
+ONLINE_PERIOD_MERGE_GAP = 10 * 60  # 间隔不超过该秒数的在线时段合并为一段 (每5分钟记录一次在线时间)
+ONLINE_PERIOD_DETAIL_DAYS = 30  # 保留最近多少天的在线时段明细, 更早的只保留每日在线秒数
+
+
+def is_legacy_stat_format(input_str: str) -> bool:
+    return input_str.lstrip().startswith("{")
+
+
+def split_stat_fields(input_str: str, field_num: int, version: str = STAT_FORMAT_VERSION) -> List[str]:
+    """拆分紧凑格式, 返回版本号之后的 field_num 个字段, 最后一个字段可以包含分隔符"""
+    fields = input_str.split(STAT_FIELD_SEP, field_num)
+    if len(fields) != field_num + 1 or fields[0] != version:
+        raise ValueError(f"Invalid stat format: {input_str[:50]}")
+    return fields[1:]
+
+
+def read_stat_fields(input_str: str, field_num: int, legacy_indexes: List[int]) -> List[str]:
+    """读取紧凑格式的 field_num 个字段; 含计数字段的旧版本只取 legacy_indexes 处的字段"""
+    if input_str.startswith(LEGACY_COUNTER_FORMAT_VERSION + STAT_FIELD_SEP):
+        fields = split_stat_fields(input_str, LEGACY_COUNTER_FIELD_NUM, LEGACY_COUNTER_FORMAT_VERSION)
+        return [fields[index] for index in legacy_indexes]
+    return split_stat_fields(input_str, field_num)
+
+
+def join_stat_fields(*fields: str) -> str:
+    return STAT_FIELD_SEP.join((STAT_FORMAT_VERSION,) + fields)
+
+
+# 以下计数元素只用于读取旧版统计数据中的计数 (见 v4_stat_counter 迁移), 计数现在按天记录在 stat_counter 表中
 class StatElementBase:
     def serialize(self) -> str:
         return f"{self.cur_day_val}|{self.last_day_val}|{self.total_val}|{self.update_time}"
@@ -158,41 +194,73 @@ class RollStatInfo:
 @custom_json_object
 class MetaStatInfo(JsonObject):
     def serialize(self) -> str:
-        json_dict = {"online_period": [[datetime_to_int(start_period), datetime_to_int(end_period)] for
-                                       start_period, end_period in self.online_period],
-                     "msg": self.msg.serialize(),
-                     "cmd": self.cmd.serialize(),
-                     }
-        return json.dumps(json_dict)
+        # 时段为带时区的 datetime, 用 timestamp() 与 int_to_datetime 互逆, 不受运行机器时区影响
+        period_str = ",".join([f"{int(start_period.timestamp())}-{int(end_period.timestamp())}"
+                               for start_period, end_period in self.online_period])
+        daily_str = ",".join([f"{day.strftime('%Y%m%d')}:{seconds}" for day, seconds in self.online_daily.items()])
+        return join_stat_fields(period_str, daily_str)
 
     def deserialize(self, json_str: str) -> None:
-        json_dict: dict = json.loads(json_str)
-        online_time_period: List[List[int, int]] = json_dict["online_period"]
-        self.online_period = [[int_to_datetime(time_period[0]), int_to_datetime(time_period[1])] for time_period in online_time_period]
-        self.msg.deserialize(json_dict["msg"])
-        self.cmd.deserialize(json_dict["cmd"])
+        if is_legacy_stat_format(json_str):
+            json_dict: dict = json.loads(json_str)
+            online_time_period: List[List[int, int]] = json_dict["online_period"]
+            self.online_period = [[int_to_datetime(time_period[0]), int_to_datetime(time_period[1])] for time_period in online_time_period]
+            return
+        period_str, daily_str = read_stat_fields(json_str, 2, legacy_indexes=[2, 3])
+        self.online_period = []
+        for period in period_str.split(",") if period_str else []:
+            start_str, end_str = period.split("-")
+            self.online_period.append([int_to_datetime(int(start_str)), int_to_datetime(int(end_str))])
+        self.online_daily = {}
+        for day_info in daily_str.split(",") if daily_str else []:
+            day_str, seconds_str = day_info.split(":")
+            self.online_daily[datetime.datetime.strptime(day_str, "%Y%m%d").date()] = int(seconds_str)
 
     def __init__(self):
         self.online_period: List[List[datetime.datetime]] = []
-        self.msg: StatElementBase = StatElementBase()
-        self.cmd: UserCommandStatInfo = UserCommandStatInfo()
-
-    def stat_msg(self, time: int = 1):
-        self.msg.inc(time)
-
-    def stat_cmd(self, command):
-        self.cmd.record(command)
+        self.online_daily: Dict[datetime.date, int] = {}  # 超出明细保留天数的在线时段, 按天记录在线秒数
 
     def update(self, is_first_time: bool = False) -> bool:
         current_date = get_current_date_raw()
         if is_first_time:
             self.online_period.append([current_date, current_date])
 
-        should_tick_daily: bool = False
-        if current_date.date() != self.online_period[-1][-1].date():  # 最后在线时间和当前时间不是同一天
-            should_tick_daily = True
-            self.msg.update()
-            self.cmd.update()
+        # 最后在线时间和当前时间不是同一天
+        should_tick_daily: bool = current_date.date() != self.online_period[-1][-1].date()
 
         self.online_period[-1][-1] = current_date
+        if is_first_time or should_tick_daily:
+            self.compact_online_period(current_date)
         return should_tick_daily
+
+    def compact_online_period(self, current_date: Optional[datetime.datetime] = None) -> None:
+        """合并相邻的在线时段, 并将早于 ONLINE_PERIOD_DETAIL_DAYS 天的时段折算为每日在线秒数"""
+        if not self.online_period:
+            return
+        current_date = current_date or get_current_date_raw()
+        merged: List[List[datetime.datetime]] = []
+        for start, end in sorted(self.online_period, key=lambda period: period[0]):
+            if merged and (start - merged[-1][1]).total_seconds() <= ONLINE_PERIOD_MERGE_GAP:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        cutoff_day = current_date.date() - datetime.timedelta(days=ONLINE_PERIOD_DETAIL_DAYS)
+        cutoff = datetime.datetime.combine(cutoff_day, datetime.time(), tzinfo=current_date.tzinfo)
+        self.online_period = []
+        for start, end in merged:
+            if end <= cutoff:
+                self._add_online_daily(start, end)
+            elif start < cutoff:
+                self._add_online_daily(start, cutoff)
+                self.online_period.append([cutoff, end])
+            else:
+                self.online_period.append([start, end])
+        self.online_daily = dict(sorted(self.online_daily.items()))
+
+    def _add_online_daily(self, start: datetime.datetime, end: datetime.datetime) -> None:
+        while start < end:
+            next_day = datetime.datetime.combine(start.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=start.tzinfo)
+            day_end = min(end, next_day)
+            self.online_daily[start.date()] = self.online_daily.get(start.date(), 0) + int((day_end - start).total_seconds())
+            start = day_end
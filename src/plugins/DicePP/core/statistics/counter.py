@@ -0,0 +1,113 @@
+"""
+按天累计的统计计数
+
+消息数、指令使用次数、掷骰次数和D20点数分布以 (实体类型, 实体ID, 指标, 日期) -> 计数 的形式保存在 stat_counter 表中.
+处理消息时只在内存缓冲中累加, 由 Bot 定期 (以及读取统计前) 批量写入数据库, 每日更新不再需要改写每一行.
+"""
+import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils.time import get_current_date_raw
+
+STAT_ENTITY_META = "meta"
+STAT_ENTITY_USER = "user"
+STAT_ENTITY_GROUP = "group"
+STAT_META_ID = ""  # 全局统计只有一个实体
+
+STAT_METRIC_MSG = "msg"
+STAT_METRIC_ROLL = "roll"
+STAT_METRIC_CMD_PREFIX = "cmd:"
+STAT_METRIC_D20_PREFIX = "d20:"
+
+STAT_DAY_ROLLED_UP = 0  # 已折叠的早期数据
+STAT_COUNTER_DETAIL_DAYS = 400  # 保留逐日计数的天数, 更早的在每日更新时折叠, 不再能按日期查询
+
+STAT_FLUSH_INTERVAL = 10  # 缓冲写入数据库的间隔 (秒)
+
+
+def cmd_metric(flag: int) -> str:
+    return f"{STAT_METRIC_CMD_PREFIX}{flag}"
+
+
+def d20_metric(value: int) -> str:
+    return f"{STAT_METRIC_D20_PREFIX}{value}"
+
+
+def date_to_day(date: datetime.date) -> int:
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def day_to_date(day: int) -> datetime.date:
+    return datetime.date(day // 10000, day // 100 % 100, day % 100)
+
+
+def today_day() -> int:
+    return date_to_day(get_current_date_raw().date())
+
+
+class StatCounterBuffer:
+    """统计计数的内存缓冲, 相同的 (实体, 指标, 日期) 合并为一行"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str, str, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def inc(self, entity_type: str, entity_id: str, metric: str, value: int = 1, day: Optional[int] = None) -> None:
+        if not value:
+            return
+        key = (entity_type, entity_id, metric, day if day is not None else today_day())
+        self._pending[key] = self._pending.get(key, 0) + value
+
+    def inc_entities(self, entities: Iterable[Tuple[str, str]], metric: str, value: int = 1) -> None:
+        day = today_day()
+        for entity_type, entity_id in entities:
+            self.inc(entity_type, entity_id, metric, value, day)
+
+    async def flush(self, repo) -> int:
+        """写入 StatCounterRepository, 返回写入的行数; 写入失败时计数留在缓冲中等待下次写入"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        try:
+            await repo.increment_many([key + (value,) for key, value in pending.items()])
+        except Exception:
+            for key, value in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + value
+            raise
+        return len(pending)
+
+
+class StatSummary:
+    """某个实体 (或某类实体合计) 在一段日期内各指标的计数"""
+
+    def __init__(self, counts: Dict[str, int]):
+        self.counts = counts
+
+    def get(self, metric: str) -> int:
+        return self.counts.get(metric, 0)
+
+    @property
+    def msg(self) -> int:
+        return self.get(STAT_METRIC_MSG)
+
+    @property
+    def roll(self) -> int:
+        return self.get(STAT_METRIC_ROLL)
+
+    def cmd(self, flag: int) -> int:
+        return self.get(cmd_metric(flag))
+
+    def cmd_flags(self) -> Dict[int, int]:
+        return {int(metric[len(STAT_METRIC_CMD_PREFIX):]): value for metric, value in self.counts.items()
+                if metric.startswith(STAT_METRIC_CMD_PREFIX)}
+
+    def d20_list(self):
+        """D20 各点数的次数, 下标0对应1点"""
+        return [self.get(d20_metric(value)) for value in range(1, 21)]
+
+
+async def load_stat_summary(repo, entity_type: str, entity_id: Optional[str] = None,
+                            day_from: Optional[int] = None, day_to: Optional[int] = None) -> StatSummary:
+    return StatSummary(await repo.sum_by_metric(entity_type, entity_id, day_from, day_to))
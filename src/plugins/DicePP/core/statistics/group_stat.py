@@ -3,24 +3,25 @@ import json
 from core.data import JsonObject, custom_json_object
 from utils.time import get_current_date_int
 
-from core.statistics.basic_stat import StatElementBase, UserCommandStatInfo, RollStatInfo
+from core.statistics.basic_stat import is_legacy_stat_format, read_stat_fields, join_stat_fields
 
 
 class GroupMetaInfo:
     def serialize(self) -> str:
-        json_dict = {"name": self.name,
-                     "member": f"{self.member_count}|{self.max_member}",
-                     "up": self.update_time,
-                     "warn": self.warn_time,
-                     }
-        return json.dumps(json_dict)
+        # 群名可能包含任意字符, 放在最后
+        return f"{self.member_count}|{self.max_member}|{self.update_time}|{self.warn_time}|{self.name}"
 
     def deserialize(self, input_str: str) -> None:
-        json_dict: dict = json.loads(input_str)
-        self.name = json_dict["name"]
-        self.member_count, self.max_member = (int(val_str) for val_str in json_dict["member"].split("|"))
-        self.update_time = json_dict["up"]
-        self.warn_time = json_dict["warn"]
+        if is_legacy_stat_format(input_str):
+            json_dict: dict = json.loads(input_str)
+            self.name = json_dict["name"]
+            self.member_count, self.max_member = (int(val_str) for val_str in json_dict["member"].split("|"))
+            self.update_time = json_dict["up"]
+            self.warn_time = json_dict["warn"]
+            return
+        member_str, max_str, up_str, warn_str, self.name = input_str.split("|", 4)
+        self.member_count, self.max_member = int(member_str), int(max_str)
+        self.update_time, self.warn_time = int(up_str), int(warn_str)
 
     def __init__(self):
         self.name: str = "未知"
@@ -39,36 +40,17 @@ class GroupMetaInfo:
 @custom_json_object
 class GroupStatInfo(JsonObject):
     def serialize(self) -> str:
-        json_dict = {"msg": self.msg.serialize(),
-                     "cmd": self.cmd.serialize(),
-                     "roll": self.roll.serialize(),
-                     "meta": self.meta.serialize(),
-                     }
-        return json.dumps(json_dict)
+        return join_stat_fields(self.meta.serialize())
 
     def deserialize(self, json_str: str) -> None:
-        json_dict: dict = json.loads(json_str)
-        self.msg.deserialize(json_dict["msg"])
-        self.cmd.deserialize(json_dict["cmd"])
-        self.roll.deserialize(json_dict["roll"])
-        self.meta.deserialize(json_dict["meta"])
+        if is_legacy_stat_format(json_str):
+            meta_str = json.loads(json_str)["meta"]
+        else:
+            meta_str = read_stat_fields(json_str, 1, legacy_indexes=[3])[0]
+        self.meta.deserialize(meta_str)
 
     def __init__(self):
-        self.msg: StatElementBase = StatElementBase()
-        self.cmd: UserCommandStatInfo = UserCommandStatInfo()
-        self.roll: RollStatInfo = RollStatInfo()
         self.meta: GroupMetaInfo = GroupMetaInfo()
 
-    def stat_msg(self, time: int = 1):
-        self.msg.inc(time)
-
-    def stat_cmd(self, command):
-        self.cmd.record(command)
-
     def is_valid(self):
         raise NotImplementedError()
-
-    def daily_update(self):
-        self.msg.update()
-        self.cmd.update()
-        self.roll.update()
@@ -2,7 +2,7 @@ import json
 
 from core.data import JsonObject, custom_json_object
 
-from core.statistics.basic_stat import StatElementBase, UserCommandStatInfo, RollStatInfo
+from core.statistics.basic_stat import is_legacy_stat_format, read_stat_fields, join_stat_fields
 
 
 class UserMetaInfo:
@@ -19,36 +19,17 @@ class UserMetaInfo:
 @custom_json_object
 class UserStatInfo(JsonObject):
     def serialize(self) -> str:
-        json_dict = {"msg": self.msg.serialize(),
-                     "cmd": self.cmd.serialize(),
-                     "roll": self.roll.serialize(),
-                     "meta": self.meta.serialize(),
-                     }
-        return json.dumps(json_dict)
+        return join_stat_fields(self.meta.serialize())
 
     def deserialize(self, json_str: str) -> None:
-        json_dict: dict = json.loads(json_str)
-        self.msg.deserialize(json_dict["msg"])
-        self.cmd.deserialize(json_dict["cmd"])
-        self.roll.deserialize(json_dict["roll"])
-        self.meta.deserialize(json_dict["meta"])
+        if is_legacy_stat_format(json_str):
+            meta_str = json.loads(json_str)["meta"]
+        else:
+            meta_str = read_stat_fields(json_str, 1, legacy_indexes=[3])[0]
+        self.meta.deserialize(meta_str)
 
     def __init__(self):
-        self.msg: StatElementBase = StatElementBase()
-        self.cmd: UserCommandStatInfo = UserCommandStatInfo()
-        self.roll: RollStatInfo = RollStatInfo()
         self.meta: UserMetaInfo = UserMetaInfo()
 
-    def stat_msg(self, time: int = 1):
-        self.msg.inc(time)
-
-    def stat_cmd(self, command):
-        self.cmd.record(command)
-
     def is_valid(self):
         raise NotImplementedError()
-
-    def daily_update(self):
-        self.msg.update()
-        self.cmd.update()
-        self.roll.update()
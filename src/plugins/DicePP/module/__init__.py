@@ -1,3 +1,10 @@
+"""
+功能子包, import 时注册各自的指令、本地化键与配置项
+
+Bot 启动时导入本包; 子包顶层只导入轻量依赖, openpyxl / aiohttp / zhconv / LLM 客户端等较重的依赖
+在首次使用或启用功能的 delay_init 中再加载 (见 tests/module/test_import_budget.py)。
+module.fastapi 不注册指令, 由需要 HTTP 接口的入口 (nonebot 适配器、standalone_bot) 自行导入。
+"""
 import module.common
 
 import module.roll
@@ -8,7 +15,6 @@ import module.dice_hub
 import module.character
 import module.initiative
 
-import module.fastapi
 import module.misc
 
 import module.persona
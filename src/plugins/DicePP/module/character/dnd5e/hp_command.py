@@ -13,7 +13,7 @@ from core.communication import MessageMetaData, PrivateMessagePort, GroupMessage
 
 from utils.string import match_substring
 from module.roll import exec_roll_exp, RollDiceError, RollResult
-from core.data.models import DNDCharacter, NPCHealth, HPInfo
+from core.data.models import DNDCharacter, NPCHealth, HPInfo, HP_PROJECTION_FIELDS
 from module.character.dnd5e.services import HPService
 
 LOC_HP_INFO = "hp_info"
@@ -68,15 +68,17 @@ class HPCommand(UserCommandBase):
                 feedback = self.format_loc(LOC_HP_INFO_MISS, name=nickname)
 
         elif arg_str.startswith("list"):  # 查看当前群聊的所有生命值信息
-            pc_chars = await self.bot.db.characters_dnd.list_by(group_id=meta.group_id)
+            # PC 只读生命值投影列，不解析完整角色卡
+            pc_rows = await self.bot.db.characters_dnd.list_projection(
+                HP_PROJECTION_FIELDS, group_id=meta.group_id, is_init=1
+            )
             npc_list = await self.bot.db.npc_health.list_by(group_id=meta.group_id)
-            if pc_chars or npc_list:
+            if pc_rows or npc_list:
                 feedback = ""
-                for char in pc_chars:
-                    if not char.is_init:
-                        continue
-                    nickname = await self.bot.get_nickname(char.user_id, meta.group_id)
-                    feedback += f"{nickname} {char.hp_info.get_info()}\n"
+                nicknames = await self.bot.get_nicknames([row["user_id"] for row in pc_rows], meta.group_id)
+                for row in pc_rows:
+                    hp_info = HPInfo.from_projection(row)
+                    feedback += f"{nicknames[row['user_id']]} {hp_info.get_info()}\n"
                 for npc in npc_list:
                     if npc.hp_data:
                         try:
@@ -1,15 +1,10 @@
+import asyncio
 import json
 import os
 import re
 import time
 import uuid
-import zlib
-from typing import Any, Dict, List, Optional, Tuple
-
-try:
-    import requests  # type: ignore
-except Exception:  # pragma: no cover
-    requests = None
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 
 from core.bot import Bot
 from core.command.const import *
@@ -19,6 +14,9 @@ from core.communication import GroupMessagePort, MessageMetaData
 from utils.time import get_current_date_str, str_to_datetime
 from utils.logger import dice_log
 
+from .log_export import EXPORT_BATCH_SIZE, LogExporter, merge_record_batches, generate_forum_code_line
+from .log_upload import LogUploader
+
 # 旧版本使用的常量，保留以兼容外部引用或进行数据迁移
 DC_LOG_SESSION = "log_session"
 DCK_ACTIVE = "active"
@@ -59,6 +57,9 @@ FILTER_BOT = "bot"
 FILTER_MEDIA = "media"
 FILTER_FORUM_CODE = "forum_code"
 
+# 后台导出任务的超时时间（秒）
+EXPORT_TASK_TIMEOUT = 600
+
 LOG_KEY_NAME = "name"
 LOG_KEY_CREATED_AT = "created_at"
 LOG_KEY_UPDATED_AT = "updated_at"
@@ -188,6 +189,41 @@ def _detect_roll_result(content: str) -> Optional[str]:
     return None
 
 
+def _build_upload_item(record: Dict[str, Any]) -> Dict[str, Any]:
+    """单条日志记录 -> 日志站上传条目"""
+    raw_uid = record.get("user_id") or record.get("imUserId") or ""
+    if isinstance(raw_uid, int):
+        raw_uid = str(raw_uid)
+    if not raw_uid and record.get("uniformId"):
+        raw_uid = str(record.get("uniformId")).split(":")[-1]
+    user_id = str(raw_uid or "")
+    nickname = record.get("nickname", user_id or "?")
+    try:
+        timestamp = int(str_to_datetime(record.get("time", _now_str())).timestamp())
+    except (ValueError, TypeError, AttributeError, ArithmeticError):
+        timestamp = int(time.time())
+    content = record.get("content", "")
+    is_bot_msg = record.get(LOG_KEY_SOURCE) == "bot"
+    roll_result = _detect_roll_result(content) if is_bot_msg else None
+    command_info: Optional[Dict[str, Any]] = None
+    if roll_result:
+        command_info = {
+            "cmd": "roll",
+            "result": roll_result,
+        }
+    return {
+        "nickname": nickname,
+        "imUserId": user_id,
+        "uniformId": f"QQ:{user_id}" if user_id else "",
+        "time": timestamp,
+        "message": content,
+        "isDice": bool(roll_result),
+        "commandId": record.get("message_id") or "",
+        "commandInfo": command_info,
+        "rawMsgId": record.get("message_id") or "",
+    }
+
+
 def _detect_attr_changes(content: str) -> Dict[str, int]:
     changes: Dict[str, int] = {}
     if not content:
@@ -608,13 +644,7 @@ def should_filter_record(bot: Bot, group_id: str, user_id: str, content: str, is
 
 
 def _generate_forum_code_log(records: List[Dict[str, Any]]) -> str:
-    forum_code = []
-    for record in records:
-        time = record.get("time", "未知时间")
-        nickname = record.get("nickname", "未知用户")
-        content = record.get("content", "")
-        forum_code.append(f"[color=#9ca3af]{time}[/color][color=#f99252] <{nickname}>{content} [/color]")
-    return "\n".join(forum_code)
+    return "\n".join(generate_forum_code_line(record) for record in records)
 
 
 def append_log_record(bot: Bot, group_id: str, user_id: str, nickname: str, content: str,
@@ -729,10 +759,13 @@ class _LogMessages:
         self.list_header = "日志列表："
         self.deleted = "日志《{name}》已删除。"
         self.halted = "日志《{name}》已停止记录。"
-        self.end_summary = (
-            "日志《{name}》已导出，共 {count} 条消息。"
-            "已向群文件上传生成的日志（如存在“跑团log”文件夹将自动归档）。"
-        )
+        self.end_summary = "日志《{name}》已结束记录，共 {count} 条消息。"
+        self.exporting = "正在后台导出日志文件，完成后将上传至群文件（如存在“跑团log”文件夹将自动归档）。"
+        self.exported = "日志《{name}》已导出，已向群文件上传生成的日志。"
+        self.export_in_progress = "日志《{name}》正在导出：{done}/{total} 条。"
+        self.export_failed = "日志《{name}》导出失败，请稍后使用 .log get 查看或联系管理员。"
+        self.export_timeout = "日志《{name}》导出超时，请稍后重试。"
+        self.uploading = "正在上传至日志站，完成后将发送线上链接。"
         self.pause_before_delete = "日志《{name}》正在记录，请先 .log off 或 .log halt。"
         self.not_recording = "日志《{name}》当前处于暂停状态。"
         self.switch_success = "已切换至日志《{name}》。"
@@ -891,6 +924,10 @@ class LogCommand(UserCommandBase):
         super().__init__(bot)
         self.helper = _LogHelper(bot)
         self.messages = _LogMessages()
+        # log_id -> (已导出条数, 总条数)，仅在后台导出进行中存在
+        self._export_progress: Dict[str, Tuple[int, int]] = {}
+        # 正在后台上传的 log_id
+        self._uploading: Set[str] = set()
         self.log_usage = (
             "日志指令：\n"
             ".log new <名称>  创建并立即开始新的日志\n"
@@ -949,7 +986,7 @@ class LogCommand(UserCommandBase):
             feedback = self._handle_halt(payload, group_id)
             cmds = [BotSendMsgCommand(self.bot.account, feedback, [reply_port])]
         elif action == "end":
-            cmds = self._handle_end(payload, group_id)
+            cmds = await self._handle_end(payload, group_id)
         elif action == "list":
             feedback = self._handle_list(payload)
             cmds = [BotSendMsgCommand(self.bot.account, feedback, [reply_port])]
@@ -1187,7 +1224,7 @@ class LogCommand(UserCommandBase):
                 dice_log(f"[LogDB] upsert halt error: {e}")
         return self.messages.halted.format(name=entry.get(LOG_KEY_NAME, current_id))
 
-    def _handle_end(self, payload: Dict[str, Any], group_id: str) -> List[BotCommandBase]:
+    async def _handle_end(self, payload: Dict[str, Any], group_id: str) -> List[BotCommandBase]:
         current_id = payload.get(LOG_GROUP_CURRENT, "")
         if not current_id:
             feedback = self.messages.no_current
@@ -1202,51 +1239,50 @@ class LogCommand(UserCommandBase):
         payload[LOG_GROUP_CURRENT] = ""
         payload[LOG_GROUP_LOGS][current_id] = entry
 
-        filters = _ensure_filters(payload)
-        file_main_path, display_name, extra_files = self._generate_file(group_id, entry, filters, log_id=current_id)
+        filters = dict(_ensure_filters(payload))
         count = entry.get(LOG_KEY_STATS, {}).get("messages", len(entry.get(LOG_KEY_RECORDS, [])))
-        upload_feedback = self._try_upload_log(group_id, entry, log_id=current_id)
-        upload_note = "上传至群文件"
-        upload_url = None
-        if upload_feedback:
-            upload_note = upload_feedback.get("message", upload_note)
-            upload_url = upload_feedback.get("url")
-        entry[LOG_KEY_UPLOAD] = {
-            LOG_KEY_UPLOAD_TIME: _now_str(),
-            LOG_KEY_UPLOAD_FILE: display_name,
-            LOG_KEY_UPLOAD_NOTE: upload_note,
-        }
-        if upload_url:
-            entry[LOG_KEY_UPLOAD]["url"] = upload_url
-        payload[LOG_GROUP_LOGS][current_id] = entry
-        # DB 更新上传信息
-        if get_connection and update_log_upload:
-            try:
-                conn = get_connection()
-                try:
-                    update_log_upload(conn, current_id, {
-                        "time": entry[LOG_KEY_UPLOAD].get(LOG_KEY_UPLOAD_TIME),
-                        "file": entry[LOG_KEY_UPLOAD].get(LOG_KEY_UPLOAD_FILE),
-                        "note": entry[LOG_KEY_UPLOAD].get(LOG_KEY_UPLOAD_NOTE),
-                        "url": entry[LOG_KEY_UPLOAD].get("url"),
-                    })
-                    conn.commit()
-                finally:
-                    conn.close()
-            except Exception as e:
-                dice_log(f"[LogDB] update upload error: {e}")
-
-        feedback_lines = [self.messages.end_summary.format(name=entry.get(LOG_KEY_NAME, current_id), count=count)]
-        if upload_feedback:
-            if upload_feedback.get("success") and upload_url:
-                feedback_lines.append(f"线上日志链接：{upload_url}")
-            elif upload_feedback.get("message"):
-                feedback_lines.append(f"云端上传提示：{upload_feedback['message']}")
+        # 导出与上传在后台任务中完成，先回复结束信息，文件与链接随后发送
+        self._export_progress[current_id] = (0, count)
+
+        async def export_log_task() -> List[BotCommandBase]:
+            return await self._export_task(payload, group_id, current_id, entry, filters)
+
+        def export_log_timeout() -> List[BotCommandBase]:
+            self._export_progress.pop(current_id, None)
+            return [BotSendMsgCommand(self.bot.account, self.messages.export_timeout.format(name=entry.get(LOG_KEY_NAME, current_id)),
+                                      [GroupMessagePort(group_id)])]
+
+        self.bot.register_task(export_log_task, timeout=EXPORT_TASK_TIMEOUT, timeout_callback=export_log_timeout)
+        # 云端上传与文件导出互不依赖，各自完成后分别发送
+        feedback_lines = [
+            self.messages.end_summary.format(name=entry.get(LOG_KEY_NAME, current_id), count=count),
+            self.messages.exporting,
+        ]
+        if self._register_upload(payload, group_id, current_id, entry):
+            feedback_lines.append(self.messages.uploading)
         feedback = "\n".join(feedback_lines)
+        return [BotSendMsgCommand(self.bot.account, feedback, [GroupMessagePort(group_id)])]
+
+    async def _export_task(self, payload: Dict[str, Any], group_id: str, log_id: str,
+                           entry: Dict[str, Any], filters: Dict[str, bool]) -> List[BotCommandBase]:
+        """后台导出任务：生成文件并上传至群文件"""
         port = GroupMessagePort(group_id)
+        try:
+            file_main_path, display_name, extra_files = await self._generate_file(group_id, entry, filters, log_id=log_id)
+        except Exception as e:
+            dice_log(f"[LogExport] export failed: {type(e).__name__}: {e}")
+            return [BotSendMsgCommand(self.bot.account, self.messages.export_failed.format(name=entry.get(LOG_KEY_NAME, log_id)), [port])]
+        upload = entry.setdefault(LOG_KEY_UPLOAD, {})
+        upload[LOG_KEY_UPLOAD_TIME] = _now_str()
+        upload[LOG_KEY_UPLOAD_FILE] = display_name
+        upload.setdefault(LOG_KEY_UPLOAD_NOTE, "上传至群文件")
+        payload[LOG_GROUP_LOGS][log_id] = entry
+        self._persist_upload_info(log_id, upload)
+        self.helper.save_payload(group_id, payload)
+
         folder_prefix = "跑团log/"
         commands: List[BotCommandBase] = [
-            BotSendMsgCommand(self.bot.account, feedback, [port]),
+            BotSendMsgCommand(self.bot.account, self.messages.exported.format(name=entry.get(LOG_KEY_NAME, log_id)), [port]),
             BotSendFileCommand(self.bot.account, file_main_path, folder_prefix + display_name, [port]),
         ]
         for fpath, fname in extra_files:
@@ -1299,27 +1335,18 @@ class LogCommand(UserCommandBase):
         entry = payload[LOG_GROUP_LOGS].get(log_id)
         if not entry:
             return self.messages.no_target.format(name=name)
+        if log_id in self._export_progress:
+            done, total = self._export_progress[log_id]
+            return self.messages.export_in_progress.format(name=entry.get(LOG_KEY_NAME, name), done=done, total=total)
         upload = entry.get(LOG_KEY_UPLOAD, {})
-        should_retry = not upload or not upload.get("url")
-        retry_feedback: Optional[Dict[str, Any]] = None
-        if should_retry:
-            retry_feedback = self._try_upload_log(group_id, entry, log_id=log_id)
-            if retry_feedback:
-                upload_file_name = upload.get(LOG_KEY_UPLOAD_FILE) or f"{entry.get(LOG_KEY_NAME, name)}"
-                note = retry_feedback.get("message", "")
-                entry[LOG_KEY_UPLOAD] = {
-                    LOG_KEY_UPLOAD_TIME: _now_str(),
-                    LOG_KEY_UPLOAD_FILE: upload_file_name,
-                    LOG_KEY_UPLOAD_NOTE: note or "自动上传",
-                }
-                if retry_feedback.get("url"):
-                    entry[LOG_KEY_UPLOAD]["url"] = retry_feedback["url"]
-                payload[LOG_GROUP_LOGS][log_id] = entry
-                upload = entry.get(LOG_KEY_UPLOAD, {})
+        uploading = log_id in self._uploading
+        # 尚无线上链接时在后台重新上传，完成后另行发送链接
+        if not uploading and not upload.get("url"):
+            uploading = self._register_upload(payload, group_id, log_id, entry)
         if not upload:
             message = "该日志尚未导出过。"
-            if retry_feedback and retry_feedback.get("message"):
-                message += f"\n云端上传提示：{retry_feedback['message']}"
+            if uploading:
+                message += "\n" + self.messages.uploading
             return message
         upload_time = upload.get(LOG_KEY_UPLOAD_TIME, "未知时间")
         upload_file = upload.get(LOG_KEY_UPLOAD_FILE, "未知文件")
@@ -1327,8 +1354,10 @@ class LogCommand(UserCommandBase):
         lines = [f"日志《{entry.get(LOG_KEY_NAME, name)}》最近一次导出：{upload_time}，文件名：{upload_file}"]
         if url:
             lines.append(f"线上查看：{url}")
-        elif retry_feedback and retry_feedback.get("message"):
-            lines.append(f"云端上传提示：{retry_feedback['message']}")
+        elif uploading:
+            lines.append(self.messages.uploading)
+        elif upload.get(LOG_KEY_UPLOAD_NOTE):
+            lines.append(f"云端上传提示：{upload[LOG_KEY_UPLOAD_NOTE]}")
         return "\n".join(lines)
 
     def _handle_stat(self, payload: Dict[str, Any], group_id: str, name: str) -> str:
@@ -1381,161 +1410,61 @@ class LogCommand(UserCommandBase):
         state = "ON" if filters[key] else "OFF"
         return self.bot.loc_helper.format_loc_text(LOC_LOG_SET_TOGGLED, item=param, state=state)
 
-    async def _generate_file(self, group_id: str, log_entry: Dict[str, Any], filters: Dict[str, bool], *, log_id: Optional[str] = None) -> Tuple[str, str, List[Tuple[str, str]]]:
-        # 优先从 DB 读取记录，避免占用内存
-        records: List[Dict[str, Any]]
-        # Prefer DB records but merge with any legacy in-memory records so that
-        # old-format logs (stored in payload) and new DB-backed records are
-        # concatenated for export.
+    async def _record_batches(self, log_entry: Dict[str, Any], log_id: str) -> Tuple[int, AsyncIterator[List[Dict[str, Any]]]]:
+        """返回 (记录总数, 按时间有序的记录批次)；旧版日志的内存记录（payload）与库中记录按时间归并"""
         records_payload = list(log_entry.get(LOG_KEY_RECORDS, []))
-        records_db = []
-        if get_connection and fetch_records:
-            try:
-                conn = get_connection()
-                try:
-                    use_log_id = log_id or self._get_log_id_by_entry(group_id, log_entry)
-                    records_db = fetch_records(conn, use_log_id)
-                finally:
-                    conn.close()
-            except Exception as e:
-                dice_log(f"[LogDB] fetch_records error: {e}")
-                records_db = []
-        # Merge DB-backed and payload records, sort by timestamp to preserve order
-        if records_db and records_payload:
-            try:
-                combined = records_db + records_payload
-                combined.sort(key=lambda r: str_to_datetime(r.get('time', _now_str())) or _now_str())
-                records = combined
-            except (TypeError, AttributeError):
-                records = records_db + records_payload
-        elif records_db:
-            records = records_db
-        else:
-            records = records_payload
+        total = len(records_payload)
+        db_batches: Optional[AsyncIterator[List[Dict[str, Any]]]] = None
+        try:
+            log_repo = self.bot.db.log
+            total += await log_repo.count_records(log_id)
+            db_batches = log_repo.iter_records_raw(log_id, batch_size=EXPORT_BATCH_SIZE)
+        except Exception as e:
+            dice_log(f"[LogDB] fetch_records error: {e}")
+
+        async def _no_batches():
+            return
+            yield
+
+        return total, merge_record_batches(db_batches if db_batches is not None else _no_batches(), records_payload)
+
+    async def _generate_file(self, group_id: str, log_entry: Dict[str, Any], filters: Dict[str, bool], *, log_id: Optional[str] = None) -> Tuple[str, str, List[Tuple[str, str]]]:
+        """流式导出日志文件：从 log.db 分批读取记录，渲染与写文件在工作线程中进行"""
+        use_log_id = log_id or self._get_log_id_by_entry(group_id, log_entry)
+        total, batches = await self._record_batches(log_entry, use_log_id)
+
         color_map = dict(log_entry.get(LOG_KEY_COLOR_MAP, {}))
         log_name = log_entry.get(LOG_KEY_NAME, "log")
         start_time = log_entry.get(LOG_KEY_CREATED_AT, _now_str())
         safe_name = _sanitize_filename(log_name)
         safe_start = start_time.replace('/', '-').replace(':', '-').replace(' ', '_')
-        display_name_base = f"{safe_name}_{safe_start}"
-        logs_dir = os.path.join(self.bot.data_path, "logs")
-        os.makedirs(logs_dir, exist_ok=True)
-
-        nickname_cache: Dict[str, str] = {}
-        for record in records:
-            uid = record.get('user_id')
-            if uid and uid not in nickname_cache:
-                try:
-                    nick = await self.bot.get_nickname(uid, group_id)
-                except Exception:
-                    nick = None
-                if nick and nick not in ("UNDEF_NAME", "----"):
-                    nickname_cache[uid] = nick
-
-        msg_map: Dict[str, Dict[str, str]] = {}
-        for record in records:
-            mid = record.get('message_id')
-            if not mid:
-                continue
-            raw_content = record.get('content', '')
-            cleaned = re.sub(r"\[CQ:reply,(?:id|reply|source_id)=\d+[^\]]*\]", "", raw_content)
-            sender_display = nickname_cache.get(record.get('user_id')) or record.get('nickname', '?')
-            msg_map[str(mid)] = {"content": cleaned, "nickname": sender_display}
-
-        user_display: Dict[str, str] = {}
-        for record in records:
-            uid = record.get('user_id')
-            if uid and uid not in user_display:
-                user_display[uid] = nickname_cache.get(uid) or record.get('nickname') or uid
-
-        # 预取所有 [CQ:at] 引用的 uid 昵称，避免在同步回调中调用 async 方法
-        at_uid_set: set = set()
-        for record in records:
-            for m in re.finditer(r"\[CQ:at,qq=(\d+)", record.get('content', '')):
-                at_uid_set.add(m.group(1))
-        for at_uid in at_uid_set:
-            if at_uid not in nickname_cache:
-                try:
-                    nick = await self.bot.get_nickname(at_uid, group_id)
-                except Exception:
-                    nick = None
-                if nick and nick not in ("UNDEF_NAME", "----"):
-                    nickname_cache[at_uid] = nick
-
-        def humanize_cq(raw: str) -> str:
-            text = raw
-
-            def repl_reply(match: re.Match) -> str:
-                rid = match.group(1)
-                origin = msg_map.get(rid)
-                if not origin:
-                    return "| 引用消息不在 log 范围内\n"
-                origin_content = origin['content'].strip() or "(空白)"
-                lines = [ln.strip() for ln in origin_content.splitlines() if ln.strip()][:3] or [origin_content]
-                lines = [ln[:60] + ('…' if len(ln) > 60 else '') for ln in lines]
-                quote_lines = [f"| {origin['nickname']}"] + [f"| {ln}" for ln in lines]
-                return "\n".join(quote_lines) + "\n"
-
-            text = re.sub(r"\[CQ:reply,(?:id|reply|source_id)=(\d+)[^\]]*\]", repl_reply, text)
-
-            def repl_at(match: re.Match) -> str:
-                uid = match.group(1)
-                # 优先用预取的昵称缓存，其次用 user_display，最后 fallback 到 uid
-                nick = nickname_cache.get(uid) or user_display.get(uid)
-                if not nick or nick in ("UNDEF_NAME", "----"):
-                    nick = uid
-                return f"@{nick}"
-
-            text = re.sub(r"\[CQ:at,qq=(\d+)(?:,[^\]]*)?\]", repl_at, text)
-            return text
-
-        txt_path = os.path.join(logs_dir, display_name_base + ".txt")
-        with open(txt_path, "w", encoding="utf-8") as txt_file:
-            txt_file.write(f"群 {group_id} 跑团日志 (开始于 {start_time})\n\n")
-            for record in records:
-                uid = record.get('user_id', '?')
-                display_name = nickname_cache.get(uid) or record.get('nickname') or ("骰娘" if uid == self.bot.account else uid)
-                color_map.setdefault(uid, _pick_color(color_map, uid))
-                content_out = humanize_cq(record.get('content', ''))
-                txt_file.write(f"{display_name} ({uid})  {record.get('time', '?')}\n")
-                txt_file.write(content_out + "\n\n")
-
-        docx_path = None
+
+        async def resolve_nickname(uid: str) -> Optional[str]:
+            return await self.bot.get_nickname(uid, group_id)
+
+        def on_progress(done: int, total_count: int) -> None:
+            last_done, _ = self._export_progress.get(use_log_id, (0, total_count))
+            self._export_progress[use_log_id] = (done, total_count)
+            step = max(total_count // 4, 1)
+            if done // step != last_done // step or done == total_count:
+                dice_log(f"[LogExport] {use_log_id}: {done}/{total_count}")
+
+        exporter = LogExporter(
+            group_id=group_id,
+            bot_account=self.bot.account,
+            start_time=start_time,
+            logs_dir=os.path.join(self.bot.data_path, "logs"),
+            display_name_base=f"{safe_name}_{safe_start}",
+            color_for=lambda uid: _pick_color(color_map, uid),
+            resolve_nickname=resolve_nickname,
+            forum_code=bool(filters.get(FILTER_FORUM_CODE)),
+            progress=on_progress,
+        )
+        self._export_progress[use_log_id] = (0, total)
         try:
-            from docx import Document  # type: ignore
-            from docx.shared import RGBColor  # type: ignore
-
-            document = Document()
-            document.add_heading(f"群 {group_id} 跑团日志 (开始于 {start_time})", level=1)
-            for record in records:
-                uid = record.get('user_id', '?')
-                color_hex = color_map.get(uid, "000000")
-                r = int(color_hex[0:2], 16)
-                g = int(color_hex[2:4], 16)
-                b = int(color_hex[4:6], 16)
-                display_name = nickname_cache.get(uid) or record.get('nickname') or ("骰娘" if uid == self.bot.account else uid)
-                body = document.add_paragraph()
-                run_body = body.add_run(f"<{display_name}>{humanize_cq(record.get('content', ''))}")
-                run_body.font.color.rgb = RGBColor(r, g, b)
-            docx_path = os.path.join(logs_dir, display_name_base + ".docx")
-            document.save(docx_path)
-        except Exception as exc:
-            dice_log(f"[LogExport] docx generation failed: {type(exc).__name__}: {exc}")
-            docx_path = None
-
-        extra_files: List[Tuple[str, str]] = []
-        if filters.get(FILTER_FORUM_CODE):
-            forum_txt_path = os.path.join(logs_dir, display_name_base + "_forum.txt")
-            try:
-                with open(forum_txt_path, "w", encoding="utf-8") as forum_file:
-                    forum_file.write(_generate_forum_code_log(records))
-                extra_files.append((forum_txt_path, os.path.basename(forum_txt_path)))
-            except Exception as exc:
-                dice_log(f"[LogExport] forum code generation failed: {type(exc).__name__}: {exc}")
-        if docx_path:
-            extra_files.append((txt_path, os.path.basename(txt_path)))
-            return docx_path, os.path.basename(docx_path), extra_files
-        return txt_path, os.path.basename(txt_path), extra_files
+            return await exporter.run(batches, total=total)
+        finally:
+            self._export_progress.pop(use_log_id, None)
 
     def _get_upload_settings(self) -> Dict[str, Any]:
         enabled = self.bot.config.log.upload_enable
@@ -1547,94 +1476,13 @@ class LogCommand(UserCommandBase):
             "token": token,
         }
 
-    def _build_upload_payload(self, log_entry: Dict[str, Any], log_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
-        # 尝试从 DB 获取记录
-        # Merge DB and payload records for upload payload as well
-        records_payload = list(log_entry.get(LOG_KEY_RECORDS, []))
-        records_db = []
-        if get_connection and fetch_records:
-            try:
-                conn = get_connection()
-                try:
-                    use_log_id = log_id or self._get_log_id_by_entry(group_id, log_entry)
-                    records_db = fetch_records(conn, use_log_id)
-                finally:
-                    conn.close()
-            except Exception as e:
-                dice_log(f"[LogDB] fetch_records for upload error: {e}")
-                records_db = []
-        if records_db and records_payload:
-            try:
-                combined = records_db + records_payload
-                combined.sort(key=lambda r: str_to_datetime(r.get('time', _now_str())) or _now_str())
-                records = combined
-            except (TypeError, AttributeError):
-                records = records_db + records_payload
-        elif records_db:
-            records = records_db
-        else:
-            records = records_payload
-        if not records:
-            return None
-        items: List[Dict[str, Any]] = []
-        for record in records:
-            raw_uid = record.get("user_id") or record.get("imUserId") or ""
-            if isinstance(raw_uid, int):
-                raw_uid = str(raw_uid)
-            if not raw_uid and record.get("uniformId"):
-                raw_uid = str(record.get("uniformId")).split(":")[-1]
-            user_id = str(raw_uid or "")
-            nickname = record.get("nickname", user_id or "?")
-            try:
-                timestamp = int(str_to_datetime(record.get("time", _now_str())).timestamp())
-            except (ValueError, TypeError, AttributeError, ArithmeticError):
-                timestamp = int(time.time())
-            content = record.get("content", "")
-            is_bot_msg = record.get(LOG_KEY_SOURCE) == "bot"
-            roll_result = _detect_roll_result(content) if is_bot_msg else None
-            is_dice = bool(roll_result)
-            command_info: Optional[Dict[str, Any]] = None
-            if roll_result:
-                command_info = {
-                    "cmd": "roll",
-                    "result": roll_result,
-                }
-            items.append({
-                "nickname": nickname,
-                "imUserId": user_id,
-                "uniformId": f"QQ:{user_id}" if user_id else "",
-                "time": timestamp,
-                "message": content,
-                "isDice": is_dice,
-                "commandId": record.get("message_id") or "",
-                "commandInfo": command_info,
-                "rawMsgId": record.get("message_id") or "",
-            })
-        payload = {
-            "version": UPLOAD_VERSION,
-            "items": items,
-        }
-        json_str = json.dumps(payload, ensure_ascii=False)
-        compressed = zlib.compress(json_str.encode("utf-8"))
-        return {
-            "file": compressed,
-            "name": log_entry.get(LOG_KEY_NAME, "日志"),
-        }
-
-    def _try_upload_log(self, group_id: str, log_entry: Dict[str, Any], *, log_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    async def _upload_log(self, group_id: str, log_entry: Dict[str, Any], *, log_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """压缩并上传日志到日志站，未启用时返回 None"""
         settings = self._get_upload_settings()
         if not settings.get("enabled"):
             return None
-        if requests is None:
-            return {"success": False, "message": "requests 模块不可用，已跳过云端上传"}
-        # 获取当前日志 ID 以便从 DB 读取
         use_log_id = log_id or self._get_log_id_by_entry(group_id, log_entry)
-        payload_data = self._build_upload_payload(log_entry, log_id=use_log_id)
-        if not payload_data:
-            return {"success": False, "message": "日志内容为空，已跳过云端上传"}
-        files = {
-            'file': ('log-zlib-compressed', payload_data['file'], 'application/octet-stream')
-        }
+        _, batches = await self._record_batches(log_entry, use_log_id)
         masters = self.bot.config.master
         uploader_id = None
         for mid in masters:
@@ -1643,34 +1491,66 @@ class LogCommand(UserCommandBase):
                 break
         if not uploader_id:
             uploader_id = str(self.bot.account)
-        form = {
-            'name': payload_data['name'],
-            'uniform_id': f"QQ:{uploader_id}",
-            'client': 'DicePP',
-            'version': str(UPLOAD_VERSION),
-        }
-        headers = {}
-        if settings.get("token"):
-            headers['Authorization'] = f"Bearer {settings['token']}"
+        uploader = LogUploader(settings["endpoint"], settings["token"], UPLOAD_VERSION, _build_upload_item)
+        return await uploader.upload(log_entry.get(LOG_KEY_NAME, "日志"), f"QQ:{uploader_id}", batches)
+
+    async def _upload_task(self, payload: Dict[str, Any], group_id: str, log_id: str, entry: Dict[str, Any]) -> List[BotCommandBase]:
+        """后台上传任务：完成后记录上传信息并发送链接"""
         try:
-            response = requests.put(settings['endpoint'], data=form, files=files, headers=headers, timeout=15)
-        except (OSError, requests.RequestException, TimeoutError) as exc:
-            return {"success": False, "message": f"云端上传失败：{exc}"}
+            upload_feedback = await self._upload_log(group_id, entry, log_id=log_id)
+        except Exception as e:
+            dice_log(f"[LogUpload] upload failed: {type(e).__name__}: {e}")
+            upload_feedback = {"success": False, "message": f"云端上传失败：{e}"}
+        finally:
+            self._uploading.discard(log_id)
+        if not upload_feedback:
+            return []
+        upload = entry.setdefault(LOG_KEY_UPLOAD, {})
+        upload.setdefault(LOG_KEY_UPLOAD_TIME, _now_str())
+        upload.setdefault(LOG_KEY_UPLOAD_FILE, entry.get(LOG_KEY_NAME, log_id))
+        upload[LOG_KEY_UPLOAD_NOTE] = upload_feedback.get("message", "")
+        if upload_feedback.get("url"):
+            upload["url"] = upload_feedback["url"]
+        payload[LOG_GROUP_LOGS][log_id] = entry
+        self._persist_upload_info(log_id, upload)
+        self.helper.save_payload(group_id, payload)
+
+        name = entry.get(LOG_KEY_NAME, log_id)
+        if upload_feedback.get("success") and upload_feedback.get("url"):
+            feedback = f"日志《{name}》线上日志链接：{upload_feedback['url']}"
+        else:
+            feedback = f"日志《{name}》云端上传提示：{upload_feedback.get('message', '')}"
+        return [BotSendMsgCommand(self.bot.account, feedback, [GroupMessagePort(group_id)])]
+
+    def _register_upload(self, payload: Dict[str, Any], group_id: str, log_id: str, entry: Dict[str, Any]) -> bool:
+        """登记后台上传任务，同一日志已在上传时返回 False"""
+        if log_id in self._uploading or not self._get_upload_settings().get("enabled"):
+            return False
+        self._uploading.add(log_id)
+
+        async def upload_log_task() -> List[BotCommandBase]:
+            return await self._upload_task(payload, group_id, log_id, entry)
+
+        # 上传器自身的超时与重试次数有上限，这里不再设置任务超时
+        self.bot.register_task(upload_log_task, timeout=0)
+        return True
+
+    def _persist_upload_info(self, log_id: str, upload: Dict[str, Any]) -> None:
         try:
-            resp_json = response.json()
-        except (ValueError, AttributeError):
-            resp_json = {}
-        if response.ok and isinstance(resp_json, dict) and resp_json.get('url'):
-            return {
-                "success": True,
-                "message": "云端上传成功",
-                "url": resp_json['url'],
-            }
-        msg = resp_json.get('message') if isinstance(resp_json, dict) else response.text
-        return {
-            "success": False,
-            "message": f"云端上传失败：HTTP {response.status_code} {msg or response.reason}",
-        }
+            if get_connection and update_log_upload:
+                conn = get_connection()
+                try:
+                    update_log_upload(conn, log_id, {
+                        "time": upload.get(LOG_KEY_UPLOAD_TIME),
+                        "file": upload.get(LOG_KEY_UPLOAD_FILE),
+                        "note": upload.get(LOG_KEY_UPLOAD_NOTE),
+                        "url": upload.get("url"),
+                    })
+                    conn.commit()
+                finally:
+                    conn.close()
+        except Exception as e:
+            dice_log(f"[LogDB] update upload error: {e}")
 
     def get_help(self, keyword: str, meta: MessageMetaData) -> str:
         if keyword in ("log", "日志"):
@@ -0,0 +1,330 @@
+"""
+跑团日志导出流水线
+
+从 log.db 按 id 顺序分批读取记录，逐批渲染 TXT / DOCX / 论坛代码三种格式：
+
+- 读取：``LogRepository.iter_records_raw`` 键集分页，内存占用只与批大小有关
+- 昵称：每批在事件循环上解析新出现的 user_id（含 [CQ:at] 引用），结果缓存
+- 渲染：每批交给工作线程处理 CQ 码与文件写入，事件循环不被正则和磁盘 IO 阻塞
+- DOCX：以 python-docx 生成的空文档为模板，直接流式写入 word/document.xml，
+  不在内存中构造整份文档
+"""
+import asyncio
+import datetime
+import io
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape as xml_escape
+
+from utils.logger import dice_log
+from utils.time import str_to_datetime
+
+# 单批读取 / 渲染的记录数
+EXPORT_BATCH_SIZE = 500
+# 引用消息缓存上限：仅保存截断后的引用摘要，超出后淘汰最旧的
+REPLY_CACHE_LIMIT = 4096
+INVALID_NICKNAMES = ("UNDEF_NAME", "----")
+
+RE_CQ_REPLY = re.compile(r"\[CQ:reply,(?:id|reply|source_id)=(\d+)[^\]]*\]")
+RE_CQ_AT = re.compile(r"\[CQ:at,qq=(\d+)(?:,[^\]]*)?\]")
+RE_CQ_AT_UID = re.compile(r"\[CQ:at,qq=(\d+)")
+RE_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+DOCX_BODY_PART = "word/document.xml"
+
+NicknameResolver = Callable[[str], Awaitable[Optional[str]]]
+ProgressCallback = Callable[[int, int], None]
+
+_TIME_KEY_FALLBACK = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+
+
+def _time_key(record: Dict[str, Any]) -> datetime.datetime:
+    try:
+        return str_to_datetime(record.get("time", ""))
+    except (ValueError, TypeError):
+        return _TIME_KEY_FALLBACK
+
+
+async def merge_record_batches(
+    batches: AsyncIterable[List[Dict[str, Any]]],
+    extra_records: List[Dict[str, Any]],
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """将库中按 id 有序的批次与旧版内存记录按时间归并
+
+    内存记录数量很少（旧版 payload 最多保留几十条），只对它们解析一次时间；
+    库中记录仅在存在内存记录时才解析时间。
+    """
+    if not extra_records:
+        async for batch in batches:
+            yield batch
+        return
+    keyed = sorted(((_time_key(r), i, r) for i, r in enumerate(extra_records)), key=lambda t: (t[0], t[1]))
+    pos = 0
+    async for batch in batches:
+        merged: List[Dict[str, Any]] = []
+        for record in batch:
+            key = _time_key(record)
+            while pos < len(keyed) and keyed[pos][0] <= key:
+                merged.append(keyed[pos][2])
+                pos += 1
+            merged.append(record)
+        yield merged
+    if pos < len(keyed):
+        yield [item[2] for item in keyed[pos:]]
+
+
+def generate_forum_code_line(record: Dict[str, Any]) -> str:
+    time = record.get("time", "未知时间")
+    nickname = record.get("nickname", "未知用户")
+    content = record.get("content", "")
+    return f"[color=#9ca3af]{time}[/color][color=#f99252] <{nickname}>{content} [/color]"
+
+
+class _DocxStreamWriter:
+    """流式 DOCX 写入：模板的其余部件原样复制，正文段落逐条写入压缩流"""
+
+    def __init__(self, path: str, heading: str):
+        from docx import Document  # type: ignore
+
+        document = Document()
+        document.add_heading(heading, level=1)
+        buffer = io.BytesIO()
+        document.save(buffer)
+        template = zipfile.ZipFile(buffer)
+        body_xml = template.read(DOCX_BODY_PART).decode("utf-8")
+        split_at = body_xml.rfind("<w:sectPr")
+        if split_at < 0:
+            split_at = body_xml.rfind("</w:body>")
+
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        # zipfile 同一时间只允许一个写入句柄，先复制其余部件，正文最后流式写入
+        for info in template.infolist():
+            if info.filename != DOCX_BODY_PART:
+                self._zip.writestr(info, template.read(info.filename))
+        self._body = self._zip.open(DOCX_BODY_PART, "w")
+        self._body.write(body_xml[:split_at].encode("utf-8"))
+        self._suffix = body_xml[split_at:].encode("utf-8")
+
+    def write_paragraph(self, text: str, color_hex: str) -> None:
+        text = RE_XML_INVALID.sub("", text)
+        runs = "<w:br/>".join(
+            f'<w:t xml:space="preserve">{xml_escape(line)}</w:t>' for line in text.split("\n")
+        )
+        self._body.write(
+            f'<w:p><w:r><w:rPr><w:color w:val="{color_hex}"/></w:rPr>{runs}</w:r></w:p>'.encode("utf-8")
+        )
+
+    def close(self) -> None:
+        self._body.write(self._suffix)
+        self._body.close()
+        self._zip.close()
+
+    def abort(self) -> None:
+        try:
+            self._body.close()
+            self._zip.close()
+        except (OSError, ValueError, zipfile.BadZipFile):
+            pass
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class LogExporter:
+    """单次日志导出
+
+    Args:
+        group_id: 群号（写入标题）
+        bot_account: 骰娘账号，无昵称时显示为「骰娘」
+        start_time: 日志开始时间（写入标题）
+        logs_dir: 输出目录
+        display_name_base: 输出文件名（不含扩展名）
+        color_for: user_id -> 十六进制颜色
+        resolve_nickname: 异步昵称解析，返回 None 表示无可用昵称
+        forum_code: 是否额外输出论坛代码
+        progress: 每批渲染完成后回调 (已完成条数, 总条数)
+    """
+
+    def __init__(
+        self,
+        *,
+        group_id: str,
+        bot_account: str,
+        start_time: str,
+        logs_dir: str,
+        display_name_base: str,
+        color_for: Callable[[str], str],
+        resolve_nickname: NicknameResolver,
+        forum_code: bool = False,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        self.group_id = group_id
+        self.bot_account = bot_account
+        self.start_time = start_time
+        self.logs_dir = logs_dir
+        self.display_name_base = display_name_base
+        self.color_for = color_for
+        self.resolve_nickname = resolve_nickname
+        self.forum_code = forum_code
+        self.progress = progress
+        self.count = 0
+
+        self._nicknames: Dict[str, Optional[str]] = {}
+        self._user_display: Dict[str, str] = {}
+        self._replies: "OrderedDict[str, str]" = OrderedDict()
+        self._txt = None
+        self._forum = None
+        self._docx: Optional[_DocxStreamWriter] = None
+        self._forum_lines = 0
+
+    @property
+    def txt_path(self) -> str:
+        return os.path.join(self.logs_dir, self.display_name_base + ".txt")
+
+    @property
+    def forum_path(self) -> str:
+        return os.path.join(self.logs_dir, self.display_name_base + "_forum.txt")
+
+    @property
+    def docx_path(self) -> str:
+        return os.path.join(self.logs_dir, self.display_name_base + ".docx")
+
+    async def run(
+        self,
+        batches: AsyncIterable[List[Dict[str, Any]]],
+        total: int = 0,
+    ) -> Tuple[str, str, List[Tuple[str, str]]]:
+        """消费记录批次并输出文件，返回 (主文件路径, 主文件名, [(附加文件路径, 文件名)])"""
+        await asyncio.to_thread(self._open)
+        try:
+            async for batch in batches:
+                if not batch:
+                    continue
+                await self._resolve_nicknames(batch)
+                await asyncio.to_thread(self._render_batch, batch)
+                self.count += len(batch)
+                if self.progress:
+                    self.progress(self.count, max(total, self.count))
+        finally:
+            await asyncio.to_thread(self._close)
+
+        extra_files: List[Tuple[str, str]] = []
+        if self._forum is not None:
+            extra_files.append((self.forum_path, os.path.basename(self.forum_path)))
+        if self._docx is not None:
+            extra_files.append((self.txt_path, os.path.basename(self.txt_path)))
+            return self.docx_path, os.path.basename(self.docx_path), extra_files
+        return self.txt_path, os.path.basename(self.txt_path), extra_files
+
+    # ── 事件循环侧 ──
+
+    async def _resolve_nicknames(self, batch: List[Dict[str, Any]]) -> None:
+        pending: List[str] = []
+        for record in batch:
+            uid = record.get("user_id")
+            if uid and uid not in self._nicknames and uid not in pending:
+                pending.append(uid)
+            content = record.get("content") or ""
+            if "[CQ:at" in content:
+                for at_uid in RE_CQ_AT_UID.findall(content):
+                    if at_uid not in self._nicknames and at_uid not in pending:
+                        pending.append(at_uid)
+        for uid in pending:
+            try:
+                nick = await self.resolve_nickname(uid)
+            except Exception:
+                nick = None
+            self._nicknames[uid] = nick if nick and nick not in INVALID_NICKNAMES else None
+
+    # ── 工作线程侧 ──
+
+    def _open(self) -> None:
+        os.makedirs(self.logs_dir, exist_ok=True)
+        heading = f"群 {self.group_id} 跑团日志 (开始于 {self.start_time})"
+        self._txt = open(self.txt_path, "w", encoding="utf-8")
+        self._txt.write(heading + "\n\n")
+        try:
+            self._docx = _DocxStreamWriter(self.docx_path, heading)
+        except Exception as exc:
+            dice_log(f"[LogExport] docx generation failed: {type(exc).__name__}: {exc}")
+            self._docx = None
+        if self.forum_code:
+            try:
+                self._forum = open(self.forum_path, "w", encoding="utf-8")
+            except OSError as exc:
+                dice_log(f"[LogExport] forum code generation failed: {type(exc).__name__}: {exc}")
+                self._forum = None
+
+    def _close(self) -> None:
+        if self._txt is not None:
+            self._txt.close()
+        if self._forum is not None:
+            self._forum.close()
+        if self._docx is not None:
+            try:
+                self._docx.close()
+            except Exception as exc:
+                dice_log(f"[LogExport] docx generation failed: {type(exc).__name__}: {exc}")
+                self._docx.abort()
+                self._docx = None
+
+    def _render_batch(self, batch: List[Dict[str, Any]]) -> None:
+        for record in batch:
+            uid = record.get("user_id") or "?"
+            nick = self._nicknames.get(uid)
+            raw_nickname = record.get("nickname")
+            display_name = nick or raw_nickname or ("骰娘" if uid == self.bot_account else uid)
+            if uid not in self._user_display:
+                self._user_display[uid] = nick or raw_nickname or uid
+            color = self.color_for(uid)
+            raw_content = record.get("content", "")
+            content_out = self._humanize_cq(raw_content)
+
+            self._txt.write(f"{display_name} ({uid})  {record.get('time', '?')}\n")
+            self._txt.write(content_out + "\n\n")
+            if self._docx is not None:
+                try:
+                    self._docx.write_paragraph(f"<{display_name}>{content_out}", color)
+                except Exception as exc:
+                    dice_log(f"[LogExport] docx generation failed: {type(exc).__name__}: {exc}")
+                    self._docx.abort()
+                    self._docx = None
+            if self._forum is not None:
+                if self._forum_lines:
+                    self._forum.write("\n")
+                self._forum.write(generate_forum_code_line(record))
+                self._forum_lines += 1
+
+            message_id = record.get("message_id")
+            if message_id:
+                self._remember_reply(str(message_id), nick or raw_nickname or "?", raw_content)
+
+    def _remember_reply(self, message_id: str, nickname: str, raw_content: str) -> None:
+        cleaned = RE_CQ_REPLY.sub("", raw_content).strip() or "(空白)"
+        lines = [ln.strip() for ln in cleaned.splitlines() if ln.strip()][:3] or [cleaned]
+        lines = [ln[:60] + ("…" if len(ln) > 60 else "") for ln in lines]
+        self._replies[message_id] = "\n".join([f"| {nickname}"] + [f"| {ln}" for ln in lines]) + "\n"
+        if len(self._replies) > REPLY_CACHE_LIMIT:
+            self._replies.popitem(last=False)
+
+    def _humanize_cq(self, raw: str) -> str:
+        if "[CQ:" not in raw:
+            return raw
+
+        def repl_reply(match: re.Match) -> str:
+            return self._replies.get(match.group(1)) or "| 引用消息不在 log 范围内\n"
+
+        def repl_at(match: re.Match) -> str:
+            uid = match.group(1)
+            nick = self._nicknames.get(uid) or self._user_display.get(uid)
+            if not nick or nick in INVALID_NICKNAMES:
+                nick = uid
+            return f"@{nick}"
+
+        text = RE_CQ_REPLY.sub(repl_reply, raw)
+        return RE_CQ_AT.sub(repl_at, text)
@@ -0,0 +1,171 @@
+"""
+跑团日志云端上传
+
+- 上传体：``{"version": ..., "items": [...]}`` 的 JSON 经 zlib 压缩。按批读取记录、逐批编码并送入
+  ``zlib.compressobj``，压缩结果写入 SpooledTemporaryFile（过大时落盘），内存占用与日志长度无关
+- 编码与压缩在工作线程中进行；上传使用 aiohttp，不阻塞事件循环
+- 网络错误、超时与 5xx / 429 按指数退避重试，次数有上限；其余 4xx 直接返回失败
+"""
+import asyncio
+import io
+import json
+import tempfile
+import zlib
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from utils.logger import dice_log
+
+if TYPE_CHECKING:
+    import aiohttp  # 只在上传时加载
+
+UPLOAD_TIMEOUT = 15
+UPLOAD_MAX_ATTEMPTS = 3
+UPLOAD_RETRY_DELAY = 1.0
+# 压缩结果超过该大小后转存到临时文件
+UPLOAD_SPOOL_SIZE = 1 << 20
+UPLOAD_FILE_FIELD = "log-zlib-compressed"
+
+ItemBuilder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class _BodyReader(io.RawIOBase):
+    """上传体的只读视图：部分 aiohttp 版本发送后会关闭文件对象，重试时需要保留底层文件"""
+
+    def __init__(self, file):
+        super().__init__()
+        self._file = file
+        self._file.seek(0)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._file.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+
+class _CompressedBody:
+    """流式压缩的上传体"""
+
+    def __init__(self, version: int):
+        self.file = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+        self.count = 0
+        self._compressor = zlib.compressobj()
+        self._write(f'{{"version": {json.dumps(version)}, "items": ['.encode("utf-8"))
+
+    def _write(self, raw: bytes) -> None:
+        self.file.write(self._compressor.compress(raw))
+
+    def add_batch(self, records: List[Dict[str, Any]], item_builder: ItemBuilder) -> None:
+        parts = []
+        for record in records:
+            item = json.dumps(item_builder(record), ensure_ascii=False)
+            parts.append(item if self.count == 0 and not parts else ", " + item)
+        self.count += len(parts)
+        if parts:
+            self._write("".join(parts).encode("utf-8"))
+
+    def finish(self) -> None:
+        self._write(b"]}")
+        self.file.write(self._compressor.flush())
+        self.file.seek(0)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class LogUploader:
+    """将日志记录上传到日志站
+
+    Args:
+        endpoint: 上传地址（PUT multipart/form-data）
+        token: 可选 Bearer token
+        version: 上传格式版本号
+        item_builder: 单条记录 -> 上传条目
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        token: str,
+        version: int,
+        item_builder: ItemBuilder,
+        *,
+        timeout: float = UPLOAD_TIMEOUT,
+        max_attempts: int = UPLOAD_MAX_ATTEMPTS,
+        retry_delay: float = UPLOAD_RETRY_DELAY,
+    ):
+        self.endpoint = endpoint
+        self.token = token
+        self.version = version
+        self.item_builder = item_builder
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+
+    async def upload(self, name: str, uniform_id: str, batches: AsyncIterable[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """压缩并上传，返回 {"success", "message", ["url"]}"""
+        body = _CompressedBody(self.version)
+        try:
+            async for batch in batches:
+                if batch:
+                    await asyncio.to_thread(body.add_batch, batch, self.item_builder)
+            if body.count == 0:
+                return {"success": False, "message": "日志内容为空，已跳过云端上传"}
+            await asyncio.to_thread(body.finish)
+            return await self._put_with_retry(body, name, uniform_id)
+        finally:
+            body.close()
+
+    async def _put_with_retry(self, body: _CompressedBody, name: str, uniform_id: str) -> Dict[str, Any]:
+        import aiohttp
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        result: Dict[str, Any] = {"success": False, "message": "云端上传失败"}
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            for attempt in range(self.max_attempts):
+                form = aiohttp.FormData()
+                form.add_field("name", name)
+                form.add_field("uniform_id", uniform_id)
+                form.add_field("client", "DicePP")
+                form.add_field("version", str(self.version))
+                form.add_field("file", _BodyReader(body.file), filename=UPLOAD_FILE_FIELD, content_type="application/octet-stream")
+                retryable = True
+                try:
+                    async with session.put(self.endpoint, data=form, headers=headers) as response:
+                        result, retryable = await self._parse_response(response)
+                except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exc:
+                    result = {"success": False, "message": f"云端上传失败：{exc or type(exc).__name__}"}
+                if result["success"] or not retryable:
+                    return result
+                dice_log(f"[LogUpload] 上传失败 (尝试 {attempt + 1}/{self.max_attempts}): {result['message']}")
+                if attempt < self.max_attempts - 1:
+                    await asyncio.sleep(self.retry_delay * (2 ** attempt))
+        return result
+
+    @staticmethod
+    async def _parse_response(response: "aiohttp.ClientResponse"):
+        import aiohttp
+        try:
+            resp_json = await response.json(content_type=None)
+        except (ValueError, aiohttp.ContentTypeError):
+            resp_json = {}
+        if response.status < 400 and isinstance(resp_json, dict) and resp_json.get("url"):
+            return {"success": True, "message": "云端上传成功", "url": resp_json["url"]}, False
+        msg: Optional[str] = resp_json.get("message") if isinstance(resp_json, dict) else None
+        retryable = response.status >= 500 or response.status == 429
+        return {
+            "success": False,
+            "message": f"云端上传失败：HTTP {response.status} {msg or response.reason}",
+        }, retryable
@@ -153,10 +153,18 @@ class MasterCommand(UserCommandBase):
         elif arg_str == "debug-tick":
             feedback = f"异步任务状态: {self.bot.tick_task.get_name()} Done:{self.bot.tick_task.done()} Cancelled:{self.bot.tick_task.cancelled()}\n" \
                        f"{self.bot.tick_task}"
+            for name, metrics in self.bot.scheduler.get_metrics().items():
+                feedback += f"\n{name}: 间隔{metrics['interval']}s 运行{metrics['runs']}次 跳过{metrics['skipped']}次" \
+                            f" 失败{metrics['failures']}次 超时{metrics['timeouts']}次" \
+                            f" 平均耗时{metrics['avg_duration']:.3f}s 最大耗时{metrics['max_duration']:.3f}s"
+                if metrics["last_error"]:
+                    feedback += f" 最近错误:{metrics['last_error']}"
         elif arg_str == "redo-tick":
             import asyncio
+            if self.bot.tick_task:
+                self.bot.tick_task.cancel()
+                await asyncio.gather(self.bot.tick_task, return_exceptions=True)
             self.bot.tick_task = asyncio.create_task(self.bot.tick_loop())
-            self.bot.todo_tasks = {}
             feedback = "Redo tick finish!"
         elif arg_str == "log-clean":
             # 立即删除本Bot data_path/logs 下所有文件
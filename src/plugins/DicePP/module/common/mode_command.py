@@ -1,5 +1,4 @@
 from typing import Dict, Optional, List, Tuple, Any
-import openpyxl
 import os
 import re
 
@@ -75,6 +74,7 @@ class ModeCommand(UserCommandBase):
         self.mode_upper_map: Dict[str, str] = {}
 
     def delay_init(self) -> List[str]:
+        import openpyxl
         bot_id: str = self.bot.account
         init_info: List[str] = []
         edited: bool = False
@@ -0,0 +1,95 @@
+"""
+牌库编译缓存
+
+每个 xlsx 牌库文件解析后的结果 (工作表名、条目属性与切分好的片段) 以 pickle 保存在 data/cache/decks 下,
+以源文件的绝对路径 + mtime + 大小作为键。源文件未变化时启动直接读取缓存, 不再经过 openpyxl。
+缓存格式变化时提升 DECK_CACHE_VERSION, 旧缓存会被视为未命中并覆盖。
+"""
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import dice_log
+
+DECK_CACHE_VERSION = 1
+
+# (content, weight, redraw, final_type, segments)
+CompiledItem = Tuple[str, int, bool, int, tuple]
+# (工作表名, 条目列表)
+CompiledSheet = Tuple[str, List[CompiledItem]]
+
+
+class CompiledDeckFile:
+    """一个 xlsx 牌库文件的编译结果"""
+
+    def __init__(self, sheets: List[CompiledSheet], errors: List[str]):
+        self.sheets = sheets
+        self.errors = errors  # 解析表格时产生的提示, 命中缓存时同样需要输出
+
+
+def _source_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DeckCache:
+    """按源文件路径 + mtime + 大小缓存牌库编译结果"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.stats: Dict[str, int] = {"hit": 0, "miss": 0}
+
+    def _cache_file(self, abs_path: str) -> Path:
+        digest = hashlib.sha1(abs_path.encode("utf-8")).hexdigest()[:20]
+        return self.cache_dir / f"{digest}.pickle"
+
+    def load(self, path: str) -> Optional[CompiledDeckFile]:
+        """源文件未变化时返回缓存的编译结果, 否则返回 None"""
+        abs_path = os.path.abspath(path)
+        stamp = _source_stamp(abs_path)
+        cache_file = self._cache_file(abs_path)
+        payload: Any = None
+        if stamp is not None and cache_file.exists():
+            try:
+                with open(cache_file, "rb") as f:
+                    payload = pickle.load(f)
+            except Exception as e:  # 缓存损坏或格式不兼容, 重新编译即可
+                dice_log(f"[DeckCache] 读取缓存失败 {cache_file}: {e}")
+        if (
+            isinstance(payload, dict)
+            and payload.get("version") == DECK_CACHE_VERSION
+            and payload.get("path") == abs_path
+            and payload.get("stamp") == stamp
+        ):
+            self.stats["hit"] += 1
+            return CompiledDeckFile(payload["sheets"], payload["errors"])
+        self.stats["miss"] += 1
+        return None
+
+    def store(self, path: str, compiled: CompiledDeckFile) -> None:
+        """写入编译结果; 写入失败只影响下次启动速度"""
+        abs_path = os.path.abspath(path)
+        stamp = _source_stamp(abs_path)
+        if stamp is None:
+            return
+        payload = {
+            "version": DECK_CACHE_VERSION,
+            "path": abs_path,
+            "stamp": stamp,
+            "sheets": compiled.sheets,
+            "errors": compiled.errors,
+        }
+        cache_file = self._cache_file(abs_path)
+        tmp_file = cache_file.with_suffix(".tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_file, "wb") as f:
+                pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            dice_log(f"[DeckCache] 写入缓存失败 {cache_file}: {e}")
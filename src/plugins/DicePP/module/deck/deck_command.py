@@ -1,9 +1,10 @@
-from typing import List, Tuple, Any, Iterable, Set, Dict
+from typing import List, Tuple, Any, Iterable, Set, Dict, Optional, TYPE_CHECKING
+import abc
+import asyncio
 import random
 import re
 import os
 from pathlib import Path
-import openpyxl
 
 from core.bot import Bot
 from core.command.const import *
@@ -15,8 +16,14 @@ from core.localization import LocalizationManager, LOC_FUNC_DISABLE
 from utils import read_xlsx, update_xlsx, col_based_workbook_to_dict, create_parent_dir, get_empty_col_based_workbook
 from utils.string import match_substring
 from utils.logger import dice_log
-from utils.cq_code import get_cq_image
-from module.roll import preprocess_roll_exp, is_roll_exp, exec_roll_exp
+from utils.cq_code import get_cq_image_by_path
+from module.roll import preprocess_roll_exp, is_roll_exp, exec_roll_exp, compile_roll_exp, exec_compiled_roll_exp
+from module.roll import RollResult, RollDiceError
+from module.roll.ast_engine import CompiledRollExpression
+from module.deck.deck_cache import DeckCache, CompiledDeckFile, CompiledItem
+
+if TYPE_CHECKING:
+    import openpyxl
 
 
 LOC_DRAW_RESULT = "draw_result"
@@ -51,6 +58,51 @@ DECK_ITEM_FIELD_COMMENT = {DECK_ITEM_FIELD_CONTENT: "词条内容",
                            }
 
 
+# 高级抽卡语言片段: (类型, 参数..., 原文), 原文用于无法解析时原样输出
+DECK_SEG_TEXT = "text"  # (text, 文本)
+DECK_SEG_ROLL = "roll"  # (roll, 表达式, 原文)
+DECK_SEG_DRAW = "draw"  # (draw, 牌库名, 次数表达式, 原文)
+DECK_SEG_IMG = "img"    # (img, 图片路径, 原文)
+
+DECK_ROLL_PATTERN = re.compile(r"ROLL\((.{1,30}?)\)")
+DECK_DRAW_PATTERN = re.compile(r"DRAW\((.{1,30}?),\s*(.{1,30}?)\)")
+DECK_IMG_PATTERN = re.compile(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)")
+
+
+def _split_segments(segments: List[tuple], pattern: "re.Pattern", make_segment) -> List[tuple]:
+    """在尚未解析的文本片段中查找 pattern, 拆分出新片段"""
+    result: List[tuple] = []
+    for segment in segments:
+        if segment[0] != DECK_SEG_TEXT:
+            result.append(segment)
+            continue
+        text = segment[1]
+        last = 0
+        for match in pattern.finditer(text):
+            if match.start() > last:
+                result.append((DECK_SEG_TEXT, text[last:match.start()]))
+            result.append(make_segment(match))
+            last = match.end()
+        if last < len(text):
+            result.append((DECK_SEG_TEXT, text[last:]))
+    return result
+
+
+def tokenize_deck_content(content: str) -> tuple:
+    """
+    将条目内容切分为片段, 依次识别 ROLL(...), DRAW(..., ...), IMG(...), 与逐次 re.sub 的处理顺序一致。
+    不含任何标记的内容返回空元组, 表示按普通文本输出
+    """
+    content = content.strip()
+    if "ROLL" not in content and "DRAW" not in content and "IMG" not in content:
+        return ()
+    segments: List[tuple] = [(DECK_SEG_TEXT, content)]
+    segments = _split_segments(segments, DECK_ROLL_PATTERN, lambda m: (DECK_SEG_ROLL, m.group(1), m.group()))
+    segments = _split_segments(segments, DECK_DRAW_PATTERN, lambda m: (DECK_SEG_DRAW, m.group(1), m.group(2), m.group()))
+    segments = _split_segments(segments, DECK_IMG_PATTERN, lambda m: (DECK_SEG_IMG, m.group(1), m.group()))
+    return tuple(segments)
+
+
 class ForceFinal(Exception):
     """强制终止所有抽取"""
 
@@ -61,16 +113,138 @@ class ForceFinal(Exception):
         return self.info
 
 
+class _DeckNode(metaclass=abc.ABCMeta):
+    """条目模板中的一个节点; error 为静态检查发现的问题, 运行时按 ignore 决定原样输出还是抛出"""
+    error: Optional[str] = None
+
+    @abc.abstractmethod
+    def render(self, source: "Deck", decks: Iterable["Deck"], loc_helper: LocalizationManager, ignore: bool) -> str:
+        raise NotImplementedError()
+
+
+class _TextNode(_DeckNode):
+    def __init__(self, text: str):
+        self.text = text
+
+    def render(self, source, decks, loc_helper, ignore) -> str:
+        return self.text
+
+
+class _RollExp:
+    """已预处理的掷骰表达式, 首次执行时解析, 之后复用解析结果"""
+
+    def __init__(self, roll_exp: str):
+        self.roll_exp = roll_exp
+        self._compiled: Optional[CompiledRollExpression] = None
+        self._compile_tried = False
+
+    def roll(self) -> RollResult:
+        if not self._compile_tried:
+            try:
+                self._compiled = compile_roll_exp(self.roll_exp)
+            except RollDiceError:  # 新引擎无法解析时退回逐次执行, 保持原有报错行为
+                self._compiled = None
+            self._compile_tried = True
+        if self._compiled is None:
+            return exec_roll_exp(self.roll_exp)
+        return exec_compiled_roll_exp(self._compiled)
+
+
+class _RollNode(_DeckNode):
+    def __init__(self, raw_exp: str, raw: str):
+        self.raw_exp = raw_exp
+        roll_exp = preprocess_roll_exp(raw_exp)
+        self.roll_exp: Optional[_RollExp] = _RollExp(roll_exp) if is_roll_exp(roll_exp) else None
+        if self.roll_exp is None:
+            self.error = f"{roll_exp} in {raw} is an invalid roll expression!"
+
+    def render(self, source, decks, loc_helper, ignore) -> str:
+        if self.roll_exp is not None:
+            return self.roll_exp.roll().get_complete_result()
+        if ignore:
+            return self.raw_exp
+        raise ValueError(self.error)
+
+
+class _DrawNode(_DeckNode):
+    def __init__(self, target_deck_str: str, raw_draw_exp: str, raw: str, target: Optional["Deck"]):
+        self.target_deck_str = target_deck_str
+        self.raw = raw
+        self.target = target  # 编译时解析的目标牌库
+        self.draw_exp = preprocess_roll_exp(raw_draw_exp).strip()
+        self.times: Optional[int] = None  # 固定的抽取次数
+        self.times_roll: Optional[_RollExp] = None  # 由掷骰决定的抽取次数
+        try:
+            self.times = int(self.draw_exp)
+        except ValueError:
+            if is_roll_exp(self.draw_exp):
+                self.times_roll = _RollExp(self.draw_exp)
+            else:
+                self.error = f"{self.draw_exp} in {raw} is an invalid roll expression!"
+        else:
+            if self.times <= 0 or self.times > HLDL_DRAW_LIMIT:
+                self.error = f"{self.draw_exp} in {raw} results an invalid value! value:{self.times}"
+        if not self.error and target is None:
+            self.error = f"{target_deck_str} in {raw} is an invalid deck!"
+
+    def render(self, source, decks, loc_helper, ignore) -> str:
+        # 得到抽取次数
+        if self.times is not None:
+            draw_times, draw_times_str = self.times, self.draw_exp
+        elif self.times_roll is not None:
+            roll_res = self.times_roll.roll()
+            draw_times, draw_times_str = roll_res.get_val(), roll_res.get_complete_result()
+        else:
+            if ignore:
+                return f"{self.target_deck_str}*{self.draw_exp}"
+            raise ValueError(self.error)
+        if draw_times <= 0 or draw_times > HLDL_DRAW_LIMIT:
+            if ignore:
+                return f"{self.target_deck_str}*{draw_times_str}"
+            raise ValueError(f"{self.draw_exp} in {self.raw} results an invalid value! value:{draw_times}")
+        if not self.target:
+            if ignore:
+                return f"{self.target_deck_str}*{draw_times_str}"
+            raise ValueError(f"{self.target_deck_str} in {self.raw} is an invalid deck!")
+        draw_result = self.target.draw(draw_times, decks, loc_helper, ignore).replace("\n", " ")  # 嵌套抽取不需要换行
+        return loc_helper.format_loc_text(LOC_DRAW_RESULT_INLINE, times=draw_times, deck_name=self.target_deck_str, result=draw_result)
+
+
+class _ImgNode(_DeckNode):
+    def __init__(self, key: str):
+        self.key = key
+
+    def render(self, source, decks, loc_helper, ignore) -> str:
+        key = self.key
+        file_path_relative = Path(source.path) / key
+        for file_path in (file_path_relative, Paths.CONTENT_DECKS_DIR / key, Paths.LOCAL_IMG_DIR / key):
+            cq_image = get_cq_image_by_path(file_path)  # 编码结果按文件缓存, 不必每次读取
+            if cq_image is not None:
+                return cq_image
+        dice_log(f"[DeckImage] 找不到图片 {file_path_relative.resolve()}")
+        return key
+
+
+def index_decks(decks: Iterable["Deck"]) -> Dict[str, "Deck"]:
+    """按牌库名索引, 同名时与顺序查找一致取第一个"""
+    deck_index: Dict[str, Deck] = {}
+    for deck in decks:
+        deck_index.setdefault(deck.name, deck)
+    return deck_index
+
+
 class DeckItem:
     """牌库中的一个元素"""
 
-    def __init__(self, content: str, weight: int = 1, redraw: bool = True, final_type: int = False):
+    def __init__(self, content: str, weight: int = 1, redraw: bool = True, final_type: int = False,
+                 segments: Optional[tuple] = None):
         """
         Args:
             content: 内容, 包含高级抽卡语言
             weight: 权重
             redraw: 抽出后是否放回牌库中
             final_type: 抽出后是否终止抽牌, 0为不终止, 1为终止当前抽取但不终止外层抽取, 2为终止所有抽取
+            segments: 已切分好的片段 (来自牌库缓存), 为None时根据content切分
         """
         self.content = content
         self.weight = weight
@@ -78,82 +252,42 @@ class DeckItem:
         self.final_type = final_type
         if self.weight <= 0:
             self.weight = 1
+        self.segments: tuple = tokenize_deck_content(content) if segments is None else segments
+        self.nodes: Optional[List[_DeckNode]] = None  # compile 后的模板, 引用的牌库已解析
 
-    def get_result(self, source: "Deck", decks: Iterable["Deck"], loc_helper: LocalizationManager, ignore: bool = True) -> str:
-        """处理高级抽卡语言"""
+    def to_compiled(self) -> CompiledItem:
+        return self.content, self.weight, self.redraw, self.final_type, self.segments
 
-        def handle_roll(match):
-            roll_exp = preprocess_roll_exp(match.group(1))
-            if is_roll_exp(roll_exp):
-                roll_res = exec_roll_exp(roll_exp)
-                return roll_res.get_complete_result()
-            else:
-                if ignore:
-                    return match.group(1)
-                else:
-                    raise ValueError(f"{roll_exp} in {match.group()} is an invalid roll expression!")
-
-        def handle_draw(match):
-            target_deck_str = match.group(1)
-            draw_exp = preprocess_roll_exp(match.group(2)).strip()
-            draw_times: int
-            draw_times_str: str
-            # 得到抽取次数
-            try:
-                draw_times = int(draw_exp)
-                draw_times_str = draw_exp
-            except ValueError:
-                if is_roll_exp(draw_exp):
-                    roll_res = exec_roll_exp(draw_exp)
-                    draw_times = roll_res.get_val()
-                    draw_times_str = roll_res.get_complete_result()
-                else:
-                    if ignore:
-                        return f"{target_deck_str}*{draw_exp}"
-                    else:
-                        raise ValueError(f"{draw_exp} in {match.group()} is an invalid roll expression!")
-            if draw_times <= 0 or draw_times > HLDL_DRAW_LIMIT:
-                if ignore:
-                    return f"{target_deck_str}*{draw_times_str}"
-                else:
-                    raise ValueError(f"{draw_exp} in {match.group()} results an invalid value! value:{draw_times}")
-            # 搜索目标牌库
-            target_deck = None
-            for deck in decks:
-                if deck.name == target_deck_str:
-                    target_deck = deck
-                    break
-            if not target_deck:
-                if ignore:
-                    return f"{target_deck_str}*{draw_times_str}"
-                else:
-                    raise ValueError(f"{target_deck_str} in {match.group()} is an invalid deck!")
-            draw_result = target_deck.draw(draw_times, decks, loc_helper, ignore).replace("\n", " ")  # 嵌套抽取不需要换行
-            #draw_result = loc_helper.format_loc_text(LOC_DRAW_RESULT_DESIGN,result=draw_result)
-            return loc_helper.format_loc_text(LOC_DRAW_RESULT_INLINE, times=draw_times, deck_name=target_deck_str,result=draw_result)
-
-        def handle_img(match):
-            key = match.group(1)
-            file_path_relative = Path(source.path) / key
-            file_path_absolute = Paths.CONTENT_DECKS_DIR / key
-            file_path_local_img = Paths.LOCAL_IMG_DIR / key
-            if file_path_relative.exists():
-                return get_cq_image(file_path_relative.read_bytes())
-            elif file_path_absolute.exists():
-                return get_cq_image(file_path_absolute.read_bytes())
-            elif file_path_local_img.exists():
-                return get_cq_image(file_path_local_img.read_bytes())
+    def compile(self, deck_index: Dict[str, "Deck"]) -> Optional[str]:
+        """
+        将片段编译为模板节点: 解析引用的牌库与固定的抽取次数, 检查掷骰表达式语法.
+        不会实际掷骰或抽取. 返回第一个静态错误, 没有错误返回None
+        """
+        nodes: List[_DeckNode] = []
+        for segment in self.segments:
+            seg_type = segment[0]
+            if seg_type == DECK_SEG_TEXT:
+                nodes.append(_TextNode(segment[1]))
+            elif seg_type == DECK_SEG_ROLL:
+                nodes.append(_RollNode(segment[1], segment[2]))
+            elif seg_type == DECK_SEG_DRAW:
+                nodes.append(_DrawNode(segment[1], segment[2], segment[3], deck_index.get(segment[1])))
             else:
-                dice_log(f"[DeckImage] 找不到图片 {file_path_relative.resolve()}")
-                return key
-
-        result = self.content.strip()
-        if "ROLL" in result or "DRAW" in result or "IMG" in result:
-            result = re.sub(r"ROLL\((.{1,30}?)\)", handle_roll, result)
-            result = re.sub(r"DRAW\((.{1,30}?),\s*(.{1,30}?)\)", handle_draw, result)
-            result = re.sub(r"IMG\((.{1,50}?\.[A-Za-z]{1,10}?)\)", handle_img, result)
+                nodes.append(_ImgNode(segment[1]))
+        self.nodes = nodes
+        for node in nodes:
+            if node.error:
+                return node.error
+        return None
+
+    def get_result(self, source: "Deck", decks: Iterable["Deck"], loc_helper: LocalizationManager, ignore: bool = True) -> str:
+        """处理高级抽卡语言"""
+        if self.nodes is None:  # 未随牌库一起编译 (例如临时构造的牌库), 按传入的牌库解析引用
+            self.compile(index_decks(decks))
+        if self.segments:
+            result = "".join([node.render(source, decks, loc_helper, ignore) for node in self.nodes])
         else:
-            result = loc_helper.format_loc_text(LOC_DRAW_RESULT_DESIGN,result=result)
+            result = loc_helper.format_loc_text(LOC_DRAW_RESULT_DESIGN, result=self.content.strip())
         if self.final_type == 2:
             raise ForceFinal(result + "\n" + loc_helper.format_loc_text(LOC_DRAW_FIN_ALL))
         return result
@@ -183,16 +317,17 @@ class Deck:
                 break
             weight_random = random.randint(1, weight_sum_cur)
             item_selected = None
+            index_selected = -1
             for i, item in enumerate(self.items):
                 if i in index_mask:
                     continue
                 weight_random -= item.weight
                 if weight_random <= 0:
-                    item_selected = item
+                    item_selected, index_selected = item, i
                     break
 
             if not item_selected.redraw:  # 抽到的不放回
-                index_mask.add(self.items.index(item_selected))
+                index_mask.add(index_selected)
                 weight_sum_cur -= item_selected.weight
 
             try:
@@ -215,6 +350,64 @@ class Deck:
         return feedback.strip()
 
 
+def compile_deck_workbook(wb: "openpyxl.Workbook") -> CompiledDeckFile:
+    """解析牌库工作簿, 每个工作表的条目整理为 (内容, 权重, 是否放回, 终止类型, 片段)"""
+    errors: List[str] = []
+    data_dict = col_based_workbook_to_dict(wb, DECK_ITEM_FIELD, errors)
+    sheets = []
+    for sheet_name, sheet_data in data_dict.items():
+        items: List[CompiledItem] = []
+        # 逐行生成条目
+        item_num = len(sheet_data[DECK_ITEM_FIELD_CONTENT])
+        for item_index in range(item_num):
+            content = sheet_data[DECK_ITEM_FIELD_CONTENT][item_index]
+            if not content:
+                continue
+
+            weight = sheet_data[DECK_ITEM_FIELD_WEIGHT][item_index]
+            try:
+                weight = int(weight)
+                assert weight >= 1
+            except (TypeError, ValueError, AssertionError):
+                weight = 1
+
+            redraw = sheet_data[DECK_ITEM_FIELD_REDRAW][item_index]
+            try:
+                redraw = int(redraw)
+                assert redraw in (0, 1)
+            except (TypeError, ValueError, AssertionError):
+                redraw = 1
+            redraw = True if redraw == 1 else False
+
+            final = sheet_data[DECK_ITEM_FIELD_FINAL][item_index]
+            try:
+                final = int(final)
+                assert final in (0, 1, 2)
+            except (TypeError, ValueError, AssertionError):
+                final = 0
+
+            items.append(DeckItem(content, weight, redraw, final).to_compiled())
+        sheets.append((sheet_name, items))
+    return CompiledDeckFile(sheets, errors)
+
+
+def add_compiled_decks(compiled: CompiledDeckFile, path: str, deck_dict: Dict[str, Deck]) -> None:
+    """根据编译结果生成Deck并记录到deck_dict中"""
+    for sheet_name, items in compiled.sheets:
+        deck = Deck(sheet_name, path)
+        for content, weight, redraw, final, segments in items:
+            deck.add_item(DeckItem(content, weight, redraw, final, segments))
+        if deck.items:
+            if "#" in deck.name:  # 隐藏的子Deck使用的HIDE前缀
+                args = deck.name.split("#")
+                deck.name = args[1]
+                if args[0] == "HIDE":
+                    deck.hidden = True
+
+            deck_name = preprocess_msg(deck.name)  # 预处理一下名字, 防止输入的大小写被预处理后无法匹配
+            deck_dict[deck_name] = deck
+
+
 @custom_user_command(readable_name="抽卡指令", priority=DPP_COMMAND_PRIORITY_DEFAULT,
                      flag=DPP_COMMAND_FLAG_DRAW)
 class DeckCommand(UserCommandBase):
@@ -225,6 +418,7 @@ class DeckCommand(UserCommandBase):
     def __init__(self, bot: Bot):
         super().__init__(bot)
         self.deck_dict: Dict[str, Deck] = {}
+        self.deck_cache = DeckCache(Paths.DATA_CACHE_DIR / "decks")
 
         bot.loc_helper.register_loc_text(LOC_DRAW_RESULT, "从{deck_name}中抽取{times}次：\n{result}",
                                          f"抽卡回复, times为次数, deck_name为牌库名, result由{LOC_DRAW_SINGLE}和{LOC_DRAW_MULTI}定义")
@@ -243,26 +437,31 @@ class DeckCommand(UserCommandBase):
         bot.loc_helper.register_loc_text(LOC_DRAW_ERR_VAGUE_DECK, "可能的牌库：{deck_list}", "找到多个可能的牌库")
 
 
-    def delay_init(self) -> List[str]:
-        # 从本地文件中读取资料
+    async def delay_init(self) -> List[str]:
+        # 从本地文件中读取资料; 读取与检查在工作线程中进行, 不阻塞事件循环
         data_path_list: List[str] = [self.bot.config.deck.data_path]
         for i, path in enumerate(data_path_list):
             if path.startswith("./"):  # ./开头路径相对于 Paths.CONTENT_DIR 解析
                 data_path_list[i] = str(Paths.CONTENT_DIR / path[2:])
-        init_info: List[str] = []
-        for data_path in data_path_list:
-            self.load_data_from_path(data_path, init_info)
-        for deck in self.deck_dict.values():
-            for item in deck.items:
-                try:
-                    item.get_result(deck, self.deck_dict.values(), self.bot.loc_helper, False)
-                except ForceFinal:
-                    pass
-                except ValueError as e:
-                    init_info.append(f"{deck.name}的第{deck.items.index(item)+1}个条目中存在错误: {e.args[0]}")
+        deck_dict, init_info = await asyncio.to_thread(self.load_decks, data_path_list)
+        self.deck_dict = deck_dict
         init_info.append(self.get_state())
         return init_info
 
+    def load_decks(self, data_path_list: List[str]) -> Tuple[Dict[str, Deck], List[str]]:
+        """读取全部牌库, 编译条目模板并做静态检查, 返回新的牌库字典与提示信息"""
+        deck_dict: Dict[str, Deck] = {}
+        init_info: List[str] = []
+        for data_path in data_path_list:
+            self.load_data_from_path(data_path, init_info, deck_dict)
+        deck_index = index_decks(deck_dict.values())
+        for deck in deck_dict.values():
+            for index, item in enumerate(deck.items):
+                error = item.compile(deck_index)
+                if error:
+                    init_info.append(f"{deck.name}的第{index+1}个条目中存在错误: {error}")
+        return deck_dict, init_info
+
     def can_process_msg(self, msg_str: str, meta: MessageMetaData) -> Tuple[bool, bool, Any]:
         should_proc: bool = msg_str.startswith(".draw") or msg_str.startswith(".deck")
         should_pass: bool = False
@@ -334,67 +533,25 @@ class DeckCommand(UserCommandBase):
     def get_description(self) -> str:
         return ".draw 抽卡指令"  # help指令中返回的内容
 
-    def load_data_from_path(self, path: str, error_info: List[str]) -> None:
-        """从指定文件或目录读取信息"""
-
-        def load_data_from_xlsx(wb: openpyxl.Workbook):
-            data_dict = col_based_workbook_to_dict(wb, DECK_ITEM_FIELD, error_info)
-            for sheet_name in data_dict.keys():
-                sheet_data = data_dict[sheet_name]
-                # 生成Deck
-                deck = Deck(sheet_name, path)
-                # 逐行生成DeckItem
-                item_num = len(sheet_data[DECK_ITEM_FIELD_CONTENT])
-                for item_index in range(item_num):
-                    content = sheet_data[DECK_ITEM_FIELD_CONTENT][item_index]
-                    if not content:
-                        # dice_log(f"表格{wb.path}/{sheet_name}第{item_index + 2}行缺少content, 该条目未加载")
-                        continue
-
-                    weight = sheet_data[DECK_ITEM_FIELD_WEIGHT][item_index]
-                    try:
-                        weight = int(weight)
-                        assert weight >= 1
-                    except (TypeError, ValueError, AssertionError):
-                        weight = 1
-
-                    redraw = sheet_data[DECK_ITEM_FIELD_REDRAW][item_index]
-                    try:
-                        redraw = int(redraw)
-                        assert redraw in (0, 1)
-                    except (TypeError, ValueError, AssertionError):
-                        redraw = 1
-                    redraw = True if redraw == 1 else False
-
-                    final = sheet_data[DECK_ITEM_FIELD_FINAL][item_index]
-                    try:
-                        final = int(final)
-                        assert final in (0, 1, 2)
-                    except (TypeError, ValueError, AssertionError):
-                        final = 0
-
-                    item = DeckItem(content, weight, redraw, final)
-                    deck.add_item(item)
-
-                # 记录到self字典中
-                if deck.items:
-                    if "#" in deck.name:  #隐藏的子Deck使用的HIDE前缀
-                        args = deck.name.split("#")
-                        deck.name = args[1]
-                        if args[0] == "HIDE":
-                            deck.hidden = True
-                    
-                    deck_name = preprocess_msg(deck.name)  # 预处理一下名字, 防止输入的大小写被预处理后无法匹配
-                    self.deck_dict[deck_name] = deck
+    def load_data_from_path(self, path: str, error_info: List[str], deck_dict: Optional[Dict[str, Deck]] = None) -> None:
+        """从指定文件或目录读取信息, 加入deck_dict (默认为self.deck_dict)"""
+        if deck_dict is None:
+            deck_dict = self.deck_dict
 
         if path.endswith(".xlsx"):
-            if os.path.exists(path):  # 存在文件则读取文件
-                try:
-                    workbook = read_xlsx(path)
-                except PermissionError:
-                    error_info.append(f"读取{path}时遇到错误: 权限不足")
-                    return
-                load_data_from_xlsx(workbook)
+            if os.path.exists(path):  # 存在文件则读取文件, 文件未变化时使用编译缓存
+                compiled = self.deck_cache.load(path)
+                if compiled is None:
+                    try:
+                        workbook = read_xlsx(path)
+                    except PermissionError:
+                        error_info.append(f"读取{path}时遇到错误: 权限不足")
+                        return
+                    compiled = compile_deck_workbook(workbook)
+                    workbook.close()
+                    self.deck_cache.store(path, compiled)
+                error_info += compiled.errors
+                add_compiled_decks(compiled, path, deck_dict)
             else:  # 创建一个模板文件
                 create_parent_dir(path)  # 父文件夹不存在需先创建父文件夹
                 workbook = get_empty_col_based_workbook(DECK_ITEM_FIELD, DECK_ITEM_FIELD_COMMENT)
@@ -406,7 +563,7 @@ class DeckCommand(UserCommandBase):
                     inner_paths = os.listdir(path)
                     for inner_path in inner_paths:
                         inner_path = os.path.join(path, inner_path)
-                        self.load_data_from_path(inner_path, error_info)
+                        self.load_data_from_path(inner_path, error_info, deck_dict)
                 except NotADirectoryError:
                     pass
                 except FileNotFoundError as e:  # 文件夹不存在
@@ -4,7 +4,6 @@
 import os
 from typing import List, Tuple, Any, Dict, Optional
 from pathlib import Path
-import openpyxl
 
 from core.bot import Bot
 from core.config.basic import Paths
@@ -159,6 +158,7 @@ class RandomGeneratorCommand(UserCommandBase):
             self.init_from_data_dir(sub_data_dir_path_list, error_info)
 
     def create_meta_file(self, dir_path: Path):
+        import openpyxl
         wb = openpyxl.Workbook()
         for name in wb.sheetnames:
             del wb[name]
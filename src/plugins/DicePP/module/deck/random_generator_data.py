@@ -1,19 +1,20 @@
-from typing import List, Tuple, Any, Dict, Optional, Set
+from typing import List, Tuple, Any, Dict, Optional, Set, TYPE_CHECKING
 from pathlib import Path
 from enum import Enum
 from datetime import datetime
 import random
 import math
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.cell.cell import Cell
-from openpyxl.comments import Comment
 
 from core.config.basic import Paths
 from module.roll import is_roll_exp, exec_roll_exp
 from utils.time import get_current_date_raw, datetime_to_str_day, datetime_to_str_week, datetime_to_str_month
-from utils.cq_code import get_cq_image
+from utils.cq_code import get_cq_image_by_path
 from utils import read_xlsx
 
+if TYPE_CHECKING:
+    from openpyxl.worksheet.worksheet import Worksheet
+    from openpyxl.cell.cell import Cell
+
 RAND_SOURCE_FIELD_NAME = "生成器名称"
 RAND_SOURCE_FIELD_VISIBLE = "是否可见"
 RAND_SOURCE_FIELD_GLOBAL_PATH = "全局路径"
@@ -149,7 +150,7 @@ class RandomItem:
                 if not sheet_name:
                     sheet_name = wb.sheetnames[0]
                 assert sheet_name in wb.sheetnames, f"工作表{sheet_name}不存在"
-                ws: Worksheet = wb[sheet_name]
+                ws: "Worksheet" = wb[sheet_name]
                 for col in ws.iter_cols(values_only=True):
                     self.auxiliary_data += [str(value).strip() for value in col if str(value) and str(value).strip()]
                 wb.close()
@@ -189,7 +190,7 @@ class RandomItem:
                 if file_type == SourceFileType.TXT:
                     result += file_path.read_text()
                 elif file_type == SourceFileType.IMG:
-                    result += get_cq_image(file_path.read_bytes())
+                    result += get_cq_image_by_path(file_path) or ""
                 else:
                     return "无效文件类型"
         elif self.source_type == RandomSourceType.Workbook:
@@ -225,8 +226,9 @@ class RandomDataSource:
         self.items: List[RandomItem] = []
         self.items_in_group: Dict[str, List[RandomItem]] = {}
 
-    def write_to_sheet(self, target: Worksheet):
+    def write_to_sheet(self, target: "Worksheet"):
         """不会抛出异常"""
+        from openpyxl.comments import Comment
         # 先清空表格
         target.delete_rows(1, target.max_row)
         # 写入根规则
@@ -300,7 +302,7 @@ class RandomDataSource:
                 # 写入参数
                 target.cell(row=row_index, column=column_index, value=val_text)
 
-    def read_from_sheet(self, target: Worksheet) -> str:
+    def read_from_sheet(self, target: "Worksheet") -> str:
         """不会抛出异常, 返回错误信息, 返回空字符串说明读取成功"""
         # 读取根规则
         first_item_row = -1
@@ -1,5 +1,4 @@
 from typing import Optional, Dict, Any, List
-import aiohttp
 import asyncio
 
 from utils.logger import dice_log
@@ -18,7 +17,7 @@ class HubAPIClient:
     def __init__(self, base_url: str, api_key: Optional[str] = None):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
-        self.timeout = aiohttp.ClientTimeout(total=DEFAULT_TIMEOUT)
+        self.timeout = DEFAULT_TIMEOUT
         dice_log(f"[DiceHub] 初始化 API 客户端: base_url={self.base_url}, api_key={'已设置' if api_key else '未设置'}")
 
     def _get_headers(self) -> Dict[str, str]:
@@ -34,6 +33,7 @@ class HubAPIClient:
         data: Optional[Dict[str, Any]] = None,
         retry: int = DEFAULT_RETRY,
     ) -> Dict[str, Any]:
+        import aiohttp  # 只在访问 Hub 时加载
         url = f"{self.base_url}{endpoint}"
         last_error = None
 
@@ -41,7 +41,7 @@ class HubAPIClient:
 
         for attempt in range(retry):
             try:
-                async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
                     async with session.request(
                         method, url, json=data, headers=self._get_headers()
                     ) as response:
@@ -1,2 +1,3 @@
 from .initiative_command import InitiativeCommand
 from .battleroll_command import BattlerollCommand
+from .combat_state import CombatStateService, CombatSnapshot
@@ -0,0 +1,156 @@
+"""
+战斗状态服务
+
+`.init` 等指令频繁查看先攻列表，每次都需要先攻表、条目昵称与 PC / NPC 生命值。
+本服务一次批量读取某群的这些数据并缓存：
+
+- 先攻表 1 次查询；PC 昵称 1 次 IN 查询；先攻中的 PC 生命值 1 次投影列 IN 查询；NPC 生命值 1 次查询
+- 仅在先攻表存在（战斗进行中）时缓存，按群 LRU 限长，并设置闲置过期时间
+- 通过 BotDatabase 写入钩子失效：initiative / characters_dnd / npc_health / nickname 任一写入即丢弃对应群的缓存，
+  因此 `.hp`、`.init`、`.ri`、战斗轮指令以及录卡等所有写入路径都无需手动通知
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, TYPE_CHECKING
+
+from core.data.models import InitList, HPInfo, NPCHealth, HP_PROJECTION_FIELDS
+
+if TYPE_CHECKING:
+    from core.bot import Bot
+
+COMBAT_STATE_MAX_GROUPS = 128
+# 闲置超过该时间（秒）的快照视为战斗已结束，下次访问重新读取
+COMBAT_STATE_IDLE_TTL = 1800
+
+WATCHED_TABLES = ("initiative", "characters_dnd", "npc_health", "nickname")
+
+
+def parse_npc_hp(npc: NPCHealth) -> HPInfo:
+    if not npc.hp_data:
+        return HPInfo()
+    try:
+        return HPInfo.model_validate_json(npc.hp_data)
+    except Exception:
+        return HPInfo()
+
+
+@dataclass
+class CombatSnapshot:
+    """某群战斗状态的只读快照"""
+
+    group_id: str
+    init_data: InitList
+    # PC 账号 -> 群内昵称
+    nicknames: Dict[str, str] = field(default_factory=dict)
+    # PC 账号 -> 生命值（仅已录入生命值的角色卡）
+    pc_hp: Dict[str, HPInfo] = field(default_factory=dict)
+    # NPC 名称 -> 生命值
+    npc_hp: Dict[str, HPInfo] = field(default_factory=dict)
+    loaded_at: float = field(default_factory=time.monotonic)
+    accessed_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def owners(self) -> Set[str]:
+        return {entity.owner for entity in self.init_data.entities if entity.owner}
+
+    def hp_info_of(self, owner: str, name: str) -> str:
+        """先攻条目的生命值描述，没有记录时为空字符串"""
+        if owner:
+            hp_info = self.pc_hp.get(owner)
+        else:
+            hp_info = self.npc_hp.get(name)
+        return hp_info.get_info() if hp_info is not None else ""
+
+
+class CombatStateService:
+    """按群批量读取并缓存战斗状态"""
+
+    def __init__(self, bot: "Bot", max_groups: int = COMBAT_STATE_MAX_GROUPS, idle_ttl: float = COMBAT_STATE_IDLE_TTL):
+        self.bot = bot
+        self.max_groups = max_groups
+        self.idle_ttl = idle_ttl
+        self._snapshots: "OrderedDict[str, CombatSnapshot]" = OrderedDict()
+        self._stats: Dict[str, int] = {"hits": 0, "loads": 0, "invalidations": 0}
+        # 每次相关写入递增；读取期间发生写入时不缓存读取结果
+        self._write_generation = 0
+        for table in WATCHED_TABLES:
+            self.bot.db.add_write_hook(table, self._on_write)
+
+    async def get(self, group_id: str) -> Optional[CombatSnapshot]:
+        """返回群的战斗状态快照，没有先攻表时返回 None；先攻表为副本，可直接修改后保存"""
+        snapshot = self._snapshots.get(group_id)
+        now = time.monotonic()
+        if snapshot is not None and now - snapshot.accessed_at <= self.idle_ttl:
+            self._snapshots.move_to_end(group_id)
+            snapshot.accessed_at = now
+            self._stats["hits"] += 1
+            return self._copy(snapshot)
+        self._snapshots.pop(group_id, None)
+
+        generation = self._write_generation
+        snapshot = await self._load(group_id)
+        if snapshot is None:
+            return None
+        if generation != self._write_generation:
+            return snapshot
+        self._snapshots[group_id] = snapshot
+        while len(self._snapshots) > self.max_groups:
+            self._snapshots.popitem(last=False)
+        return self._copy(snapshot)
+
+    async def _load(self, group_id: str) -> Optional[CombatSnapshot]:
+        init_data: Optional[InitList] = await self.bot.db.initiative.get(group_id)
+        if init_data is None:
+            return None
+        self._stats["loads"] += 1
+        owners = list(dict.fromkeys(entity.owner for entity in init_data.entities if entity.owner))
+        nicknames: Dict[str, str] = {}
+        pc_hp: Dict[str, HPInfo] = {}
+        if owners:
+            nicknames = await self.bot.get_nicknames(owners, group_id)
+            rows = await self.bot.db.characters_dnd.list_projection(
+                HP_PROJECTION_FIELDS, group_id=group_id, user_id=owners, is_init=1
+            )
+            pc_hp = {row["user_id"]: HPInfo.from_projection(row) for row in rows}
+        npc_hp = {npc.name: parse_npc_hp(npc) for npc in await self.bot.db.npc_health.list_by(group_id=group_id)}
+        # 玩家条目名称以当前群昵称为准
+        for entity in init_data.entities:
+            if entity.owner:
+                entity.name = nicknames.get(entity.owner, entity.name)
+        return CombatSnapshot(group_id=group_id, init_data=init_data, nicknames=nicknames, pc_hp=pc_hp, npc_hp=npc_hp)
+
+    @staticmethod
+    def _copy(snapshot: CombatSnapshot) -> CombatSnapshot:
+        return CombatSnapshot(
+            group_id=snapshot.group_id,
+            init_data=snapshot.init_data.model_copy(deep=True),
+            nicknames=snapshot.nicknames,
+            pc_hp=snapshot.pc_hp,
+            npc_hp=snapshot.npc_hp,
+            loaded_at=snapshot.loaded_at,
+            accessed_at=snapshot.accessed_at,
+        )
+
+    def invalidate(self, group_id: Optional[str] = None) -> None:
+        if group_id is None:
+            self._snapshots.clear()
+        else:
+            self._snapshots.pop(group_id, None)
+        self._stats["invalidations"] += 1
+
+    def _on_write(self, keys: Dict[str, Any]) -> None:
+        self._write_generation += 1
+        group_id = keys.get("group_id")
+        user_id = keys.get("user_id")
+        if group_id in self._snapshots:
+            self.invalidate(group_id)
+        # 默认昵称 / 账号昵称变化会影响该用户所在的所有战斗
+        if user_id and group_id in ("default", "origin"):
+            for gid in [gid for gid, snap in self._snapshots.items() if user_id in snap.owners]:
+                self.invalidate(gid)
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats["groups"] = len(self._snapshots)
+        return stats
@@ -293,67 +293,45 @@ class InitiativeCommand(UserCommandBase):
                 feedback = self.format_loc(LOC_INIT_INFO_NOT_EXIST)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
         
-        # 先找到先攻数据是否存在
-        init_data: InitList
-        init_data = await self.bot.db.initiative.get(meta.group_id)
-        if init_data is None:
+        # 先找到先攻数据是否存在（先攻表、玩家昵称与生命值由战斗状态服务批量读取并缓存）
+        snapshot = await self.bot.combat_state.get(meta.group_id)
+        if snapshot is None:
             feedback = self.format_loc(LOC_INIT_INFO_NOT_EXIST)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
-
-        # 更新玩家姓名（Pydantic 保证 entities 都是 InitEntity 实例）
-        for entity in init_data.entities:
-            if entity.owner:
-                entity.name = await self.bot.get_nickname(entity.owner, meta.group_id)
+        # 玩家条目名称已更新为当前昵称（Pydantic 保证 entities 都是 InitEntity 实例）
+        init_data: InitList = snapshot.init_data
         entities_name_list: List[str] = [entity.name for entity in init_data.entities]
 
         # 处理需要有表存在才能使用的指令
         if mode == "inspect":  # 查看先攻信息
-            # 从 SQLite 查询 HP 信息：PC 来自 characters_dnd，NPC 来自 npc_health
-            from core.data.models import DNDCharacter, NPCHealth
-            # user_id -> HPInfo (PC)
-            hp_dict: Dict[str, HPInfo] = {}
-            pc_chars = await self.bot.db.characters_dnd.list_by(group_id=meta.group_id)
-            for char in pc_chars:
-                if char.is_init:
-                    hp_dict[char.user_id] = char.hp_info
-            # name -> HPInfo (NPC)
-            npc_hp_dict: Dict[str, HPInfo] = {}
-            npc_list = await self.bot.db.npc_health.list_by(group_id=meta.group_id)
-            for npc in npc_list:
-                if npc.hp_data:
-                    try:
-                        npc_hp_dict[npc.name] = HPInfo.model_validate_json(npc.hp_data)
-                    except Exception:
-                        npc_hp_dict[npc.name] = HPInfo()
-                else:
-                    npc_hp_dict[npc.name] = HPInfo()
-
             turn_index = max(0, min(len(init_data.entities) - 1, init_data.turn - 1))
             current_entity = init_data.entities[turn_index]
             init_info = f"当前是第{init_data.round}轮,{current_entity.name}的回合\n"
             for index, entity in enumerate(init_data.entities):
-                entity_hp_info: str = ""
-                if entity.owner and entity.owner in hp_dict:  # 玩家HP信息
-                    entity_hp_info = hp_dict[entity.owner].get_info()
-                elif not entity.owner and entity.name in npc_hp_dict:  # NPC信息
-                    entity_hp_info = npc_hp_dict[entity.name].get_info()
+                entity_hp_info: str = snapshot.hp_info_of(entity.owner, entity.name)
                 init_info += f"{index + 1}.{entity.get_info()} {entity_hp_info}\n"
             init_info = init_info.strip()
             feedback = self.format_loc(LOC_INIT_INFO, init_info=init_info)
             return [BotSendMsgCommand(self.bot.account, feedback, [port])]
 
         elif mode == "clear":  # 清除所有先攻信息
-            # 删除先攻列表中 NPC（无 owner）的临时血量数据
-            for entity in init_data.entities:
-                if not entity.owner:
+            # 删除先攻列表中 NPC（无 owner）的临时血量数据，仅清除没有设置最大值的临时血量
+            # 快照把空的或无法解析的血量记为 HPInfo()，这里按原始数据判断，保留这些记录
+            npc_names = {entity.name for entity in init_data.entities if not entity.owner}
+            try:
+                npc_keys = []
+                for npc in await self.bot.db.npc_health.list_by(group_id=meta.group_id):
+                    if npc.name not in npc_names or not npc.hp_data:
+                        continue
                     try:
-                        npc_obj = await self.bot.db.npc_health.get(meta.group_id, entity.name)
-                        if npc_obj and npc_obj.hp_data:
-                            hp_info = HPInfo.model_validate_json(npc_obj.hp_data)
-                            if hp_info.hp_max == 0:  # 仅清除没有设置最大值的临时血量
-                                await self.bot.db.npc_health.delete(meta.group_id, entity.name)
+                        hp_info = HPInfo.model_validate_json(npc.hp_data)
                     except Exception:
-                        pass
+                        continue
+                    if hp_info.hp_max == 0:
+                        npc_keys.append((meta.group_id, npc.name))
+                await self.bot.db.npc_health.delete_many(npc_keys)
+            except Exception:
+                pass
             # 删除先攻信息
             await self.bot.db.initiative.delete(meta.group_id)
             feedback = self.format_loc(LOC_INIT_INFO_CLR)
@@ -2,15 +2,20 @@
 统计指令, 返回用户或群聊的一些统计信息
 """
 
-from typing import List, Tuple, Any, Dict
+import datetime
+import re
+from typing import List, Tuple, Any, Dict, Optional
 
 from core.bot import Bot
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
 from core.communication import MessageMetaData, PrivateMessagePort, GroupMessagePort
+from utils.time import get_current_date_raw
 
-from core.statistics import GroupStatInfo, UserStatInfo, UserCommandStatInfo, RollStatInfo
+from core.statistics import GroupStatInfo
+from core.statistics.counter import StatSummary, load_stat_summary, date_to_day, \
+    STAT_ENTITY_USER, STAT_ENTITY_GROUP, STAT_COUNTER_DETAIL_DAYS
 
 # LOC_TEMP = "template_loc"
 
@@ -33,94 +38,91 @@ class StatisticsCommand(UserCommandBase):
     async def process_msg(self, msg_str: str, meta: MessageMetaData, hint: Any) -> List[BotCommandBase]:
         port = GroupMessagePort(meta.group_id) if meta.group_id else PrivateMessagePort(meta.user_id)
         # 解析语句
-        arg_str = hint
+        arg_str: str = hint
+        target = ""
+        for keyword in ("群聊", "所有用户", "所有群聊"):
+            if arg_str.startswith(keyword):
+                target, arg_str = keyword, arg_str[len(keyword):].strip()
+                break
+        try:
+            date_range = parse_stat_date_range(arg_str)
+        except ValueError:
+            feedback = f"无法识别的日期范围: {arg_str}\n可以使用 7天, 20240101-20240131 或 2024-01-01~2024-01-31"
+            return [BotSendMsgCommand(self.bot.account, feedback, [port])]
+
+        # 先把内存中尚未写入的计数写入数据库
+        await self.bot.flush_stat()
+        repo = self.bot.db.stat_counter
         feedback: str = ""
-        if not arg_str:  # 统计当前用户信息
-            # 从 SQLite 读取用户统计
-            _row = await self.bot.db.user_stat.get(meta.user_id)
-            user_stat = UserStatInfo()
-            if _row and _row.data:
-                try:
-                    user_stat.deserialize(_row.data)
-                except Exception:
-                    pass
-            feedback += f"今日收到信息:{user_stat.msg.cur_day_val}, 昨日:{user_stat.msg.last_day_val}, 总计:{user_stat.msg.total_val}\n"
-            # 统计指令使用情况
-            feedback += stat_cmd_info(user_stat.cmd)
-            # 统计掷骰情况
-            feedback += stat_roll_info(user_stat.roll)
-        elif arg_str == "群聊":
+        if date_range:
+            feedback += stat_range_notice(*date_range)
+        if not target:  # 统计当前用户信息
+            feedback += await stat_entity_info(repo, STAT_ENTITY_USER, meta.user_id, date_range)
+        elif target == "群聊":
             if not meta.group_id:
                 feedback += f"当前不在群聊中..."
-            # 从 SQLite 读取群统计
-            _row = await self.bot.db.group_stat.get(meta.group_id)
-            group_stat = GroupStatInfo()
-            if _row and _row.data:
-                try:
-                    group_stat.deserialize(_row.data)
-                except Exception:
-                    pass
-            feedback += f"今日收到信息:{group_stat.msg.cur_day_val}, 昨日:{group_stat.msg.last_day_val}, 总计:{group_stat.msg.total_val}\n"
-            # 统计指令使用情况
-            feedback += stat_cmd_info(group_stat.cmd)
-            # 统计掷骰情况
-            feedback += stat_roll_info(group_stat.roll)
-        elif arg_str == "所有用户":
-            if meta.user_id not in self.bot.get_master_ids():
-                feedback = "权限不足"
             else:
-                merge_user_stat = UserStatInfo()
-                all_user_stats = await self.bot.db.user_stat.list_all()
-                for user_stat_row in all_user_stats:
-                    try:
-                        user_stat = UserStatInfo()
-                        if user_stat_row.data:
-                            user_stat.deserialize(user_stat_row.data)
-                    except Exception:
-                        continue
-                    # 统计处理信息情况
-                    merge_user_stat.msg += user_stat.msg
-                    # 统计指令使用情况
-                    merge_user_stat.cmd += user_stat.cmd
-                feedback += f"今日收到信息:{merge_user_stat.msg.cur_day_val}," \
-                            f" 昨日:{merge_user_stat.msg.last_day_val}," \
-                            f" 总计:{merge_user_stat.msg.total_val}\n"
-                feedback += stat_cmd_info(merge_user_stat.cmd)
-        elif meta.user_id in self.bot.get_master_ids() and arg_str == "所有群聊":
+                feedback += await stat_entity_info(repo, STAT_ENTITY_GROUP, meta.group_id, date_range)
+        elif target == "所有用户":
             if meta.user_id not in self.bot.get_master_ids():
                 feedback = "权限不足"
             else:
-                group_info_list: List[List[str, int, str]] = []  # id, sort_key, info_str
-                all_group_stats = await self.bot.db.group_stat.list_all()
-                for group_stat_row in all_group_stats:
-                    group_id = group_stat_row.group_id
-                    group_info = [group_id, 0, ""]
-                    try:
-                        group_stat = GroupStatInfo()
-                        if group_stat_row.data:
-                            group_stat.deserialize(group_stat_row.data)
-                    except Exception:
-                        continue
-
-                    group_info[1] = group_stat.meta.member_count  # 最小优先级
-                    group_info[2] += f"{group_id}({group_stat.meta.name}) 成员:{group_stat.meta.member_count} "
-
-                    group_info[1] += (group_stat.msg.cur_day_val + group_stat.msg.total_val // 1000) << 32  # 最大优先级
-                    group_info[2] += f"信息:[{group_stat.msg.cur_day_val}, {group_stat.msg.last_day_val}, {group_stat.msg.total_val}] "
-                    # 统计指令使用情况
-                    cmd_score = stat_cmd_score(group_stat.cmd, group_stat.msg.last_day_val, group_stat.msg.total_val)
-                    group_info[1] += cmd_score << 16  # 次大优先级
-                    group_info[2] += f"评分:{cmd_score}"
-                    group_info_list.append(group_info)
-                group_info_list = sorted(group_info_list, key=lambda x: -x[1])
-                feedback += f"共{len(group_info_list)}条群组信息:\n"
-                feedback += "\n".join([group_info[2] for group_info in group_info_list[:50]])
-                if len(group_info_list) > 50:
-                    feedback += f"\n{len(group_info_list) - 50}条信息限于篇幅未显示完全"
+                feedback += await stat_entity_info(repo, STAT_ENTITY_USER, None, date_range, show_roll=False)
+        elif meta.user_id in self.bot.get_master_ids() and target == "所有群聊":
+            feedback += await self.stat_all_group_info(date_range)
 
         feedback = feedback.strip()
         return [BotSendMsgCommand(self.bot.account, feedback, [port])]
 
+    async def stat_all_group_info(self, date_range: Optional[Tuple[datetime.date, datetime.date]]) -> str:
+        repo = self.bot.db.stat_counter
+        if date_range:
+            range_stat = await repo.sum_by_entity_metric(STAT_ENTITY_GROUP, *(date_to_day(d) for d in date_range))
+        else:
+            today = get_current_date_raw().date()
+            today_stat = await repo.sum_by_entity_metric(STAT_ENTITY_GROUP, date_to_day(today), date_to_day(today))
+            yesterday = date_to_day(today - datetime.timedelta(days=1))
+            last_stat = await repo.sum_by_entity_metric(STAT_ENTITY_GROUP, yesterday, yesterday)
+            total_stat = await repo.sum_by_entity_metric(STAT_ENTITY_GROUP)
+        # 群名与成员数仍保存在 group_stat 中
+        group_meta: Dict[str, GroupStatInfo] = {}
+        for group_stat_row in await self.bot.db.group_stat.list_all():
+            group_stat = GroupStatInfo()
+            try:
+                if group_stat_row.data:
+                    group_stat.deserialize(group_stat_row.data)
+            except Exception:
+                continue
+            group_meta[group_stat_row.group_id] = group_stat
+        all_group_id = set(group_meta) | set(range_stat if date_range else total_stat)
+
+        group_info_list: List[List[str, int, str]] = []  # id, sort_key, info_str
+        for group_id in all_group_id:
+            group_stat = group_meta.get(group_id, GroupStatInfo())
+            group_info = [group_id, 0, ""]
+            group_info[1] = group_stat.meta.member_count  # 最小优先级
+            group_info[2] += f"{group_id}({group_stat.meta.name}) 成员:{group_stat.meta.member_count} "
+            if date_range:
+                cur = StatSummary(range_stat.get(group_id, {}))
+                group_info[1] += cur.msg << 32  # 最大优先级
+                group_info[2] += f"信息:{cur.msg} "
+                cmd_score = stat_cmd_score(cur, cur)
+            else:
+                cur, last, total = (StatSummary(stat.get(group_id, {})) for stat in (today_stat, last_stat, total_stat))
+                group_info[1] += (cur.msg + total.msg // 1000) << 32  # 最大优先级
+                group_info[2] += f"信息:[{cur.msg}, {last.msg}, {total.msg}] "
+                # 统计指令使用情况
+                cmd_score = stat_cmd_score(last, total)
+            group_info[1] += cmd_score << 16  # 次大优先级
+            group_info[2] += f"评分:{cmd_score}"
+            group_info_list.append(group_info)
+        group_info_list = sorted(group_info_list, key=lambda x: -x[1])
+        feedback = f"共{len(group_info_list)}条群组信息:\n"
+        feedback += "\n".join([group_info[2] for group_info in group_info_list[:50]])
+        if len(group_info_list) > 50:
+            feedback += f"\n{len(group_info_list) - 50}条信息限于篇幅未显示完全"
+        return feedback
+
     def get_help(self, keyword: str, meta: MessageMetaData) -> str:
         if keyword == "统计":  # help后的接着的内容
             feedback: str = "可以统计用户和群聊的各种信息\n" \
@@ -128,7 +130,11 @@ class StatisticsCommand(UserCommandBase):
                             ".统计群聊 显示当前群聊的统计信息\n" \
                             "[Master专用]\n" \
                             ".统计所有用户 可以显示当前所有用户对指令的使用情况\n" \
-                            ".统计所有群聊 可以显示每一个群聊对指令的使用情况"
+                            ".统计所有群聊 可以显示每一个群聊对指令的使用情况\n" \
+                            "以上指令后都可以加上日期范围, 只统计范围内的数据, 如:\n" \
+                            ".统计7天 最近7天(包括今天)\n" \
+                            ".统计群聊20240101-20240131\n" \
+                            ".统计群聊2024-01-01~2024-01-31"
             return feedback
         return ""
 
@@ -136,53 +142,110 @@ class StatisticsCommand(UserCommandBase):
         return ".统计 统计用户与群聊信息"  # help指令中返回的内容
 
 
-def stat_cmd_info(cmd_stat: UserCommandStatInfo) -> str:
-    total_info_list, today_info_list = [], []
-    for flag, name in DPP_COMMAND_FLAG_DICT.items():
-        if flag not in cmd_stat.flag_dict:
+def _parse_stat_date(date_str: str) -> datetime.date:
+    for date_format in ("%Y%m%d", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(date_str.strip(), date_format).date()
+        except ValueError:
             continue
+    raise ValueError(f"Invalid date: {date_str}")
+
+
+def parse_stat_date_range(arg_str: str) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """
+    解析统计的日期范围, 返回 (起始日期, 结束日期), 均包含在内. arg_str为空时返回None, 无法识别时抛出ValueError
+    支持: N天 (最近N天, 包括今天), YYYYMMDD-YYYYMMDD, YYYY-MM-DD~YYYY-MM-DD, 以及单独的一天 YYYYMMDD 或 YYYY-MM-DD
+    """
+    arg_str = arg_str.strip()
+    if not arg_str:
+        return None
+    if arg_str.endswith("天"):
+        days = int(arg_str[:-1])
+        if days <= 0:
+            raise ValueError(f"Invalid days: {days}")
+        today = get_current_date_raw().date()
+        return today - datetime.timedelta(days=days - 1), today
+    if "~" in arg_str:
+        date_str_list = arg_str.split("~")
+    elif re.fullmatch(r"\d{8}\s*-\s*\d{8}", arg_str):
+        date_str_list = arg_str.split("-")
+    else:
+        date_str_list = [arg_str]
+    if len(date_str_list) > 2:
+        raise ValueError(f"Invalid date range: {arg_str}")
+    start, end = _parse_stat_date(date_str_list[0]), _parse_stat_date(date_str_list[-1])
+    return (start, end) if start <= end else (end, start)
+
+
+def stat_range_notice(start: datetime.date, end: datetime.date) -> str:
+    feedback = f"{start}至{end}的统计:\n" if start != end else f"{start}的统计:\n"
+    detail_begin = get_current_date_raw().date() - datetime.timedelta(days=STAT_COUNTER_DETAIL_DAYS)
+    if start < detail_begin:
+        feedback += f"({detail_begin}之前的数据已合并, 不能按日期统计)\n"
+    return feedback
+
+
+async def stat_entity_info(repo, entity_type: str, entity_id: Optional[str],
+                           date_range: Optional[Tuple[datetime.date, datetime.date]], show_roll: bool = True) -> str:
+    """entity_id为None时统计该类型的所有实体"""
+    if date_range:
+        cur = await load_stat_summary(repo, entity_type, entity_id, *(date_to_day(d) for d in date_range))
+        feedback = f"收到信息:{cur.msg}\n指令记录: {stat_cmd_list(cur)}\n"
+        if show_roll:
+            feedback += stat_roll_line("", cur) + "\n"
+        return feedback
+    today = get_current_date_raw().date()
+    cur = await load_stat_summary(repo, entity_type, entity_id, date_to_day(today), date_to_day(today))
+    yesterday = date_to_day(today - datetime.timedelta(days=1))
+    last = await load_stat_summary(repo, entity_type, entity_id, yesterday, yesterday)
+    total = await load_stat_summary(repo, entity_type, entity_id)
+    feedback = f"今日收到信息:{cur.msg}, 昨日:{last.msg}, 总计:{total.msg}\n"
+    # 统计指令使用情况
+    feedback += stat_cmd_info(cur, total)
+    # 统计掷骰情况
+    if show_roll:
+        feedback += stat_roll_info(cur, total)
+    return feedback
+
+
+def stat_cmd_list(summary: StatSummary) -> str:
+    cmd_flags = summary.cmd_flags()
+    info_list = []
+    for flag, name in DPP_COMMAND_FLAG_DICT.items():
         if flag & DPP_COMMAND_FLAG_SET_HIDE_IN_STAT:
             continue
-        total_num, today_num = cmd_stat.flag_dict[flag].total_val, cmd_stat.flag_dict[flag].cur_day_val
-        if total_num:
-            total_info_list.append(f"{name}:{total_num}")
-        if today_num:
-            today_info_list.append(f"{name}:{today_num}")
-    if total_info_list:
-        total_info = ", ".join(total_info_list)
-    else:
-        total_info = "暂无记录"
-    if today_info_list:
-        today_info = ", ".join(today_info_list)
-    else:
-        today_info = "暂无记录"
-    return f"今日指令记录: {today_info}\n总计: {total_info}\n"
+        if cmd_flags.get(flag):
+            info_list.append(f"{name}:{cmd_flags[flag]}")
+    return ", ".join(info_list) if info_list else "暂无记录"
 
 
-def stat_roll_info(roll_stat: RollStatInfo) -> str:
-    # 今日
-    today_info = f"今日掷骰次数:{roll_stat.times.cur_day_val} D20统计:{roll_stat.d20.cur_list}"
-    if sum(roll_stat.d20.cur_list) == 0:
-        d20_avg = 0
-    else:
-        d20_avg = sum([(i + 1) * num for i, num in enumerate(roll_stat.d20.cur_list)]) / sum(roll_stat.d20.cur_list)
-    today_info += " 平均值: {:.3f}".format(d20_avg)
-    # 总计
-    total_info = f"总计掷骰次数:{roll_stat.times.total_val} D20统计:{roll_stat.d20.total_list}"
-    if sum(roll_stat.d20.total_list) == 0:
+def stat_cmd_info(today: StatSummary, total: StatSummary) -> str:
+    return f"今日指令记录: {stat_cmd_list(today)}\n总计: {stat_cmd_list(total)}\n"
+
+
+def stat_roll_line(prefix: str, summary: StatSummary) -> str:
+    d20_list = summary.d20_list()
+    if sum(d20_list) == 0:
         d20_avg = 0
     else:
-        d20_avg = sum([(i + 1) * num for i, num in enumerate(roll_stat.d20.total_list)]) / sum(roll_stat.d20.total_list)
-    total_info += " 平均值: {:.3f}".format(d20_avg)
-    return f"{today_info}\n{total_info}\n"
+        d20_avg = sum([(i + 1) * num for i, num in enumerate(d20_list)]) / sum(d20_list)
+    return f"{prefix}掷骰次数:{summary.roll} D20统计:{d20_list}" + " 平均值: {:.3f}".format(d20_avg)
+
+
+def stat_roll_info(today: StatSummary, total: StatSummary) -> str:
+    return f"{stat_roll_line('今日', today)}\n{stat_roll_line('总计', total)}\n"
 
 
-def stat_cmd_score(cmd_flag_info: UserCommandStatInfo, last_msg_num: int, total_msg_num: int) -> int:
+def stat_cmd_score(last: StatSummary, total: StatSummary) -> int:
     res = 0
+    last_msg_num, total_msg_num = last.msg, total.msg
+    if not total_msg_num:
+        return 0
+    total_flags, last_flags = total.cmd_flags(), last.cmd_flags()
     for flag in DPP_COMMAND_FLAG_DICT:
-        if flag not in cmd_flag_info.flag_dict:
+        if flag not in total_flags:
             continue
-        total_num, last_num = cmd_flag_info.flag_dict[flag].total_val, cmd_flag_info.flag_dict[flag].last_day_val
+        total_num, last_num = total_flags[flag], last_flags.get(flag, 0)
         if not last_msg_num:
             last_num, last_msg_num = 0, 1
         if flag & DPP_COMMAND_FLAG_SET_STD:
@@ -4,25 +4,34 @@ Persona AI 命令入口
 集成 orchestrator 完成对话功能
 支持白名单访问控制
 """
-from typing import List, Dict, Tuple, Any, Optional
+from typing import List, Dict, Tuple, Any, Optional, TYPE_CHECKING
+from collections import deque
 import json
+import statistics
 import time
 import asyncio
 
 from core.bot import Bot
+from core.bot.scheduler import TICK_INTERVAL_SECOND
 from core.command.user_cmd import UserCommandBase, custom_user_command
 from core.command.bot_cmd import BotSendMsgCommand, BotCommandBase
 from core.communication import PrivateMessagePort, GroupMessagePort, MessageMetaData
 from core.command.const import DPP_COMMAND_PRIORITY_DEFAULT, DPP_COMMAND_FLAG_FUN
 from utils.logger import dice_log
 
-from .orchestrator import PersonaOrchestrator
-from .llm.router import QuotaExceeded
-from .data.store import PersonaDataStore
+from .llm.streaming import StreamingReply
 from .data.persist_keys import PERSONA_SK_OBSERVATION_BUFFERS
-from .proactive.observation_buffer import ObservationBuffer
 from .utils.privacy import mask_sensitive_string
 
+# 主动消息的周期任务名, 见 Bot.register_periodic_job
+PERSONA_PROACTIVE_JOB = "persona:proactive"
+
+if TYPE_CHECKING:
+    # orchestrator 及其依赖（LLM 客户端、数据库、Agent 等）只在模块启用时于 delay_init 中加载
+    from .orchestrator import PersonaOrchestrator
+    from .data.store import PersonaDataStore
+    from .proactive.observation_buffer import ObservationBuffer
+
 
 @custom_user_command("PersonaAI", priority=DPP_COMMAND_PRIORITY_DEFAULT, flag=DPP_COMMAND_FLAG_FUN)
 class PersonaCommand(UserCommandBase):
@@ -31,13 +40,14 @@ class PersonaCommand(UserCommandBase):
     def __init__(self, bot: Bot):
         super().__init__(bot)
         self.enabled: bool = False
-        self.orchestrator: PersonaOrchestrator = None
-        self.data_store: PersonaDataStore = None
+        self.orchestrator: "PersonaOrchestrator" = None
+        self.data_store: "PersonaDataStore" = None
         self._whitelist_confirm_pending: Dict[str, float] = {}  # user_id -> timestamp
-        self._observation_buffers: Dict[str, ObservationBuffer] = {}  # group_id -> buffer
-        self._observation_buffers_loaded: bool = False
-        # 主循环在 async 中调用同步 tick() 时，单槽异步任务（避免 orchestrator.tick 慢于 1s 时堆积）
-        self._async_tick_task: Optional[asyncio.Task] = None
+        self._observation_buffers: Dict[str, "ObservationBuffer"] = {}  # group_id -> buffer（按群惰性加载）
+        self._legacy_observation_buffers_migrated: bool = False
+        # 对话回复的首条消息耗时（秒，流式与非流式均记录）及流式回复计数
+        self._first_message_latency: deque = deque(maxlen=100)
+        self._stream_stats: Dict[str, int] = {"replies": 0, "segments": 0}
         self._async_tick_daily_task: Optional[asyncio.Task] = None
         self._observation_persist_monotonic: float = 0.0
         # 管理员子命令分发器（在 delay_init 后由外部补齐）
@@ -74,6 +84,7 @@ class PersonaCommand(UserCommandBase):
             return ["Persona AI 模块已禁用"]
 
         # 创建 orchestrator（但不立即初始化，因为需要异步）
+        from .orchestrator import PersonaOrchestrator
         self.orchestrator = PersonaOrchestrator(self.bot)
 
         # 注册异步初始化任务
@@ -81,11 +92,14 @@ class PersonaCommand(UserCommandBase):
             success = await self.orchestrator.initialize()
             if success:
                 self.data_store = self.orchestrator.data_store
-                await self._ensure_observation_buffers_loaded()
+                await self._migrate_legacy_observation_buffers()
                 # 注册消息发送后跨模块通知 hook（先注销旧 hook 再注册，防止热重载后重复）
                 if hasattr(self, "_post_send_hook_unregister"):
                     self._post_send_hook_unregister()
                 self._post_send_hook_unregister = self.bot.add_post_send_hook(self._group_chat_recorder)
+                if hasattr(self, "_shutdown_hook_unregister"):
+                    self._shutdown_hook_unregister()
+                self._shutdown_hook_unregister = self.bot.add_shutdown_hook(self._on_bot_shutdown)
                 dice_log(f"[Persona] 模块初始化成功: {config.character_name}")
             else:
                 dice_log(f"[Persona] 模块初始化失败")
@@ -94,9 +108,17 @@ class PersonaCommand(UserCommandBase):
 
         self._register_admin_handlers()
         self.bot.register_task(init_orchestrator, is_async=True, timeout=30)
+        self.bot.register_periodic_job(PERSONA_PROACTIVE_JOB, self._scheduled_tick, TICK_INTERVAL_SECOND)
 
         return [f"Persona AI 模块加载中 (角色: {config.character_name})"]
 
+    async def _on_bot_shutdown(self) -> None:
+        """关闭前写回观察缓冲、后台互动队列与关系/画像缓存"""
+        if not self.orchestrator:
+            return
+        await self._persist_observation_buffers_to_store()
+        await self.orchestrator.shutdown()
+
     @staticmethod
     def _is_persona_trigger(meta: MessageMetaData, msg: str) -> bool:
         """判断消息是否为 persona 触发（@bot 或 .ai/。ai 前缀）"""
@@ -304,6 +326,7 @@ class PersonaCommand(UserCommandBase):
         
         # 特殊命令处理
         is_at_trigger = meta.to_me and not msg_str.strip().startswith(".ai")
+        streamed = False
 
         if content == "ping":
             response = "pong"
@@ -339,12 +362,17 @@ class PersonaCommand(UserCommandBase):
                 response = self._get_introduction()
         elif is_at_trigger:
             if self.orchestrator and self.enabled:
+                from .llm.router import QuotaExceeded
+                from .orchestrator import CHAT_ERROR_REPLY
+                stream = self._start_stream_reply(group_id, user_id)
+                stream_kwargs = {"on_text": stream.on_text} if self._stream_enabled() else {}
                 try:
                     response = await self.orchestrator.chat(
                         user_id=user_id,
                         group_id=group_id,
                         message=content,
                         nickname=nickname,
+                        **stream_kwargs,
                     )
                 except QuotaExceeded as e:
                     dice_log(f"[Persona] 配额超限: user={user_id}, group={group_id}")
@@ -352,13 +380,16 @@ class PersonaCommand(UserCommandBase):
                         f"{e}\n\n"
                         "使用 `.ai key config` 配置自己的 API Key 可解除限制"
                     )
+                response = await stream.finish(response, failed=response == CHAT_ERROR_REPLY)
+                streamed = stream.streamed
+                self._record_reply_latency(stream)
             else:
                 response = "Persona AI 模块未启用或未初始化"
         else:
             response = self._get_introduction()
         
-        # 发送回复（去重命中时 response 为 None，静默不发送）
-        if not response:
+        # 发送回复（去重命中时 response 为 None，静默不发送；流式回复可能已全部发出）
+        if not response and not streamed:
             return []
 
         # 更新群活跃度（群聊且是@触发或AI命令）
@@ -374,9 +405,37 @@ class PersonaCommand(UserCommandBase):
             except Exception as e:
                 dice_log(f"[Persona] 群活跃度更新失败（已忽略）: {e}")
 
+        if not response:
+            return []
         port = GroupMessagePort(group_id) if group_id else PrivateMessagePort(user_id)
         return [BotSendMsgCommand(self.bot.account, response, [port])]
 
+    def _stream_enabled(self) -> bool:
+        return bool(self.config and self.config.stream_enabled) and self.bot.proxy is not None
+
+    def _start_stream_reply(self, group_id: str, user_id: str) -> StreamingReply:
+        """创建对话回复的 StreamingReply；未开启流式时只用于记录首条消息耗时"""
+        port = GroupMessagePort(group_id) if group_id else PrivateMessagePort(user_id)
+
+        async def send(text: str) -> None:
+            await self.bot.proxy.process_bot_command(BotSendMsgCommand(self.bot.account, text, [port]))
+
+        if not self._stream_enabled():
+            return StreamingReply(send)
+        return StreamingReply(
+            send,
+            min_gap=self.config.stream_min_gap_seconds,
+            min_segment_chars=self.config.stream_min_segment_chars,
+        )
+
+    def _record_reply_latency(self, stream: StreamingReply) -> None:
+        latency = stream.first_message_latency
+        if latency is not None:
+            self._first_message_latency.append(latency)
+        if stream.streamed:
+            self._stream_stats["replies"] += 1
+            self._stream_stats["segments"] += stream.segments_sent
+
     async def _handle_join(self, user_id: str, args: List[str]) -> str:
         """处理 join 命令（用户加入白名单）"""
         if not self.data_store:
@@ -560,7 +619,8 @@ class PersonaCommand(UserCommandBase):
             lines.append(f"  待分享: {scheduler_status.get('pending_shares', 0)}")
             lines.append(f"  今日触发: {len(scheduler_status.get('scheduled_today', []))}")
             lines.append(f"  角色活跃中: {'是' if scheduler_status.get('is_character_active') else '否'}")
-        tick_p = self._async_tick_task is not None and not self._async_tick_task.done()
+        proactive_job = self.bot.scheduler.jobs.get(PERSONA_PROACTIVE_JOB)
+        tick_p = proactive_job is not None and proactive_job.is_running
         daily_p = (
             self._async_tick_daily_task is not None and not self._async_tick_daily_task.done()
         )
@@ -635,6 +695,8 @@ class PersonaCommand(UserCommandBase):
         rel.trust = new_score
         rel.secureness = new_score
         await self.data_store.update_relationship(rel)
+        if self.orchestrator and self.orchestrator.scheduler:
+            self.orchestrator.scheduler.note_relationship(rel)
         return f"已设置用户 {target_user} 的好感度为 {new_score:.2f}"
 
     async def _admin_reload(self, user_id: str, group_id: str, args: List[str]) -> str:
@@ -801,6 +863,51 @@ class PersonaCommand(UserCommandBase):
             else "Token 消耗: 输入 N/A / 输出 N/A"
         )
 
+        queue = self.orchestrator.interaction_queue
+        if queue is not None:
+            q = queue.get_stats()
+            queue_str = (
+                f"\n后台队列: 挂起 {q['depth']}, 延迟 {q['lag_seconds']:.1f}s, "
+                f"已处理 {q['processed']}, 合并 {q['coalesced']}, 重试 {q['retried']}, 失败 {q['failed']}"
+            )
+        else:
+            queue_str = "\n后台队列: 未启用"
+
+        cache_str = (
+            f"\n提示词缓存命中率: 主模型 {stats['primary']['cache_hit_ratio'] * 100:.1f}%, "
+            f"辅助模型 {stats['auxiliary']['cache_hit_ratio'] * 100:.1f}%"
+        )
+        builder = self.orchestrator.context_builder
+        if builder is not None:
+            prefix = stats["prefixes"].get(builder.prefix_fingerprint)
+            prefix_ratio = f"{prefix['cache_hit_ratio'] * 100:.1f}%" if prefix else "N/A"
+            cache_str += (
+                f"\n角色前缀: {builder.prefix_fingerprint} ({len(builder.static_prefix)} 字), 命中率 {prefix_ratio}"
+            )
+
+        if self._first_message_latency:
+            ttfm = statistics.median(self._first_message_latency)
+            stream_str = (
+                f"\n首条消息耗时 p50: {ttfm:.1f}s; 流式回复 {self._stream_stats['replies']} 次, "
+                f"提前发出 {self._stream_stats['segments']} 条, "
+                f"首段文本 p50={self.orchestrator.llm_router.get_first_text_percentiles('primary')['p50'] / 1000.0:.1f}s"
+            )
+        else:
+            stream_str = ""
+
+        pq, aq = stats["primary"]["queue"], stats["auxiliary"]["queue"]
+        admission_str = (
+            f"\n并发池: 主模型 {pq['in_flight']}/{pq['limit']} 排队 {pq['waiting']} "
+            f"等待 p50/max={pq['wait_p50_ms']}/{pq['wait_max_ms']}ms; "
+            f"辅助模型 {aq['in_flight']}/{aq['limit']} 排队 {aq['waiting']} "
+            f"等待 p50/max={aq['wait_p50_ms']}/{aq['wait_max_ms']}ms, 合并 {stats['auxiliary']['coalesced']}"
+        )
+        cs = stats["clients"]
+        admission_str += (
+            f"\n连接池: 客户端 {cs['clients']} 个, 新建 {cs['created']} / 复用 {cs['reused']} / 闲置移除 {cs['evicted']}, "
+            f"HTTP/2 {'开启' if cs['http2'] else '未安装 h2'}"
+        )
+
         return (
             f"今日调用: {primary_requests + aux_requests} 次\n"
             f"主模型: {primary_requests} 次, 错误率 {primary_error_rate}, "
@@ -808,6 +915,10 @@ class PersonaCommand(UserCommandBase):
             f"辅助模型: {aux_requests} 次, 错误率 {aux_error_rate}, "
             f"p50/p90/p99={a50:.1f}s/{a90:.1f}s/{a99:.1f}s\n"
             f"{token_str}"
+            f"{cache_str}"
+            f"{stream_str}"
+            f"{admission_str}"
+            f"{queue_str}"
         )
 
     async def _handle_admin_errors(self, user_id: str) -> str:
@@ -1021,45 +1132,69 @@ class PersonaCommand(UserCommandBase):
         """.pa 命令已废弃，请使用 .ai admin 子命令"""
         return ".pa 命令已废弃，请使用 .ai admin 子命令"
 
-    async def _ensure_observation_buffers_loaded(self) -> None:
-        if self._observation_buffers_loaded or not self.data_store:
+    async def _migrate_legacy_observation_buffers(self) -> None:
+        """将旧版 persona_settings 整表 blob 拆分写入 persona_observation_buffer 表（一次性）"""
+        if self._legacy_observation_buffers_migrated or not self.data_store:
             return
-        self._observation_buffers_loaded = True
+        self._legacy_observation_buffers_migrated = True
         raw = await self.data_store.get_setting(PERSONA_SK_OBSERVATION_BUFFERS)
         if not raw:
             return
         try:
             blob = json.loads(raw)
         except json.JSONDecodeError:
-            return
-        for gid, payload in blob.items():
-            if not isinstance(payload, dict):
-                continue
+            blob = {}
+        if isinstance(blob, dict):
+            payloads = {gid: payload for gid, payload in blob.items() if isinstance(payload, dict)}
+            await self.data_store.save_observation_buffers(payloads)
+        await self.data_store.delete_setting(PERSONA_SK_OBSERVATION_BUFFERS)
+
+    def _new_observation_buffer(self, group_id: str, payload: Optional[Dict[str, Any]] = None) -> "ObservationBuffer":
+        from .proactive.observation_buffer import ObservationBuffer
+        kwargs = dict(
+            initial_threshold=self.config.observe_initial_threshold,
+            max_threshold=self.config.observe_max_threshold,
+            min_threshold=self.config.observe_min_threshold,
+            max_buffer_size=self.config.observe_max_buffer_size,
+            max_records_per_group=self.config.observe_max_records,
+            timezone=self.config.timezone,
+        )
+        if isinstance(payload, dict):
             try:
-                self._observation_buffers[gid] = ObservationBuffer.from_persist_dict(
-                    gid,
-                    payload,
-                    initial_threshold=self.config.observe_initial_threshold,
-                    max_threshold=self.config.observe_max_threshold,
-                    min_threshold=self.config.observe_min_threshold,
-                    max_buffer_size=self.config.observe_max_buffer_size,
-                    max_records_per_group=self.config.observe_max_records,
-                    timezone=self.config.timezone,
-                )
+                return ObservationBuffer.from_persist_dict(group_id, payload, **kwargs)
             except Exception:
-                continue
+                pass
+        return ObservationBuffer(group_id=group_id, **kwargs)
+
+    async def _get_observation_buffer(self, group_id: str) -> "ObservationBuffer":
+        """获取群观察缓冲；首次访问时从 persona_observation_buffer 表加载该群"""
+        buffer = self._observation_buffers.get(group_id)
+        if buffer is None:
+            payload = await self.data_store.get_observation_buffer(group_id) if self.data_store else None
+            buffer = self._new_observation_buffer(group_id, payload)
+            self._observation_buffers[group_id] = buffer
+        return buffer
 
     async def _persist_observation_buffers_to_store(self) -> None:
+        """仅写入自上次持久化后有变更的群"""
         if not self.data_store:
             return
-        data = {gid: buf.to_persist_dict() for gid, buf in self._observation_buffers.items()}
-        await self.data_store.set_setting(
-            PERSONA_SK_OBSERVATION_BUFFERS,
-            json.dumps(data, ensure_ascii=False),
-        )
+        dirty = {gid: buf for gid, buf in self._observation_buffers.items() if buf.dirty}
+        if not dirty:
+            return
+        # 先取快照并清除脏标记，写库期间新加入的消息会重新标脏，不会被覆盖
+        snapshot = {gid: buf.to_persist_dict() for gid, buf in dirty.items()}
+        for buf in dirty.values():
+            buf.dirty = False
+        try:
+            await self.data_store.save_observation_buffers(snapshot)
+        except Exception:
+            for buf in dirty.values():
+                buf.dirty = True
+            raise
 
     async def _maybe_persist_observation_buffers(self, *, force: bool = False) -> None:
-        """节流整表 blob 写入；提取观察后应 force=True。"""
+        """节流脏缓冲写入；提取观察后应 force=True。"""
         interval = 5.0
         now_m = time.monotonic()
         if (
@@ -1091,19 +1226,7 @@ class PersonaCommand(UserCommandBase):
             dice_log(f"[Persona] 旁听群消息写入失败: {e}")
 
         try:
-            await self._ensure_observation_buffers_loaded()
-            if group_id not in self._observation_buffers:
-                self._observation_buffers[group_id] = ObservationBuffer(
-                    group_id=group_id,
-                    initial_threshold=self.config.observe_initial_threshold,
-                    max_threshold=self.config.observe_max_threshold,
-                    min_threshold=self.config.observe_min_threshold,
-                    max_buffer_size=self.config.observe_max_buffer_size,
-                    max_records_per_group=self.config.observe_max_records,
-                    timezone=self.config.timezone,
-                )
-
-            buffer = self._observation_buffers[group_id]
+            buffer = await self._get_observation_buffer(group_id)
 
             should_extract = buffer.add_message(
                 user_id=user_id,
@@ -1156,48 +1279,12 @@ class PersonaCommand(UserCommandBase):
             cmds.append(BotSendMsgCommand(self.bot.account, content, [port]))
         return cmds
 
-    def tick(self) -> List[BotCommandBase]:
-        """
-        每秒调用，驱动主动消息调度器。
-
-        主循环在运行中的事件循环里同步调用本方法：通过 create_task 执行异步 tick，
-        并在后续每秒收齐已完成任务的结果，避免消息丢失。
-
-        语义为 **at-most-once / 单槽**：同一时刻最多一个未完成的异步 tick；更强投递保证需另行设计（如发件箱）。
-        """
+    async def _scheduled_tick(self) -> List[BotCommandBase]:
+        """由 Bot 的定时任务调度器每秒调用，驱动主动消息调度器；调度器保证同一时刻最多一个运行中的 tick。"""
         if not self.enabled or not self.orchestrator:
             return []
-
-        try:
-            loop = asyncio.get_event_loop()
-
-            async def _run_tick() -> List[BotCommandBase]:
-                raw = await self.orchestrator.tick()
-                return self._proactive_messages_to_commands(raw)
-
-            out: List[BotCommandBase] = []
-            t = self._async_tick_task
-            if t is not None and t.done():
-                try:
-                    if not t.cancelled():
-                        out.extend(t.result())
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    dice_log(f"[Persona] tick 异步任务失败: {e}")
-                finally:
-                    self._async_tick_task = None
-
-            if loop.is_running():
-                if self._async_tick_task is None or self._async_tick_task.done():
-                    self._async_tick_task = asyncio.create_task(_run_tick())
-                return out
-
-            messages = loop.run_until_complete(self.orchestrator.tick())
-            return self._proactive_messages_to_commands(messages)
-        except Exception as e:
-            dice_log(f"[Persona] tick 失败: {e}")
-            return []
+        raw = await self.orchestrator.tick()
+        return self._proactive_messages_to_commands(raw)
 
     def tick_daily(self) -> List[BotCommandBase]:
         """每天调用，生成日记（异步逻辑通过任务队列在运行中的事件循环里执行）。"""
@@ -1250,6 +1337,7 @@ class PersonaCommand(UserCommandBase):
             return "模块未初始化"
 
         from .data.models import UserLLMConfig
+        from .data.store import PersonaDataStore
 
         # 检查加密密钥是否设置
         if not PersonaDataStore._get_encryption_key():
@@ -0,0 +1,86 @@
+"""
+群聊共享历史的进程内环形缓冲
+
+按 group_id 缓存最近 N 条 ``GroupConversation``，由 ``PersonaDataStore.add_group_conversation``
+（命令入流、post-send hook、群聊记录器都经由此处）同步维护，使大多数对话轮次无需访问 SQLite。
+
+.. note::
+    缓冲仅在「已预热」的群上视为权威数据：首次读取时从库中装载最近 ``keep`` 条，
+    此后的写入直接追加。群表本身也按 ``group_max_messages`` 裁剪，因此两者保持一致。
+    多个 ``PersonaDataStore`` 实例写同一个库时缓冲不可见对方写入，生产环境只有一个实例。
+"""
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Deque, Iterable, List, Optional
+
+from .models import GroupConversation
+
+
+class GroupHistoryBuffer:
+    """每群一个 deque，群数量按 LRU 限制"""
+
+    def __init__(self, max_groups: int = 256):
+        self.max_groups = max_groups
+        self._groups: "OrderedDict[str, Deque[GroupConversation]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_groups > 0
+
+    def is_warm(self, group_id: str) -> bool:
+        return group_id in self._groups
+
+    def warm(self, group_id: str, history: Iterable[GroupConversation], keep: int) -> None:
+        """以库中读取的升序历史初始化该群缓冲"""
+        if not self.enabled:
+            return
+        buf: Deque[GroupConversation] = deque(history)
+        while len(buf) > keep:
+            buf.popleft()
+        self._groups[group_id] = buf
+        self._groups.move_to_end(group_id)
+        while len(self._groups) > self.max_groups:
+            self._groups.popitem(last=False)
+
+    def append(self, msg: GroupConversation, keep: int) -> None:
+        """追加一条新消息；未预热的群忽略（下次读取时从库装载）"""
+        buf = self._groups.get(msg.group_id)
+        if buf is None:
+            return
+        buf.append(msg)
+        while len(buf) > keep:
+            buf.popleft()
+
+    def trim(self, group_id: str, keep: int) -> None:
+        buf = self._groups.get(group_id)
+        if buf is None:
+            return
+        while len(buf) > keep:
+            buf.popleft()
+
+    def invalidate(self, group_id: Optional[str] = None) -> None:
+        if group_id is None:
+            self._groups.clear()
+        else:
+            self._groups.pop(group_id, None)
+
+    def window(
+        self,
+        group_id: str,
+        since: Optional[datetime] = None,
+        max_rows: Optional[int] = None,
+    ) -> List[GroupConversation]:
+        """从新到旧收集满足 since / max_rows 的消息，按时间升序返回"""
+        buf = self._groups.get(group_id)
+        if buf is None:
+            return []
+        self._groups.move_to_end(group_id)
+        result: List[GroupConversation] = []
+        for msg in reversed(buf):
+            if max_rows is not None and len(result) >= max_rows:
+                break
+            if since is not None and msg.created_at is not None and msg.created_at < since:
+                break
+            result.append(msg)
+        result.reverse()
+        return result
@@ -85,6 +85,15 @@ CREATE TABLE IF NOT EXISTS persona_observations (
 );
 """
 
+# 群聊观察缓冲表（按群存储 ObservationBuffer 快照，替代 persona_settings 中的整表 blob）
+CREATE_OBSERVATION_BUFFER_TABLE = """
+CREATE TABLE IF NOT EXISTS persona_observation_buffer (
+    group_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,       -- JSON, ObservationBuffer.to_persist_dict()
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
 # 角色日记表
 CREATE_DIARY_TABLE = """
 CREATE TABLE IF NOT EXISTS persona_diary (
@@ -173,6 +182,7 @@ CREATE TABLE IF NOT EXISTS persona_group_conversations (
     role TEXT NOT NULL,
     content TEXT NOT NULL,
     display_name TEXT DEFAULT '',
+    token_estimate REAL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 """
@@ -262,6 +272,7 @@ ALL_MIGRATIONS = [
     CREATE_SCORE_HISTORY_TABLE,
     CREATE_USAGE_TABLE,
     CREATE_OBSERVATIONS_TABLE,
+    CREATE_OBSERVATION_BUFFER_TABLE,
     CREATE_DIARY_TABLE,
     CREATE_DAILY_EVENTS_TABLE,
     CREATE_CHARACTER_STATE_TABLE,
@@ -45,11 +45,15 @@ class RelationshipState(BaseModel):
     last_relationship_decay_applied_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
+    @staticmethod
+    def composite_from(intimacy: float, passion: float, trust: float, secureness: float) -> float:
+        """由四维分数计算综合分数（加权平均），批处理路径按行直接调用"""
+        return intimacy * 0.3 + passion * 0.2 + trust * 0.3 + secureness * 0.2
+
     @property
     def composite_score(self) -> float:
         """综合分数（加权平均）"""
-        return (self.intimacy * 0.3 + self.passion * 0.2 + 
-                self.trust * 0.3 + self.secureness * 0.2)
+        return self.composite_from(self.intimacy, self.passion, self.trust, self.secureness)
     
     def get_warmth_level(self, labels: List[str]) -> tuple[int, str]:
         """
@@ -130,6 +134,8 @@ class GroupConversation(Message):
     """
     group_id: str  # 覆盖基类默认值，群聊场景下必传
     display_name: str = ""
+    # 入库时计算的 content token 估算值；旧数据为 None，读取方按需回退到实时估算
+    token_estimate: Optional[float] = None
 
 
 class WhitelistEntry(BaseModel):
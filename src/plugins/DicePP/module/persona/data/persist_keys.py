@@ -2,7 +2,7 @@
 持久化存储的键名常量
 """
 
-# 观察缓冲区配置
+# 观察缓冲区（旧版整表 blob，仅用于迁移到 persona_observation_buffer 表）
 PERSONA_SK_OBSERVATION_BUFFERS = "persona_observation_buffers"
 
 # 角色生活模拟状态
@@ -3,7 +3,7 @@ Persona 数据存储层
 
 统一的数据访问接口
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import json
 import os
@@ -15,6 +15,8 @@ from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+from utils.string import estimate_tokens
+
 from ..wall_clock import persona_wall_now
 from ..utils.privacy import mask_sensitive_string
 
@@ -24,6 +26,8 @@ from .models import (
     LLMTraceRecord, DelayedTask, GroupConversation, CharacterState,
 )
 from .migrations import ALL_MIGRATIONS
+from .group_history import GroupHistoryBuffer
+from .write_back import WriteBackCache
 
 
 class PersonaDataStore:
@@ -44,6 +48,8 @@ class PersonaDataStore:
         group_activity_content_window_hours: float = 24.0,  # 内容保护时间窗口
         timezone: str = "Asia/Shanghai",
         group_max_messages: int = 40,
+        group_history_cache_groups: int = 256,
+        state_cache_entries: int = 0,
     ):
         self.db = db_connection
         self._group_activity_decay_per_day = group_activity_decay_per_day
@@ -52,6 +58,11 @@ class PersonaDataStore:
         self._group_activity_content_window_hours = group_activity_content_window_hours
         self._timezone = timezone
         self._group_max_messages = group_max_messages
+        # 群聊共享历史环形缓冲（0 表示禁用，所有读取直接走 SQL）
+        self._group_history = GroupHistoryBuffer(max_groups=group_history_cache_groups)
+        # 关系 / 画像写回缓存（0 表示禁用，每次写入立即提交）
+        self._relationship_cache: WriteBackCache = WriteBackCache(max_entries=state_cache_entries)
+        self._profile_cache: WriteBackCache = WriteBackCache(max_entries=state_cache_entries)
 
     def _wall_now(self) -> datetime:
         """与 `PersonaConfig.timezone` 一致的墙钟（naive 本地时间）。"""
@@ -81,6 +92,7 @@ class PersonaDataStore:
         await self._ensure_score_history_conversation_digest()
         await self._ensure_observations_debug_columns()
         await self._ensure_daily_events_share_columns()
+        await self._ensure_group_conversations_token_column()
 
     async def _ensure_group_activity_daily_columns(self) -> None:
         """
@@ -160,6 +172,16 @@ class PersonaDataStore:
                 "ALTER TABLE persona_daily_events ADD COLUMN duration_minutes INTEGER DEFAULT 0"
             )
 
+    async def _ensure_group_conversations_token_column(self) -> None:
+        """群聊历史表：入库时的 token 估算值（避免每轮重复估算）。"""
+        async with self.db.execute("PRAGMA table_info(persona_group_conversations)") as cursor:
+            rows = await cursor.fetchall()
+        col_names = {row[1] for row in rows}
+        if "token_estimate" not in col_names:
+            await self.db.execute(
+                "ALTER TABLE persona_group_conversations ADD COLUMN token_estimate REAL"
+            )
+
     # ========== 消息相关 ==========
 
     async def add_message(self, user_id: str, group_id: str, role: str, content: str) -> None:
@@ -251,17 +273,19 @@ class PersonaDataStore:
 
         群聊历史按 group_id 共享，私聊历史继续使用 persona_messages 按 user_id+group_id 隔离。
         """
-        now_iso = self._wall_now().isoformat()
+        now = self._wall_now()
+        token_estimate = estimate_tokens(content)
         await self.db.execute("BEGIN")
         try:
-            await self.db.execute(
+            cursor = await self.db.execute(
                 """
                 INSERT INTO persona_group_conversations
-                (group_id, user_id, role, content, display_name, created_at)
-                VALUES (?, ?, ?, ?, ?, ?)
+                (group_id, user_id, role, content, display_name, token_estimate, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
-                (group_id, user_id, role, content, display_name, now_iso),
+                (group_id, user_id, role, content, display_name, token_estimate, now.isoformat()),
             )
+            row_id = cursor.lastrowid
             # 同一事务内执行裁剪
             await self.db.execute(
                 """
@@ -280,26 +304,74 @@ class PersonaDataStore:
         except Exception:
             await self.db.rollback()
             raise
+        self._group_history.append(
+            GroupConversation(
+                id=row_id,
+                group_id=group_id,
+                user_id=user_id,
+                role=role,
+                content=content,
+                display_name=display_name or "",
+                token_estimate=token_estimate,
+                created_at=now,
+            ),
+            keep=self._group_max_messages,
+        )
 
     async def get_group_conversations(
         self,
         group_id: str,
         limit: Optional[int] = None,
+        *,
+        since: Optional[datetime] = None,
+        max_rows: Optional[int] = None,
     ) -> List[GroupConversation]:
         """获取群聊历史，按时间升序返回
 
         群聊历史按 group_id 共享，私聊历史继续使用 persona_messages 按 user_id+group_id 隔离。
+
+        Args:
+            limit: 兼容旧调用的条数上限，与 max_rows 同时给出时取较小值
+            since: 仅返回 created_at >= since 的消息（naive 墙钟时间）
+            max_rows: 最多返回最近的多少条
+
+        已预热的群直接从进程内环形缓冲返回；其余情况把时间与条数限制下推到 SQL
+        （依赖 idx_pgc_group_created 索引），首次读取时顺带预热缓冲。
         """
+        row_cap = limit if max_rows is None else (max_rows if limit is None else min(limit, max_rows))
+
+        cache_usable = (
+            self._group_history.enabled
+            and (row_cap is None or row_cap <= self._group_max_messages)
+        )
+        if cache_usable:
+            if not self._group_history.is_warm(group_id):
+                recent = await self._select_group_conversations(group_id, None, self._group_max_messages)
+                self._group_history.warm(group_id, recent, keep=self._group_max_messages)
+            return self._group_history.window(group_id, since=since, max_rows=row_cap)
+
+        return await self._select_group_conversations(group_id, since, row_cap)
+
+    async def _select_group_conversations(
+        self,
+        group_id: str,
+        since: Optional[datetime],
+        max_rows: Optional[int],
+    ) -> List[GroupConversation]:
+        """按 (group_id, created_at DESC) 取最近窗口，升序返回"""
         sql = """
-            SELECT id, group_id, user_id, role, content, display_name, created_at
+            SELECT id, group_id, user_id, role, content, display_name, created_at, token_estimate
             FROM persona_group_conversations
             WHERE group_id = ?
-            ORDER BY created_at DESC
         """
         params: List[Any] = [group_id]
-        if limit is not None:
+        if since is not None:
+            sql += " AND created_at >= ?"
+            params.append(since.isoformat())
+        sql += " ORDER BY created_at DESC, id DESC"
+        if max_rows is not None:
             sql += " LIMIT ?"
-            params.append(limit)
+            params.append(max_rows)
 
         async with self.db.execute(sql, params) as cursor:
             rows = await cursor.fetchall()
@@ -314,6 +386,7 @@ class PersonaDataStore:
                     content=row[4],
                     display_name=row[5] or "",
                     created_at=datetime.fromisoformat(row[6]) if row[6] else None,
+                    token_estimate=row[7],
                 ))
             return messages
 
@@ -333,6 +406,7 @@ class PersonaDataStore:
             (group_id, group_id, keep),
         )
         await self.db.commit()
+        self._group_history.trim(group_id, keep)
 
     async def search_group_conversations(
         self,
@@ -709,28 +783,41 @@ class PersonaDataStore:
 
     async def add_score_event(self, event: ScoreEvent) -> None:
         """添加评分事件"""
-        await self.db.execute(
+        await self.add_score_events([event])
+
+    async def add_score_events(self, events: List[ScoreEvent]) -> None:
+        """批量添加评分事件（一次提交）"""
+        if not events:
+            return
+        await self._insert_score_events(events)
+        await self.db.commit()
+
+    async def _insert_score_events(self, events: List[ScoreEvent]) -> None:
+        now = self._wall_now().isoformat()
+        await self.db.executemany(
             """
             INSERT INTO persona_score_history
             (user_id, group_id, intimacy_delta, passion_delta, trust_delta, secureness_delta,
              composite_before, composite_after, reason, conversation_digest, created_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (
-                event.user_id,
-                event.group_id,
-                event.deltas.intimacy,
-                event.deltas.passion,
-                event.deltas.trust,
-                event.deltas.secureness,
-                event.composite_before,
-                event.composite_after,
-                event.reason,
-                event.conversation_digest,
-                event.created_at.isoformat() if event.created_at else self._wall_now().isoformat(),
-            )
+            [
+                (
+                    event.user_id,
+                    event.group_id,
+                    event.deltas.intimacy,
+                    event.deltas.passion,
+                    event.deltas.trust,
+                    event.deltas.secureness,
+                    event.composite_before,
+                    event.composite_after,
+                    event.reason,
+                    event.conversation_digest,
+                    event.created_at.isoformat() if event.created_at else now,
+                )
+                for event in events
+            ],
         )
-        await self.db.commit()
 
     # ========== 群聊观察 ==========
 
@@ -811,6 +898,43 @@ class PersonaDataStore:
         )
         await self.db.commit()
 
+    # ========== 群聊观察缓冲（按群持久化） ==========
+
+    async def get_observation_buffer(self, group_id: str) -> Optional[Dict[str, Any]]:
+        """读取单个群的观察缓冲快照（``ObservationBuffer.to_persist_dict`` 格式）"""
+        async with self.db.execute(
+            "SELECT payload FROM persona_observation_buffer WHERE group_id = ?",
+            (group_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if not row or not row[0]:
+            return None
+        try:
+            data = json.loads(row[0])
+        except json.JSONDecodeError:
+            return None
+        return data if isinstance(data, dict) else None
+
+    async def save_observation_buffers(self, payloads: Dict[str, Dict[str, Any]]) -> None:
+        """批量写入多个群的观察缓冲快照（单事务）"""
+        if not payloads:
+            return
+        now_iso = self._wall_now().isoformat()
+        await self.db.executemany(
+            """
+            INSERT INTO persona_observation_buffer (group_id, payload, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT(group_id) DO UPDATE SET
+                payload = excluded.payload,
+                updated_at = excluded.updated_at
+            """,
+            [
+                (group_id, json.dumps(payload, ensure_ascii=False), now_iso)
+                for group_id, payload in payloads.items()
+            ],
+        )
+        await self.db.commit()
+
     # ========== 日记相关 ==========
 
     async def get_diary(self, date: str) -> Optional[str]:
@@ -960,6 +1084,9 @@ class PersonaDataStore:
         await self.db.commit()
 
     async def get_user_profile(self, user_id: str) -> Optional[UserProfile]:
+        cached = self._profile_cache.get(user_id)
+        if cached is not None:
+            return cached.model_copy(deep=True)
         async with self.db.execute(
             "SELECT facts, updated_at FROM persona_user_profiles WHERE user_id = ?",
             (user_id,)
@@ -967,14 +1094,24 @@ class PersonaDataStore:
             row = await cursor.fetchone()
             if not row:
                 return None
-            return UserProfile(
+            profile = UserProfile(
                 user_id=user_id,
                 facts=json.loads(row[0]) if row[0] else {},
                 updated_at=datetime.fromisoformat(row[1]) if row[1] else None
             )
+        self._profile_cache.put(user_id, profile.model_copy(deep=True))
+        return profile
 
     async def save_user_profile(self, profile: UserProfile) -> None:
-        await self.db.execute(
+        if self._profile_cache.enabled:
+            self._profile_cache.put(profile.user_id, profile.model_copy(deep=True), dirty=True)
+            return
+        await self._upsert_user_profiles([profile])
+        await self.db.commit()
+
+    async def _upsert_user_profiles(self, profiles: List[UserProfile]) -> None:
+        now = self._wall_now().isoformat()
+        await self.db.executemany(
             """
             INSERT INTO persona_user_profiles (user_id, facts, updated_at)
             VALUES (?, ?, ?)
@@ -982,11 +1119,13 @@ class PersonaDataStore:
                 facts = excluded.facts,
                 updated_at = excluded.updated_at
             """,
-            (profile.user_id, json.dumps(profile.facts), self._wall_now().isoformat())
+            [(p.user_id, json.dumps(p.facts), now) for p in profiles],
         )
-        await self.db.commit()
 
     async def get_relationship(self, user_id: str, group_id: str = "") -> Optional[RelationshipState]:
+        cached = self._relationship_cache.get((user_id, group_id))
+        if cached is not None:
+            return cached.model_copy()
         async with self.db.execute(
             """
             SELECT intimacy, passion, trust, secureness, last_interaction_at,
@@ -999,7 +1138,7 @@ class PersonaDataStore:
             row = await cursor.fetchone()
             if not row:
                 return None
-            return RelationshipState(
+            rel = RelationshipState(
                 user_id=user_id,
                 group_id=group_id,
                 intimacy=row[0],
@@ -1012,8 +1151,13 @@ class PersonaDataStore:
                 ),
                 updated_at=datetime.fromisoformat(row[6]) if row[6] else None
             )
+        self._relationship_cache.put((user_id, group_id), rel.model_copy())
+        return rel
 
     async def init_relationship(self, user_id: str, group_id: str, initial_score: float = 30.0) -> RelationshipState:
+        cached = self._relationship_cache.get((user_id, group_id))
+        if cached is not None:
+            return cached.model_copy()
         await self.db.execute(
             """
             INSERT OR IGNORE INTO persona_user_relationships
@@ -1040,12 +1184,33 @@ class PersonaDataStore:
         return rel
 
     async def update_relationship(self, rel: RelationshipState) -> None:
-        decay_at = (
-            rel.last_relationship_decay_applied_at.isoformat()
-            if rel.last_relationship_decay_applied_at
-            else None
-        )
-        await self.db.execute(
+        if self._relationship_cache.enabled:
+            now = self._wall_now()
+            cached = rel.model_copy(update={"updated_at": now})
+            if cached.last_interaction_at is None:
+                cached.last_interaction_at = now
+            self._relationship_cache.put((rel.user_id, rel.group_id), cached, dirty=True)
+            return
+        await self._upsert_relationships([rel])
+        await self.db.commit()
+
+    async def update_relationships_batch(self, rels: List[RelationshipState]) -> int:
+        """在一个事务中以 executemany 写入多条关系，并同步缓存"""
+        if not rels:
+            return 0
+        await self._upsert_relationships(rels)
+        await self.db.commit()
+        now = self._wall_now()
+        for rel in rels:
+            key = (rel.user_id, rel.group_id)
+            # 已缓存的条目刷新为落库后的值；未缓存的不主动装入
+            if self._relationship_cache.get(key) is not None:
+                self._relationship_cache.put(key, rel.model_copy(update={"updated_at": now}))
+        return len(rels)
+
+    async def _upsert_relationships(self, rels: List[RelationshipState]) -> None:
+        now = self._wall_now().isoformat()
+        await self.db.executemany(
             """
             INSERT INTO persona_user_relationships
             (user_id, group_id, intimacy, passion, trust, secureness,
@@ -1060,23 +1225,50 @@ class PersonaDataStore:
                 last_relationship_decay_applied_at = excluded.last_relationship_decay_applied_at,
                 updated_at = excluded.updated_at
             """,
-            (
-                rel.user_id,
-                rel.group_id,
-                rel.intimacy,
-                rel.passion,
-                rel.trust,
-                rel.secureness,
-                rel.last_interaction_at.isoformat()
-                if rel.last_interaction_at
-                else self._wall_now().isoformat(),
-                decay_at,
-                self._wall_now().isoformat(),
-            )
+            [
+                (
+                    rel.user_id,
+                    rel.group_id,
+                    rel.intimacy,
+                    rel.passion,
+                    rel.trust,
+                    rel.secureness,
+                    rel.last_interaction_at.isoformat() if rel.last_interaction_at else now,
+                    (
+                        rel.last_relationship_decay_applied_at.isoformat()
+                        if rel.last_relationship_decay_applied_at
+                        else None
+                    ),
+                    now,
+                )
+                for rel in rels
+            ],
         )
-        await self.db.commit()
+
+    async def flush_write_back(self) -> int:
+        """将写回缓存中的脏关系与画像一次性落库，返回写入条数"""
+        rels = self._relationship_cache.take_dirty()
+        profiles = self._profile_cache.take_dirty()
+        if not rels and not profiles:
+            return 0
+        try:
+            if rels:
+                await self._upsert_relationships(rels)
+            if profiles:
+                await self._upsert_user_profiles(profiles)
+            await self.db.commit()
+        except Exception:
+            self._relationship_cache.mark_dirty((r.user_id, r.group_id) for r in rels)
+            self._profile_cache.mark_dirty(p.user_id for p in profiles)
+            raise
+        return len(rels) + len(profiles)
+
+    def pending_write_back(self) -> int:
+        """尚未落库的关系与画像条数"""
+        return self._relationship_cache.dirty_count + self._profile_cache.dirty_count
 
     async def get_top_relationships(self, group_id: str = "", limit: int = 10) -> List[RelationshipState]:
+        await self.flush_write_back()
         # 私聊关系在库中一般为 ''；兼容历史 NULL 行
         if group_id == "":
             where_clause = "COALESCE(group_id, '') = ''"
@@ -1432,6 +1624,7 @@ class PersonaDataStore:
 
     async def list_all_relationships_raw(self) -> List[RelationshipState]:
         """列出所有关系行，无过滤（用于每日衰减批处理等）。"""
+        await self.flush_write_back()
         async with self.db.execute(
             """
             SELECT user_id, group_id, intimacy, passion, trust, secureness,
@@ -1458,6 +1651,86 @@ class PersonaDataStore:
                 for row in rows
             ]
 
+    async def list_relationship_decay_rows(
+        self,
+    ) -> List[Tuple[str, str, float, float, float, float, Optional[datetime], Optional[datetime]]]:
+        """每日衰减批处理用的窄查询，不构造 RelationshipState。
+
+        Returns:
+            [(user_id, group_id, intimacy, passion, trust, secureness,
+              last_interaction_at, last_relationship_decay_applied_at)]
+        """
+        await self.flush_write_back()
+        async with self.db.execute(
+            """
+            SELECT user_id, group_id, intimacy, passion, trust, secureness,
+                   last_interaction_at, last_relationship_decay_applied_at
+            FROM persona_user_relationships
+            WHERE last_interaction_at IS NOT NULL
+            """
+        ) as cursor:
+            rows = await cursor.fetchall()
+        parse = datetime.fromisoformat
+        return [
+            (
+                row[0],
+                row[1] if row[1] is not None else "",
+                row[2], row[3], row[4], row[5],
+                parse(row[6]) if row[6] else None,
+                parse(row[7]) if row[7] else None,
+            )
+            for row in rows
+        ]
+
+    async def apply_relationship_decays(
+        self,
+        decays: List[Tuple[str, str, float]],
+        events: List[ScoreEvent],
+        applied_at: datetime,
+    ) -> int:
+        """在一个事务中写入衰减结果与对应评分事件。
+
+        衰减以 SQL 表达式相对扣减（四项同减并钳制在 0-100），与批处理读取之后的并发写入可以叠加；
+        已缓存的关系同步扣减，保留其脏标记。
+
+        Args:
+            decays: [(user_id, group_id, 衰减量)]
+            events: 评分事件
+            applied_at: 衰减水位时间
+        """
+        if not decays:
+            return 0
+        stamp = applied_at.isoformat()
+        try:
+            await self.db.executemany(
+                """
+                UPDATE persona_user_relationships SET
+                    intimacy = MAX(0.0, MIN(100.0, intimacy - ?1)),
+                    passion = MAX(0.0, MIN(100.0, passion - ?1)),
+                    trust = MAX(0.0, MIN(100.0, trust - ?1)),
+                    secureness = MAX(0.0, MIN(100.0, secureness - ?1)),
+                    last_relationship_decay_applied_at = ?2,
+                    updated_at = ?2
+                WHERE user_id = ?3 AND COALESCE(group_id, '') = ?4
+                """,
+                [(amount, stamp, user_id, group_id) for user_id, group_id, amount in decays],
+            )
+            await self._insert_score_events(events)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        for user_id, group_id, amount in decays:
+            cached = self._relationship_cache.get((user_id, group_id))
+            if cached is None:
+                continue
+            cached.apply_deltas(
+                ScoreDeltas(intimacy=-amount, passion=-amount, trust=-amount, secureness=-amount),
+                updated_at=applied_at,
+            )
+            cached.last_relationship_decay_applied_at = applied_at
+        return len(decays)
+
     async def list_active_relationships(self, min_score: float = 0, active_within_days: int = 30) -> List[RelationshipState]:
         """列出活跃关系记录（用于想念触发等场景）
 
@@ -1468,6 +1741,7 @@ class PersonaDataStore:
         Returns:
             关系状态列表
         """
+        await self.flush_write_back()
         cutoff_date = (self._wall_now() - timedelta(days=active_within_days)).isoformat()
 
         async with self.db.execute(
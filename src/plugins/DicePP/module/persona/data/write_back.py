@@ -0,0 +1,78 @@
+"""
+关系 / 画像状态的进程内写回缓存
+
+``PersonaDataStore`` 用它缓存 ``RelationshipState`` 与 ``UserProfile``：读命中直接返回副本，
+写入只标记脏数据，由 ``flush_write_back`` 以一次 ``executemany`` 事务落库（定时与关闭时触发）。
+
+.. note::
+    条目数按 LRU 限制，但脏条目在落库前不会被淘汰，因此实际条目数可能短暂超过上限。
+"""
+from collections import OrderedDict
+from typing import Generic, Hashable, List, Optional, Set, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class WriteBackCache(Generic[K, V]):
+    """带脏标记的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[K, V]" = OrderedDict()
+        self._dirty: Set[K] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> Optional[V]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: K, value: V, dirty: bool = False) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if dirty:
+            self._dirty.add(key)
+        self._evict()
+
+    def _evict(self) -> None:
+        if len(self._entries) <= self.max_entries:
+            return
+        for key in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if key not in self._dirty:
+                del self._entries[key]
+
+    def take_dirty(self) -> List[V]:
+        """取出全部脏条目并清除脏标记（条目仍保留在缓存中，落库失败时可 ``mark_dirty`` 恢复）"""
+        values = [self._entries[k] for k in self._dirty if k in self._entries]
+        self._dirty.clear()
+        return values
+
+    def mark_dirty(self, keys) -> None:
+        """落库失败时恢复脏标记"""
+        for key in keys:
+            if key in self._entries:
+                self._dirty.add(key)
+
+    def invalidate(self, key: Optional[K] = None) -> None:
+        if key is None:
+            self._entries.clear()
+            self._dirty.clear()
+        else:
+            self._entries.pop(key, None)
+            self._dirty.discard(key)
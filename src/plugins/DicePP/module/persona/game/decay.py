@@ -3,12 +3,12 @@
 
 实现好感度随时间自然衰减的逻辑
 """
-from typing import Optional, Tuple, TYPE_CHECKING
+from typing import List, Optional, Sequence, Tuple, TYPE_CHECKING
 from datetime import datetime
 import logging
 
 from ..data.models import RelationshipState, ScoreDeltas
-from ..wall_clock import persona_wall_now
+from ..wall_clock import PERSONA_EPOCH, persona_wall_now
 
 logger = logging.getLogger("persona.decay")
 
@@ -26,6 +26,26 @@ def _decay_hours_elapsed(
     return max(0.0, idle_hours - grace_hours)
 
 
+def _hours_since_epoch(at: datetime) -> float:
+    return (at - PERSONA_EPOCH).total_seconds() / 3600.0
+
+
+def _decay_reason(
+    idle_hours: float,
+    grace_hours: int,
+    delta_h: float,
+    raw_decay: float,
+    decay_amount: float,
+    actual_decay: float,
+    floor: float,
+) -> str:
+    return (
+        f"空闲 {idle_hours:.1f}h (免衰减 {grace_hours}h), "
+        f"增量可衰减 {delta_h:.2f}h, 原始衰减 {raw_decay:.2f}, 上限后 {decay_amount:.2f}, "
+        f"下限保护后 {actual_decay:.2f} (下限 {floor:.1f})"
+    )
+
+
 class DecayConfig:
     """衰减配置（运行时用；字段与 `PersonaConfig` 的 decay_* 一一对应）"""
 
@@ -130,15 +150,66 @@ class DecayCalculator:
             secureness=-actual_decay,
         )
 
-        reason = (
-            f"空闲 {idle_hours:.1f}h (免衰减 {self.config.grace_period_hours}h), "
-            f"增量可衰减 {delta_h:.2f}h, 原始衰减 {raw_decay:.2f}, 上限后 {decay_amount:.2f}, "
-            f"下限保护后 {actual_decay:.2f} (下限 {floor:.1f})"
+        reason = _decay_reason(
+            idle_hours, self.config.grace_period_hours, delta_h, raw_decay, decay_amount, actual_decay, floor
         )
 
         logger.debug("Decay calculated for %s: %s", relationship.user_id, reason)
         return deltas, reason
 
+    def batch_decay(
+        self,
+        last_interaction_at: Sequence[Optional[datetime]],
+        decay_applied_at: Sequence[Optional[datetime]],
+        composite_scores: Sequence[float],
+        initial_score: float,
+        now: Optional[datetime] = None,
+    ) -> List[Tuple[int, float, str]]:
+        """
+        按列批量计算衰减量（每日批处理用），逐行语义与 should_apply_decay + calculate_decay 一致。
+
+        三个序列按下标一一对应；时间先统一换算为自 PERSONA_EPOCH 起的小时数再做浮点运算，
+        不构造 RelationshipState。
+
+        Returns:
+            [(行下标, 衰减量, 计算说明)]，只包含实际衰减量 > 0.01 的行
+        """
+        if not self.config.enabled:
+            return []
+        now = self._resolve_now(now)
+        now_h = _hours_since_epoch(now)
+        grace = float(self.config.grace_period_hours)
+        rate = self.config.decay_rate_per_hour
+        cap = self.config.daily_cap
+        floor = initial_score + self.config.floor_offset
+
+        results: List[Tuple[int, float, str]] = []
+        for i, (t0, ta, score) in enumerate(zip(last_interaction_at, decay_applied_at, composite_scores)):
+            if t0 is None:
+                continue
+            t0_h = _hours_since_epoch(t0)
+            idle_hours = now_h - t0_h
+            if idle_hours <= grace:
+                continue
+            h_now = idle_hours - grace
+            h_then = 0.0
+            if ta is not None:
+                h_then = max(0.0, max(_hours_since_epoch(ta), t0_h) - t0_h - grace)
+            delta_h = h_now - h_then
+            if delta_h <= 1e-9:
+                continue
+            raw_decay = delta_h * rate
+            decay_amount = min(raw_decay, cap)
+            actual_decay = min(decay_amount, max(0, score - floor))
+            if actual_decay <= 0.01:
+                continue
+            results.append((
+                i,
+                actual_decay,
+                _decay_reason(idle_hours, self.config.grace_period_hours, delta_h, raw_decay, decay_amount, actual_decay, floor),
+            ))
+        return results
+
     def effective_relationship(
         self,
         relationship: RelationshipState,
@@ -0,0 +1,178 @@
+"""
+对话后处理的后台队列
+
+``PersonaOrchestrator.chat`` 生成回复后，好感度衰减、关系写回、批量评分（一次辅助模型调用）
+与画像合并都交给本队列异步执行，回复无需等待这些工作完成。
+
+- 同一 (用户, 群) 的待处理任务会合并为一个：多轮对话只做一次关系读写
+- 队列按挂起的 (用户, 群) 数限长，满时由调用方回退为同步执行
+- 任务失败按指数退避重试，超过上限后记录并丢弃
+- 工作协程在队列清空后自动退出，下次提交时再启动，不会在空闲时残留任务
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("persona.interaction_queue")
+
+
+@dataclass
+class InteractionJob:
+    """某 (用户, 群) 累积的待处理对话"""
+
+    user_id: str
+    group_id: str
+    first_at: datetime
+    last_at: datetime
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    attempts: int = 0
+    not_before: float = 0.0
+    # 关系更新与消息归档已完成，重试时只需重跑评分
+    recorded: bool = False
+
+    @property
+    def key(self) -> str:
+        return f"{self.user_id}:{self.group_id}"
+
+    def merge(self, other: "InteractionJob") -> None:
+        """将更晚提交的同键任务并入本任务"""
+        if self.recorded and other.messages:
+            # 已记录的部分不再重复记录，只需记录新并入的对话
+            self.recorded = False
+            self.first_at = other.first_at
+            self.last_at = other.last_at
+        self.messages.extend(other.messages)
+        if other.first_at < self.first_at:
+            self.first_at = other.first_at
+        if other.last_at > self.last_at:
+            self.last_at = other.last_at
+
+
+class InteractionQueue:
+    """按 (用户, 群) 合并的有界后台队列"""
+
+    def __init__(
+        self,
+        handler: Callable[[InteractionJob], Awaitable[Any]],
+        max_pending: int = 512,
+        max_retries: int = 2,
+        retry_delay: float = 2.0,
+    ):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._pending: "OrderedDict[str, InteractionJob]" = OrderedDict()
+        self._in_flight: Optional[InteractionJob] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._stats: Dict[str, int] = {
+            "submitted": 0,
+            "coalesced": 0,
+            "processed": 0,
+            "retried": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+        self._last_lag = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending) + (1 if self._in_flight is not None else 0)
+
+    def submit(self, job: InteractionJob) -> bool:
+        """提交任务；返回 False 表示队列已满，调用方应同步处理"""
+        existing = self._pending.get(job.key)
+        if existing is not None:
+            existing.merge(job)
+            self._stats["submitted"] += 1
+            self._stats["coalesced"] += 1
+            return True
+        if len(self._pending) >= self.max_pending:
+            self._stats["rejected"] += 1
+            return False
+        self._pending[job.key] = job
+        self._stats["submitted"] += 1
+        self._ensure_worker()
+        return True
+
+    def _ensure_worker(self) -> None:
+        self._idle.clear()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def _pop_ready(self) -> Optional[InteractionJob]:
+        now = time.monotonic()
+        for key, job in self._pending.items():
+            if job.not_before <= now:
+                del self._pending[key]
+                return job
+        return None
+
+    async def _run(self) -> None:
+        try:
+            while self._pending:
+                job = self._pop_ready()
+                if job is None:
+                    wait = min(j.not_before for j in self._pending.values()) - time.monotonic()
+                    await asyncio.sleep(max(0.0, wait))
+                    continue
+                self._in_flight = job
+                self._last_lag = time.monotonic() - job.enqueued_at
+                try:
+                    await self.handler(job)
+                    self._stats["processed"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self._on_failure(job, e)
+                finally:
+                    self._in_flight = None
+        finally:
+            self._idle.set()
+
+    def _on_failure(self, job: InteractionJob, error: Exception) -> None:
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._stats["failed"] += 1
+            logger.warning(f"后台互动任务失败，已放弃: key={job.key}, attempts={job.attempts}, error={error}")
+            return
+        self._stats["retried"] += 1
+        job.not_before = time.monotonic() + self.retry_delay * (2 ** (job.attempts - 1))
+        logger.info(f"后台互动任务失败，稍后重试: key={job.key}, attempts={job.attempts}, error={error}")
+        # 重试期间同键又有新任务：以旧任务为准合并，保持消息顺序
+        newer = self._pending.pop(job.key, None)
+        if newer is not None:
+            job.merge(newer)
+        self._pending[job.key] = job
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """等待队列清空（含重试），返回是否在超时前完成"""
+        if self._idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def lag_seconds(self) -> float:
+        """最早挂起任务已等待的秒数；队列为空时为最近一次出队时的等待时长"""
+        jobs = list(self._pending.values())
+        if self._in_flight is not None:
+            jobs.append(self._in_flight)
+        if not jobs:
+            return self._last_lag
+        return time.monotonic() - min(j.enqueued_at for j in jobs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = dict(self._stats)
+        stats["depth"] = self.depth
+        stats["lag_seconds"] = self.lag_seconds()
+        return stats
@@ -0,0 +1,92 @@
+"""
+LLM 请求准入控制
+
+每个模型层级一个 AdmissionPool：限制并发数，排队的请求按优先级（数值越小越优先）、
+同优先级按先来后到获得名额，并记录排队等待时间。
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, List, Tuple
+
+# 面向用户的对话回复
+PRIORITY_USER = 0
+# 后台任务：评分、观察提取、事件生成、分享消息等
+PRIORITY_BACKGROUND = 10
+
+
+class AdmissionPool:
+    """带优先级排队的并发池"""
+
+    def __init__(self, limit: int, wait_window: int = 100):
+        self.limit = max(1, limit)
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wait_ms: Deque[int] = deque(maxlen=wait_window)
+        self._admitted = 0
+        self._queued = 0
+        self._max_wait_ms = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int) -> None:
+        start = time.monotonic()
+        if self._in_flight < self.limit and not self.waiting:
+            self._in_flight += 1
+        else:
+            self._queued += 1
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._seq), fut))
+            try:
+                # 被唤醒时名额已由 release 转交
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    self.release()
+                raise
+        self._record_wait(int((time.monotonic() - start) * 1000))
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _record_wait(self, wait_ms: int) -> None:
+        self._admitted += 1
+        self._wait_ms.append(wait_ms)
+        self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+
+    def get_stats(self) -> Dict[str, int]:
+        waits = sorted(self._wait_ms)
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": self.waiting,
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "wait_p50_ms": waits[len(waits) // 2] if waits else 0,
+            "wait_max_ms": self._max_wait_ms,
+        }
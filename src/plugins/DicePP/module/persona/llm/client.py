@@ -1,13 +1,18 @@
 """
 LLM 客户端封装
 
-基于 AsyncOpenAI 的异步客户端，支持超时和错误处理
+基于 AsyncOpenAI 的异步客户端，支持超时和错误处理。
+chat / chat_with_tools 传入 on_text 时走流式接口，可见文本（已过滤思考过程）到达即回调。
 """
 import asyncio
 import logging
+from types import SimpleNamespace
 from typing import List, Dict, Optional, Any, Callable, Awaitable
 import time
 
+from .client_registry import get_client_registry
+from .streaming import TextCallback, ThinkTagFilter
+
 # 工具执行器类型别名
 ToolExecutor = Callable[[List[Dict]], Awaitable[List[Dict]]]
 
@@ -34,20 +39,17 @@ class LLMClient:
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
+        # 显式指定的 AsyncOpenAI 客户端；为 None 时从进程级注册表按 (base_url, api_key) 获取
         self._client = None
 
     def _get_client(self):
-        """延迟初始化客户端"""
-        if self._client is None:
-            try:
-                from openai import AsyncOpenAI
-                self._client = AsyncOpenAI(
-                    api_key=self.api_key,
-                    base_url=self.base_url,
-                )
-            except ImportError:
-                raise ImportError("openai package is required. Install with: pip install openai")
-        return self._client
+        """获取 AsyncOpenAI 客户端（同一 base_url + api_key 在进程内复用，连接池全局共享）"""
+        if self._client is not None:
+            return self._client
+        try:
+            return get_client_registry().get(self.base_url, self.api_key)
+        except ImportError:
+            raise ImportError("openai package is required. Install with: pip install openai")
 
     def _filter_think_tags(self, content: str) -> str:
         """过滤 <think>...</think> 思考过程标签"""
@@ -58,12 +60,78 @@ class LLMClient:
         content = content.strip()
         return content
 
+    async def _create_completion(
+        self,
+        client,
+        create_kwargs: Dict[str, Any],
+        timeout: float,
+        on_text: Optional[TextCallback] = None,
+    ):
+        """发起一次补全请求；on_text 为空时即普通请求，否则消费流式响应并拼装为同结构的响应对象"""
+        if on_text is None:
+            return await asyncio.wait_for(client.chat.completions.create(**create_kwargs), timeout=timeout)
+        return await asyncio.wait_for(self._consume_stream(client, create_kwargs, on_text), timeout=timeout)
+
+    async def _consume_stream(self, client, create_kwargs: Dict[str, Any], on_text: TextCallback):
+        start_time = time.monotonic()
+        stream = await client.chat.completions.create(
+            **create_kwargs, stream=True, stream_options={"include_usage": True}
+        )
+        think_filter = ThinkTagFilter()
+        parts: List[str] = []
+        tool_calls: Dict[int, Dict[str, Any]] = {}
+        usage = None
+        first_text_at: Optional[float] = None
+
+        async def emit(text: str) -> None:
+            nonlocal first_text_at
+            if not text:
+                return
+            if first_text_at is None:
+                first_text_at = time.monotonic()
+            parts.append(text)
+            await on_text(text)
+
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                await emit(think_filter.feed(delta.content))
+            for tc in delta.tool_calls or []:
+                entry = tool_calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                if tc.id:
+                    entry["id"] = tc.id
+                if tc.function is not None:
+                    entry["name"] += tc.function.name or ""
+                    entry["arguments"] += tc.function.arguments or ""
+        await emit(think_filter.flush())
+
+        message = SimpleNamespace(
+            content="".join(parts),
+            tool_calls=[
+                SimpleNamespace(
+                    id=tc["id"],
+                    function=SimpleNamespace(name=tc["name"], arguments=tc["arguments"]),
+                )
+                for _, tc in sorted(tool_calls.items())
+            ] or None,
+        )
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message)],
+            usage=usage,
+            first_text_latency=(first_text_at - start_time) if first_text_at is not None else None,
+        )
+
     async def chat(
         self,
         messages: List[Dict[str, str]],
         timeout: int = 30,
         max_retries: int = 3,
         temperature: Optional[float] = None,
+        on_text: Optional[TextCallback] = None,
     ) -> tuple[str, dict]:
         """
         发送聊天请求
@@ -72,6 +140,7 @@ class LLMClient:
             messages: 消息列表，格式 [{"role": "user", "content": "..."}, ...]
             timeout: 超时时间（秒）
             max_retries: 最大重试次数
+            on_text: 流式回调；给定时使用流式接口，已回调过文本后出错不再重试
             
         Returns:
             (回复文本, 元数据字典)
@@ -84,7 +153,13 @@ class LLMClient:
         
         last_error = None
         retry_delay = 2  # 初始重试延迟（秒）
-        
+        emitted = False
+
+        async def tracked_on_text(text: str) -> None:
+            nonlocal emitted
+            emitted = True
+            await on_text(text)
+
         for attempt in range(max_retries + 1):
             try:
                 start_time = time.monotonic()
@@ -96,9 +171,8 @@ class LLMClient:
                 if temperature is not None:
                     create_kwargs["temperature"] = temperature
 
-                response = await asyncio.wait_for(
-                    client.chat.completions.create(**create_kwargs),
-                    timeout=timeout
+                response = await self._create_completion(
+                    client, create_kwargs, timeout, tracked_on_text if on_text else None
                 )
                 
                 latency = time.monotonic() - start_time
@@ -115,11 +189,17 @@ class LLMClient:
                     "model": self.model,
                     "tokens_input": response.usage.prompt_tokens if response.usage else 0,
                     "tokens_output": response.usage.completion_tokens if response.usage else 0,
+                    "cached_tokens": self._get_cached_tokens(response),
                 }
+                if on_text is not None:
+                    metadata["first_text_latency"] = response.first_text_latency
                 
                 return content, metadata
 
             except asyncio.TimeoutError as e:
+                # 部分内容已发给用户，重试会导致重复
+                if emitted:
+                    raise
                 last_error = e
                 if attempt < max_retries:
                     await asyncio.sleep(retry_delay)
@@ -131,7 +211,7 @@ class LLMClient:
                 error_msg = str(e).lower()
                 
                 # 检查是否需要重试的错误
-                retryable = any(keyword in error_msg for keyword in _RETRYABLE_KEYWORDS)
+                retryable = not emitted and any(keyword in error_msg for keyword in _RETRYABLE_KEYWORDS)
                 
                 if retryable and attempt < max_retries:
                     await asyncio.sleep(retry_delay)
@@ -188,6 +268,7 @@ class LLMClient:
                         "tool_names": [tc.function.name],
                         "tokens_input": response.usage.prompt_tokens if response.usage else 0,
                         "tokens_output": response.usage.completion_tokens if response.usage else 0,
+                        "cached_tokens": self._get_cached_tokens(response),
                     }
                     return args, metadata
 
@@ -197,6 +278,7 @@ class LLMClient:
                     "model": self.model,
                     "tokens_input": response.usage.prompt_tokens if response.usage else 0,
                     "tokens_output": response.usage.completion_tokens if response.usage else 0,
+                    "cached_tokens": self._get_cached_tokens(response),
                 }
 
             except asyncio.TimeoutError as e:
@@ -227,6 +309,7 @@ class LLMClient:
         max_tool_rounds: int = 5,
         timeout: int = 60,
         temperature: Optional[float] = None,
+        on_text: Optional[TextCallback] = None,
     ) -> tuple[str, dict]:
         """
         支持多轮工具调用的对话（完整循环实现）
@@ -247,15 +330,27 @@ class LLMClient:
             max_tool_rounds: 最多多少轮工具调用
             timeout: 单次调用超时时间
             temperature: 采样温度
+            on_text: 流式回调；给定时每轮都使用流式接口，工具调用轮中的说明文字也会回调
 
         Returns:
-            (最终回复文本, 元数据字典)
+            (最终回复文本, 元数据字典)；流式时元数据的 preamble 为已回调给用户的工具调用轮说明文字
         """
         client = self._get_client()
         current_messages = list(messages)  # 复制一份，避免修改原列表
         total_tool_calls = 0
         all_tool_names: List[str] = []
         retry_count = 0  # 独立重试计数器，避免轮次过多时退避时间过长
+        emitted = False
+        first_text_latency: Optional[float] = None
+        start_time = time.monotonic()
+        preamble: List[str] = []  # 流式时工具调用轮中已发给用户的说明文字
+
+        async def tracked_on_text(text: str) -> None:
+            nonlocal emitted, first_text_latency
+            if not emitted:
+                emitted = True
+                first_text_latency = time.monotonic() - start_time
+            await on_text(text)
 
         for round_num in range(max_tool_rounds):
             try:
@@ -268,9 +363,8 @@ class LLMClient:
                 if temperature is not None:
                     create_kwargs["temperature"] = temperature
 
-                response = await asyncio.wait_for(
-                    client.chat.completions.create(**create_kwargs),
-                    timeout=timeout
+                response = await self._create_completion(
+                    client, create_kwargs, timeout, tracked_on_text if on_text else None
                 )
 
                 message = response.choices[0].message
@@ -299,11 +393,18 @@ class LLMClient:
                         # Phase 3: 缓存数据收集
                         "cached_tokens": self._get_cached_tokens(response),
                     }
+                    if on_text is not None:
+                        metadata["first_text_latency"] = first_text_latency
+                        metadata["preamble"] = "\n".join(preamble)
 
                     return content, metadata
 
                 # 有工具调用，需要执行工具并继续对话
                 total_tool_calls += len(message.tool_calls)
+                if on_text is not None and message.content:
+                    text = self._filter_think_tags(message.content).strip()
+                    if text:
+                        preamble.append(text)
 
                 # 将 assistant 的消息（含 tool_calls）加入上下文
                 current_messages.append({
@@ -373,8 +474,8 @@ class LLMClient:
                 raise
             except Exception as e:
                 error_msg = str(e).lower()
-                # 检查是否需要重试的错误
-                retryable = any(keyword in error_msg for keyword in _RETRYABLE_KEYWORDS)
+                # 检查是否需要重试的错误（部分内容已发给用户时不重试，避免重复）
+                retryable = not emitted and any(keyword in error_msg for keyword in _RETRYABLE_KEYWORDS)
 
                 if not retryable or retry_count >= 3:  # 最多重试 3 次
                     raise
@@ -395,22 +496,18 @@ class LLMClient:
         }
 
     def _get_cached_tokens(self, response) -> int:
-        """提取缓存 token 数（不同厂商格式不同）
-
-        TODO: 当前仅用于日志，后续可持久化到 persona_llm_cache_stats 表
-        用于统计缓存命中率、分析模型效率、计算成本节省
-        """
+        """提取缓存 token 数（不同厂商格式不同），LLMRouter 据此统计各层级与各角色前缀的缓存命中率"""
         if not response.usage:
             return 0
 
+        cached = None
         # OpenAI 格式 (GPT-4o+)
-        if hasattr(response.usage, 'prompt_tokens_details'):
-            details = response.usage.prompt_tokens_details
-            if details and hasattr(details, 'cached_tokens'):
-                return details.cached_tokens
+        details = getattr(response.usage, 'prompt_tokens_details', None)
+        if details is not None:
+            cached = getattr(details, 'cached_tokens', None)
 
         # Anthropic 格式
-        if hasattr(response.usage, 'cache_read_input_tokens'):
-            return response.usage.cache_read_input_tokens
+        if cached is None:
+            cached = getattr(response.usage, 'cache_read_input_tokens', None)
 
-        return 0
+        return cached if isinstance(cached, int) else 0
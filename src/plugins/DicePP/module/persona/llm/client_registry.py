@@ -0,0 +1,158 @@
+"""
+LLM 客户端注册表
+
+进程内所有 AsyncOpenAI 客户端按 (base_url, api_key) 复用，并共享同一个 httpx 连接池：
+主/辅助模型与用户自定义 Key 访问同一服务时复用已建立的 TLS 连接（keep-alive），安装 h2 时启用 HTTP/2。
+长时间未使用的客户端（多为用户自定义 Key）会被移除；关闭时统一释放连接池。
+
+连接池绑定创建它的事件循环；在新的事件循环中使用时会重建（测试中每个用例一个事件循环）。
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger("persona.llm")
+
+# 连接池上限：同时进行的 LLM 请求数很少，但流式请求会长时间占用连接
+POOL_MAX_CONNECTIONS = 32
+POOL_MAX_KEEPALIVE = 16
+POOL_KEEPALIVE_EXPIRY = 120.0
+# 客户端闲置超过该时间（秒）后移除
+CLIENT_IDLE_TTL = 1800.0
+CLIENT_MAX_ENTRIES = 64
+# 闲置检查的最小间隔（秒）
+EVICT_CHECK_INTERVAL = 60.0
+
+ClientKey = Tuple[str, str]
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class _Entry:
+    client: Any
+    last_used: float
+
+
+class ClientRegistry:
+    """按 (base_url, api_key) 复用 AsyncOpenAI 客户端，所有客户端共享一个 httpx 连接池"""
+
+    def __init__(
+        self,
+        max_connections: int = POOL_MAX_CONNECTIONS,
+        max_keepalive: int = POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = POOL_KEEPALIVE_EXPIRY,
+        idle_ttl: float = CLIENT_IDLE_TTL,
+        max_entries: int = CLIENT_MAX_ENTRIES,
+        clock=time.monotonic,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._http_client: Optional[Any] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: "OrderedDict[ClientKey, _Entry]" = OrderedDict()
+        self._last_evict_check = clock()
+        self._stats: Dict[str, int] = {"created": 0, "reused": 0, "evicted": 0, "pool_resets": 0}
+
+    def _new_http_client(self):
+        import httpx
+        from openai import DefaultAsyncHttpxClient
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return DefaultAsyncHttpxClient(limits=limits, http2=http2_available())
+
+    def _ensure_pool(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self._http_client is not None and loop is self._loop:
+            return
+        if self._http_client is not None:
+            # 旧连接池属于另一个事件循环，无法在此关闭，直接丢弃
+            self._stats["pool_resets"] += 1
+            self._clients.clear()
+        self._http_client = self._new_http_client()
+        self._loop = loop
+
+    def get(self, base_url: str, api_key: str):
+        """返回 (base_url, api_key) 对应的 AsyncOpenAI 客户端"""
+        self._ensure_pool()
+        now = self._clock()
+        if now - self._last_evict_check >= EVICT_CHECK_INTERVAL:
+            self.evict_idle(now)
+
+        key = (base_url, api_key)
+        entry = self._clients.get(key)
+        if entry is not None:
+            entry.last_used = now
+            self._clients.move_to_end(key)
+            self._stats["reused"] += 1
+            return entry.client
+
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self._http_client)
+        self._clients[key] = _Entry(client, now)
+        self._stats["created"] += 1
+        while len(self._clients) > self.max_entries:
+            self._clients.popitem(last=False)
+            self._stats["evicted"] += 1
+        return client
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """移除闲置超时的客户端；连接池共享，移除客户端不会断开其他客户端的连接"""
+        now = self._clock() if now is None else now
+        self._last_evict_check = now
+        stale = [key for key, entry in self._clients.items() if now - entry.last_used > self.idle_ttl]
+        for key in stale:
+            del self._clients[key]
+        self._stats["evicted"] += len(stale)
+        return len(stale)
+
+    async def aclose(self) -> None:
+        """关闭共享连接池；之后再次 get 会重建"""
+        self._clients.clear()
+        http_client, self._http_client = self._http_client, None
+        loop, self._loop = self._loop, None
+        if http_client is None:
+            return
+        try:
+            if loop is None or loop is asyncio.get_running_loop():
+                await http_client.aclose()
+        except Exception as e:
+            logger.warning(f"关闭 LLM 连接池失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "clients": len(self._clients),
+            "http2": http2_available(),
+        }
+
+
+_registry: Optional[ClientRegistry] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    """进程级默认注册表"""
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry()
+    return _registry
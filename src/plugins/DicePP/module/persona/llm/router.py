@@ -2,18 +2,26 @@
 LLM 路由器
 
 多模型路由 + 并发控制 + 配额管理
+
+并发控制按层级分池：主模型与辅助模型各有独立的 AdmissionPool，后台辅助任务的突发不会阻塞对话回复；
+池内按优先级排队（面向用户的请求优先），并统计排队等待时间。
+完全相同且仍在进行中的辅助模型请求（如同一分享事件对多个目标的相同 prompt）合并为一次调用。
 """
 from __future__ import annotations
 
 import asyncio
-from collections import deque
+from collections import OrderedDict, deque
+import hashlib
 import json
-from typing import List, Dict, Any, Optional, Callable, Awaitable, TYPE_CHECKING
+from typing import List, Dict, Any, Optional, Callable, Awaitable, TypeVar, TYPE_CHECKING
 import time
 import uuid
 import logging
 
+from .admission import AdmissionPool, PRIORITY_BACKGROUND, PRIORITY_USER
 from .client import LLMClient
+from .client_registry import get_client_registry
+from .streaming import TextCallback
 from ..data.models import ModelTier, UserLLMConfig
 
 if TYPE_CHECKING:
@@ -21,6 +29,11 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("persona.llm")
 
+T = TypeVar("T")
+
+# 按静态前缀指纹统计缓存命中率时保留的指纹数（角色热重载会产生新指纹）
+PREFIX_STATS_MAX = 16
+
 
 class QuotaExceeded(Exception):
     """配额超限异常"""
@@ -46,6 +59,7 @@ class LLMRouter:
         config: Optional[PersonaConfig] = None,
         trace_enabled: bool = False,
         trace_max_age_days: int = 7,
+        auxiliary_max_concurrent: Optional[int] = None,
     ):
         """
         初始化 LLM 路由器
@@ -57,7 +71,7 @@ class LLMRouter:
             auxiliary_api_key: 辅助模型 API Key（留空复用主模型）
             auxiliary_base_url: 辅助模型 Base URL
             auxiliary_model: 辅助模型名称
-            max_concurrent: 最大并发数
+            max_concurrent: 主模型最大并发数
             timeout: 默认超时时间
             daily_limit: 每日配额限制
             quota_check_enabled: 是否启用配额检查
@@ -65,6 +79,7 @@ class LLMRouter:
             config: 配置对象（用于白名单检查）
             trace_enabled: 是否启用 trace 记录
             trace_max_age_days: trace 保留天数
+            auxiliary_max_concurrent: 辅助模型最大并发数（None 时与主模型相同）
         """
         # 主模型客户端
         self.primary_client = LLMClient(
@@ -84,8 +99,13 @@ class LLMRouter:
             model=aux_model,
         )
 
-        # 并发控制
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # 并发控制：按层级分池
+        self._pools: Dict[str, AdmissionPool] = {
+            "primary": AdmissionPool(max_concurrent),
+            "auxiliary": AdmissionPool(auxiliary_max_concurrent or max_concurrent),
+        }
+        # 进行中的可合并请求：请求指纹 -> 共享任务
+        self._inflight: Dict[str, asyncio.Future] = {}
         self.timeout = timeout
 
         # 配额控制（可在初始化后设置）
@@ -96,15 +116,22 @@ class LLMRouter:
 
         # 统计
         self.stats = {
-            "primary": {"requests": 0, "errors": 0},
-            "auxiliary": {"requests": 0, "errors": 0},
+            "primary": {"requests": 0, "errors": 0, "coalesced": 0, "streamed": 0, "prompt_tokens": 0, "cached_tokens": 0},
+            "auxiliary": {"requests": 0, "errors": 0, "coalesced": 0, "streamed": 0, "prompt_tokens": 0, "cached_tokens": 0},
         }
+        # 静态前缀指纹 -> 提示词缓存用量
+        self._prefix_stats: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
 
         # Phase 7a: sliding-window latency stats per tier (maxlen=100)
         self._latency_window: Dict[str, deque] = {
             "primary": deque(maxlen=100),
             "auxiliary": deque(maxlen=100),
         }
+        # 流式请求的首段文本耗时（毫秒）
+        self._first_text_window: Dict[str, deque] = {
+            "primary": deque(maxlen=100),
+            "auxiliary": deque(maxlen=100),
+        }
         self.trace_enabled = trace_enabled
         self.trace_max_age_days = trace_max_age_days
         self._trace_tasks: set[asyncio.Task] = set()
@@ -262,6 +289,83 @@ class LLMRouter:
 
         return tier_name, client, user_config, actual_timeout
 
+    @staticmethod
+    def _resolve_priority(model_tier: ModelTier, user_id: Optional[str], priority: Optional[int]) -> int:
+        if priority is not None:
+            return priority
+        return PRIORITY_USER if model_tier == ModelTier.PRIMARY and user_id else PRIORITY_BACKGROUND
+
+    @staticmethod
+    def _coalesce_key(kind: str, client: LLMClient, **request: Any) -> str:
+        """请求指纹：客户端 + 完整请求参数"""
+        raw = json.dumps(
+            [kind, client.base_url, client.model, client.api_key, request],
+            ensure_ascii=False, sort_keys=True, default=str,
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _admit(
+        self,
+        tier_name: str,
+        priority: int,
+        work: Callable[[], Awaitable[T]],
+        coalesce_key: Optional[str] = None,
+    ) -> T:
+        """在层级并发池中执行请求；给定 coalesce_key 时与进行中的相同请求共享结果"""
+        if coalesce_key is not None:
+            shared = self._inflight.get(coalesce_key)
+            if shared is not None:
+                self.stats[tier_name]["coalesced"] += 1
+                return await asyncio.shield(shared)
+
+        async def _run() -> T:
+            async with self._pools[tier_name].slot(priority):
+                self.stats[tier_name]["requests"] += 1
+                return await work()
+
+        if coalesce_key is None:
+            return await _run()
+
+        task = asyncio.ensure_future(_run())
+        self._inflight[coalesce_key] = task
+
+        def _done(t: asyncio.Future) -> None:
+            if self._inflight.get(coalesce_key) is t:
+                del self._inflight[coalesce_key]
+            # 所有调用方都已取消时避免 "exception was never retrieved"
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(_done)
+        # shield：单个调用方被取消不影响其他共享同一结果的调用方
+        return await asyncio.shield(task)
+
+    def _record_cache_usage(self, tier_name: str, metadata: Dict[str, Any], prefix_fingerprint: Optional[str]) -> None:
+        """累计提示词缓存用量：按层级，以及按调用方提供的静态前缀指纹"""
+        prompt_tokens = metadata.get("tokens_input", 0)
+        cached_tokens = metadata.get("cached_tokens", 0)
+        if not isinstance(prompt_tokens, int) or not isinstance(cached_tokens, int):
+            return
+        tier_stats = self.stats[tier_name]
+        tier_stats["prompt_tokens"] += prompt_tokens
+        tier_stats["cached_tokens"] += cached_tokens
+        if not prefix_fingerprint:
+            return
+        entry = self._prefix_stats.get(prefix_fingerprint)
+        if entry is None:
+            entry = self._prefix_stats[prefix_fingerprint] = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+            while len(self._prefix_stats) > PREFIX_STATS_MAX:
+                self._prefix_stats.popitem(last=False)
+        else:
+            self._prefix_stats.move_to_end(prefix_fingerprint)
+        entry["requests"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["cached_tokens"] += cached_tokens
+
+    @staticmethod
+    def _cache_hit_ratio(usage: Dict[str, int]) -> float:
+        return usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0.0
+
     async def _execute_and_trace(
         self,
         client: LLMClient,
@@ -275,6 +379,7 @@ class LLMRouter:
         temperature: Optional[float],
         model_tier: ModelTier,
         is_tools: bool = False,
+        prefix_fingerprint: Optional[str] = None,
     ) -> tuple[str, dict]:
         """执行 LLM 调用并统一记录 trace"""
         status = "ok"
@@ -291,6 +396,10 @@ class LLMRouter:
             tokens_in = metadata.get("tokens_input", 0)
             tokens_out = metadata.get("tokens_output", 0)
             latency = time.monotonic() - start_time
+            self._record_cache_usage(tier_name, metadata, prefix_fingerprint)
+            if metadata.get("first_text_latency") is not None:
+                self.stats[tier_name]["streamed"] += 1
+                self._first_text_window[tier_name].append(int(metadata["first_text_latency"] * 1000))
 
             # Phase 4: 增加用量计数（仅主模型）
             if model_tier == ModelTier.PRIMARY and user_id:
@@ -359,6 +468,9 @@ class LLMRouter:
         temperature: Optional[float] = None,
         user_id: Optional[str] = None,
         group_id: Optional[str] = None,
+        priority: Optional[int] = None,
+        prefix_fingerprint: Optional[str] = None,
+        on_text: Optional[TextCallback] = None,
     ) -> str:
         """
         生成回复
@@ -370,6 +482,9 @@ class LLMRouter:
             temperature: 采样温度；None 时使用服务端默认
             user_id: 用户ID（用于配额检查）
             group_id: 群ID（用于配额检查）
+            priority: 排队优先级，数值越小越优先；None 时主模型且带 user_id 为 PRIORITY_USER，否则为 PRIORITY_BACKGROUND
+            prefix_fingerprint: 消息静态前缀指纹（见 ContextBuilder.prefix_fingerprint），用于按角色统计缓存命中率
+            on_text: 流式回调，给定时以流式接口请求，可见文本到达即回调（此时不合并相同请求）
 
         Returns:
             回复文本
@@ -382,16 +497,17 @@ class LLMRouter:
         )
 
         session_id = f"{user_id or ''}:{group_id or ''}:{uuid.uuid4().hex[:16]}"
+        stream_kwargs = {"on_text": on_text} if on_text is not None else {}
 
-        async with self.semaphore:
-            self.stats[tier_name]["requests"] += 1
-            content, _ = await self._execute_and_trace(
+        def _work() -> Awaitable[tuple[str, dict]]:
+            return self._execute_and_trace(
                 client,
                 tier_name,
                 client.chat(
                     messages=messages,
                     timeout=actual_timeout,
                     temperature=temperature,
+                    **stream_kwargs,
                 ),
                 session_id=session_id,
                 user_id=user_id,
@@ -400,8 +516,16 @@ class LLMRouter:
                 temperature=temperature,
                 model_tier=model_tier,
                 is_tools=False,
+                prefix_fingerprint=prefix_fingerprint,
             )
-            return content
+
+        coalesce_key = None
+        if model_tier == ModelTier.AUXILIARY and on_text is None:
+            coalesce_key = self._coalesce_key("chat", client, messages=messages, temperature=temperature)
+        content, _ = await self._admit(
+            tier_name, self._resolve_priority(model_tier, user_id, priority), _work, coalesce_key
+        )
+        return content
 
     async def generate_with_forced_tool(
         self,
@@ -413,6 +537,8 @@ class LLMRouter:
         temperature: Optional[float] = None,
         user_id: Optional[str] = None,
         group_id: Optional[str] = None,
+        priority: Optional[int] = None,
+        prefix_fingerprint: Optional[str] = None,
     ) -> tuple[str, dict]:
         """
         强制调用指定工具，只发一轮请求。
@@ -423,9 +549,8 @@ class LLMRouter:
 
         session_id = f"{user_id or ''}:{group_id or ''}:{uuid.uuid4().hex[:16]}"
 
-        async with self.semaphore:
-            self.stats[tier_name]["requests"] += 1
-            content, metadata = await self._execute_and_trace(
+        def _work() -> Awaitable[tuple[str, dict]]:
+            return self._execute_and_trace(
                 client,
                 tier_name,
                 client.generate_with_forced_tool(
@@ -442,8 +567,19 @@ class LLMRouter:
                 temperature=temperature,
                 model_tier=model_tier,
                 is_tools=True,
+                prefix_fingerprint=prefix_fingerprint,
             )
-            return content, metadata
+
+        coalesce_key = None
+        if model_tier == ModelTier.AUXILIARY:
+            coalesce_key = self._coalesce_key(
+                "forced_tool", client, messages=messages, tools=tools, tool_name=tool_name, temperature=temperature
+            )
+        content, metadata = await self._admit(
+            tier_name, self._resolve_priority(model_tier, user_id, priority), _work, coalesce_key
+        )
+        # 合并的调用方共享同一份元数据，返回副本避免互相修改
+        return content, dict(metadata)
 
     # ── Phase 3: 工具调用
     async def generate_with_tools(
@@ -459,6 +595,9 @@ class LLMRouter:
         max_tool_rounds: int = 5,
         user_id: Optional[str] = None,
         group_id: Optional[str] = None,
+        priority: Optional[int] = None,
+        prefix_fingerprint: Optional[str] = None,
+        on_text: Optional[TextCallback] = None,
     ) -> tuple[str, dict]:
         """
         生成回复，支持工具调用（完整循环）
@@ -473,6 +612,9 @@ class LLMRouter:
             max_tool_rounds: 最多多少轮工具调用
             user_id: 用户ID（用于配额检查）
             group_id: 群ID（用于配额检查）
+            priority: 排队优先级，规则同 generate
+            prefix_fingerprint: 消息静态前缀指纹，规则同 generate
+            on_text: 流式回调，规则同 generate
 
         Returns:
             (回复文本, 元数据字典)
@@ -485,10 +627,10 @@ class LLMRouter:
         )
 
         session_id = f"{user_id or ''}:{group_id or ''}:{uuid.uuid4().hex[:16]}"
+        stream_kwargs = {"on_text": on_text} if on_text is not None else {}
 
-        async with self.semaphore:
-            self.stats[tier_name]["requests"] += 1
-            content, metadata = await self._execute_and_trace(
+        def _work() -> Awaitable[tuple[str, dict]]:
+            return self._execute_and_trace(
                 client,
                 tier_name,
                 client.chat_with_tools(
@@ -498,6 +640,7 @@ class LLMRouter:
                     max_tool_rounds=max_tool_rounds,
                     timeout=actual_timeout,
                     temperature=temperature,
+                    **stream_kwargs,
                 ),
                 session_id=session_id,
                 user_id=user_id,
@@ -506,15 +649,32 @@ class LLMRouter:
                 temperature=temperature,
                 model_tier=model_tier,
                 is_tools=True,
+                prefix_fingerprint=prefix_fingerprint,
             )
-            return content, metadata
+
+        # 工具执行有副作用，不合并
+        return await self._admit(tier_name, self._resolve_priority(model_tier, user_id, priority), _work)
+
+    async def aclose(self) -> None:
+        """关闭共享的 LLM 连接池（进程退出前调用）"""
+        await get_client_registry().aclose()
 
     def get_stats(self) -> Dict[str, Any]:
-        """获取统计信息"""
-        return {
-            "primary": self.stats["primary"].copy(),
-            "auxiliary": self.stats["auxiliary"].copy(),
+        """获取统计信息（含各层级并发池的排队情况、提示词缓存命中率与各静态前缀的命中率）"""
+        stats: Dict[str, Any] = {
+            tier: {
+                **self.stats[tier],
+                "cache_hit_ratio": self._cache_hit_ratio(self.stats[tier]),
+                "queue": self._pools[tier].get_stats(),
+            }
+            for tier in ("primary", "auxiliary")
         }
+        stats["clients"] = get_client_registry().get_stats()
+        stats["prefixes"] = {
+            fingerprint: {**usage, "cache_hit_ratio": self._cache_hit_ratio(usage)}
+            for fingerprint, usage in self._prefix_stats.items()
+        }
+        return stats
 
     _RATE_LIMIT_KEYWORDS = ("rate limit", "rate_limit_error", "ratelimitreached", "insufficient_quota", "429")
     _AUTH_KEYWORDS = ("authentication", "unauthorized", "401", "403")
@@ -535,7 +695,14 @@ class LLMRouter:
         return "unknown"
 
     def get_latency_percentiles(self, tier: str = "primary") -> Dict[str, float]:
-        window = self._latency_window.get(tier)
+        return self._percentiles(self._latency_window.get(tier))
+
+    def get_first_text_percentiles(self, tier: str = "primary") -> Dict[str, float]:
+        """流式请求从发出到首段可见文本的耗时分位数（毫秒）"""
+        return self._percentiles(self._first_text_window.get(tier))
+
+    @staticmethod
+    def _percentiles(window: Optional[deque]) -> Dict[str, float]:
         if not window:
             return {"p50": 0.0, "p90": 0.0, "p99": 0.0}
         sorted_vals = sorted(window)
@@ -0,0 +1,215 @@
+"""
+流式回复
+
+- ThinkTagFilter: 增量过滤 <think>...</think>，标签可以跨分片
+- SentenceSegmenter: 把可见文本切成完整的句子/段落
+- PacedSender: 按最小间隔发送分段，间隔内到达的分段合并为一条，避免触发 QQ 发送频率限制
+- StreamingReply: 组合以上两者，作为 orchestrator.chat 的 on_text 回调
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger("persona.llm")
+
+# 流式文本回调：参数为新到达的可见文本
+TextCallback = Callable[[str], Awaitable[None]]
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# 句末标点；紧随其后的右引号/右括号归入同一句
+SENTENCE_ENDINGS = frozenset("。！？!?…~～\n")
+CLOSING_PUNCTUATION = frozenset("”’」』）)】》\"'")
+
+
+def _partial_tag_suffix(text: str, tag: str) -> int:
+    """text 末尾可能是 tag 前缀的最长长度"""
+    for k in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:k]):
+            return k
+    return 0
+
+
+class ThinkTagFilter:
+    """增量过滤思考过程；未闭合的 <think> 到流结束时整体丢弃"""
+
+    def __init__(self):
+        self._inside = False
+        self._pending = ""
+
+    def feed(self, text: str) -> str:
+        buf = self._pending + text
+        self._pending = ""
+        out: List[str] = []
+        while buf:
+            tag = THINK_CLOSE if self._inside else THINK_OPEN
+            idx = buf.find(tag)
+            if idx < 0:
+                keep = _partial_tag_suffix(buf, tag)
+                if not self._inside:
+                    out.append(buf[:len(buf) - keep])
+                self._pending = buf[len(buf) - keep:] if keep else ""
+                break
+            if not self._inside:
+                out.append(buf[:idx])
+            buf = buf[idx + len(tag):]
+            self._inside = not self._inside
+        return "".join(out)
+
+    def flush(self) -> str:
+        rest = "" if self._inside else self._pending
+        self._inside = False
+        self._pending = ""
+        return rest
+
+
+class SentenceSegmenter:
+    """按句末标点切分；不足 min_chars 的句子与后文合并"""
+
+    def __init__(self, min_chars: int = 12):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        segments: List[str] = []
+        start = 0
+        i = 0
+        n = len(self._buffer)
+        while i < n:
+            if self._buffer[i] in SENTENCE_ENDINGS:
+                end = i + 1
+                while end < n and (self._buffer[end] in SENTENCE_ENDINGS or self._buffer[end] in CLOSING_PUNCTUATION):
+                    end += 1
+                # 标点在缓冲末尾时，后续分片可能还有右引号或连续标点，等下一片再判断
+                if end == n:
+                    break
+                segment = self._buffer[start:end].strip()
+                if len(segment) >= self.min_chars:
+                    segments.append(segment)
+                    start = end
+                i = end
+            else:
+                i += 1
+        self._buffer = self._buffer[start:]
+        return segments
+
+    def flush(self) -> str:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest
+
+
+class PacedSender:
+    """后台按最小间隔发送分段；发送期间到达的分段合并为下一条"""
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        min_gap: float = 1.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._send = send
+        self.min_gap = min_gap
+        self._clock = clock
+        self._buffer: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._last_sent: Optional[float] = None
+        self.sent = 0
+        self.first_sent_at: Optional[float] = None
+
+    def put(self, segment: str) -> None:
+        self._buffer.append(segment)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+
+    async def _wait_gap(self) -> None:
+        if self._last_sent is None:
+            return
+        wait = self._last_sent + self.min_gap - self._clock()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _drain(self) -> None:
+        while self._buffer:
+            await self._wait_gap()
+            text = "\n".join(self._buffer)
+            self._buffer.clear()
+            try:
+                await self._send(text)
+            except Exception as e:
+                logger.warning(f"流式分段发送失败: {e}")
+            self._last_sent = self._clock()
+            if self.first_sent_at is None:
+                self.first_sent_at = self._last_sent
+            self.sent += 1
+
+    async def finish(self, tail: str = "") -> str:
+        """等待已排队的分段发完，返回尚未发送的剩余文本（已间隔 min_gap，可直接作为最后一条发送）"""
+        if self._task is not None:
+            await self._task
+        rest = "\n".join([*self._buffer, tail] if tail else self._buffer)
+        self._buffer.clear()
+        if rest:
+            await self._wait_gap()
+        return rest
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class StreamingReply:
+    """一次对话回复的流式发送：on_text 接收可见文本，完整句子交给 PacedSender 陆续发出"""
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        min_gap: float = 1.5,
+        min_segment_chars: int = 12,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._clock = clock
+        self._segmenter = SentenceSegmenter(min_segment_chars)
+        self._sender = PacedSender(send, min_gap, clock)
+        self.started_at = clock()
+        self.finished_at: Optional[float] = None
+        self.streamed = False
+
+    async def on_text(self, text: str) -> None:
+        self.streamed = True
+        for segment in self._segmenter.feed(text):
+            self._sender.put(segment)
+
+    async def finish(self, response: Optional[str], failed: bool = False) -> Optional[str]:
+        """
+        结束流式发送，返回还需作为最后一条发送的文本。
+        没有收到过流式文本（首条消息、拒绝、去重、出错等）时原样返回 response。
+        failed 表示流式中途出错、response 为错误提示：此时在剩余文本之后补上 response，而不是丢弃它。
+        """
+        try:
+            if not self.streamed:
+                return response
+            rest = await self._sender.finish(self._segmenter.flush())
+            if failed and response:
+                return f"{rest}\n{response}" if rest else response
+            return rest
+        finally:
+            self.finished_at = self._clock()
+
+    @property
+    def segments_sent(self) -> int:
+        return self._sender.sent
+
+    @property
+    def first_message_latency(self) -> Optional[float]:
+        """从开始到首条消息发出的秒数；没有提前发出的分段时以 finish 时刻计"""
+        first = self._sender.first_sent_at if self._sender.first_sent_at is not None else self.finished_at
+        return first - self.started_at if first is not None else None
+
+    def cancel(self) -> None:
+        self._sender.cancel()
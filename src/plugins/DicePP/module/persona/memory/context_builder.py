@@ -1,8 +1,14 @@
 """
 上下文构建器
 
-组装四层记忆到 LLM 消息列表
+组装四层记忆到 LLM 消息列表。
+
+system 内容按变化频率从低到高排列，使提供商侧的提示词缓存能命中尽可能长的前缀：
+1. 静态前缀：角色设定、名字、固定指令、示例对话（同一角色卡不变，按角色缓存并计算指纹）
+2. 半静态：今日事件/日记、关系描述、用户档案（按天或按用户变化）
+3. 易变：按本条消息命中的世界书、当前时间、近期对话（每轮变化）
 """
+import hashlib
 import logging
 from typing import List, Dict, Optional, Any, Tuple
 
@@ -29,6 +35,22 @@ class ContextBuilder:
         self.max_short_term_chars = max_short_term_chars
         self.timezone = timezone
         self.lore_token_budget = lore_token_budget
+        self._static_prefix: Optional[str] = None
+        self._prefix_fingerprint: Optional[str] = None
+
+    @property
+    def static_prefix(self) -> str:
+        """静态前缀：只取决于角色卡，首次使用时生成"""
+        if self._static_prefix is None:
+            self._static_prefix = self._build_static_prefix()
+        return self._static_prefix
+
+    @property
+    def prefix_fingerprint(self) -> str:
+        """静态前缀指纹，用于按角色统计提示词缓存命中率"""
+        if self._prefix_fingerprint is None:
+            self._prefix_fingerprint = hashlib.sha256(self.static_prefix.encode("utf-8")).hexdigest()[:16]
+        return self._prefix_fingerprint
 
     def build(
         self,
@@ -37,6 +59,7 @@ class ContextBuilder:
         diary_context: str = "",
         current_message: str = "",
         warmth_label: str = "友好",
+        lore_sections: Optional[Dict[str, List[str]]] = None,
     ) -> List[Dict[str, str]]:
         messages = []
 
@@ -44,15 +67,13 @@ class ContextBuilder:
         system_parts = []
 
         # 世界书扫描（按位置分类，为后续 LoreEntry.position 扩展留接口）
-        lore_sections = self._build_lore_text(short_term_history, current_message)
+        if lore_sections is None:
+            lore_sections = self._build_lore_text(short_term_history, current_message)
 
         system_prompt = self._build_system_prompt(user_profile, diary_context, warmth_label, lore_sections)
         system_parts.append(system_prompt)
 
-        if self.character.mes_example:
-            example = self.character.format_mes_example()
-            system_parts.append(f"示例对话:\n{example}")
-
+        # 近期对话变化最频繁，放在最后
         short_term_text = self._format_short_term(short_term_history)
         if short_term_text:
             system_parts.append(f"近期对话:\n{short_term_text}")
@@ -129,29 +150,8 @@ class ContextBuilder:
 
         return sections
 
-    def _build_system_prompt(
-        self,
-        user_profile: Optional[UserProfile],
-        diary_context: str,
-        warmth_label: str = "友好",
-        lore_sections: Optional[Dict[str, List[str]]] = None,
-    ) -> str:
+    def _build_static_prefix(self) -> str:
         parts = []
-        lore_sections = lore_sections or {}
-
-        # before_char 位置的世界书放在角色设定之前
-        before_lore = lore_sections.get("before_char", [])
-        if before_lore:
-            bullets = "\n".join([f"- {c}" for c in before_lore])
-            parts.append(f"【世界书】\n{bullets}")
-
-        # 添加当前时间（使用中文星期）
-        now = persona_wall_now(self.timezone)
-        weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
-        weekday = weekdays[now.weekday()]
-        time_str = now.strftime(f"%Y年%m月%d日 %H:%M {weekday}")
-        parts.append(f"当前时间: {time_str}")
-
         if self.character.system_prompt:
             parts.append(self.character.system_prompt)
         else:
@@ -163,22 +163,46 @@ class ContextBuilder:
                 parts.append(f"场景: {self.character.scenario}")
 
         parts.append(f"你的名字是: {self.character.name}")
+        parts.append("请记住用户说过的话，在适当时候提及。不承认自己是AI。")
+
+        if self.character.mes_example:
+            example = self.character.format_mes_example()
+            parts.append(f"示例对话:\n{example}")
+
+        return "\n\n".join(parts)
+
+    def _build_system_prompt(
+        self,
+        user_profile: Optional[UserProfile],
+        diary_context: str,
+        warmth_label: str = "友好",
+        lore_sections: Optional[Dict[str, List[str]]] = None,
+    ) -> str:
+        parts = [self.static_prefix]
+        lore_sections = lore_sections or {}
+
+        # 半静态：全体用户共享的今日事件在前，单个用户的关系与档案在后
+        if diary_context:
+            parts.append(f"【今天发生的事】\n{diary_context}")
+
         parts.append(f"当前你和用户的关系: {warmth_label}")
 
         if user_profile and user_profile.facts:
             facts_text = "\n".join([f"- {k}: {v}" for k, v in user_profile.facts.items()])
             parts.append(f"【你对用户的了解】\n{facts_text}")
 
-        # after_char 位置的世界书（当前默认位置）放在用户了解之后
-        after_lore = lore_sections.get("after_char", [])
-        if after_lore:
-            bullets = "\n".join([f"- {c}" for c in after_lore])
+        # 易变：世界书按本条消息命中，before_char 条目排在 after_char 之前
+        lore = lore_sections.get("before_char", []) + lore_sections.get("after_char", [])
+        if lore:
+            bullets = "\n".join([f"- {c}" for c in lore])
             parts.append(f"【世界书】\n{bullets}")
 
-        if diary_context:
-            parts.append(f"【今天发生的事】\n{diary_context}")
-
-        parts.append("请记住用户说过的话，在适当时候提及。不承认自己是AI。")
+        # 添加当前时间（使用中文星期）
+        now = persona_wall_now(self.timezone)
+        weekdays = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+        weekday = weekdays[now.weekday()]
+        time_str = now.strftime(f"%Y年%m月%d日 %H:%M {weekday}")
+        parts.append(f"当前时间: {time_str}")
 
         return "\n\n".join(parts)
 
@@ -207,9 +231,10 @@ class ContextBuilder:
             # 如果超限制且已保留至少一条，停止
             if total_chars + msg_chars > max_chars and result:
                 break
-            result.insert(0, msg)  # 插入头部保持顺序
+            result.append(msg)
             total_chars += msg_chars
 
+        result.reverse()  # 恢复时间升序
         return result
 
     def build_debug_info(
@@ -231,6 +256,8 @@ class ContextBuilder:
         if user_profile and user_profile.facts:
             profile_text = "\n".join([f"- {k}: {v}" for k, v in user_profile.facts.items()])
         return {
+            "prefix_fingerprint": self.prefix_fingerprint,
+            "static_prefix_chars": len(self.static_prefix),
             "system_prompt_chars": len(system_prompt),
             "short_term_chars": len(short_term_text),
             "profile_chars": len(profile_text),
@@ -14,13 +14,15 @@ from core.bot import Bot
 from .character.loader import CharacterLoader
 from .character.models import Character
 from .llm.router import LLMRouter
+from .llm.streaming import TextCallback
 from .data.store import PersonaDataStore
-from .data.models import ModelTier, UserProfile, RelationshipState, ScoreEvent, GroupConversation
+from .data.models import ModelTier, UserProfile, RelationshipState, ScoreDeltas, ScoreEvent, GroupConversation
 from .agents.scoring_agent import ScoringAgent
+from .interaction_queue import InteractionQueue, InteractionJob
 from .memory.context_builder import ContextBuilder
 from .game.decay import DecayCalculator, DecayConfig
 from .wall_clock import persona_wall_now, PERSONA_EPOCH
-from utils.string import estimate_tokens
+from utils.string import estimate_tokens, truncate_by_tokens
 from .proactive.character_life import CharacterLife, CharacterLifeConfig
 from .proactive.scheduler import ProactiveScheduler, ProactiveConfig
 from .proactive.target_selector import TargetSelector
@@ -32,6 +34,9 @@ from .utils.roll_adapter import RollAdapter
 
 logger = logging.getLogger("persona.orchestrator")
 
+# chat 出错时的回复；流式回复已发出部分文本时，命令据此在剩余文本之后补发错误提示
+CHAT_ERROR_REPLY = "抱歉，我出错了，请稍后再试..."
+
 
 class PersonaOrchestrator:
     DIGEST_MAX_MESSAGES = 6
@@ -51,9 +56,12 @@ class PersonaOrchestrator:
         self.event_agent: Optional[EventGenerationAgent] = None
         self.scheduler: Optional[ProactiveScheduler] = None
         self.delayed_task_queue: Optional[EventShareTaskQueue] = None
+        self.interaction_queue: Optional[InteractionQueue] = None
         self._initialized = False
         self._pending_messages: Dict[str, List[Dict[str, str]]] = {}
         self._last_messages: Dict[str, Tuple[str, float]] = {}  # key -> (message, timestamp)
+        self._last_write_back_monotonic: float = time.monotonic()
+        self._write_back_interval: float = 30.0
 
     def _create_context_builder(self, character: Character) -> ContextBuilder:
         return ContextBuilder(
@@ -114,6 +122,7 @@ class PersonaOrchestrator:
                 auxiliary_model=self.config.auxiliary_model,
                 max_concurrent=self.config.max_concurrent_requests,
                 timeout=self.config.timeout,
+                auxiliary_max_concurrent=self.config.auxiliary_max_concurrent_requests or None,
             )
             logger.info("LLM 路由器已初始化")
             
@@ -132,8 +141,11 @@ class PersonaOrchestrator:
                 group_activity_content_window_hours=self.config.group_activity_content_window_hours,
                 timezone=self.config.timezone,
                 group_max_messages=self.config.group_max_messages,
+                group_history_cache_groups=self.config.group_history_cache_groups,
+                state_cache_entries=self.config.state_cache_entries,
             )
             await self.data_store.ensure_tables()
+            self._write_back_interval = self.config.state_write_back_interval_seconds
             logger.info("数据存储已初始化")
 
             # Phase 4: 设置 LLMRouter 的配额检查依赖
@@ -225,6 +237,15 @@ class PersonaOrchestrator:
             )
             logger.info("延迟任务队列已初始化")
 
+            if self.config.background_interaction_enabled:
+                self.interaction_queue = InteractionQueue(
+                    handler=self._run_interaction_job,
+                    max_pending=self.config.interaction_queue_max_pending,
+                    max_retries=self.config.interaction_queue_max_retries,
+                    retry_delay=self.config.interaction_queue_retry_delay_seconds,
+                )
+                logger.info("后台互动队列已初始化")
+
             logger.info("评分 Agent 和上下文构建器已初始化")
 
             self._initialized = True
@@ -240,7 +261,12 @@ class PersonaOrchestrator:
         group_id: str,
         message: str,
         nickname: str = "",
+        on_text: Optional[TextCallback] = None,
     ) -> Optional[str]:
+        """
+        对话入口；返回完整回复，去重命中时返回 None。
+        on_text 为流式回调：LLM 回复以流式请求，可见文本到达即回调（首条消息、拒绝等非 LLM 回复不会回调）。
+        """
         if not self._initialized or not self.data_store or not self.llm_router or not self.character:
             return "Persona AI 模块未初始化"
 
@@ -331,7 +357,7 @@ class PersonaOrchestrator:
             # Phase 3: 工具调用
             if self.config.tools_enabled:
                 logger.debug(f"对话走 tools 路径: user={user_id}, tools_enabled=true")
-                response = await self._chat_with_tools(user_id, group_id, messages)
+                response = await self._chat_with_tools(user_id, group_id, messages, on_text=on_text)
             else:
                 logger.debug(f"对话走普通路径: user={user_id}, tools_enabled=false")
                 response = await self.llm_router.generate(
@@ -339,6 +365,8 @@ class PersonaOrchestrator:
                     model_tier=ModelTier.PRIMARY,
                     user_id=user_id,
                     group_id=group_id,
+                    prefix_fingerprint=self._prefix_fingerprint(),
+                    **({"on_text": on_text} if on_text is not None else {}),
                 )
 
             if not group_id:
@@ -354,7 +382,7 @@ class PersonaOrchestrator:
 
         except Exception as e:
             logger.exception("对话处理失败")
-            return "抱歉，我出错了，请稍后再试..."
+            return CHAT_ERROR_REPLY
 
     # ========== Phase 3: 工具调用 ==========
 
@@ -363,6 +391,7 @@ class PersonaOrchestrator:
         user_id: str,
         group_id: str,
         messages: List[Dict],
+        on_text: Optional[TextCallback] = None,
     ) -> str:
         """
         支持工具调用的对话（完整循环实现）
@@ -398,6 +427,8 @@ class PersonaOrchestrator:
             max_tool_rounds=self.config.tools_max_rounds,
             user_id=user_id,
             group_id=group_id,
+            prefix_fingerprint=self._prefix_fingerprint(),
+            **({"on_text": on_text} if on_text is not None else {}),
         )
 
         # 记录工具调用元数据便于调试
@@ -409,6 +440,10 @@ class PersonaOrchestrator:
                 f"cached={metadata.get('cached_tokens', 0)}"
             )
 
+        # 流式时工具调用轮中的说明文字已经发给用户，并入回复一起写入历史
+        preamble = metadata.get("preamble")
+        if preamble:
+            content = f"{preamble}\n{content}" if content else preamble
         return content
 
     def _get_tools(self) -> List[Dict]:
@@ -701,21 +736,68 @@ class PersonaOrchestrator:
             return f"掷骰: {expression} = {val}"
 
     async def _update_interaction(self, user_id: str, group_id: str, user_msg: str, assistant_msg: str) -> None:
+        """对话后的关系更新与评分：优先投递到后台队列，队列不可用或已满时同步执行"""
+        if not self.data_store:
+            return
+
+        now = persona_wall_now(self.config.timezone)
+        job = InteractionJob(
+            user_id=user_id,
+            group_id=group_id,
+            first_at=now,
+            last_at=now,
+            messages=[
+                {"role": "user", "content": user_msg},
+                {"role": "assistant", "content": assistant_msg},
+            ],
+        )
+        if self.interaction_queue is not None and self.interaction_queue.submit(job):
+            return
+
+        await self._record_interaction(job)
+        if self._scoring_due(job.key):
+            try:
+                await self._process_batch_scoring(user_id, group_id)
+            except Exception as e:
+                logger.warning(f"批量评分失败（不影响对话）: {e}")
+                self._pending_messages.pop(job.key, None)
+
+    async def _run_interaction_job(self, job: InteractionJob) -> None:
+        """后台队列的任务处理函数；失败抛出异常交由队列重试"""
         if not self.data_store:
             return
+        if not job.recorded:
+            await self._record_interaction(job)
+        if not self._scoring_due(job.key):
+            return
+        try:
+            await self._process_batch_scoring(job.user_id, job.group_id)
+        except Exception:
+            # 最后一次尝试仍失败：与同步路径一致，丢弃本批待评分消息
+            if self.interaction_queue is None or job.attempts >= self.interaction_queue.max_retries:
+                self._pending_messages.pop(job.key, None)
+            raise
 
+    def _scoring_due(self, key: str) -> bool:
+        return len(self._pending_messages.get(key, [])) >= self.config.scoring_interval * 2
+
+    async def _record_interaction(self, job: InteractionJob) -> None:
+        """应用时间衰减、刷新互动时间并归档待评分消息
+
+        合并后的任务以首条消息时间计算衰减，以末条消息时间作为最后互动时间。
+        """
+        user_id, group_id = job.user_id, job.group_id
         rel = await self.data_store.get_relationship(user_id, group_id)
         initial = float(self.character.extensions.initial_relationship) if self.character else 30.0
         if not rel:
             rel = await self.data_store.init_relationship(user_id, group_id, initial)
 
-        now = persona_wall_now(self.config.timezone)
         decay_event: Optional[ScoreEvent] = None
-        if self.decay_calculator and self.decay_calculator.should_apply_decay(rel, now):
-            deltas, reason = self.decay_calculator.calculate_decay(rel, initial, now)
+        if self.decay_calculator and self.decay_calculator.should_apply_decay(rel, job.first_at):
+            deltas, reason = self.decay_calculator.calculate_decay(rel, initial, job.first_at)
             if abs(deltas.intimacy) > 0.01:
                 composite_before = rel.composite_score
-                rel.apply_deltas(deltas, updated_at=now)
+                rel.apply_deltas(deltas, updated_at=job.first_at)
                 decay_event = ScoreEvent(
                     user_id=user_id,
                     group_id=group_id,
@@ -726,27 +808,26 @@ class PersonaOrchestrator:
                     conversation_digest="",
                 )
 
-        rel.last_interaction_at = now
-        rel.last_relationship_decay_applied_at = now
+        rel.last_interaction_at = job.last_at
+        rel.last_relationship_decay_applied_at = job.last_at
         await self.data_store.update_relationship(rel)
+        if self.scheduler:
+            self.scheduler.note_relationship(rel)
         if decay_event:
             await self.data_store.add_score_event(decay_event)
             logger.info(
                 f"应用时间衰减: {user_id} 衰减 {decay_event.deltas.intimacy:.2f}, 原因: {decay_event.reason}"
             )
 
-        key = f"{user_id}:{group_id}"
-        if key not in self._pending_messages:
-            self._pending_messages[key] = []
-        self._pending_messages[key].append({"role": "user", "content": user_msg})
-        self._pending_messages[key].append({"role": "assistant", "content": assistant_msg})
+        self._pending_messages.setdefault(job.key, []).extend(job.messages)
+        job.messages = []
+        job.recorded = True
 
-        if len(self._pending_messages[key]) >= self.config.scoring_interval * 2:
-            try:
-                await self._process_batch_scoring(user_id, group_id)
-            except Exception as e:
-                logger.warning(f"批量评分失败（不影响对话）: {e}")
-                self._pending_messages.pop(key, None)
+    async def flush_background_work(self, timeout: Optional[float] = None) -> bool:
+        """等待后台互动队列处理完毕（关闭前或测试中使用）"""
+        if self.interaction_queue is None:
+            return True
+        return await self.interaction_queue.drain(timeout)
 
     async def _process_batch_scoring(self, user_id: str, group_id: str) -> None:
         if not self.scoring_agent or not self.data_store:
@@ -767,17 +848,24 @@ class PersonaOrchestrator:
             initial = float(self.character.extensions.initial_relationship)
             rel_for_scoring = self.decay_calculator.effective_relationship(rel, initial)
 
-        deltas, new_facts = await self.scoring_agent.batch_analyze(
-            messages=messages,
-            current_profile=profile,
-            relationship=rel_for_scoring,
-        )
+        try:
+            deltas, new_facts = await self.scoring_agent.batch_analyze(
+                messages=messages,
+                current_profile=profile,
+                relationship=rel_for_scoring,
+            )
+        except Exception:
+            # 放回待评分队列，由调用方决定重试或丢弃
+            self._pending_messages[key] = messages + self._pending_messages.get(key, [])
+            raise
 
         now = persona_wall_now(self.config.timezone)
         if rel:
             composite_before = rel.composite_score
             rel.apply_deltas(deltas, updated_at=now)
             await self.data_store.update_relationship(rel)
+            if self.scheduler:
+                self.scheduler.note_relationship(rel)
 
             event = ScoreEvent(
                 user_id=user_id,
@@ -822,8 +910,13 @@ class PersonaOrchestrator:
                 return truncated, len(truncated) < len(history_dicts)
             return history_dicts, False
 
-        # 群聊路径：群共享历史 + token 动态窗口
-        history = await self.data_store.get_group_conversations(group_id, limit=None)
+        # 群聊路径：群共享历史 + token 动态窗口（时间与条数限制下推到数据层）
+        since = persona_wall_now(self.config.timezone) - timedelta(minutes=self.config.group_max_age_minutes)
+        history = await self.data_store.get_group_conversations(
+            group_id,
+            since=since,
+            max_rows=self.config.group_max_messages,
+        )
         return self._apply_token_window(history)
 
     def _apply_token_window(
@@ -866,15 +959,13 @@ class PersonaOrchestrator:
             if not content:
                 continue
 
-            # 单条截断
-            content_tokens = estimate_tokens(content)
+            # 单条截断（优先使用入库时的估算值，旧数据回退到实时估算）
+            content_tokens = msg.token_estimate
+            if content_tokens is None:
+                content_tokens = estimate_tokens(content)
             if content_tokens > single_max:
-                ratio = single_max / content_tokens
-                max_chars = max(1, int(len(content) * ratio))
-                content = content[:max_chars]
-                # 重新估算并二次校验（token-字符非线性关系可能导致偏差）
-                while len(content) > 1 and estimate_tokens(content) > single_max:
-                    content = content[:-1]
+                content = truncate_by_tokens(content, single_max)
+                content_tokens = estimate_tokens(content)
 
             # speaker_name
             if msg.role == "assistant":
@@ -882,21 +973,21 @@ class PersonaOrchestrator:
             else:
                 speaker_name = msg.display_name or "群友"
 
-            # 总成本 = 格式化后完整字符串的 token 估算
-            formatted = f"[{speaker_name}] {content}"
-            msg_cost = estimate_tokens(formatted)
+            # 总成本 = 格式化后完整字符串 "[speaker] content" 的 token 估算（估算对拼接可加）
+            msg_cost = estimate_tokens(f"[{speaker_name}] ") + content_tokens
 
             # 至少保留一条消息，即使单条即超预算
             if total_tokens + msg_cost > budget and result:
                 break
 
-            result.insert(0, {
+            result.append({
                 "role": msg.role,
                 "content": content,
                 "speaker_name": speaker_name,
             })
             total_tokens += msg_cost
 
+        result.reverse()
         return result, len(result) < original_count
 
     def _resolve_warmth_label(self, user_id: str, rel: Optional[RelationshipState]) -> str:
@@ -951,6 +1042,9 @@ class PersonaOrchestrator:
         """构建世界书 lore 段落"""
         return self.context_builder._build_lore_text(history_dicts, current_message)
 
+    def _prefix_fingerprint(self) -> Optional[str]:
+        return self.context_builder.prefix_fingerprint if self.context_builder else None
+
     async def _build_messages(
         self,
         user_id: str,
@@ -983,6 +1077,7 @@ class PersonaOrchestrator:
             diary_context=diary_context,
             current_message=current_message,
             warmth_label=warmth_label,
+            lore_sections=lore_sections,
         )
 
     async def clear_history(self, user_id: str, group_id: str) -> None:
@@ -1013,40 +1108,76 @@ class PersonaOrchestrator:
         return self.decay_calculator.effective_relationship(rel, initial)
 
     async def apply_relationship_decay_batch(self) -> int:
-        """每日批处理：将长时间未互动用户的时间衰减写入数据库。返回写库条数。"""
+        """每日批处理：将长时间未互动用户的时间衰减写入数据库。返回写库条数。
+
+        只读取衰减所需的列，按列批量计算（DecayCalculator.batch_decay），
+        衰减结果与评分事件在一个事务内以 executemany 写入。
+        """
         if not self.decay_calculator or not self.data_store or not self.character:
             return 0
         initial = float(self.character.extensions.initial_relationship)
-        n = 0
         now = persona_wall_now(self.config.timezone)
         try:
-            for rel in await self.data_store.list_all_relationships_raw():
-                if not self.decay_calculator.should_apply_decay(rel, now):
-                    continue
-                deltas, reason = self.decay_calculator.calculate_decay(rel, initial, now)
-                rel.last_relationship_decay_applied_at = now
-                if abs(deltas.intimacy) <= 0.01:
-                    continue  # 无实际衰减，不写库
-                composite_before = rel.composite_score
-                rel.apply_deltas(deltas, updated_at=now)
-                await self.data_store.update_relationship(rel)
-                await self.data_store.add_score_event(
+            rows = await self.data_store.list_relationship_decay_rows()
+            composite = [
+                RelationshipState.composite_from(intimacy, passion, trust, secureness)
+                for _, _, intimacy, passion, trust, secureness, _, _ in rows
+            ]
+            results = self.decay_calculator.batch_decay(
+                [row[6] for row in rows], [row[7] for row in rows], composite, initial, now
+            )
+            decays = []
+            events: List[ScoreEvent] = []
+            for i, amount, reason in results:
+                user_id, group_id, intimacy, passion, trust, secureness = rows[i][:6]
+                deltas = ScoreDeltas(intimacy=-amount, passion=-amount, trust=-amount, secureness=-amount)
+                after = RelationshipState(
+                    user_id=user_id, group_id=group_id,
+                    intimacy=intimacy, passion=passion, trust=trust, secureness=secureness,
+                )
+                after.apply_deltas(deltas, updated_at=now)
+                decays.append((user_id, group_id, amount))
+                events.append(
                     ScoreEvent(
-                        user_id=rel.user_id,
-                        group_id=rel.group_id,
+                        user_id=user_id,
+                        group_id=group_id,
                         deltas=deltas,
-                        composite_before=composite_before,
-                        composite_after=rel.composite_score,
+                        composite_before=composite[i],
+                        composite_after=after.composite_score,
                         reason=f"time_decay_batch: {reason}",
                         conversation_digest="",
                     )
                 )
-                n += 1
+            n = await self.data_store.apply_relationship_decays(decays, events, now)
             if n:
                 logger.info(f"每日衰减批处理: 更新 {n} 条关系")
+            return n
         except Exception as e:
             logger.warning(f"每日衰减批处理失败: {e}")
-        return n
+            return 0
+
+    async def flush_state(self) -> int:
+        """将缓存中的关系与画像写回数据库"""
+        if not self.data_store:
+            return 0
+        self._last_write_back_monotonic = time.monotonic()
+        try:
+            return await self.data_store.flush_write_back()
+        except Exception as e:
+            logger.warning(f"关系/画像写回失败: {e}")
+            return 0
+
+    async def shutdown(self) -> None:
+        """关闭前处理完后台互动队列、写回缓存状态并释放 LLM 连接池"""
+        if not self._initialized:
+            return
+        if not await self.flush_background_work(timeout=self.config.shutdown_drain_timeout_seconds):
+            logger.warning("关闭时后台互动队列未在超时内处理完毕")
+        n = await self.flush_state()
+        if n:
+            logger.info(f"关闭前写回 {n} 条关系/画像")
+        if self.llm_router:
+            await self.llm_router.aclose()
 
     async def reload_character(self) -> Tuple[bool, str]:
         """
@@ -1089,6 +1220,9 @@ class PersonaOrchestrator:
 
         messages = []
 
+        if time.monotonic() - self._last_write_back_monotonic >= self._write_back_interval:
+            await self.flush_state()
+
         try:
             # 尝试生成生活事件（统一槽位，含边界事件和日常事件）
             if self.character_life:
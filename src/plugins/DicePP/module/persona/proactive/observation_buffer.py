@@ -11,8 +11,9 @@
 - 阈值因此会在 `min_threshold`～`max_threshold` 之间浮动；爆发期可能接近上限，需调参时改构造参数。
 """
 import re
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Set, Any
+from typing import Deque, List, Dict, Optional, Set, Any
 from datetime import datetime, timedelta
 import logging
 
@@ -74,8 +75,11 @@ class ObservationBuffer:
         self.max_records_per_group = max_records_per_group
         self._dynamic_threshold_config = dynamic_threshold_config or DynamicThresholdConfig()
 
-        self._buffer: List[BufferedMessage] = []
+        # 超出 max_buffer_size 时自动丢弃最旧消息
+        self._buffer: Deque[BufferedMessage] = deque(maxlen=max_buffer_size)
         self._last_trigger_time: Optional[datetime] = None
+        # 自上次持久化以来是否有变更（由 PersonaCommand 按群增量落库）
+        self.dirty: bool = False
 
     def _wall_now(self) -> datetime:
         from ..wall_clock import persona_wall_now
@@ -176,10 +180,7 @@ class ObservationBuffer:
             timestamp=self._wall_now(),
         )
         self._buffer.append(msg)
-
-        # 限制缓冲区大小
-        if len(self._buffer) > self.max_buffer_size:
-            self._buffer = self._buffer[-self.max_buffer_size:]
+        self.dirty = True
 
         # 检查是否触发提取
         return self._should_trigger()
@@ -230,8 +231,9 @@ class ObservationBuffer:
 
     def get_messages_for_extraction(self) -> List[BufferedMessage]:
         """获取用于提取观察的消息并清空缓冲"""
-        messages = self._buffer.copy()
+        messages = list(self._buffer)
         self._buffer.clear()
+        self.dirty = True
         return messages
 
     def get_status(self) -> Dict:
@@ -243,7 +245,7 @@ class ObservationBuffer:
         }
 
     def to_persist_dict(self) -> Dict[str, Any]:
-        """序列化到 persona_settings（跨重启恢复缓冲与动态阈值）。"""
+        """序列化到 persona_observation_buffer 表（跨重启恢复缓冲与动态阈值）。"""
         return {
             "threshold": self.threshold,
             "last_trigger": self._last_trigger_time.isoformat() if self._last_trigger_time else None,
@@ -300,8 +302,6 @@ class ObservationBuffer:
                 )
             except (KeyError, TypeError, ValueError):
                 continue
-        if len(buf._buffer) > buf.max_buffer_size:
-            buf._buffer = buf._buffer[-buf.max_buffer_size :]
         return buf
 
 
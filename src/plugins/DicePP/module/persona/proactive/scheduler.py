@@ -2,10 +2,17 @@
 主动消息调度器
 
 管理定时问候、想念触发、事件分享等主动消息
+
+想念触发使用按"下次可触发时间"排序的小顶堆：
+- 可触发时间 = max(最后互动 + miss_min_hours, 上次主动消息 + min_interval_hours)
+- 候选集合每 MISS_INDEX_REFRESH 整体重建一次，其间由 note_relationship 在互动/评分后增量更新
+- 每次 tick 只弹出已到期的候选；静音状态与今日事件在单次 tick 内各只查询一次
 """
 from typing import List, Dict, Optional, Set, Tuple, Any
 from datetime import datetime, timedelta
 import asyncio
+import heapq
+import itertools
 import json
 import random
 import logging
@@ -24,6 +31,15 @@ from .utils import effective_for_proactive
 
 logger = logging.getLogger("persona.scheduler")
 
+# 想念候选集合整体重建间隔（期间的分数衰减等变化在到期时再按有效分数判断）
+MISS_INDEX_REFRESH = timedelta(hours=1)
+# 与 list_active_relationships 的 active_within_days 一致
+MISS_ACTIVE_WITHIN_DAYS = 30
+# 已静音用户的复查间隔
+MISS_MUTED_RECHECK = timedelta(minutes=30)
+
+MissKey = Tuple[str, str]  # (user_id, group_id)
+
 
 class ProactiveConfig:
     """主动消息配置"""
@@ -84,6 +100,14 @@ class ProactiveScheduler(BoundaryReceiver):
         self._last_proactive_time: Dict[str, datetime] = {}  # target_key -> last_time
 
         self._last_event_date: Optional[str] = None
+
+        # 想念候选：关系快照、当前有效的到期时间，以及 (到期时间, 序号, key) 小顶堆
+        # 堆中到期时间与 _miss_due 不一致的条目已过期，弹出时丢弃
+        self._miss_candidates: Dict[MissKey, RelationshipState] = {}
+        self._miss_due: Dict[MissKey, datetime] = {}
+        self._miss_heap: List[Tuple[datetime, int, MissKey]] = []
+        self._miss_seq = itertools.count()
+        self._miss_index_built_at: Optional[datetime] = None
         self._pending_targets: Set[str] = set()  # 当前正在处理的目标（防并发重复）
 
         # 在首次异步使用时再创建，避免绑定到错误的事件循环
@@ -265,49 +289,111 @@ class ProactiveScheduler(BoundaryReceiver):
         except ValueError:
             return False
 
+    # ── 想念候选索引 ──────────────────────────────
+
+    def _miss_ready_at(self, rel: RelationshipState) -> Optional[datetime]:
+        """候选最早可触发想念消息的时间，没有互动记录时为 None"""
+        if not rel.last_interaction_at:
+            return None
+        ready = rel.last_interaction_at + timedelta(hours=self.config.miss_min_hours)
+        last_time = self._last_proactive_time.get(f"user:{rel.user_id}")
+        if last_time:
+            ready = max(ready, last_time + timedelta(hours=self.config.min_interval_hours))
+        return ready
+
+    def _schedule_miss(self, key: MissKey, due: datetime) -> None:
+        self._miss_due[key] = due
+        heapq.heappush(self._miss_heap, (due, next(self._miss_seq), key))
+        # 频繁互动会留下大量过期条目，超过有效条目数两倍时压缩
+        if len(self._miss_heap) > 2 * len(self._miss_due) + 64:
+            self._miss_heap = [(d, next(self._miss_seq), k) for k, d in self._miss_due.items()]
+            heapq.heapify(self._miss_heap)
+
+    def _drop_miss(self, key: MissKey) -> None:
+        self._miss_candidates.pop(key, None)
+        self._miss_due.pop(key, None)
+
+    def _track_miss_candidate(self, rel: RelationshipState) -> None:
+        key = (rel.user_id, rel.group_id)
+        ready = self._miss_ready_at(rel)
+        if ready is None or rel.composite_score < self.config.miss_min_score:
+            self._drop_miss(key)
+            return
+        self._miss_candidates[key] = rel
+        self._schedule_miss(key, ready)
+
+    async def _rebuild_miss_index(self, now: datetime) -> None:
+        relationships = await self._get_active_relationships()
+        logger.debug(f"想念候选重建: 活跃关系数={len(relationships)}")
+        self._miss_candidates.clear()
+        self._miss_due.clear()
+        self._miss_heap = []
+        for rel in relationships:
+            self._track_miss_candidate(rel)
+        self._miss_index_built_at = now
+
+    def note_relationship(self, rel: RelationshipState) -> None:
+        """关系写入后调用（互动、评分、管理员设置），增量更新想念候选"""
+        if self._miss_index_built_at is None:
+            return
+        self._track_miss_candidate(rel.model_copy())
+
     async def _check_missed_users(self) -> List[Dict]:
-        """检查并触发想念消息"""
+        """检查并触发想念消息（只处理已到期的候选）"""
         if not self.config.miss_enabled:
             return []
 
         messages = []
         now = self._now()
-        min_idle = timedelta(hours=self.config.miss_min_hours)
+        active_window = timedelta(days=MISS_ACTIVE_WITHIN_DAYS)
+        retry_at = now + self._tick_interval
+        # (key, 下次检查时间)：本次 tick 结束后再入堆，避免同一 tick 内重复弹出
+        deferred: List[Tuple[MissKey, datetime]] = []
 
         try:
-            relationships = await self._get_active_relationships()
-            logger.debug(f"想念检查: 活跃关系数={len(relationships)}")
+            if self._miss_index_built_at is None or now - self._miss_index_built_at >= MISS_INDEX_REFRESH:
+                await self._rebuild_miss_index(now)
+
+            # 单次 tick 内的查询缓存
+            muted: Dict[str, bool] = {}
+            today_events = None
+
+            while self._miss_heap and self._miss_heap[0][0] <= now:
+                due, _, key = heapq.heappop(self._miss_heap)
+                if self._miss_due.get(key) != due:
+                    continue
+                del self._miss_due[key]
+                rel = self._miss_candidates[key]
+                user_id = rel.user_id
 
-            for rel in relationships:
                 eff = effective_for_proactive(rel, self._decay_calculator, self.character)
                 # 检查最小好感度（与对话展示一致）
                 if eff.composite_score < self.config.miss_min_score:
                     logger.debug(
-                        f"想念跳过(好感度低): user={rel.user_id}, "
+                        f"想念跳过(好感度低): user={user_id}, "
                         f"score={eff.composite_score:.1f}"
                     )
-                    continue
-
-                # 检查空闲时间
-                if not rel.last_interaction_at:
+                    self._drop_miss(key)
                     continue
 
                 idle_time = now - rel.last_interaction_at
-                idle_hours = idle_time.total_seconds() / 3600
-                if idle_time < min_idle:
-                    logger.debug(
-                        f"想念跳过(空闲短): user={rel.user_id}, idle={idle_hours:.1f}h"
-                    )
+                if idle_time > active_window:
+                    self._drop_miss(key)
                     continue
 
-                # 检查最小间隔
-                user_id = rel.user_id
-                if not self._can_send_to_key(f"user:{user_id}"):
-                    logger.debug(f"想念跳过(间隔): user={user_id}")
+                # 空闲时间与最小间隔（主动分享可能在入堆后刷新了间隔）
+                ready = self._miss_ready_at(rel)
+                if ready > now:
+                    logger.debug(f"想念推迟: user={user_id}, until={ready:%Y-%m-%d %H:%M}")
+                    self._schedule_miss(key, ready)
                     continue
+
                 # Phase 3: 检查用户是否关闭了主动消息
-                if await self.data_store.is_user_muted(user_id):
+                if user_id not in muted:
+                    muted[user_id] = await self.data_store.is_user_muted(user_id)
+                if muted[user_id]:
                     logger.debug(f"想念跳过(静音): user={user_id}")
+                    deferred.append((key, now + MISS_MUTED_RECHECK))
                     continue
 
                 # 检查概率 P = 0.40 + 0.40 * (score/100)
@@ -316,14 +402,16 @@ class ProactiveScheduler(BoundaryReceiver):
                     logger.debug(
                         f"想念跳过(概率): user={user_id}, p={probability:.2f}"
                     )
+                    deferred.append((key, retry_at))
                     continue
 
                 # 获取今天的一个事件作为素材（不再依赖 _pending_shares）
-                today = self._get_today_str()
-                today_events = await self.data_store.get_daily_events(today)
+                if today_events is None:
+                    today_events = await self.data_store.get_daily_events(self._get_today_str())
                 if not today_events:
                     logger.debug(f"想念跳过(无事件): user={user_id}")
-                    continue
+                    deferred.append((key, retry_at))
+                    break
                 event = random.choice(today_events)
                 event_desc = event.description
                 event_reaction = getattr(event, "reaction", "")
@@ -338,19 +426,26 @@ class ProactiveScheduler(BoundaryReceiver):
                 )
 
                 msg = await self._create_miss_you_message(target, event_desc, event_reaction)
-                if msg:
-                    messages.append(msg)
-                    self._last_proactive_time[f"user:{user_id}"] = now
-                    logger.info(
-                        f"想念触发: user={user_id}, idle={idle_hours:.1f}h, "
-                        f"score={eff.composite_score:.1f}, event={event_desc[:40]}"
-                    )
+                if not msg:
+                    deferred.append((key, retry_at))
+                    continue
+                messages.append(msg)
+                self._last_proactive_time[f"user:{user_id}"] = now
+                self._schedule_miss(key, self._miss_ready_at(rel))
+                logger.info(
+                    f"想念触发: user={user_id}, idle={idle_time.total_seconds() / 3600:.1f}h, "
+                    f"score={eff.composite_score:.1f}, event={event_desc[:40]}"
+                )
 
-                    # 限制每次 tick 只发送一条想念消息
-                    break
+                # 限制每次 tick 只发送一条想念消息
+                break
 
         except Exception as e:
             logger.exception(f"检查想念触发失败: {e}")
+        finally:
+            for key, due in deferred:
+                if key in self._miss_candidates:
+                    self._schedule_miss(key, due)
 
         return messages
 
@@ -363,7 +458,7 @@ class ProactiveScheduler(BoundaryReceiver):
         try:
             return await self.data_store.list_active_relationships(
                 min_score=self.config.miss_min_score,
-                active_within_days=30
+                active_within_days=MISS_ACTIVE_WITHIN_DAYS
             )
         except Exception as e:
             logger.error(f"获取活跃关系失败: {e}")
@@ -584,4 +679,5 @@ class ProactiveScheduler(BoundaryReceiver):
             "enabled": self.config.enabled,
             "is_character_active": self._is_character_active(),
             "last_proactive_count": len(self._last_proactive_time),
+            "miss_candidates": len(self._miss_due),
         }
@@ -1,15 +1,16 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, TYPE_CHECKING
 import os
 import json
 import re
-import openpyxl
 import sqlite3
-from openpyxl.comments import Comment
 
 from core.data import JsonObject, custom_json_object
 from utils.time import get_current_date_str
 
 from utils import read_xlsx, update_xlsx, col_based_workbook_to_dict, create_parent_dir, get_empty_col_based_workbook
+
+if TYPE_CHECKING:
+    import openpyxl
 #from module.query import QUERY_DATA_FIELD, QUERY_DATA_FIELD_LIST, QUERY_REDIRECT_FIELD, QUERY_REDIRECT_FIELD_LIST
 
 #QIF = QUERY_ITEM_FIELD 太长了还是缩写的好。
@@ -125,7 +126,7 @@ def regexp_normalize(string: str) -> str:
             new_string += char
     return new_string
 
-def load_data_from_xlsx(wb: openpyxl.Workbook, sql_cur: Any,xlsx_name: str, xlsx_mode: int = 0) -> bool:
+def load_data_from_xlsx(wb: "openpyxl.Workbook", sql_cur: Any,xlsx_name: str, xlsx_mode: int = 0) -> bool:
     """将数据从xlsx中读取出来"""
     def try_load_data(data: str,default_var: str = "") -> str:
         return str(data).strip() if data else default_var
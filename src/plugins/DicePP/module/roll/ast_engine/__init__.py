@@ -24,6 +24,8 @@ from .errors import RollSyntaxError, RollRuntimeError, RollLimitError
 from .preprocessor import preprocess
 from .adapter import (
     exec_roll_exp_ast,
+    compile_roll_exp_ast,
+    CompiledRollExpression,
     exec_roll_exp_unified,
     sample_roll_exp_ast,
     build_sampling_plan,
@@ -52,6 +54,8 @@ __all__ = [
     "RollLimitError",
     # Adapter (main API)
     "exec_roll_exp_ast",
+    "compile_roll_exp_ast",
+    "CompiledRollExpression",
     "exec_roll_exp_unified",
     "sample_roll_exp_ast",
     "build_sampling_plan",
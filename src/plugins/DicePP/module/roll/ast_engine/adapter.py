@@ -105,32 +105,61 @@ def exec_roll_exp_ast(
         RollRuntimeError: If evaluation fails
         RollLimitError: If safety limits exceeded
     """
+    return compile_roll_exp_ast(expression, limits).execute(dice_roller)
+
+
+@dataclass
+class CompiledRollExpression:
+    """
+    A roll expression compiled once (preprocess + static limits check + parse)
+    for repeated full evaluation.
+
+    Unlike SamplingPlan, a CompiledRollExpression is meant to be owned by
+    long-lived data such as deck items: the evaluator never mutates the AST,
+    and dynamic limits are still enforced by evaluate() on every execute().
+    """
+    processed: str
+    _ast: Any = field(repr=False)
+    _limits: SafetyLimits = field(repr=False)
+
+    def execute(self, dice_roller: Optional[Callable[[int], int]] = None) -> RollExpressionResult:
+        """Evaluate once and return the same result exec_roll_exp_ast would."""
+        # Evaluate (pass processed expression for trace, and limits)
+        result = evaluate(self._ast, dice_roller=dice_roller, expression=self.processed, limits=self._limits)
+
+        # Build canonical exp from AST (e.g. "D" → "1D20", "3D" → "3D20")
+        exp = canonical_str(self._ast)
+
+        # Build result using LegacyTextRenderer on the populated trace
+        info = _build_info_text(result)
+        return RollExpressionResult(
+            value=result.value,
+            expression=exp,
+            info=info,
+            exp=exp,
+            _eval_result=result,
+        )
+
+
+def compile_roll_exp_ast(expression: str, limits: Optional[SafetyLimits] = None) -> CompiledRollExpression:
+    """
+    Compile a roll expression for repeated evaluation.
+
+    Raises:
+        RollSyntaxError: If expression has syntax errors
+        RollLimitError: If static expression-length limits are exceeded
+    """
     limits = limits or DEFAULT_LIMITS
-    
+
     # Preprocess: normalize text and expand Chinese aliases
     processed = preprocess(expression)
-    
+
     # Check expression length (on processed form)
     check_expression_length(processed, limits)
-    
+
     # Parse expression
     ast = parse_expression(processed)
-    
-    # Evaluate (pass original expression for display, processed for trace, and limits)
-    result = evaluate(ast, dice_roller=dice_roller, expression=processed, limits=limits)
-
-    # Build canonical exp from AST (e.g. "D" → "1D20", "3D" → "3D20")
-    exp = canonical_str(ast)
-
-    # Build result using LegacyTextRenderer on the populated trace
-    info = _build_info_text(result)
-    return RollExpressionResult(
-        value=result.value,
-        expression=exp,
-        info=info,
-        exp=exp,
-        _eval_result=result,
-    )
+    return CompiledRollExpression(processed=processed, _ast=ast, _limits=limits)
 
 
 def _build_info_text(result: EvalResult) -> str:
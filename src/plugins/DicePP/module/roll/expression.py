@@ -9,7 +9,7 @@ from .modifier import RollExpModifier, ROLL_MODIFIERS_DICT
 from .connector import RollExpConnector, ROLL_CONNECTORS_DICT, REModSubstract, REModAdd
 from .roll_utils import RollDiceError, roll_a_dice, match_outer_parentheses, clear_border_parentheses, remove_redundant_parentheses
 from .result import RollResult
-from .ast_engine.adapter import exec_roll_exp_ast
+from .ast_engine.adapter import exec_roll_exp_ast, compile_roll_exp_ast, CompiledRollExpression
 from .ast_engine.errors import RollEngineError
 
 XDY_RE = "([1-9][0-9]*)?D([1-9][0-9]*)?"
@@ -821,20 +821,42 @@ def exec_roll_exp(input_str: str) -> RollResult:
     若需要使用 legacy 路径，须通过 ast_engine.legacy_adapter 中的显式开关启用，
     并调用 exec_roll_exp_legacy()。
     """
-    import logging as _logging
-    _log = _logging.getLogger(__name__)
-
     try:
         ast_result = exec_roll_exp_ast(input_str)
         return _build_roll_result(ast_result)
-    except RollEngineError as e:
+    except Exception as e:
+        _raise_roll_engine_error(input_str, e)
+
+
+def _raise_roll_engine_error(input_str: str, e: Exception):
+    import logging as _logging
+    _log = _logging.getLogger(__name__)
+    if isinstance(e, RollEngineError):
         # AST 引擎语义错误：包装为 RollDiceError 以兼容上游 handler，不回退 legacy。
         _log.error("roll_engine=ast expression=%r error=%s: %s", input_str, type(e).__name__, e.info)
         raise RollDiceError(e.info) from e
+    # 非预期内部错误：记录错误日志后直接向上抛出，默认路径不允许静默回退 legacy。
+    _log.error("roll_engine=ast expression=%r unexpected_error=%s: %s", input_str, type(e).__name__, e)
+    raise RollDiceError(f"掷骰引擎内部错误: {type(e).__name__}: {e}") from e
+
+
+def compile_roll_exp(input_str: str) -> CompiledRollExpression:
+    """
+    预编译掷骰表达式 (预处理与解析只做一次), 之后用 exec_compiled_roll_exp 重复执行,
+    结果与 exec_roll_exp(input_str) 相同。表达式不合法时抛出 RollDiceError
+    """
+    try:
+        return compile_roll_exp_ast(input_str)
+    except Exception as e:
+        _raise_roll_engine_error(input_str, e)
+
+
+def exec_compiled_roll_exp(compiled: CompiledRollExpression) -> RollResult:
+    """执行一次预编译的掷骰表达式"""
+    try:
+        return _build_roll_result(compiled.execute())
     except Exception as e:
-        # 非预期内部错误：记录错误日志后直接向上抛出，默认路径不允许静默回退 legacy。
-        _log.error("roll_engine=ast expression=%r unexpected_error=%s: %s", input_str, type(e).__name__, e)
-        raise RollDiceError(f"掷骰引擎内部错误: {type(e).__name__}: {e}") from e
+        _raise_roll_engine_error(compiled.processed, e)
 
 
 def exec_roll_exp_legacy(input_str: str) -> RollResult:
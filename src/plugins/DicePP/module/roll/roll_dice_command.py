@@ -2,7 +2,8 @@ from typing import List, Tuple, Any
 import asyncio
 
 from core.bot import Bot
-from core.statistics import UserStatInfo, GroupStatInfo
+from core.statistics import UserStatInfo
+from core.statistics.counter import STAT_ENTITY_USER, STAT_ENTITY_GROUP, STAT_METRIC_ROLL, d20_metric
 from core.command.const import *
 from core.command import UserCommandBase, custom_user_command
 from core.command import BotCommandBase, BotSendMsgCommand
@@ -360,48 +361,6 @@ class RollDiceCommand(UserCommandBase):
     def get_description(self) -> str:
         return ".r 掷骰"
 
-    async def tick_daily(self) -> List[BotCommandBase]:
-        # 清除今日统计
-        from core.data.models import UserStat, GroupStat
-
-        # 更新用户数据
-        user_stat_list = await self.bot.db.user_stat.list_all()
-        for user_stat_row in user_stat_list:
-            user_stat = UserStatInfo()
-            try:
-                if user_stat_row.data:
-                    user_stat.deserialize(user_stat_row.data)
-            except Exception:
-                pass
-            # 重置掷骰统计
-            user_stat.roll.times.update(1)
-            user_stat.roll.d20.update()
-            # 保存回去
-            try:
-                await self.bot.db.user_stat.upsert(UserStat(user_id=user_stat_row.user_id, data=user_stat.serialize()))
-            except Exception:
-                pass
-
-        # 更新群聊数据
-        group_stat_list = await self.bot.db.group_stat.list_all()
-        for group_stat_row in group_stat_list:
-            group_stat = GroupStatInfo()
-            try:
-                if group_stat_row.data:
-                    group_stat.deserialize(group_stat_row.data)
-            except Exception:
-                pass
-            # 重置掷骰统计
-            group_stat.roll.times.update(1)
-            group_stat.roll.d20.update()
-            # 保存回去
-            try:
-                await self.bot.db.group_stat.upsert(GroupStat(group_id=group_stat_row.group_id, data=group_stat.serialize()))
-            except Exception:
-                pass
-
-        return []
-
 
 # ---------------------------------------------------------------------------
 # Adaptive sampling tier thresholds (value_range = observed max - min)
@@ -522,41 +481,12 @@ def get_roll_state_loc_text(bot: Bot, res_list: List[RollResult]):
 
 
 async def record_roll_data(bot: Bot, meta: MessageMetaData, res_list: List[RollResult]):
-    """统计掷骰数据 —— 从 SQLite 读取后更新再写回"""
-    from core.data.models import UserStat, GroupStat
-
-    roll_times = len(res_list)
-
-    # 读取用户 stat
-    _row = await bot.db.user_stat.get(meta.user_id)
-    user_stat = UserStatInfo()
-    if _row and _row.data:
-        try:
-            user_stat.deserialize(_row.data)
-        except Exception:
-            pass
-    user_stat.roll.times.inc(roll_times)
-    for res in (res for res in res_list if res.d20_num == 1):
-        user_stat.roll.d20.record(int(res.val_list[0]))
-    try:
-        await bot.db.user_stat.upsert(UserStat(user_id=meta.user_id, data=user_stat.serialize()))
-    except Exception as _exc:
-        dice_log(f"[RollStat] 写入用户统计 DB 失败: {_exc}")
-
-    # 更新群数据
-    if not meta.group_id:
-        return
-    _grow = await bot.db.group_stat.get(meta.group_id)
-    group_stat = GroupStatInfo()
-    if _grow and _grow.data:
-        try:
-            group_stat.deserialize(_grow.data)
-        except Exception:
-            pass
-    group_stat.roll.times.inc(roll_times)
+    """统计掷骰数据, 计数累加在 Bot 的统计缓冲中, 由 Bot 定期写入数据库"""
+    stat_entities = [(STAT_ENTITY_USER, meta.user_id)]
+    if meta.group_id:
+        stat_entities.append((STAT_ENTITY_GROUP, meta.group_id))
+    bot.stat_buffer.inc_entities(stat_entities, STAT_METRIC_ROLL, len(res_list))
     for res in (res for res in res_list if res.d20_num == 1):
-        group_stat.roll.d20.record(int(res.val_list[0]))
-    try:
-        await bot.db.group_stat.upsert(GroupStat(group_id=meta.group_id, data=group_stat.serialize()))
-    except Exception as _exc:
-        dice_log(f"[RollStat] 写入群统计 DB 失败: {_exc}")
+        d20_val = int(res.val_list[0])
+        if 1 <= d20_val <= 20:
+            bot.stat_buffer.inc_entities(stat_entities, d20_metric(d20_val))
@@ -21,7 +21,7 @@ import utils.string
 import utils.data
 import utils.cq_code
 
-from utils.string import estimate_tokens
+from utils.string import estimate_tokens, truncate_by_tokens
 
 # 导出列表，方便 IDE 自动补全和静态分析
 __all__ = [
@@ -39,4 +39,5 @@ __all__ = [
     "create_parent_dir",
     # Token 估算
     "estimate_tokens",
+    "truncate_by_tokens",
 ]
\ No newline at end of file
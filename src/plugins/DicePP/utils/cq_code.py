@@ -1,8 +1,18 @@
-from typing import Union
+import os
+from collections import OrderedDict
+from typing import Union, Optional, Dict, Tuple
 from io import BytesIO
 from pathlib import Path
 from base64 import b64encode
 
+# 本地图片的发送方式
+IMAGE_SEND_BASE64 = "base64"  # 读取文件内容内联为 base64 (OneBot 实现与骰娘不在同一台机器时也能发送)
+IMAGE_SEND_FILE = "file"  # 发送 file:// 路径, 由 OneBot 实现自行读取文件 (须与骰娘共享文件系统)
+IMAGE_SEND_MODES = (IMAGE_SEND_BASE64, IMAGE_SEND_FILE)
+
+CQ_IMAGE_BASE64_PREFIX = "[CQ:image,file=base64:"
+CQ_IMAGE_BASE64_MASK = "[CQ:image,file=base64:...]"
+
 
 def get_cq_image(file: Union[str, bytes, BytesIO, Path]) -> str:
     if isinstance(file, BytesIO):
@@ -15,6 +25,97 @@ def get_cq_image(file: Union[str, bytes, BytesIO, Path]) -> str:
         file = f"file:///{file}"
     return f"[CQ:image,file={file}]"
 
+
+class ImagePayloadCache:
+    """
+    本地图片路径 -> 图片CQ码 的LRU缓存.
+    以源文件的 mtime + 大小判断是否失效, 按CQ码总长度限制缓存大小, 单张超过上限的图片不缓存.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, send_mode: str = IMAGE_SEND_BASE64):
+        self.max_bytes = max_bytes
+        self.send_mode = send_mode if send_mode in IMAGE_SEND_MODES else IMAGE_SEND_BASE64
+        self.total_bytes = 0
+        self.stats: Dict[str, int] = {"hit": 0, "miss": 0, "evict": 0}
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], str]]" = OrderedDict()
+
+    def configure(self, max_bytes: Optional[int] = None, send_mode: Optional[str] = None) -> None:
+        """修改配置, 已有的缓存全部作废"""
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        if send_mode is not None:
+            self.send_mode = send_mode if send_mode in IMAGE_SEND_MODES else IMAGE_SEND_BASE64
+        self.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def get(self, path: Union[str, Path]) -> Optional[str]:
+        """返回图片的CQ码, 文件不存在时返回None"""
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self._entries.move_to_end(key)
+            self.stats["hit"] += 1
+            return entry[1]
+        self.stats["miss"] += 1
+        if entry is not None:
+            self._remove(key)
+        if self.send_mode == IMAGE_SEND_FILE:
+            payload = get_cq_image(Path(key))
+        else:
+            try:
+                payload = get_cq_image(Path(key).read_bytes())
+            except OSError:
+                return None
+        if len(payload) <= self.max_bytes:
+            self._entries[key] = (stamp, payload)
+            self.total_bytes += len(payload)
+            while self.total_bytes > self.max_bytes:
+                old_key = next(iter(self._entries))
+                self._remove(old_key)
+                self.stats["evict"] += 1
+        return payload
+
+    def _remove(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self.total_bytes -= len(payload)
+
+
+# 进程内共享, 由 Bot 启动时按配置调用 configure
+image_payload_cache = ImagePayloadCache()
+
+
+def get_cq_image_by_path(path: Union[str, Path]) -> Optional[str]:
+    """读取本地图片并生成CQ码 (经过缓存), 文件不存在时返回None"""
+    return image_payload_cache.get(path)
+
+
+def mask_base64_images(msg: str) -> str:
+    """将消息中的 base64 图片替换为占位符, 用于日志输出. 只用 str.find 定位, 不对 base64 内容做正则匹配"""
+    start = msg.find(CQ_IMAGE_BASE64_PREFIX)
+    if start == -1:
+        return msg
+    parts = []
+    pos = 0
+    while start != -1:
+        end = msg.find("]", start + len(CQ_IMAGE_BASE64_PREFIX))
+        if end == -1:
+            break
+        parts.append(msg[pos:start])
+        parts.append(CQ_IMAGE_BASE64_MASK)
+        pos = end + 1
+        start = msg.find(CQ_IMAGE_BASE64_PREFIX, pos)
+    parts.append(msg[pos:])
+    return "".join(parts)
+
+
 def get_cq_reply(message_id: str) -> str:
     if message_id.isdigit():
         return f"[CQ:reply,id={message_id}]\n"
@@ -25,4 +126,4 @@ def get_cq_at(user_id: str) ->str:
     if user_id.isdigit():
         return f"[CQ:at,qq={user_id}]"
     else:
-        return f"@{user_id}"
\ No newline at end of file
+        return f"@{user_id}"
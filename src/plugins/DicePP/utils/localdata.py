@@ -1,9 +1,10 @@
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 import os
 import json
 import aiofiles
-import openpyxl
-from openpyxl.comments import Comment
+
+if TYPE_CHECKING:
+    import openpyxl  # openpyxl 导入较慢, 只在读写 xlsx 时加载
 
 
 def read_json(path: str) -> dict:
@@ -35,10 +36,11 @@ async def update_json_async(json_dict: dict, path: str) -> None:
         await f.write(json_str)
 
 
-def read_xlsx(path: str) -> openpyxl.Workbook:
+def read_xlsx(path: str) -> "openpyxl.Workbook":
     """
     读取xlsx, 记得之后手动关闭workbook
     """
+    import openpyxl
     wb = openpyxl.load_workbook(path)
     wb_title = path.rsplit("/", maxsplit=1)[-1]
     wb_title = wb_title.rsplit("\\", maxsplit=1)[-1]
@@ -48,12 +50,14 @@ def read_xlsx(path: str) -> openpyxl.Workbook:
     return wb
 
 
-def update_xlsx(workbook: openpyxl.Workbook, path: str) -> None:
+def update_xlsx(workbook: "openpyxl.Workbook", path: str) -> None:
     workbook.save(path)
 
 
-def get_empty_col_based_workbook(keywords: List[str], keyword_comments: Dict[str, str]) -> openpyxl.Workbook:
+def get_empty_col_based_workbook(keywords: List[str], keyword_comments: Dict[str, str]) -> "openpyxl.Workbook":
     """获得一个模板工作簿"""
+    import openpyxl
+    from openpyxl.comments import Comment
     wb = openpyxl.Workbook()
     for name in wb.sheetnames:
         del wb[name]
@@ -64,7 +68,7 @@ def get_empty_col_based_workbook(keywords: List[str], keyword_comments: Dict[str
     return wb
 
 
-def col_based_workbook_to_dict(wb: openpyxl.Workbook, keywords: List[str], error_info: List[str]) -> dict:
+def col_based_workbook_to_dict(wb: "openpyxl.Workbook", keywords: List[str], error_info: List[str]) -> dict:
     """
     将已经读取的 column based 工作簿转换为dict, 要求第一行是关键字, 后续行是对应内容, 如果sheet中没有任何内容或关键字不完整则不会创建对应的字典
     Args:
@@ -1,36 +1,48 @@
+import re
+from bisect import bisect_right
+from itertools import accumulate
 from typing import List, Iterable
 
+_CJK_CHAR_RE = re.compile("[\u4e00-\u9fff]")
+
 
 def estimate_tokens(text: str) -> float:
     """基于字符统计的 token 估算策略，为性能考虑不引入真实 tokenizer。
     中文字符按 1 token，其余按每 4 字符 1 token。
     所有调用方均通过本函数估算，调整策略时只需修改此处即可。
+    估算对拼接可加：estimate_tokens(a + b) == estimate_tokens(a) + estimate_tokens(b)。
     """
-    cn_chars = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    if text.isascii():
+        return len(text) / 4
+    cn_chars = len(_CJK_CHAR_RE.findall(text))
     other_chars = len(text) - cn_chars
     return cn_chars + other_chars / 4
 
 
+def truncate_by_tokens(text: str, max_tokens: float) -> str:
+    """截取估算 token 不超过 max_tokens 的最长前缀（至少保留 1 个字符）。
+    使用前缀累计成本数组 + 二分查找，线性时间。
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if text.isascii():
+        return text[:max(1, int(max_tokens * 4))]
+    cumulative = list(accumulate(1.0 if "\u4e00" <= ch <= "\u9fff" else 0.25 for ch in text))
+    return text[:max(1, bisect_right(cumulative, max_tokens))]
+
+
+# 全角空格 -> 空格, 中文句号 -> 英文句号, 其余全角字符 (U+FF01~U+FF5E) 位移回半角
+# 。，＋－＝＃：；（）ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｙｗｘｙｚ等
+FULLWIDTH_TO_ASCII = {0x3000: 0x20, 0x3002: 0x2E, **{code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}}
+
+
 def to_english_str(input_str: str) -> str:
     """
     将字符串中的中文符号与全角字符转为英文
     """
     if type(input_str) != str:
         raise ValueError(f'ChineseToEnglishSymbol: Input {input_str} must be str type')
-    output_str = ""
-    for character in input_str:
-        code: int = ord(character)
-        if code == 12288: # 全角空格 变 普通空格
-            code = 32
-        elif code == 12290: # 中文句号 变 英文句号
-            code = 46
-        elif code >= 65281 and code <= 65374: # 剩下的全角火星文全部位移回半角
-            code -= 65248
-        output_str += chr(code)
-    """
-    。，＋－＝＃：；（）ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｙｗｘｙｚ等
-    """
-    return output_str
+    return input_str.translate(FULLWIDTH_TO_ASCII)
 
 
 def match_substring(substring: str, str_list: Iterable[str]) -> List[str]:
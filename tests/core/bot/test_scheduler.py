@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from core.bot.scheduler import TickScheduler
+
+
+class _Dispatch:
+    def __init__(self):
+        self.commands = []
+
+    async def __call__(self, commands):
+        self.commands.extend(commands)
+
+
+@pytest.mark.unit
+class TestTickScheduler:
+    @pytest.mark.asyncio
+    async def test_jobs_run_independently(self):
+        dispatch = _Dispatch()
+        scheduler = TickScheduler(dispatch)
+        fast_runs = []
+
+        async def fast():
+            fast_runs.append(time.perf_counter())
+            return ["fast"]
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        scheduler.add_job("fast", fast, 0.02, jitter=0)
+        scheduler.add_job("slow", slow, 0.02, jitter=0)
+        scheduler.start()
+        await asyncio.sleep(0.25)
+        scheduler.stop()
+        # 慢任务不会阻塞快任务
+        assert len(fast_runs) >= 5
+        assert dispatch.commands[:2] == ["fast", "fast"]
+        metrics = scheduler.get_metrics()
+        # 慢任务运行期间到期的调度被跳过, 不会堆积
+        assert metrics["slow"]["skipped"] >= 5
+        assert not scheduler.jobs["slow"].is_running
+
+    @pytest.mark.asyncio
+    async def test_failure_and_timeout_metrics(self):
+        scheduler = TickScheduler(_Dispatch())
+
+        async def broken():
+            raise ValueError("boom")
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        scheduler.add_job("broken", broken, 0.02, jitter=0)
+        scheduler.add_job("hang", hang, 0.02, jitter=0, timeout=0.05)
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        scheduler.stop()
+        metrics = scheduler.get_metrics()
+        assert metrics["broken"]["failures"] == metrics["broken"]["runs"] >= 2
+        assert "boom" in metrics["broken"]["last_error"]
+        assert metrics["hang"]["timeouts"] >= 1
+        assert metrics["hang"]["max_duration"] >= 0.05
+
+    @pytest.mark.asyncio
+    async def test_run_once_waits_for_start(self):
+        dispatch = _Dispatch()
+        scheduler = TickScheduler(dispatch)
+
+        async def task():
+            return ["done"]
+
+        def sync_task():
+            return ["sync"]
+
+        async def too_slow():
+            await asyncio.sleep(10)
+
+        scheduler.run_once(task)
+        scheduler.run_once(sync_task, is_async=False)
+        scheduler.run_once(too_slow, timeout=0.05, timeout_callback=lambda: ["timeout"])
+        await asyncio.sleep(0.05)
+        assert dispatch.commands == []
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        scheduler.stop()
+        assert sorted(dispatch.commands) == ["done", "sync", "timeout"]
+
+    @pytest.mark.asyncio
+    async def test_jitter_and_replace(self):
+        scheduler = TickScheduler(_Dispatch())
+
+        async def noop():
+            return None
+
+        job = scheduler.add_job("job", noop, 10, jitter=0.5, initial_delay=1)
+        delays = [job.next_delay() for _ in range(50)]
+        assert all(10 <= delay <= 15 for delay in delays)
+        assert len(set(delays)) > 1
+        assert 1 <= job.next_delay(first=True) <= 6
+        replaced = scheduler.add_job("job", noop, 5)
+        assert scheduler.jobs == {"job": replaced}
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import shutil
+from unittest.async_case import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import pytest
+
+from core.communication import GroupInfo
+from core.data.models import GroupStat
+from core.statistics import GroupStatInfo
+
+
+def _group_info(group_id: str, name: str, member_count: int, max_member: int = 200) -> GroupInfo:
+    info = GroupInfo(group_id)
+    info.group_name, info.member_count, info.max_member_count = name, member_count, max_member
+    return info
+
+
+class _FakeProxy:
+    """只实现 update_group_info_all 用到的接口"""
+
+    def __init__(self, group_list, detail):
+        self.group_list = group_list
+        self.detail = detail
+        self.active = 0
+        self.max_active = 0
+
+    async def get_group_list(self):
+        return self.group_list
+
+    async def get_group_info(self, group_id: str):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if group_id not in self.detail:
+            raise RuntimeError("group not found")
+        return self.detail[group_id]
+
+
+@pytest.mark.integration
+class TestUpdateGroupInfoAll(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        from core.bot import Bot
+        self.bot = Bot("test_group_info_bot", no_tick=True)
+        await self.bot.delay_init_command()
+
+    async def asyncTearDown(self):
+        await self.bot.shutdown_async()
+        shutil.rmtree(self.bot.data_path, ignore_errors=True)
+
+    async def _meta(self, group_id: str):
+        row = await self.bot.db.group_stat.get(group_id)
+        stat = GroupStatInfo()
+        stat.deserialize(row.data)
+        return stat.meta
+
+    async def test_bulk_merge(self):
+        old = GroupStatInfo()
+        old.meta.warn_time = 2
+        await self.bot.db.group_stat.upsert(GroupStat(group_id="g1", data=old.serialize()))
+        left = GroupStatInfo()
+        left.meta.update("旧群", 10, 200)
+        await self.bot.db.group_stat.upsert(GroupStat(group_id="left", data=left.serialize()))
+
+        group_list = [_group_info("g1", "群一", 10), _group_info("g2", "群二", 0, 0), _group_info("g3", "群三", 0, 0)]
+        self.bot.proxy = _FakeProxy(group_list, {"g2": _group_info("g2", "", 42, 500)})
+        with patch.object(self.bot.db.group_stat, "upsert", side_effect=AssertionError("应批量写入")):
+            result = await self.bot.update_group_info_all()
+        self.assertEqual([info.group_id for info in result], ["g1", "g2", "g3"])
+
+        g1 = await self._meta("g1")
+        self.assertEqual((g1.name, g1.member_count, g1.warn_time), ("群一", 10, 2))
+        g2 = await self._meta("g2")
+        self.assertEqual((g2.name, g2.member_count, g2.max_member), ("群二", 42, 500))
+        g3 = await self._meta("g3")  # 查询失败时保留群列表中的信息
+        self.assertEqual((g3.name, g3.member_count), ("群三", 0))
+        left_meta = await self._meta("left")
+        self.assertEqual((left_meta.name, left_meta.member_count, left_meta.max_member), ("旧群", -1, -1))
+
+    async def test_member_fetch_concurrency_is_bounded(self):
+        from core.bot import dicebot
+        group_list = [_group_info(f"g{i}", f"群{i}", 0, 0) for i in range(30)]
+        detail = {info.group_id: _group_info(info.group_id, "", 5) for info in group_list}
+        self.bot.proxy = _FakeProxy(group_list, detail)
+        await self.bot.update_group_info_all()
+        self.assertLessEqual(self.bot.proxy.max_active, dicebot.GROUP_INFO_FETCH_CONCURRENCY)
+        self.assertGreater(self.bot.proxy.max_active, 1)
+        self.assertEqual((await self._meta("g29")).member_count, 5)
@@ -0,0 +1,150 @@
+"""
+Performance benchmark: preprocess_msg normalization
+====================================================
+Compares the legacy four-pass pipeline (per-char full-width loop, lower/strip,
+html.unescape, zhconv) against the fused, table-driven preprocess_msg on a
+realistic chat corpus: dice commands, short Chinese chat, traditional Chinese,
+HTML entities from the adapter and long pasted text.
+
+Usage
+-----
+Run from the project root (with the virtualenv active):
+
+    python tests/core/communication/bench_preprocess_msg.py
+
+Output includes:
+- Wall-clock time per corpus category for legacy and optimized paths (median of runs)
+- Speedup ratio
+- PASS/FAIL verdict against the minimum improvement threshold for the full corpus
+
+Regression Detection
+--------------------
+Set the environment variable PREPROCESS_BENCH_THRESHOLD (default 2.0) to override
+the minimum acceptable speedup ratio on the mixed corpus:
+
+    PREPROCESS_BENCH_THRESHOLD=2.0 python tests/core/communication/bench_preprocess_msg.py
+
+Notes
+-----
+- The optimized path is timed with its LRU cache enabled, as in production;
+  the "uncached" row times the uncached normalizer to show the cold cost.
+- Outputs of both paths are compared before timing; a mismatch fails the run.
+- Warmup iteration (first run) is excluded from the median.
+"""
+
+import os
+import sys
+import time
+import random
+import statistics
+from pathlib import Path
+from typing import Callable, List
+
+# ---------------------------------------------------------------------------
+# Path setup – allow running from repo root without installing the package
+# ---------------------------------------------------------------------------
+_REPO_ROOT = Path(__file__).parent.parent.parent.parent  # tests/../../..
+_SRC = _REPO_ROOT / "src" / "plugins" / "DicePP"
+_TESTS = _REPO_ROOT / "tests" / "core" / "communication"
+for _p in (_SRC, _TESTS):
+    if str(_p) not in sys.path:
+        sys.path.insert(0, str(_p))
+
+from core.communication.process import preprocess_msg, _normalize
+from test_process import legacy_preprocess_msg
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+RUNS = 5        # number of timed runs per category (first is warmup)
+THRESHOLD = float(os.environ.get("PREPROCESS_BENCH_THRESHOLD", "2.0"))
+
+_rng = random.Random(20240101)
+
+COMMANDS = [
+    ".r", ".r 1d20", ".R 1D20+5 攻击", ".rh d100", ".ra 侦查", ".jrrp", ".draw 塔罗牌",
+    ".init", ".ri +2", ".rexp 3d6", ".查询 火球术", ".help", ".log on", ".coc", ".dnd",
+    "。ｒ　１ｄ２０", "．ｒａ　聆听", ".r 4d6k3 属性", ".hp -5", ".nn 小明",
+]
+CHAT = [
+    "哈哈哈哈", "今天团几点开？", "我先去吃个饭", "好耶！", "这个骰子是不是有问题啊",
+    "草", "??", "ok", "收到", "明天见~", "大成功！！！", "有人在吗", "GM我想问一下规则",
+    "這個法術怎麼用", "我們今晚開團嗎", "&#91;图片&#93;", "&amp;lt;test&amp;gt;", "lol",
+]
+LONG_LINES = [
+    "你推开了那扇吱呀作响的木门，一股潮湿的霉味扑面而来。房间里昏暗无光，只有窗缝透进来的一缕月光，"
+    "照在地板上厚厚的灰尘上。墙角堆着几个破旧的木箱，其中一个的盖子半开着，里面似乎有什么东西在反光。",
+    "The ancient dragon unfurls its wings, casting a shadow over the entire valley. "
+    "Roll for initiative, and remember that the lair actions happen on initiative count 20.",
+    "「在那遙遠的北方，有一座被冰雪覆蓋的城堡」，老人緩緩說道，『傳說那裡住著一位沉睡的公主』。",
+]
+
+
+def _corpus(items: List[str], n: int) -> List[str]:
+    return [_rng.choice(items) for _ in range(n)]
+
+
+CATEGORIES = [
+    ("commands", _corpus(COMMANDS, 20_000)),
+    ("chat", _corpus(CHAT, 20_000)),
+    ("long", _corpus(LONG_LINES, 2_000)),
+]
+MIXED = _corpus(COMMANDS + CHAT, 40_000) + _corpus(LONG_LINES, 1_000)
+_rng.shuffle(MIXED)
+
+
+def _timed(fn: Callable[[str], str], corpus: List[str]) -> float:
+    t0 = time.perf_counter()
+    for msg in corpus:
+        fn(msg)
+    return time.perf_counter() - t0
+
+
+def _median_time(fn, corpus: List[str], runs: int) -> float:
+    times: List[float] = []
+    for i in range(runs):
+        t = _timed(fn, corpus)
+        if i > 0:  # skip warmup
+            times.append(t)
+    return statistics.median(times)
+
+
+def _check_equivalence() -> bool:
+    for msg in set(COMMANDS + CHAT + LONG_LINES):
+        if preprocess_msg(msg) != legacy_preprocess_msg(msg):
+            print(f"MISMATCH: {msg!r}")
+            return False
+    return True
+
+
+def run_benchmark() -> bool:
+    if not _check_equivalence():
+        return False
+    print(f"\n{'='*70}")
+    print(f"  preprocess_msg Benchmark  (threshold={THRESHOLD:.1f}x, runs={RUNS})")
+    print(f"{'='*70}")
+    print(f"{'Corpus':<16} {'Msgs':>7}  {'Legacy(s)':>10}  {'Optimized(s)':>12}  {'Speedup':>8}")
+    print(f"{'-'*70}")
+
+    rows = list(CATEGORIES) + [("mixed", MIXED)]
+    speedup = 0.0
+    for name, corpus in rows:
+        base_t = _median_time(legacy_preprocess_msg, corpus, RUNS)
+        opt_t = _median_time(preprocess_msg, corpus, RUNS)
+        speedup = base_t / opt_t if opt_t > 0 else float("inf")
+        print(f"{name:<16} {len(corpus):>7}  {base_t:>10.3f}  {opt_t:>12.3f}  {speedup:>7.2f}x")
+
+    cold_t = _median_time(_normalize, MIXED, RUNS)
+    base_t = _median_time(legacy_preprocess_msg, MIXED, RUNS)
+    print(f"{'mixed/uncached':<16} {len(MIXED):>7}  {base_t:>10.3f}  {cold_t:>12.3f}  {base_t / cold_t:>7.2f}x")
+
+    ok = speedup >= THRESHOLD
+    print(f"{'='*70}")
+    print(f"  {'PASS' if ok else 'REGRESSION DETECTED'} (mixed speedup {speedup:.2f}x)")
+    print(f"{'='*70}\n")
+    return ok
+
+
+if __name__ == "__main__":
+    ok = run_benchmark()
+    sys.exit(0 if ok else 1)
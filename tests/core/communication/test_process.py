@@ -0,0 +1,69 @@
+import html
+import unittest
+
+import pytest
+from zhconv import convert
+
+from core.communication.process import preprocess_msg, _normalize_cached, PREPROCESS_CACHE_MAX_LEN
+
+
+def legacy_preprocess_msg(msg_str: str) -> str:
+    """逐步处理的旧实现, 作为对照"""
+    result = ""
+    for char in msg_str:
+        code = ord(char)
+        if code == 12288:
+            code = 32
+        elif code == 12290:
+            code = 46
+        elif 65281 <= code <= 65374:
+            code -= 65248
+        result += chr(code)
+    result = result.lower().strip()
+    result = html.unescape(result)
+    return convert(result, 'zh-cn')
+
+
+@pytest.mark.unit
+class TestPreprocessMsg(unittest.TestCase):
+    CASES = [
+        "",
+        "   ",
+        ".R 1D20+5 攻击",
+        ".r1d20",
+        "ＡＢＣ！　＃１２３。",
+        "&#36;R 1D6",
+        "&amp;&lt;&gt;",
+        "&#20320;好",
+        "&#24460;面",
+        "後發臺灣",
+        "「引用」『书名』｢半角｣",
+        "  .JRRP  ",
+        "&#65281;",
+        "ΣİǅÀ",
+        "hello & world",
+        "長" * 200,
+    ]
+
+    def test_matches_legacy(self):
+        for msg in self.CASES:
+            self.assertEqual(preprocess_msg(msg), legacy_preprocess_msg(msg), msg)
+
+    def test_ascii_fast_path(self):
+        self.assertEqual(preprocess_msg("  .R 1D20  "), ".r 1d20")
+        self.assertEqual(preprocess_msg("&#36;&amp;"), "$&")
+
+    def test_entity_decoded_to_traditional(self):
+        # 实体转义后出现繁体字, 仍然需要简体转换
+        self.assertEqual(preprocess_msg("&#24460;"), "后")
+
+    def test_brackets_converted(self):
+        self.assertEqual(preprocess_msg("「你好」"), "“你好”")
+
+    def test_short_messages_cached(self):
+        _normalize_cached.cache_clear()
+        preprocess_msg(".r 1d20")
+        preprocess_msg(".r 1d20")
+        self.assertEqual(_normalize_cached.cache_info().hits, 1)
+        preprocess_msg("x" * (PREPROCESS_CACHE_MAX_LEN + 1))
+        self.assertEqual(_normalize_cached.cache_info().currsize, 1)
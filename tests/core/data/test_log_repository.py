@@ -320,3 +320,33 @@ class TestLogRepository:
 
         records = await log_repo.query_by_user("user1", limit=10)
         assert len(records) >= 1
+
+    @pytest.mark.asyncio
+    async def test_iter_records_raw_batches_in_id_order(self, log_repo):
+        session = LogSession(
+            id="session1",
+            group_id="group1",
+            name="Test",
+            recording=True,
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        await log_repo.save_session(session)
+        for i in range(7):
+            await log_repo.add_record(LogRecord(
+                log_id="session1",
+                time=datetime(2024, 1, 1, 12, 0, i),
+                user_id=f"user{i % 2}",
+                nickname="User",
+                content=f"msg{i}",
+                source="user",
+                message_id=str(100 + i),
+            ))
+
+        assert await log_repo.count_records("session1") == 7
+        batches = [batch async for batch in log_repo.iter_records_raw("session1", batch_size=3)]
+        assert [len(b) for b in batches] == [3, 3, 1]
+        flat = [r for b in batches for r in b]
+        assert [r["content"] for r in flat] == [f"msg{i}" for i in range(7)]
+        assert flat[0]["message_id"] == "100"
+        assert [b async for b in log_repo.iter_records_raw("missing")] == []
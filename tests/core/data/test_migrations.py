@@ -35,12 +35,12 @@ async def test_runner_applies_v1_and_noop_on_second_run():
             runner = MigrationRunner(db=db, log_db=log_db, registry=default_registry())
             first = await runner.migrate_up()
             assert first.current_version == 0
-            assert first.target_version == 2
-            assert first.applied_versions == [1, 2]
+            assert first.target_version == 4
+            assert first.applied_versions == [1, 2, 3, 4]
 
             second = await runner.migrate_up()
-            assert second.current_version == 2
-            assert second.target_version == 2
+            assert second.current_version == 4
+            assert second.target_version == 4
             assert second.applied_versions == []
 
             cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='karma'")
@@ -89,14 +89,130 @@ async def test_runner_retry_after_failure_succeeds():
             await log_db.close()
 
 
+@pytest.mark.asyncio
+async def test_v3_backfills_characters_dnd_projection():
+    from core.data.models import DNDCharacter
+
+    char = DNDCharacter(group_id="g1", user_id="u1", is_init=True)
+    char.hp_info.initialize(7, 10, 2)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = await aiosqlite.connect(os.path.join(tmpdir, "bot_data.db"))
+        log_db = await aiosqlite.connect(os.path.join(tmpdir, "log.db"))
+        try:
+            registry = MigrationRegistry()
+            registry.register(BaselineMigrationV1())
+            await MigrationRunner(db=db, log_db=log_db, registry=registry).migrate_up()
+            await db.execute(
+                "INSERT INTO characters_dnd (group_id, user_id, data, updated_at) VALUES (?, ?, ?, '')",
+                ("g1", "u1", char.model_dump_json()),
+            )
+            await db.commit()
+
+            result = await MigrationRunner(db=db, log_db=log_db, registry=default_registry()).migrate_up()
+            assert result.applied_versions == [2, 3, 4]
+            cursor = await db.execute("SELECT hp_cur, hp_max, hp_temp, hp_alive, is_init FROM characters_dnd")
+            assert await cursor.fetchall() == [(7, 10, 2, 1, 1)]
+            cursor = await db.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_characters_dnd_group_init'"
+            )
+            assert await cursor.fetchone() is not None
+        finally:
+            await db.close()
+            await log_db.close()
+
+
+@pytest.mark.asyncio
+async def test_v4_backfills_stat_counter_from_blobs():
+    from core.data.models import GroupStat
+    from core.statistics import GroupStatInfo
+    from utils.time import int_to_datetime
+
+    update_time = 1700000000  # 2023-11-15 06:13 东八区
+    assert int_to_datetime(update_time).date().isoformat() == "2023-11-15"
+    d20 = ["0"] * 60
+    d20[19] = d20[59] = "1"  # 今日与累计的 20 点各一次
+    # 旧版紧凑格式: 版本;消息;指令;掷骰;元信息, 计数为 今日|昨日|累计|更新时间
+    data = f"2;3|2|10|{update_time};;1|0|1|{update_time}&{'|'.join(d20)};-1|-1|0|0|测试群"
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = await aiosqlite.connect(os.path.join(tmpdir, "bot_data.db"))
+        log_db = await aiosqlite.connect(os.path.join(tmpdir, "log.db"))
+        try:
+            registry = MigrationRegistry()
+            registry.register(BaselineMigrationV1())
+            await MigrationRunner(db=db, log_db=log_db, registry=registry).migrate_up()
+            await db.execute(
+                "INSERT INTO group_stat (group_id, data, updated_at) VALUES (?, ?, '')",
+                ("g1", GroupStat(group_id="g1", data=data).model_dump_json()),
+            )
+            await db.commit()
+
+            await MigrationRunner(db=db, log_db=log_db, registry=default_registry()).migrate_up()
+            cursor = await db.execute("SELECT metric, day, value FROM stat_counter WHERE entity_id = 'g1' ORDER BY metric, day")
+            assert await cursor.fetchall() == [
+                ("d20:20", 20231115, 1),
+                ("msg", 0, 5),
+                ("msg", 20231114, 2),
+                ("msg", 20231115, 3),
+                ("roll", 20231115, 1),
+            ]
+            cursor = await db.execute("SELECT json_extract(data, '$.data') FROM group_stat WHERE group_id = 'g1'")
+            info = GroupStatInfo()
+            info.deserialize((await cursor.fetchone())[0])
+            assert info.meta.name == "测试群"
+        finally:
+            await db.close()
+            await log_db.close()
+
+
+@pytest.mark.asyncio
+async def test_v4_keeps_last_active_day_of_idle_user():
+    """两天前最后一次用指令的用户: 每日更新已把今日/昨日清零, 仍要在 update_time 当天留下计数"""
+    from core.data.models import UserStat
+    from core.data import StatCounterRepository
+
+    update_time = 1700000000  # 2023-11-15 06:13 东八区
+    d20 = "|".join(["0"] * 60)
+    # 旧版紧凑格式: 版本;消息;指令;掷骰;元信息, 计数为 今日|昨日|累计|更新时间
+    idle = f"2;0|0|0|0;8|0|0|5|{update_time};0|0|0|0&{d20};"
+    shifted = f"2;0|0|0|0;8|0|2|6|{update_time};0|0|0|0&{d20};"  # 只经过了一次每日更新
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = await aiosqlite.connect(os.path.join(tmpdir, "bot_data.db"))
+        log_db = await aiosqlite.connect(os.path.join(tmpdir, "log.db"))
+        try:
+            registry = MigrationRegistry()
+            registry.register(BaselineMigrationV1())
+            await MigrationRunner(db=db, log_db=log_db, registry=registry).migrate_up()
+            for user_id, data in (("u1", idle), ("u2", shifted)):
+                await db.execute(
+                    "INSERT INTO user_stat (user_id, data, updated_at) VALUES (?, ?, '')",
+                    (user_id, UserStat(user_id=user_id, data=data).model_dump_json()),
+                )
+            await db.commit()
+
+            await MigrationRunner(db=db, log_db=log_db, registry=default_registry()).migrate_up()
+            cursor = await db.execute(
+                "SELECT entity_id, metric, day, value FROM stat_counter WHERE entity_type = 'user' ORDER BY entity_id, day"
+            )
+            assert await cursor.fetchall() == [
+                ("u1", "cmd:8", 0, 4),
+                ("u1", "cmd:8", 20231115, 1),
+                ("u2", "cmd:8", 0, 4),
+                ("u2", "cmd:8", 20231115, 2),
+            ]
+            assert await StatCounterRepository(db).last_active_day("user", "cmd:") == {"u1": 20231115, "u2": 20231115}
+        finally:
+            await db.close()
+            await log_db.close()
+
+
 @pytest.mark.asyncio
 async def test_bot_database_connect_runs_full_baseline_schema():
     bot_id = "test_migration_e2e"
     db = BotDatabase(bot_id)
     await db.connect()
     try:
-        assert await db.schema_version() == 2
-        assert await db.target_schema_version() == 2
+        assert await db.schema_version() == 4
+        assert await db.target_schema_version() == 4
         # Smoke check: repositories and log tables are available after migration.
         assert db.karma is not None
         assert db.log is not None
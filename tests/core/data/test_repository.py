@@ -99,3 +99,78 @@ class TestRepository:
 
         with pytest.raises(ValueError):
             await repo.delete("user1", "group1", "extra")
+
+    @pytest.mark.asyncio
+    async def test_list_in(self, repo, monkeypatch):
+        import core.data.repository as repository_module
+        monkeypatch.setattr(repository_module, "IN_QUERY_CHUNK", 2)
+        for i in range(5):
+            await repo.save(UserKarma(user_id=f"user{i}", group_id="group1", value=i))
+        await repo.save(UserKarma(user_id="user1", group_id="group2", value=100))
+        await repo.save(UserKarma(user_id="user1", group_id="group3", value=200))
+
+        results = await repo.list_in("user_id", ["user0", "user1", "user3", "user1", "missing"], group_id="group1")
+        assert sorted(r.value for r in results) == [0, 1, 3]
+
+        results = await repo.list_in("user_id", ["user1"], group_id=["group2", "group3"])
+        assert sorted(r.value for r in results) == [100, 200]
+        assert await repo.list_in("user_id", []) == []
+
+    @pytest.mark.asyncio
+    async def test_delete_many_and_write_hooks(self, repo):
+        seen = []
+        repo._write_hooks.append(seen.append)
+        await repo.save(UserKarma(user_id="user1", group_id="group1", value=1))
+        await repo.upsert_many([UserKarma(user_id="user2", group_id="group1", value=2),
+                                UserKarma(user_id="user3", group_id="group2", value=3)])
+        await repo.delete_many([("user1", "group1"), ("user3", "group2")])
+
+        assert [r.user_id for r in await repo.list_all()] == ["user2"]
+        assert seen == [
+            {"user_id": "user1", "group_id": "group1"},
+            {"user_id": "user2", "group_id": "group1"},
+            {"user_id": "user3", "group_id": "group2"},
+            {"user_id": "user1", "group_id": "group1"},
+            {"user_id": "user3", "group_id": "group2"},
+        ]
+        with pytest.raises(ValueError):
+            await repo.delete_many([("user1",)])
+
+    @pytest.mark.asyncio
+    async def test_list_projection(self):
+        import aiosqlite
+        from core.data.models import DNDCharacter, HPInfo, HP_PROJECTION_FIELDS
+        from core.data.database import CHARACTERS_DND_PROJECTIONS
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = await aiosqlite.connect(os.path.join(tmpdir, "test.db"))
+            try:
+                repo = Repository[DNDCharacter](
+                    db, DNDCharacter, "characters_dnd", ["group_id", "user_id"], projections=CHARACTERS_DND_PROJECTIONS
+                )
+                await repo._ensure_table()
+                char = DNDCharacter(group_id="g1", user_id="u1", is_init=True)
+                char.hp_info.initialize(12, 20, 3)
+                await repo.save(char)
+                await repo.upsert_many([
+                    DNDCharacter(group_id="g1", user_id="u2"),
+                    DNDCharacter(group_id="g2", user_id="u1", is_init=True),
+                ])
+                char.hp_info.take_damage(15)
+                await repo.save(char)
+
+                rows = await repo.list_projection(HP_PROJECTION_FIELDS, group_id="g1", is_init=1)
+                assert rows == [{"group_id": "g1", "user_id": "u1", "hp_cur": 0, "hp_max": 20, "hp_temp": 0, "hp_alive": 0}]
+                assert HPInfo.from_projection(rows[0]).get_info() == char.hp_info.get_info()
+
+                rows = await repo.list_projection(["is_init"], user_id=["u1", "u2"])
+                assert sorted((r["group_id"], r["user_id"], r["is_init"]) for r in rows) == [
+                    ("g1", "u1", 1), ("g1", "u2", 0), ("g2", "u1", 1)
+                ]
+                assert await repo.list_projection(["hp_cur"], user_id=[]) == []
+                with pytest.raises(ValueError):
+                    await repo.list_projection(["data"])
+                with pytest.raises(ValueError):
+                    await repo.list_projection(["hp_cur"], name="x")
+            finally:
+                await db.close()
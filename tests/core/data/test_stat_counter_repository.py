@@ -0,0 +1,126 @@
+import os
+import tempfile
+
+import pytest
+
+pytestmark = pytest.mark.integration
+
+from core.data import StatCounterRepository
+from core.data.migrations.v4_stat_counter import StatCounterMigrationV4
+from core.data.migrations.base import MigrationContext
+from core.statistics.counter import StatCounterBuffer, StatSummary, cmd_metric, d20_metric
+
+
+class TestStatCounterRepository:
+    @pytest.fixture
+    async def repo(self):
+        import aiosqlite
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = await aiosqlite.connect(os.path.join(tmpdir, "test.db"))
+            log_db = await aiosqlite.connect(os.path.join(tmpdir, "log.db"))
+            await StatCounterMigrationV4().up(MigrationContext(db=db, log_db=log_db))
+            yield StatCounterRepository(db)
+            await db.close()
+            await log_db.close()
+
+    @pytest.mark.asyncio
+    async def test_increment_accumulates(self, repo):
+        await repo.increment_many([("user", "u1", "msg", 20240101, 2), ("user", "u1", "msg", 20240102, 1)])
+        await repo.increment_many([("user", "u1", "msg", 20240101, 3)])
+        assert await repo.sum_by_metric("user", "u1") == {"msg": 6}
+        assert await repo.sum_by_metric("user", "u1", 20240101, 20240101) == {"msg": 5}
+        assert await repo.sum_by_metric("user", "u1", day_from=20240102) == {"msg": 1}
+
+    @pytest.mark.asyncio
+    async def test_sum_by_entity_and_last_active(self, repo):
+        await repo.increment_many([
+            ("group", "g1", cmd_metric(1), 20240101, 1),
+            ("group", "g1", "msg", 20240105, 4),
+            ("group", "g2", cmd_metric(2), 20240103, 2),
+            ("group", "g2", "msg", 20240103, 1),
+        ])
+        assert await repo.sum_by_entity("group", "msg") == {"g1": 4, "g2": 1}
+        assert await repo.last_active_day("group", "cmd:") == {"g1": 20240101, "g2": 20240103}
+        assert await repo.sum_by_entity_metric("group", 20240103) == {"g1": {"msg": 4}, "g2": {"cmd:2": 2, "msg": 1}}
+        assert sorted(await repo.list_entities("group")) == ["g1", "g2"]
+
+    @pytest.mark.asyncio
+    async def test_rollup_keeps_totals(self, repo):
+        await repo.increment_many([
+            ("user", "u1", "msg", 20230101, 1),
+            ("user", "u1", "msg", 20230601, 2),
+            ("user", "u1", "msg", 20240101, 4),
+        ])
+        assert await repo.rollup_before(20240101) == 2
+        assert await repo.sum_by_metric("user", "u1") == {"msg": 7}
+        assert await repo.sum_by_metric("user", "u1", 20230101, 20231231) == {}
+        # 再次折叠时累加到已有的折叠行上
+        await repo.increment_many([("user", "u1", "msg", 20240102, 8)])
+        await repo.rollup_before(20240103)
+        assert await repo.sum_by_metric("user", "u1", 0, 0) == {"msg": 15}
+
+    @pytest.mark.asyncio
+    async def test_rollup_keeps_latest_cmd_day(self, repo):
+        await repo.increment_many([
+            ("user", "u1", cmd_metric(1), 20230101, 1),
+            ("user", "u1", cmd_metric(1), 20230601, 2),
+            ("user", "u1", cmd_metric(2), 20230601, 1),
+            ("user", "u1", "msg", 20230601, 5),
+            ("user", "u2", cmd_metric(1), 20230101, 1),
+            ("user", "u2", cmd_metric(1), 20240102, 1),
+        ])
+        assert await repo.rollup_before(20240101, keep_latest_prefix="cmd:") == 3
+        assert await repo.last_active_day("user", "cmd:") == {"u1": 20230601, "u2": 20240102}
+        assert await repo.sum_by_metric("user", "u1", 0, 0) == {"cmd:1": 1, "msg": 5}
+        assert await repo.sum_by_metric("user", "u1") == {"cmd:1": 3, "cmd:2": 1, "msg": 5}
+
+    @pytest.mark.asyncio
+    async def test_delete_entities(self, repo):
+        await repo.increment_many([("user", f"u{i}", "msg", 20240101, 1) for i in range(5)])
+        await repo.increment_many([("group", "u0", "msg", 20240101, 1)])
+        await repo.delete_entities("user", ["u0", "u1", "u2"])
+        assert sorted(await repo.list_entities("user")) == ["u3", "u4"]
+        assert await repo.list_entities("group") == ["u0"]
+
+
+class TestStatCounterBuffer:
+    class _Repo:
+        def __init__(self, fail: bool = False):
+            self.fail = fail
+            self.rows = []
+
+        async def increment_many(self, rows):
+            if self.fail:
+                raise RuntimeError("db closed")
+            self.rows.extend(rows)
+
+    @pytest.mark.asyncio
+    async def test_merge_and_flush(self):
+        buffer = StatCounterBuffer()
+        for _ in range(3):
+            buffer.inc_entities([("meta", ""), ("user", "u1")], "msg")
+        buffer.inc("user", "u1", d20_metric(20), day=20240101)
+        assert len(buffer) == 3
+        repo = self._Repo()
+        assert await buffer.flush(repo) == 3
+        assert len(buffer) == 0
+        assert ("user", "u1", "d20:20", 20240101, 1) in repo.rows
+        assert sum(row[4] for row in repo.rows if row[2] == "msg") == 6
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_counts(self):
+        buffer = StatCounterBuffer()
+        buffer.inc("user", "u1", "msg", 2, day=20240101)
+        with pytest.raises(RuntimeError):
+            await buffer.flush(self._Repo(fail=True))
+        buffer.inc("user", "u1", "msg", 1, day=20240101)
+        repo = self._Repo()
+        await buffer.flush(repo)
+        assert repo.rows == [("user", "u1", "msg", 20240101, 3)]
+
+    def test_summary(self):
+        summary = StatSummary({"msg": 3, cmd_metric(4): 2, d20_metric(1): 1, d20_metric(20): 2})
+        assert summary.msg == 3 and summary.roll == 0
+        assert summary.cmd_flags() == {4: 2}
+        assert summary.d20_list()[0] == 1 and summary.d20_list()[19] == 2
@@ -0,0 +1,121 @@
+import datetime
+import json
+import unittest
+
+import pytest
+
+from core.statistics import MetaStatInfo, UserStatInfo, GroupStatInfo
+from core.statistics.basic_stat import ONLINE_PERIOD_DETAIL_DAYS, STAT_FORMAT_VERSION
+from utils.time import china_tz, int_to_datetime
+
+
+def _dt(day: int, hour: int = 0, minute: int = 0) -> datetime.datetime:
+    # 与 int_to_datetime 一致使用东八区, 结果不随运行机器的时区变化
+    base = datetime.datetime(2024, 1, 1, tzinfo=china_tz)
+    return base + datetime.timedelta(days=day, hours=hour, minutes=minute)
+
+
+def _legacy_group_stat_json(stat: GroupStatInfo) -> str:
+    """旧版 json 格式, 用于兼容性测试"""
+    meta = json.dumps({"name": stat.meta.name, "member": f"{stat.meta.member_count}|{stat.meta.max_member}",
+                       "up": stat.meta.update_time, "warn": stat.meta.warn_time})
+    return json.dumps({"msg": "5|0|5|0", "cmd": "", "roll": "0|0|0|0&" + "|".join(["0"] * 60), "meta": meta})
+
+
+@pytest.mark.unit
+class TestCompactStatFormat(unittest.TestCase):
+    def _group_stat(self) -> GroupStatInfo:
+        stat = GroupStatInfo()
+        stat.meta.update("测试群;名字|带分隔符", 10, 200)
+        stat.meta.warn_time = 1
+        return stat
+
+    def test_group_round_trip(self):
+        stat = self._group_stat()
+        data = stat.serialize()
+        self.assertTrue(data.startswith(STAT_FORMAT_VERSION + ";"))
+        self.assertNotIn("{", data)
+        restored = GroupStatInfo()
+        restored.deserialize(data)
+        self.assertEqual(restored.serialize(), data)
+        self.assertEqual(restored.meta.name, "测试群;名字|带分隔符")
+        self.assertEqual(restored.meta.warn_time, 1)
+
+    def test_legacy_formats_still_readable(self):
+        stat = self._group_stat()
+        restored = GroupStatInfo()
+        restored.deserialize(_legacy_group_stat_json(stat))
+        self.assertEqual(restored.serialize(), stat.serialize())
+
+        # 带计数字段的旧版紧凑格式, 计数由 v4 迁移转存, 这里只读取元信息
+        legacy_compact = f"2;5|0|5|0;1|3|0|3|0;0|0|0|0&{'|'.join(['0'] * 60)};{stat.meta.serialize()}"
+        restored = GroupStatInfo()
+        restored.deserialize(legacy_compact)
+        self.assertEqual(restored.serialize(), stat.serialize())
+
+        restored_user = UserStatInfo()
+        restored_user.deserialize(json.dumps({"msg": "2|0|2|0", "cmd": "", "roll": "", "meta": ""}))
+        self.assertEqual(restored_user.serialize(), UserStatInfo().serialize())
+
+    def test_counters_not_serialized(self):
+        self.assertEqual(UserStatInfo().serialize(), STAT_FORMAT_VERSION + ";")
+        self.assertLess(len(self._group_stat().serialize()), len(_legacy_group_stat_json(self._group_stat())))
+
+
+@pytest.mark.unit
+class TestOnlinePeriodCompaction(unittest.TestCase):
+    def test_merge_adjacent_periods(self):
+        stat = MetaStatInfo()
+        stat.online_period = [[_dt(0, 1), _dt(0, 2)], [_dt(0, 2, 5), _dt(0, 3)], [_dt(0, 5), _dt(0, 6)]]
+        stat.compact_online_period(_dt(1))
+        self.assertEqual(stat.online_period, [[_dt(0, 1), _dt(0, 3)], [_dt(0, 5), _dt(0, 6)]])
+        self.assertEqual(stat.online_daily, {})
+
+    def test_old_periods_become_daily_aggregates(self):
+        stat = MetaStatInfo()
+        now = _dt(ONLINE_PERIOD_DETAIL_DAYS + 10, 12)
+        stat.online_period = [[_dt(0, 23), _dt(1, 1)]]  # 跨天
+        stat.online_period += [[_dt(day, 8), _dt(day, 9)] for day in range(2, ONLINE_PERIOD_DETAIL_DAYS + 11)]
+        stat.compact_online_period(now)
+        self.assertEqual(stat.online_daily[_dt(0).date()], 3600)
+        self.assertEqual(stat.online_daily[_dt(1).date()], 3600)
+        self.assertEqual(len(stat.online_period), ONLINE_PERIOD_DETAIL_DAYS + 1)
+        self.assertGreaterEqual(stat.online_period[0][0], _dt(10))
+        self.assertEqual(stat.online_period[-1], [_dt(ONLINE_PERIOD_DETAIL_DAYS + 10, 8), _dt(ONLINE_PERIOD_DETAIL_DAYS + 10, 9)])
+
+        restored = MetaStatInfo()
+        restored.deserialize(stat.serialize())
+        self.assertEqual(restored.online_period, stat.online_period)
+        self.assertEqual(restored.online_daily, stat.online_daily)
+
+    def test_many_boots_stay_bounded(self):
+        stat = MetaStatInfo()
+        for day in range(1000):
+            stat.online_period.append([_dt(day, 1), _dt(day, 2)])
+            stat.online_period.append([_dt(day, 3), _dt(day, 4)])
+        stat.compact_online_period(_dt(1000))
+        self.assertLessEqual(len(stat.online_period), 2 * ONLINE_PERIOD_DETAIL_DAYS)
+        self.assertEqual(sum(stat.online_daily.values()), 2 * 3600 * (1000 - ONLINE_PERIOD_DETAIL_DAYS))
+
+    def test_legacy_meta_json(self):
+        period = [int(_dt(0, 1).timestamp()), int(_dt(0, 2).timestamp())]
+        legacy = json.dumps({"online_period": [period], "msg": "1|0|1|0", "cmd": ""})
+        stat = MetaStatInfo()
+        stat.deserialize(legacy)
+        self.assertEqual(stat.online_period, [[int_to_datetime(period[0]), int_to_datetime(period[1])]])
+        self.assertEqual(stat.online_period, [[_dt(0, 1), _dt(0, 2)]])
+
+    def test_legacy_meta_compact(self):
+        period = f"{int(_dt(0, 1).timestamp())}-{int(_dt(0, 2).timestamp())}"
+        stat = MetaStatInfo()
+        stat.deserialize(f"2;1|0|1|0;;{period};20231201:60")
+        self.assertEqual(stat.online_period, [[_dt(0, 1), _dt(0, 2)]])
+        self.assertEqual(stat.online_daily, {datetime.date(2023, 12, 1): 60})
+        self.assertEqual(stat.serialize(), f"{STAT_FORMAT_VERSION};{period};20231201:60")
+
+    def test_first_update_compacts(self):
+        stat = MetaStatInfo()
+        stat.online_period = [[_dt(0, 1), _dt(0, 2)], [_dt(0, 2), _dt(0, 3)]]
+        stat.update(is_first_time=True)
+        self.assertEqual(len(stat.online_period), 1)  # 旧的两段已合并并折算, 只剩本次启动的时段
+        self.assertEqual(sum(stat.online_daily.values()), 2 * 3600)
@@ -5,6 +5,7 @@ PersonaCommand 集成测试框架
 使用 MagicMock/AsyncMock 构造测试环境，不依赖真实 NoneBot 事件循环。
 """
 
+import asyncio
 import pytest
 import time
 from datetime import datetime, timedelta
@@ -12,6 +13,7 @@ from unittest.mock import MagicMock, AsyncMock, patch
 from unittest.async_case import IsolatedAsyncioTestCase
 
 from plugins.DicePP.module.persona.command import PersonaCommand
+from plugins.DicePP.module.persona.orchestrator import CHAT_ERROR_REPLY
 from plugins.DicePP.module.persona.data.models import (
     RelationshipState,
     UserProfile,
@@ -113,7 +115,7 @@ class TestCanProcessMsg(IsolatedAsyncioTestCase):
         bot.config.persona_ai.observe_group_enabled = True
         cmd = _make_cmd(bot)
         cmd.data_store = AsyncMock()
-        cmd._observation_buffers_loaded = True
+        cmd._legacy_observation_buffers_migrated = True
         meta = _make_group_meta("hello", to_me=False)
         ok, _, _ = await cmd.can_process_msg("hello", meta)
         assert ok is False
@@ -366,7 +368,7 @@ class TestUserCommands(IsolatedAsyncioTestCase):
         assert "已开启 AI 对话" in cmds[0].msg
 
     async def test_key_commands(self):
-        with patch("plugins.DicePP.module.persona.command.PersonaDataStore._get_encryption_key", return_value="fake_secret"):
+        with patch("plugins.DicePP.module.persona.data.store.PersonaDataStore._get_encryption_key", return_value="fake_secret"):
             self.store.get_user_llm_config = AsyncMock(return_value=None)
             meta = _make_private_meta(".ai key")
             cmds = await self.cmd.process_msg(".ai key", meta, None)
@@ -394,7 +396,7 @@ class TestUserCommands(IsolatedAsyncioTestCase):
 
 @pytest.mark.integration
 class TestEdgeAndExceptionPaths(IsolatedAsyncioTestCase):
-    """异常/边界路径（3个）"""
+    """异常/边界路径（4个）"""
 
     async def asyncSetUp(self):
         self.bot = _make_mock_bot()
@@ -415,6 +417,56 @@ class TestEdgeAndExceptionPaths(IsolatedAsyncioTestCase):
         cmds = await self.cmd.process_msg("你好", meta, None)
         assert "配额超限" in cmds[0].msg
 
+    async def test_streaming_reply_sends_segments_early(self):
+        self.cmd.config = self.cmd.config.model_copy(update={
+            "stream_enabled": True, "stream_min_gap_seconds": 0.0, "stream_min_segment_chars": 4,
+        })
+        self.bot.proxy = MagicMock()
+        self.bot.proxy.process_bot_command = AsyncMock()
+
+        async def fake_chat(user_id, group_id, message, nickname, on_text):
+            for piece in ["早上好呀。", "今天也要加油哦！", "晚点见"]:
+                await on_text(piece)
+                await asyncio.sleep(0.01)
+            return "早上好呀。今天也要加油哦！晚点见"
+
+        self.cmd.orchestrator.chat = fake_chat
+        meta = _make_private_meta("早")
+        meta.to_me = True
+        cmds = await self.cmd.process_msg("早", meta, None)
+
+        early = [c.args[0].msg for c in self.bot.proxy.process_bot_command.await_args_list]
+        assert early == ["早上好呀。", "今天也要加油哦！"]
+        assert [c.msg for c in cmds] == ["晚点见"]
+        assert self.cmd._stream_stats == {"replies": 1, "segments": 2}
+        assert len(self.cmd._first_message_latency) == 1
+
+    async def test_streaming_failure_sends_error_after_partial_text(self):
+        """流式中途出错: 已发出的段落保留, 剩余文本之后补发错误提示"""
+        self.cmd.config = self.cmd.config.model_copy(update={
+            "stream_enabled": True, "stream_min_gap_seconds": 0.0, "stream_min_segment_chars": 4,
+        })
+        self.bot.proxy = MagicMock()
+        self.bot.proxy.process_bot_command = AsyncMock()
+
+        async def fake_chat(user_id, group_id, message, nickname, on_text):
+            # 与 orchestrator.chat 一致: 流在发出部分文本后抛错, 被捕获并返回错误提示
+            try:
+                for piece in ["早上好呀。", "今天也要"]:
+                    await on_text(piece)
+                raise ConnectionError("stream reset")
+            except ConnectionError:
+                return CHAT_ERROR_REPLY
+
+        self.cmd.orchestrator.chat = fake_chat
+        meta = _make_private_meta("早")
+        meta.to_me = True
+        cmds = await self.cmd.process_msg("早", meta, None)
+
+        early = [c.args[0].msg for c in self.bot.proxy.process_bot_command.await_args_list]
+        assert early == ["早上好呀。"]
+        assert [c.msg for c in cmds] == [f"今天也要\n{CHAT_ERROR_REPLY}"]
+
     async def test_orchestrator_none_for_clear(self):
         self.cmd.orchestrator = None
         meta = _make_private_meta(".ai clear")
@@ -429,3 +481,71 @@ class TestEdgeAndExceptionPaths(IsolatedAsyncioTestCase):
         meta2 = _make_private_meta(".ai")
         cmds2 = await self.cmd.process_msg(".ai", meta2, None)
         assert "你好，我是" in cmds2[0].msg
+
+
+@pytest.mark.integration
+class TestObservationBufferPersistence(IsolatedAsyncioTestCase):
+    """观察缓冲按群惰性加载与增量持久化"""
+
+    async def asyncSetUp(self):
+        self.bot = _make_mock_bot()
+        self.bot.config.persona_ai.observe_group_enabled = True
+        self.cmd = _make_cmd(self.bot)
+        self.store = AsyncMock()
+        self.store.get_observation_buffer = AsyncMock(return_value=None)
+        self.cmd.data_store = self.store
+
+    async def test_lazy_load_per_group(self):
+        self.store.get_observation_buffer = AsyncMock(
+            return_value={"threshold": 33, "messages": []}
+        )
+        buf = await self.cmd._get_observation_buffer("g1")
+        assert buf.threshold == 33
+        again = await self.cmd._get_observation_buffer("g1")
+        assert again is buf
+        self.store.get_observation_buffer.assert_awaited_once_with("g1")
+
+    async def test_only_dirty_buffers_flushed(self):
+        await self.cmd._handle_group_observation("g1", "u1", "A", "第一条足够长的消息")
+        await self.cmd._get_observation_buffer("g2")
+        await self.cmd._maybe_persist_observation_buffers(force=True)
+        payloads = self.store.save_observation_buffers.await_args.args[0]
+        assert set(payloads) == {"g1"}
+        assert self.cmd._observation_buffers["g1"].dirty is False
+
+        self.store.save_observation_buffers.reset_mock()
+        await self.cmd._maybe_persist_observation_buffers(force=True)
+        self.store.save_observation_buffers.assert_not_awaited()
+
+    async def test_message_added_during_save_stays_dirty(self):
+        buf = await self.cmd._get_observation_buffer("g1")
+        buf.add_message("u1", "A", "第一条足够长的消息")
+
+        async def save(payloads):
+            buf.add_message("u2", "B", "写库期间到达的另一条消息")
+
+        self.store.save_observation_buffers = AsyncMock(side_effect=save)
+        await self.cmd._maybe_persist_observation_buffers(force=True)
+        assert len(self.store.save_observation_buffers.await_args.args[0]["g1"]["messages"]) == 1
+        assert buf.dirty is True
+
+    async def test_failed_save_restores_dirty(self):
+        buf = await self.cmd._get_observation_buffer("g1")
+        buf.add_message("u1", "A", "第一条足够长的消息")
+        self.store.save_observation_buffers = AsyncMock(side_effect=RuntimeError("db closed"))
+        with pytest.raises(RuntimeError):
+            await self.cmd._maybe_persist_observation_buffers(force=True)
+        assert buf.dirty is True
+
+    async def test_migrate_legacy_blob(self):
+        import json
+        from plugins.DicePP.module.persona.data.persist_keys import PERSONA_SK_OBSERVATION_BUFFERS
+
+        self.store.get_setting = AsyncMock(
+            return_value=json.dumps({"g1": {"threshold": 21, "messages": []}, "bad": 1})
+        )
+        await self.cmd._migrate_legacy_observation_buffers()
+        self.store.save_observation_buffers.assert_awaited_once_with(
+            {"g1": {"threshold": 21, "messages": []}}
+        )
+        self.store.delete_setting.assert_awaited_once_with(PERSONA_SK_OBSERVATION_BUFFERS)
@@ -205,6 +205,48 @@ class TestOrchestratorChatNormalFlow:
         assert r2 is None
 
 
+class TestOrchestratorChatBackgroundScoring:
+    """测试关系更新与批量评分移出回复路径"""
+
+    @pytest.mark.asyncio
+    async def test_reply_not_blocked_by_scoring(self, temp_db, monkeypatch):
+        from plugins.DicePP.module.persona.data.models import ScoreDeltas
+
+        orch, _ = await _build_orchestrator_with_mock_llm(temp_db, monkeypatch)
+        orch.config.scoring_interval = 1
+        await orch.data_store.add_group_conversation("g1", "u1", "user", "prev")
+
+        gate = asyncio.Event()
+
+        async def slow_batch_analyze(**kwargs):
+            await gate.wait()
+            return ScoreDeltas(intimacy=1.0), {}
+
+        orch.scoring_agent.batch_analyze = AsyncMock(side_effect=slow_batch_analyze)
+
+        response = await asyncio.wait_for(orch.chat("u1", "g1", "hello", nickname="User"), timeout=2)
+        assert response == "Mocked LLM response"
+        assert orch.interaction_queue.depth == 1
+
+        gate.set()
+        assert await orch.flush_background_work(timeout=5)
+        orch.scoring_agent.batch_analyze.assert_awaited_once()
+        events = await orch.data_store.get_recent_score_events("u1", "g1", limit=5)
+        assert any(e.reason == "批量评分" for e in events)
+        assert orch.interaction_queue.get_stats()["processed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_sync_path_when_background_disabled(self, temp_db, monkeypatch):
+        orch, _ = await _build_orchestrator_with_mock_llm(temp_db, monkeypatch)
+        orch.interaction_queue = None
+        await orch.data_store.add_group_conversation("g1", "u1", "user", "prev")
+
+        await orch.chat("u1", "g1", "hello", nickname="User")
+        rel = await orch.data_store.get_relationship("u1", "g1")
+        assert rel is not None
+        assert rel.last_interaction_at is not None
+
+
 class TestOrchestratorChatRelationshipRefuse:
     """测试厌倦拒绝机制"""
 
@@ -324,6 +366,7 @@ class TestOrchestratorChatDecayApplication:
 
         response = await orch.chat("u1", "g1", "hello", nickname="User")
         assert response == "Mocked LLM response"
+        assert await orch.flush_background_work(timeout=5)
 
         # Relationship should have decay applied
         updated_rel = await orch.data_store.get_relationship("u1", "g1")
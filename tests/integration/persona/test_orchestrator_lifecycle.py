@@ -216,6 +216,56 @@ class TestOrchestratorRelationshipDisplay:
         assert n == 0
 
 
+class TestOrchestratorStateWriteBack:
+    """测试关系缓存的写回与关闭流程"""
+
+    @pytest.mark.asyncio
+    async def test_shutdown_flushes_cached_relationship(self, temp_db, monkeypatch):
+        orch, _ = await _build_initialized_orchestrator(temp_db, monkeypatch)
+        rel = await orch.data_store.init_relationship("u1", "g1", 30.0)
+        rel.intimacy = 66.0
+        await orch.data_store.update_relationship(rel)
+        assert orch.data_store.pending_write_back() == 1
+
+        await orch.shutdown()
+
+        assert orch.data_store.pending_write_back() == 0
+        async with orch.data_store.db.execute(
+            "SELECT intimacy FROM persona_user_relationships WHERE user_id = 'u1'"
+        ) as cursor:
+            assert (await cursor.fetchone())[0] == 66.0
+
+    @pytest.mark.asyncio
+    async def test_decay_batch_updates_cached_entry(self, temp_db, monkeypatch):
+        orch, _ = await _build_initialized_orchestrator(temp_db, monkeypatch)
+        orch.decay_calculator = DecayCalculator(
+            DecayConfig(
+                enabled=True,
+                grace_period_hours=0,
+                decay_rate_per_hour=1.0,
+                daily_cap=100.0,
+                floor_offset=-100.0,
+            ),
+            timezone_name="UTC",
+        )
+        for uid in ("u1", "u2"):
+            await orch.data_store.update_relationship(RelationshipState(
+                user_id=uid,
+                group_id="g1",
+                intimacy=50.0,
+                passion=50.0,
+                trust=50.0,
+                secureness=50.0,
+                last_interaction_at=datetime.now() - timedelta(hours=5),
+            ))
+
+        assert await orch.apply_relationship_decay_batch() == 2
+        cached = await orch.data_store.get_relationship("u1", "g1")
+        assert cached.intimacy < 50.0
+        events = await orch.data_store.get_recent_score_events("u2", "g1", limit=5)
+        assert events and events[0].reason.startswith("time_decay_batch")
+
+
 class TestOrchestratorReloadCharacter:
     """测试热重载角色卡"""
 
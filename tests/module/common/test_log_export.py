@@ -0,0 +1,123 @@
+"""
+日志导出流水线测试
+
+测试覆盖:
+- TXT / DOCX / 论坛代码分批输出
+- 引用与 @ 的 CQ 码转换
+- 进度回调
+- 旧版内存记录与库中批次按时间归并
+"""
+import os
+import tempfile
+
+import pytest
+
+from module.common.log_export import LogExporter, merge_record_batches
+
+
+def _record(i: int, uid: str = "111", content: str = None, message_id: str = None):
+    return {
+        "id": i,
+        "time": f"2024/01/01 12:{i // 60:02d}:{i % 60:02d}",
+        "user_id": uid,
+        "nickname": f"raw{uid}",
+        "content": content if content is not None else f"msg{i}",
+        "source": "user",
+        "message_id": message_id,
+    }
+
+
+async def _batches(records, size):
+    for i in range(0, len(records), size):
+        yield records[i:i + size]
+
+
+async def _nickname(uid: str):
+    return {"111": "甲", "222": "乙"}.get(uid)
+
+
+def _exporter(tmpdir: str, **kwargs) -> LogExporter:
+    params = dict(
+        group_id="g1",
+        bot_account="999",
+        start_time="2024/01/01 12:00:00",
+        logs_dir=tmpdir,
+        display_name_base="test_log",
+        color_for=lambda uid: "FF0000",
+        resolve_nickname=_nickname,
+    )
+    params.update(kwargs)
+    return LogExporter(**params)
+
+
+class TestLogExporter:
+    @pytest.mark.asyncio
+    async def test_export_txt_and_docx_in_batches(self):
+        records = [_record(i, uid="111" if i % 2 else "222") for i in range(25)]
+        progress = []
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exporter = _exporter(tmpdir, progress=lambda done, total: progress.append((done, total)))
+            main_path, main_name, extra = await exporter.run(_batches(records, 10), total=len(records))
+
+            assert main_name == "test_log.docx"
+            assert [name for _, name in extra] == ["test_log.txt"]
+            assert progress == [(10, 25), (20, 25), (25, 25)]
+
+            with open(os.path.join(tmpdir, "test_log.txt"), encoding="utf-8") as f:
+                text = f.read()
+            assert text.startswith("群 g1 跑团日志")
+            assert "乙 (222)  2024/01/01 12:00:00\nmsg0\n" in text
+            assert "msg24" in text
+
+            from docx import Document
+            doc = Document(main_path)
+            paragraphs = [p.text for p in doc.paragraphs]
+            # 标题 + 每条记录一段
+            assert len(paragraphs) == 26
+            assert paragraphs[1] == "<乙>msg0"
+            assert paragraphs[-1] == "<乙>msg24"
+
+    @pytest.mark.asyncio
+    async def test_reply_and_at_are_humanized(self):
+        records = [
+            _record(0, uid="111", content="第一行\n第二行", message_id="1"),
+            _record(1, uid="222", content="[CQ:reply,id=1]好的 [CQ:at,qq=111]"),
+            _record(2, uid="333", content="[CQ:reply,id=404]? [CQ:at,qq=333]"),
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exporter = _exporter(tmpdir)
+            await exporter.run(_batches(records, 2))
+            with open(os.path.join(tmpdir, "test_log.txt"), encoding="utf-8") as f:
+                text = f.read()
+        assert "| 甲\n| 第一行\n| 第二行\n好的 @甲" in text
+        assert "| 引用消息不在 log 范围内\n? @raw333" in text
+
+    @pytest.mark.asyncio
+    async def test_forum_code_output(self):
+        records = [_record(i) for i in range(3)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            exporter = _exporter(tmpdir, forum_code=True)
+            _, _, extra = await exporter.run(_batches(records, 2))
+            assert [name for _, name in extra] == ["test_log_forum.txt", "test_log.txt"]
+            with open(extra[0][0], encoding="utf-8") as f:
+                lines = f.read().split("\n")
+        assert len(lines) == 3
+        assert lines[0] == "[color=#9ca3af]2024/01/01 12:00:00[/color][color=#f99252] <raw111>msg0 [/color]"
+
+    @pytest.mark.asyncio
+    async def test_docx_strips_invalid_xml_chars(self):
+        records = [_record(0, content="a\x01b<c>&")]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            main_path, _, _ = await _exporter(tmpdir).run(_batches(records, 1))
+            from docx import Document
+            assert Document(main_path).paragraphs[-1].text == "<甲>ab<c>&"
+
+    @pytest.mark.asyncio
+    async def test_merge_record_batches_interleaves_legacy_records(self):
+        db_records = [_record(i) for i in (0, 2, 4)]
+        legacy = [_record(3, content="legacy3"), _record(9, content="legacy9"), _record(1, content="legacy1")]
+        merged = [r async for batch in merge_record_batches(_batches(db_records, 2), legacy) for r in batch]
+        assert [r["content"] for r in merged] == ["msg0", "legacy1", "msg2", "legacy3", "msg4", "legacy9"]
+
+        only_db = [r async for batch in merge_record_batches(_batches(db_records, 2), []) for r in batch]
+        assert only_db == db_records
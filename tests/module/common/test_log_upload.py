@@ -0,0 +1,133 @@
+"""
+日志云端上传测试（本地桩服务器）
+
+测试覆盖:
+- 流式压缩的上传体可被完整解压
+- 5xx 重试后成功、4xx 不重试
+- 空日志不发起请求
+"""
+import json
+import zlib
+
+import pytest
+from aiohttp import web
+
+from module.common.log_command import _build_upload_item
+from module.common.log_upload import LogUploader
+
+
+def _record(i: int, source: str = "user", content: str = None):
+    return {
+        "time": f"2024/01/01 12:00:{i % 60:02d}",
+        "user_id": "111",
+        "nickname": "甲",
+        "content": content or f"msg{i}",
+        "source": source,
+        "message_id": str(i),
+    }
+
+
+async def _batches(records, size):
+    for i in range(0, len(records), size):
+        yield records[i:i + size]
+
+
+class _StubServer:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+        self.runner = None
+        self.url = ""
+
+    async def handle(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        file_field = form["file"]
+        self.requests.append({
+            "headers": dict(request.headers),
+            "form": {k: v for k, v in form.items() if k != "file"},
+            "filename": file_field.filename,
+            "body": file_field.file.read(),
+        })
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 200:
+            return web.json_response({"url": "https://log.example/abc"})
+        return web.json_response({"message": "busy"}, status=status)
+
+    async def __aenter__(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_put("/log", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/log"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def _uploader(url: str, **kwargs) -> LogUploader:
+    return LogUploader(url, kwargs.pop("token", ""), 105, _build_upload_item, retry_delay=0.01, **kwargs)
+
+
+class TestLogUploader:
+    @pytest.mark.asyncio
+    async def test_upload_streams_compressed_body(self):
+        records = [_record(i) for i in range(1200)]
+        records.append(_record(1200, source="bot", content="检定：大成功"))
+        async with _StubServer([200]) as server:
+            result = await _uploader(server.url, token="tk").upload("测试日志", "QQ:1", _batches(records, 500))
+
+        assert result == {"success": True, "message": "云端上传成功", "url": "https://log.example/abc"}
+        assert len(server.requests) == 1
+        req = server.requests[0]
+        assert req["headers"]["Authorization"] == "Bearer tk"
+        assert req["form"] == {"name": "测试日志", "uniform_id": "QQ:1", "client": "DicePP", "version": "105"}
+        assert req["filename"] == "log-zlib-compressed"
+        payload = json.loads(zlib.decompress(req["body"]).decode("utf-8"))
+        assert payload["version"] == 105
+        assert len(payload["items"]) == 1201
+        assert payload["items"][0]["message"] == "msg0"
+        assert payload["items"][0]["uniformId"] == "QQ:111"
+        assert payload["items"][-1]["isDice"] is True
+
+    @pytest.mark.asyncio
+    async def test_server_error_is_retried(self):
+        async with _StubServer([503, 502, 200]) as server:
+            result = await _uploader(server.url).upload("log", "QQ:1", _batches([_record(0)], 10))
+        assert result["success"] is True
+        assert len(server.requests) == 3
+        # 每次重试都发送完整的上传体
+        assert all(zlib.decompress(r["body"]) == zlib.decompress(server.requests[0]["body"]) for r in server.requests)
+
+    @pytest.mark.asyncio
+    async def test_retries_are_bounded(self):
+        async with _StubServer([503] * 5) as server:
+            result = await _uploader(server.url, max_attempts=2).upload("log", "QQ:1", _batches([_record(0)], 10))
+        assert result["success"] is False
+        assert "HTTP 503 busy" in result["message"]
+        assert len(server.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_client_error_not_retried(self):
+        async with _StubServer([400, 200]) as server:
+            result = await _uploader(server.url).upload("log", "QQ:1", _batches([_record(0)], 10))
+        assert result["success"] is False
+        assert len(server.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_connection_error_reported(self):
+        async with _StubServer([]) as server:
+            url = server.url
+        result = await _uploader(url, max_attempts=2).upload("log", "QQ:1", _batches([_record(0)], 10))
+        assert result["success"] is False
+        assert result["message"].startswith("云端上传失败")
+
+    @pytest.mark.asyncio
+    async def test_empty_log_skips_request(self):
+        async with _StubServer([]) as server:
+            result = await _uploader(server.url).upload("log", "QQ:1", _batches([], 10))
+        assert result == {"success": False, "message": "日志内容为空，已跳过云端上传"}
+        assert server.requests == []
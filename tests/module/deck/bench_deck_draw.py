@@ -0,0 +1,221 @@
+"""
+Performance benchmark: compiled deck item templates
+====================================================
+Draws from a deeply nested generator deck (every level draws from the next one via DRAW and
+rolls dice via ROLL) and compares the legacy per-draw interpretation (preprocess + parse every
+ROLL expression, linear search over all decks for every DRAW) against the compiled node tree
+built at load time (deck references resolved once, roll ASTs parsed once and reused).
+
+Usage
+-----
+Run from the project root (with the virtualenv active):
+
+    python tests/module/deck/bench_deck_draw.py
+
+Output includes:
+- Wall-clock time for DRAWS draws on the legacy and compiled paths (median of RUNS runs)
+- Speedup ratio
+- PASS/FAIL verdict against the minimum improvement threshold
+
+Regression Detection
+--------------------
+Set the environment variable DECK_BENCH_THRESHOLD (default 2.0) to override the minimum
+acceptable speedup ratio.  A result below this value is flagged as a regression:
+
+    DECK_BENCH_THRESHOLD=2.0 python tests/module/deck/bench_deck_draw.py
+
+Notes
+-----
+- The deck set contains DISTRACTOR_DECKS unrelated decks so that name lookup cost is realistic
+  for a bot with a large deck library.
+- Both paths consume the random module identically; a smoke check with a fixed seed verifies
+  that they produce identical output before timing.
+- Warmup iteration (first run) is excluded from the median.
+"""
+
+import os
+import sys
+import time
+import random
+import statistics
+from pathlib import Path
+from typing import Iterable, List, Set
+
+# ---------------------------------------------------------------------------
+# Path setup – allow running from repo root without installing the package
+# ---------------------------------------------------------------------------
+_REPO_ROOT = Path(__file__).parent.parent.parent.parent  # tests/../../..
+_SRC = _REPO_ROOT / "src" / "plugins" / "DicePP"
+if str(_SRC) not in sys.path:
+    sys.path.insert(0, str(_SRC))
+
+from module.deck.deck_command import (
+    Deck, DeckItem, index_decks, HLDL_DRAW_LIMIT, DECK_SEG_TEXT, DECK_SEG_ROLL, DECK_SEG_DRAW,
+)
+from module.roll import preprocess_roll_exp, is_roll_exp, exec_roll_exp
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+RUNS = 4           # number of timed runs (first is warmup)
+DRAWS = 10_000     # top-level draws per run
+DEPTH = 6          # nesting depth of the generator deck
+DISTRACTOR_DECKS = 300
+THRESHOLD = float(os.environ.get("DECK_BENCH_THRESHOLD", "2.0"))
+
+
+class _Loc:
+    """只做最简单替换的本地化桩, 避免把模板格式化成本计入对比"""
+
+    def format_loc_text(self, key, **kwargs):
+        return str(kwargs.get("result", kwargs.get("content", "")))
+
+
+def _build_decks() -> List[Deck]:
+    decks: List[Deck] = []
+    for level in range(DEPTH):
+        deck = Deck(f"生成器{level}", "/tmp")
+        if level + 1 < DEPTH:
+            deck.add_item(DeckItem(f"第{level}层: 力量ROLL(3d6) 敏捷ROLL(4d6k3) DRAW(生成器{level + 1}, 1)", weight=3))
+            deck.add_item(DeckItem(f"第{level}层分支 ROLL(1d20+5) DRAW(生成器{level + 1}, 1d2)", weight=1))
+        else:
+            deck.add_item(DeckItem("终点 ROLL(2d8+3)", weight=1))
+        for i in range(20):
+            deck.add_item(DeckItem(f"普通条目{level}-{i}", weight=1))
+        decks.append(deck)
+    for i in range(DISTRACTOR_DECKS):
+        deck = Deck(f"无关牌库{i}", "/tmp")
+        deck.add_item(DeckItem(f"无关条目{i}"))
+        decks.insert(len(decks) // 2, deck)
+    deck_index = index_decks(decks)
+    for deck in decks:
+        for item in deck.items:
+            assert item.compile(deck_index) is None
+    return decks
+
+
+# ---------------------------------------------------------------------------
+# Legacy implementation (per-draw interpretation, copied from the pre-compilation DeckItem/Deck)
+# ---------------------------------------------------------------------------
+def legacy_get_result(item: DeckItem, decks: Iterable[Deck], loc) -> str:
+    def handle_roll(raw_exp: str):
+        roll_exp = preprocess_roll_exp(raw_exp)
+        if is_roll_exp(roll_exp):
+            return exec_roll_exp(roll_exp).get_complete_result()
+        return raw_exp
+
+    def handle_draw(target_deck_str: str, raw_draw_exp: str):
+        draw_exp = preprocess_roll_exp(raw_draw_exp).strip()
+        try:
+            draw_times = int(draw_exp)
+        except ValueError:
+            if not is_roll_exp(draw_exp):
+                return f"{target_deck_str}*{draw_exp}"
+            draw_times = exec_roll_exp(draw_exp).get_val()
+        if draw_times <= 0 or draw_times > HLDL_DRAW_LIMIT:
+            return f"{target_deck_str}*{draw_times}"
+        target_deck = None
+        for deck in decks:
+            if deck.name == target_deck_str:
+                target_deck = deck
+                break
+        if not target_deck:
+            return f"{target_deck_str}*{draw_times}"
+        draw_result = legacy_draw(target_deck, draw_times, decks, loc).replace("\n", " ")
+        return loc.format_loc_text("", times=draw_times, deck_name=target_deck_str, result=draw_result)
+
+    if not item.segments:
+        return loc.format_loc_text("", result=item.content.strip())
+    parts: List[str] = []
+    for segment in item.segments:
+        if segment[0] == DECK_SEG_TEXT:
+            parts.append(segment[1])
+        elif segment[0] == DECK_SEG_ROLL:
+            parts.append(handle_roll(segment[1]))
+        elif segment[0] == DECK_SEG_DRAW:
+            parts.append(handle_draw(segment[1], segment[2]))
+    return "".join(parts)
+
+
+def legacy_draw(deck: Deck, times: int, decks: Iterable[Deck], loc) -> str:
+    weight_sum_cur = deck.weight_sum
+    index_mask: Set[int] = set()
+    feedback = ""
+    for _ in range(times):
+        weight_random = random.randint(1, weight_sum_cur)
+        item_selected = None
+        for i, item in enumerate(deck.items):
+            if i in index_mask:
+                continue
+            weight_random -= item.weight
+            if weight_random <= 0:
+                item_selected = item
+                break
+        if not item_selected.redraw:
+            index_mask.add(deck.items.index(item_selected))
+            weight_sum_cur -= item_selected.weight
+        content = legacy_get_result(item_selected, decks, loc)
+        feedback += loc.format_loc_text("", content=content + "\n" if times > 1 else content)
+    return feedback.strip()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def _median_time(fn, runs: int) -> float:
+    times: List[float] = []
+    for i in range(runs):
+        t = _timed(fn)
+        if i > 0:  # skip warmup
+            times.append(t)
+    return statistics.median(times)
+
+
+def run_benchmark() -> bool:
+    decks = _build_decks()
+    top = decks[0]
+    loc = _Loc()
+
+    # 冒烟检查: 两种实现对同一随机种子给出相同结果
+    random.seed(7)
+    legacy = [legacy_draw(top, 1, decks, loc) for _ in range(200)]
+    random.seed(7)
+    compiled = [top.draw(1, decks, loc) for _ in range(200)]
+    if legacy != compiled:
+        print("MISMATCH between legacy and compiled draw results")
+        return False
+
+    def run_legacy():
+        for _ in range(DRAWS):
+            legacy_draw(top, 1, decks, loc)
+
+    def run_compiled():
+        for _ in range(DRAWS):
+            top.draw(1, decks, loc)
+
+    print(f"\n{'='*70}")
+    print(f"  Deck.draw Benchmark  (depth={DEPTH}, decks={len(decks)}, draws={DRAWS}, "
+          f"threshold={THRESHOLD:.1f}x, runs={RUNS})")
+    print(f"{'='*70}")
+    base_t = _median_time(run_legacy, RUNS)
+    opt_t = _median_time(run_compiled, RUNS)
+    speedup = base_t / opt_t if opt_t > 0 else float("inf")
+    print(f"{'Legacy(s)':>12}  {'Compiled(s)':>12}  {'Speedup':>8}")
+    print(f"{base_t:>12.3f}  {opt_t:>12.3f}  {speedup:>7.2f}x")
+
+    ok = speedup >= THRESHOLD
+    print(f"{'='*70}")
+    print(f"  {'PASS' if ok else 'REGRESSION DETECTED'} (speedup {speedup:.2f}x)")
+    print(f"{'='*70}\n")
+    return ok
+
+
+if __name__ == "__main__":
+    ok = run_benchmark()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,174 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import openpyxl
+import pytest
+
+from module.deck.deck_cache import DeckCache, DECK_CACHE_VERSION
+from module.deck.deck_command import (
+    DeckCommand, DeckItem, Deck, tokenize_deck_content, compile_deck_workbook, add_compiled_decks,
+    DECK_ITEM_FIELD, DECK_SEG_TEXT, DECK_SEG_ROLL, DECK_SEG_DRAW, DECK_SEG_IMG,
+)
+
+
+def _write_deck_xlsx(path, sheets):
+    """sheets: {工作表名: [(内容, 权重), ...]}"""
+    wb = openpyxl.Workbook()
+    for name in wb.sheetnames:
+        del wb[name]
+    for sheet_name, rows in sheets.items():
+        ws = wb.create_sheet(sheet_name)
+        ws.append(DECK_ITEM_FIELD)
+        for content, weight in rows:
+            ws.append([content, weight, 1, 0])
+    wb.save(path)
+    wb.close()
+
+
+def _make_command():
+    bot = MagicMock()
+    return DeckCommand(bot)
+
+
+@pytest.mark.unit
+class TestTokenizeDeckContent(unittest.TestCase):
+    def test_plain_text(self):
+        self.assertEqual(tokenize_deck_content("  普通内容 "), ())
+
+    def test_segments_in_order(self):
+        segments = tokenize_deck_content("掷ROLL(1d6)后抽DRAW(塔罗, 2)并展示IMG(a.png)")
+        self.assertEqual(segments, (
+            (DECK_SEG_TEXT, "掷"),
+            (DECK_SEG_ROLL, "1d6", "ROLL(1d6)"),
+            (DECK_SEG_TEXT, "后抽"),
+            (DECK_SEG_DRAW, "塔罗", "2", "DRAW(塔罗, 2)"),
+            (DECK_SEG_TEXT, "并展示"),
+            (DECK_SEG_IMG, "a.png", "IMG(a.png)"),
+        ))
+
+    def test_keyword_without_placeholder(self):
+        # 含关键字但没有完整标记时按原文输出, 且不套用结果模板
+        self.assertEqual(tokenize_deck_content("ROLL 一下"), ((DECK_SEG_TEXT, "ROLL 一下"),))
+
+
+@pytest.mark.unit
+class TestDeckItemCompile(unittest.TestCase):
+    def setUp(self):
+        self.index = {"子牌库": Deck("子牌库", "/tmp")}
+
+    def test_compile_is_static(self):
+        item = DeckItem("ROLL(1d20) DRAW(子牌库, 1d3) DRAW(子牌库, 2)")
+        with patch("module.deck.deck_command.exec_roll_exp", side_effect=AssertionError("不应掷骰")), \
+                patch("module.deck.deck_command.exec_compiled_roll_exp", side_effect=AssertionError("不应掷骰")):
+            self.assertIsNone(item.compile(self.index))
+        targets = [node.target for node in item.nodes if hasattr(node, "target")]
+        self.assertEqual(targets, [self.index["子牌库"]] * 2)
+
+    def test_roll_parsed_once(self):
+        from module.deck.deck_command import compile_roll_exp
+        item = DeckItem("ROLL(1d20+1)")
+        self.assertIsNone(item.compile(self.index))
+        loc = MagicMock()
+        with patch("module.deck.deck_command.compile_roll_exp", side_effect=compile_roll_exp) as mock_compile:
+            for _ in range(5):
+                value = int(item.get_result(None, [], loc).split("=")[-1])
+                self.assertTrue(2 <= value <= 21)
+        self.assertEqual(mock_compile.call_count, 1)
+
+    def test_draw_node_renders_nested_deck(self):
+        sub = self.index["子牌库"]
+        sub.add_item(DeckItem("嵌套"))
+        item = DeckItem("抽到DRAW(子牌库, 2)")
+        self.assertIsNone(item.compile(self.index))
+        loc = MagicMock()
+        loc.format_loc_text = MagicMock(side_effect=lambda key, **kwargs: kwargs.get("result", kwargs.get("content", "")))
+        self.assertEqual(item.get_result(None, [sub], loc), "抽到嵌套 嵌套")
+
+    def test_compile_errors(self):
+        self.assertIn("invalid deck", DeckItem("DRAW(不存在, 1)").compile(self.index))
+        self.assertIn("invalid value", DeckItem("DRAW(子牌库, 100)").compile(self.index))
+        self.assertIn("invalid roll expression", DeckItem("ROLL((1d6)").compile({}))
+
+
+@pytest.mark.unit
+class TestDeckCache(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        self.deck_path = os.path.join(self.root, "decks", "tarot.xlsx")
+        os.makedirs(os.path.dirname(self.deck_path))
+        _write_deck_xlsx(self.deck_path, {
+            "塔罗": [("愚者", 1), ("魔术师 DRAW(正逆, 1)", 2)],
+            "HIDE#正逆": [("正位", 1), ("逆位", 1)],
+        })
+        self.cache_dir = os.path.join(self.root, "cache")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_compile_and_add_decks(self):
+        wb = openpyxl.load_workbook(self.deck_path)
+        compiled = compile_deck_workbook(wb)
+        deck_dict = {}
+        add_compiled_decks(compiled, self.deck_path, deck_dict)
+        self.assertEqual(set(deck_dict), {"塔罗", "正逆"})
+        self.assertTrue(deck_dict["正逆"].hidden)
+        self.assertEqual(deck_dict["塔罗"].weight_sum, 3)
+        self.assertEqual(deck_dict["塔罗"].items[1].segments[1][0], DECK_SEG_DRAW)
+
+    def test_hit_until_source_changes(self):
+        cache = DeckCache(self.cache_dir)
+        self.assertIsNone(cache.load(self.deck_path))
+        compiled = compile_deck_workbook(openpyxl.load_workbook(self.deck_path))
+        cache.store(self.deck_path, compiled)
+        hit = cache.load(self.deck_path)
+        self.assertEqual(hit.sheets, compiled.sheets)
+
+        stat = os.stat(self.deck_path)
+        os.utime(self.deck_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(cache.load(self.deck_path))
+        self.assertEqual(cache.stats, {"hit": 1, "miss": 2})
+
+    def test_version_mismatch_and_corrupt_file(self):
+        cache = DeckCache(self.cache_dir)
+        compiled = compile_deck_workbook(openpyxl.load_workbook(self.deck_path))
+        cache.store(self.deck_path, compiled)
+        with patch("module.deck.deck_cache.DECK_CACHE_VERSION", DECK_CACHE_VERSION + 1):
+            self.assertIsNone(cache.load(self.deck_path))
+        cache_file = cache._cache_file(os.path.abspath(self.deck_path))
+        cache_file.write_bytes(b"not a pickle")
+        self.assertIsNone(cache.load(self.deck_path))
+
+    def test_command_second_load_skips_openpyxl(self):
+        cmd = _make_command()
+        cmd.deck_cache = DeckCache(self.cache_dir)
+        deck_dict, info = cmd.load_decks([os.path.dirname(self.deck_path)])
+        self.assertEqual(set(deck_dict), {"塔罗", "正逆"})
+        self.assertEqual(info, [])
+
+        with patch("module.deck.deck_command.read_xlsx", side_effect=AssertionError("应命中缓存")):
+            deck_dict, info = cmd.load_decks([os.path.dirname(self.deck_path)])
+        self.assertEqual(set(deck_dict), {"塔罗", "正逆"})
+        self.assertEqual(cmd.deck_cache.stats["hit"], 1)
+
+    def test_command_reports_invalid_reference(self):
+        _write_deck_xlsx(self.deck_path, {"塔罗": [("DRAW(不存在, 1)", 1)]})
+        cmd = _make_command()
+        cmd.deck_cache = DeckCache(self.cache_dir)
+        _, info = cmd.load_decks([self.deck_path])
+        self.assertEqual(len(info), 1)
+        self.assertIn("塔罗的第1个条目中存在错误", info[0])
+
+    def test_cached_items_draw(self):
+        cmd = _make_command()
+        cmd.deck_cache = DeckCache(self.cache_dir)
+        cmd.load_decks([self.deck_path])
+        deck_dict, _ = cmd.load_decks([self.deck_path])
+        loc = MagicMock()
+        loc.format_loc_text = MagicMock(side_effect=lambda key, **kwargs: kwargs.get("content", kwargs.get("result", "")))
+        deck: Deck = deck_dict["塔罗"]
+        for _ in range(20):
+            result = deck.draw(1, deck_dict.values(), loc)
+            self.assertTrue(result == "愚者" or result.startswith("魔术师 "))
@@ -254,6 +254,58 @@ class TestInitiativeList(_InitBotBase):
         assert any(word in result2 for word in ["互换", "交换", "swap", "已"])
 
 
+class TestInitiativeCombatState(_InitBotBase):
+    """Tests for the cached combat state behind .init."""
+
+    async def test_init__snapshot_cached_and_invalidated_on_writes(self):
+        await self._send_group(".ri", user_id="user1", nickname="战士", dice_values=[20])
+        await self._send_group(".ri 哥布林", user_id="dm", nickname="DM", dice_values=[10])
+        await self._send_group(".init")
+        loads = self.bot.combat_state.get_stats()["loads"]
+
+        # 没有写入时重复查看命中缓存
+        await self._send_group(".init")
+        stats = self.bot.combat_state.get_stats()
+        assert stats["loads"] == loads
+        assert stats["hits"] >= 1
+
+        # .hp 写入 NPC 生命值后缓存失效，列表显示新生命值
+        await self._send_group(".hp 哥布林=7/12", user_id="dm", nickname="DM")
+        cmds, result = await self._send_group(".init")
+        assert self.bot.combat_state.get_stats()["loads"] == loads + 1
+        assert "7/12" in result
+
+        # 昵称变化同样会反映到列表中
+        await self.bot.update_nickname("user1", self.group_id, "狂战士")
+        cmds, result = await self._send_group(".init")
+        assert "狂战士" in result
+
+    async def test_init_clr__removes_temporary_npc_hp_only(self):
+        await self._send_group(".ri 哥布林", user_id="dm", nickname="DM", dice_values=[10])
+        await self._send_group(".ri 巨龙", user_id="dm", nickname="DM", dice_values=[5])
+        await self._send_group(".hp 哥布林-3", user_id="dm", nickname="DM")
+        await self._send_group(".hp 巨龙=100/100", user_id="dm", nickname="DM")
+
+        await self._send_group(".init clr")
+
+        assert await self.bot.db.npc_health.get(self.group_id, "哥布林") is None
+        assert await self.bot.db.npc_health.get(self.group_id, "巨龙") is not None
+        assert await self.bot.combat_state.get(self.group_id) is None
+
+    async def test_init_clr__keeps_npc_rows_without_parseable_hp(self):
+        from core.data.models import NPCHealth
+
+        await self._send_group(".ri 哥布林", user_id="dm", nickname="DM", dice_values=[10])
+        await self._send_group(".ri 史莱姆", user_id="dm", nickname="DM", dice_values=[5])
+        await self.bot.db.npc_health.upsert(NPCHealth(group_id=self.group_id, name="哥布林", hp_data=""))
+        await self.bot.db.npc_health.upsert(NPCHealth(group_id=self.group_id, name="史莱姆", hp_data="not json"))
+
+        await self._send_group(".init clr")
+
+        assert await self.bot.db.npc_health.get(self.group_id, "哥布林") is not None
+        assert await self.bot.db.npc_health.get(self.group_id, "史莱姆") is not None
+
+
 @pytest.mark.integration
 class TestInitiativeBattleRound(_InitBotBase):
     """Tests for battle round (.br, .ed) commands."""
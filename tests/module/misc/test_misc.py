@@ -138,3 +138,34 @@ class TestCocMiscCommandIntegration(_BotTestBase):
         # 原因应在输出中（当 args[0] 不是有效整数时，reason 含整个参数）
         # 或者直接断言有输出、不崩溃即可
         self.assertTrue(len(cmds) > 0, ".coc 含原因时应有输出")
+
+
+# ─────────────────────────── 统计 集成测试 ───────────────────────────
+
+@pytest.mark.integration
+class TestStatisticsCommandIntegration(_BotTestBase):
+    """StatisticsCommand (.统计) 集成测试"""
+
+    BOT_NAME = "test_stat_misc_bot"
+
+    async def test_counts_messages_and_rolls(self):
+        await self._send_group(".r d20", user_id="stat_user")
+        await self._send_group("普通消息", user_id="stat_user")
+        cmds = await self._send_group(".统计", user_id="stat_user")
+        result = "\n".join([str(c) for c in cmds])
+        self.assertIn("今日收到信息:3, 昨日:0, 总计:3", result)
+        self.assertIn("今日掷骰次数:1", result)
+
+    async def test_date_range(self):
+        from utils.time import get_current_date_raw
+        await self._send_group(".r", user_id="stat_user")
+        today = get_current_date_raw().date()
+        cmds = await self._send_group(f".统计群聊{today:%Y%m%d}-{today:%Y%m%d}", user_id="stat_user")
+        result = "\n".join([str(c) for c in cmds])
+        self.assertIn(f"{today}的统计", result)
+        self.assertIn("收到信息:2", result)
+        self.assertIn("掷骰次数:1", result)
+        cmds = await self._send_group(".统计7天", user_id="stat_user")
+        self.assertIn("收到信息:", "\n".join([str(c) for c in cmds]))
+        cmds = await self._send_group(".统计昨天", user_id="stat_user")
+        self.assertIn("无法识别的日期范围", "\n".join([str(c) for c in cmds]))
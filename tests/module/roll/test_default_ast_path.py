@@ -207,3 +207,36 @@ class TestComputeExpAstMigration:
         """exec_roll_exp() 仍严格走 AST。"""
         result = exec_roll_exp("3+4")
         assert result.get_val() == 7
+
+
+# ===========================================================================
+# 预编译表达式: 解析一次, 多次执行
+# ===========================================================================
+
+@pytest.mark.unit
+class TestCompiledRollExp:
+    def test_compiled_matches_exec_roll_exp(self):
+        """相同骰值下, 预编译执行与 exec_roll_exp 的结果文本一致。"""
+        import random
+        from module.roll.expression import compile_roll_exp, exec_compiled_roll_exp
+        compiled = compile_roll_exp("4D6K3+2")
+        for seed in range(10):
+            random.seed(seed)
+            expected = exec_roll_exp("4D6K3+2")
+            random.seed(seed)
+            actual = exec_compiled_roll_exp(compiled)
+            assert actual.get_complete_result() == expected.get_complete_result()
+            assert actual.get_val() == expected.get_val()
+
+    def test_compile_does_not_reparse(self):
+        """执行预编译表达式不再调用解析器。"""
+        from module.roll.expression import compile_roll_exp, exec_compiled_roll_exp
+        compiled = compile_roll_exp("2D20+5")
+        with patch("module.roll.ast_engine.adapter.parse_expression", side_effect=AssertionError("不应重新解析")):
+            for _ in range(3):
+                assert 7 <= exec_compiled_roll_exp(compiled).get_val() <= 45
+
+    def test_compile_invalid_raises_roll_dice_error(self):
+        from module.roll.expression import compile_roll_exp
+        with pytest.raises(RollDiceError):
+            compile_roll_exp("(1D6")
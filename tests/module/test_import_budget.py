@@ -0,0 +1,72 @@
+"""
+启动导入耗时回归测试
+
+在子进程中以 ``python -X importtime -c "import module"`` 导入全部功能子包（即 Bot 启动时注册指令的过程），
+检查较重的第三方依赖没有在导入阶段被加载，并且总耗时不超过预算。
+
+预算可通过环境变量 DICEPP_IMPORT_BUDGET_MS 调整（默认 3000ms，远高于本地实测值，只用于发现明显退化）。
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+_DICEPP_ROOT = Path(__file__).resolve().parent.parent.parent / "src" / "plugins" / "DicePP"
+
+IMPORT_BUDGET_MS = float(os.environ.get("DICEPP_IMPORT_BUDGET_MS", "3000"))
+
+# 只应在首次使用或启用功能的 delay_init 中加载的模块
+DEFERRED_MODULES = [
+    "fastapi",
+    "openpyxl",
+    "aiohttp",
+    "openai",
+    "httpx",
+    "zhconv",
+    "docx",
+    "module.fastapi",
+    "module.persona.orchestrator",
+    "module.persona.data.store",
+]
+
+
+def _import_times(statement: str) -> Dict[str, int]:
+    """返回 {模块名: 累计导入耗时(us)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=str(_DICEPP_ROOT),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # 表头
+        times[parts[2].strip()] = int(parts[1])
+    return times
+
+
+@pytest.mark.slow
+def test_module_import_defers_heavy_dependencies():
+    times = _import_times("import module")
+    assert "module" in times
+    loaded = [name for name in DEFERRED_MODULES if name in times]
+    assert loaded == [], f"启动导入阶段加载了应延迟的模块: {loaded}"
+
+
+@pytest.mark.slow
+def test_module_import_within_budget():
+    # 先导入一次预热字节码缓存，再计时
+    _import_times("import module")
+    cumulative_ms = _import_times("import module")["module"] / 1000
+    assert cumulative_ms <= IMPORT_BUDGET_MS, (
+        f"import module 耗时 {cumulative_ms:.0f}ms, 超出预算 {IMPORT_BUDGET_MS:.0f}ms"
+    )
@@ -0,0 +1,158 @@
+"""
+Performance benchmark: daily relationship decay batch
+======================================================
+Compares the model-based path (list_all_relationships_raw → per-row
+should_apply_decay/calculate_decay → update_relationships_batch +
+add_score_events) with the columnar path used by
+PersonaOrchestrator.apply_relationship_decay_batch
+(list_relationship_decay_rows → DecayCalculator.batch_decay →
+apply_relationship_decays) on N synthetic relationships.
+
+Usage
+-----
+Run from the project root (with the virtualenv active):
+
+    python tests/unit/persona/bench_relationship_decay.py
+
+Environment variables:
+- RELDECAY_BENCH_N          number of relationships (default 100000)
+- RELDECAY_BENCH_THRESHOLD  minimum acceptable speedup (default 1.5)
+
+Notes
+-----
+- Each path runs against a fresh copy of the same SQLite file, so both see
+  identical data and both write their results.
+- About 2/3 of the synthetic rows are past the grace period and decay.
+- Timings include reading, computing and committing; the final verdict is
+  based on the speedup ratio, which is far less machine-dependent than the
+  absolute numbers.
+"""
+
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import aiosqlite
+
+_REPO_ROOT = Path(__file__).parent.parent.parent.parent  # tests/../../..
+_SRC = _REPO_ROOT / "src"
+if str(_SRC) not in sys.path:
+    sys.path.insert(0, str(_SRC))
+if str(_SRC / "plugins" / "DicePP") not in sys.path:
+    sys.path.insert(0, str(_SRC / "plugins" / "DicePP"))
+
+from plugins.DicePP.module.persona.data.models import ScoreDeltas, ScoreEvent, RelationshipState
+from plugins.DicePP.module.persona.data.store import PersonaDataStore
+from plugins.DicePP.module.persona.game.decay import DecayCalculator, DecayConfig
+from plugins.DicePP.module.persona.wall_clock import persona_wall_now
+
+N = int(os.environ.get("RELDECAY_BENCH_N", "100000"))
+THRESHOLD = float(os.environ.get("RELDECAY_BENCH_THRESHOLD", "1.5"))
+INITIAL = 30.0
+TIMEZONE = "Asia/Shanghai"
+
+
+async def _seed(path: str, now) -> None:
+    rng = random.Random(42)
+    async with aiosqlite.connect(path) as db:
+        store = PersonaDataStore(db)
+        await store.ensure_tables()
+        rows = []
+        for i in range(N):
+            score = rng.uniform(20, 100)
+            idle = timedelta(hours=rng.uniform(0, 24 * 20))
+            rows.append(RelationshipState(
+                user_id=f"user{i}",
+                group_id=f"group{i % 50}" if i % 3 else "",
+                intimacy=score, passion=score, trust=score, secureness=score,
+                last_interaction_at=now - idle,
+                last_relationship_decay_applied_at=(now - idle / 2) if i % 4 == 0 else None,
+            ))
+        await store.update_relationships_batch(rows)
+
+
+async def _model_path(store: PersonaDataStore, calc: DecayCalculator, now) -> int:
+    changed, events = [], []
+    for rel in await store.list_all_relationships_raw():
+        if not calc.should_apply_decay(rel, now):
+            continue
+        deltas, reason = calc.calculate_decay(rel, INITIAL, now)
+        rel.last_relationship_decay_applied_at = now
+        if abs(deltas.intimacy) <= 0.01:
+            continue
+        before = rel.composite_score
+        rel.apply_deltas(deltas, updated_at=now)
+        changed.append(rel)
+        events.append(ScoreEvent(
+            user_id=rel.user_id, group_id=rel.group_id, deltas=deltas,
+            composite_before=before, composite_after=rel.composite_score,
+            reason=f"time_decay_batch: {reason}", conversation_digest="",
+        ))
+    n = await store.update_relationships_batch(changed)
+    await store.add_score_events(events)
+    return n
+
+
+async def _columnar_path(store: PersonaDataStore, calc: DecayCalculator, now) -> int:
+    rows = await store.list_relationship_decay_rows()
+    composite = [r[2] * 0.3 + r[3] * 0.2 + r[4] * 0.3 + r[5] * 0.2 for r in rows]
+    results = calc.batch_decay([r[6] for r in rows], [r[7] for r in rows], composite, INITIAL, now)
+    decays, events = [], []
+    for i, amount, reason in results:
+        user_id, group_id = rows[i][0], rows[i][1]
+        deltas = ScoreDeltas(intimacy=-amount, passion=-amount, trust=-amount, secureness=-amount)
+        decays.append((user_id, group_id, amount))
+        events.append(ScoreEvent(
+            user_id=user_id, group_id=group_id, deltas=deltas,
+            composite_before=composite[i], composite_after=max(0.0, composite[i] - amount),
+            reason=f"time_decay_batch: {reason}", conversation_digest="",
+        ))
+    return await store.apply_relationship_decays(decays, events, now)
+
+
+async def _timed(path: str, fn, calc, now):
+    async with aiosqlite.connect(path) as db:
+        store = PersonaDataStore(db)
+        start = time.perf_counter()
+        n = await fn(store, calc, now)
+        return time.perf_counter() - start, n
+
+
+async def main() -> int:
+    now = persona_wall_now(TIMEZONE)
+    calc = DecayCalculator(DecayConfig(), timezone_name=TIMEZONE)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        seed = os.path.join(tmpdir, "seed.db")
+        print(f"Seeding {N} relationships ...")
+        await _seed(seed, now)
+
+        model_db = os.path.join(tmpdir, "model.db")
+        columnar_db = os.path.join(tmpdir, "columnar.db")
+        shutil.copy(seed, model_db)
+        shutil.copy(seed, columnar_db)
+        model_s, model_n = await _timed(model_db, _model_path, calc, now)
+        columnar_s, columnar_n = await _timed(columnar_db, _columnar_path, calc, now)
+
+    speedup = model_s / columnar_s if columnar_s else float("inf")
+    print(f"{'path':<10} {'rows':>8} {'seconds':>9}")
+    print(f"{'model':<10} {model_n:>8} {model_s:>9.3f}")
+    print(f"{'columnar':<10} {columnar_n:>8} {columnar_s:>9.3f}")
+    print(f"speedup: {speedup:.2f}x (threshold {THRESHOLD:.2f}x)")
+    if model_n != columnar_n:
+        print("FAIL: paths decayed a different number of rows")
+        return 1
+    if speedup < THRESHOLD:
+        print("FAIL: speedup below threshold")
+        return 1
+    print("PASS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
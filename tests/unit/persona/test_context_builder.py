@@ -35,7 +35,8 @@ class TestContextBuilderCharacterBook:
         assert "苏晓的猫叫墨墨。" in system_content
         assert system_content.index("【你对用户的了解") < system_content.index("【世界书】")
 
-    def test_lore_position_before_diary(self):
+    def test_lore_position_after_diary(self):
+        """世界书按消息命中属于易变内容，排在半静态的今日事件之后"""
         char = self._make_character([
             LoreEntry(keys=["加班"], content="出版社经常加班。"),
         ])
@@ -48,7 +49,7 @@ class TestContextBuilderCharacterBook:
         system_content = messages[0]["content"]
         assert "【世界书】" in system_content
         assert "【今天发生的事】" in system_content
-        assert system_content.index("【世界书】") < system_content.index("【今天发生的事】")
+        assert system_content.index("【今天发生的事】") < system_content.index("【世界书】")
 
     def test_no_lore_when_no_match(self):
         char = self._make_character([
@@ -140,6 +141,60 @@ class TestContextBuilderCharacterBook:
         assert "x" * 60 in system_content
 
 
+class TestContextBuilderPrefixLayout:
+    """测试 system 内容按 静态前缀 / 半静态 / 易变 排列"""
+
+    def _make_character(self, **kwargs):
+        return Character(
+            name="苏晓",
+            description="一个温柔的AI伴侣",
+            mes_example="<START>\n{{user}}: 你好\n{{char}}: 你好呀",
+            character_book=CharacterBook(entries=[LoreEntry(keys=["墨墨"], content="苏晓的猫叫墨墨。")]),
+            **kwargs,
+        )
+
+    def test_static_prefix_is_identical_across_turns(self):
+        builder = ContextBuilder(self._make_character())
+        first = builder.build(
+            short_term_history=[{"role": "user", "content": "早", "speaker_name": "小明"}],
+            user_profile=UserProfile(user_id="u1", facts={"name": "小明"}),
+            diary_context="今天下雨了",
+            current_message="墨墨呢",
+            warmth_label="亲密",
+        )[0]["content"]
+        second = builder.build(
+            short_term_history=[],
+            user_profile=UserProfile(user_id="u2", facts={"name": "小红"}),
+            current_message="在吗",
+        )[0]["content"]
+        prefix = builder.static_prefix
+        assert first.startswith(prefix)
+        assert second.startswith(prefix)
+        assert "示例对话" in prefix
+        for volatile in ("当前时间", "关系", "今天下雨了", "苏晓的猫叫墨墨。"):
+            assert volatile not in prefix
+
+    def test_sections_ordered_by_volatility(self):
+        builder = ContextBuilder(self._make_character())
+        content = builder.build(
+            short_term_history=[{"role": "user", "content": "早", "speaker_name": "小明"}],
+            user_profile=UserProfile(user_id="u1", facts={"name": "小明"}),
+            diary_context="今天下雨了",
+            current_message="墨墨呢",
+        )[0]["content"]
+        order = ["示例对话", "【今天发生的事】", "当前你和用户的关系", "【你对用户的了解】", "【世界书】", "当前时间", "近期对话"]
+        positions = [content.index(marker) for marker in order]
+        assert positions == sorted(positions)
+
+    def test_prefix_fingerprint_per_character(self):
+        a = ContextBuilder(self._make_character())
+        b = ContextBuilder(self._make_character())
+        c = ContextBuilder(self._make_character(personality="活泼"))
+        assert a.prefix_fingerprint == b.prefix_fingerprint
+        assert a.prefix_fingerprint != c.prefix_fingerprint
+        assert len(a.prefix_fingerprint) == 16
+
+
 class TestContextBuilderSpeakerPrefix:
     """测试 _format_short_term 称呼前缀 (fix-persona-group-history-context)"""
 
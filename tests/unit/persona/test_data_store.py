@@ -253,6 +253,116 @@ class TestUserProfileCRUD:
         assert await store.get_user_profile("u_unknown") is None
 
 
+class TestStateWriteBack:
+    """测试关系 / 画像写回缓存"""
+
+    @staticmethod
+    async def _count_row(store, user_id):
+        async with store.db.execute(
+            "SELECT intimacy FROM persona_user_relationships WHERE user_id = ?", (user_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+
+    @pytest.mark.asyncio
+    async def test_update_deferred_until_flush(self, temp_db):
+        store = PersonaDataStore(temp_db.db, state_cache_entries=16)
+        rel = await store.init_relationship("u1", "g1", initial_score=30.0)
+        rel.intimacy = 55.0
+        await store.update_relationship(rel)
+
+        # 读命中缓存，库中尚未写入
+        assert (await store.get_relationship("u1", "g1")).intimacy == 55.0
+        assert await self._count_row(store, "u1") == 30.0
+        assert store.pending_write_back() == 1
+
+        assert await store.flush_write_back() == 1
+        assert await self._count_row(store, "u1") == 55.0
+        assert store.pending_write_back() == 0
+
+    @pytest.mark.asyncio
+    async def test_cached_reads_return_copies(self, temp_db):
+        store = PersonaDataStore(temp_db.db, state_cache_entries=16)
+        await store.save_user_profile(UserProfile(user_id="u1", facts={"pet": "cat"}))
+        p1 = await store.get_user_profile("u1")
+        p1.facts["pet"] = "dog"
+        assert (await store.get_user_profile("u1")).facts["pet"] == "cat"
+
+        rel = await store.init_relationship("u1", "g1", initial_score=30.0)
+        rel.intimacy = 99.0
+        assert (await store.get_relationship("u1", "g1")).intimacy == 30.0
+
+    @pytest.mark.asyncio
+    async def test_list_queries_flush_first(self, temp_db):
+        store = PersonaDataStore(temp_db.db, state_cache_entries=16)
+        rel = await store.init_relationship("u1", "g1", initial_score=30.0)
+        rel.intimacy = 70.0
+        await store.update_relationship(rel)
+
+        rels = await store.list_all_relationships_raw()
+        assert rels[0].intimacy == 70.0
+        assert store.pending_write_back() == 0
+
+    @pytest.mark.asyncio
+    async def test_dirty_entries_not_evicted(self, temp_db):
+        store = PersonaDataStore(temp_db.db, state_cache_entries=1)
+        for uid in ("u1", "u2", "u3"):
+            await store.update_relationship(RelationshipState(user_id=uid, group_id="g1", intimacy=60.0))
+        assert store.pending_write_back() == 3
+        assert await store.flush_write_back() == 3
+        for uid in ("u1", "u2", "u3"):
+            assert await self._count_row(store, uid) == 60.0
+
+    @pytest.mark.asyncio
+    async def test_update_relationships_batch(self, temp_db):
+        store = temp_db
+        rels = [RelationshipState(user_id=f"u{i}", group_id="g1", intimacy=float(i)) for i in range(5)]
+        assert await store.update_relationships_batch(rels) == 5
+        fetched = await store.list_all_relationships_raw()
+        assert sorted(r.intimacy for r in fetched) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+    @pytest.mark.asyncio
+    async def test_apply_relationship_decays_single_transaction(self, temp_db):
+        store = PersonaDataStore(temp_db.db, state_cache_entries=16)
+        t0 = datetime(2026, 1, 1, 12, 0, 0)
+        await store.update_relationships_batch([
+            RelationshipState(user_id=f"u{i}", group_id="g1", intimacy=60.0, passion=60.0,
+                              trust=60.0, secureness=60.0, last_interaction_at=t0)
+            for i in range(3)
+        ] + [RelationshipState(user_id="u0", group_id="", intimacy=2.0, passion=2.0, trust=2.0, secureness=2.0)])
+        cached = await store.get_relationship("u1", "g1")
+        cached.passion = 70.0
+        await store.update_relationship(cached)
+
+        rows = await store.list_relationship_decay_rows()
+        assert store.pending_write_back() == 0
+        assert len(rows) == 4
+        assert sorted((r[0], r[1]) for r in rows)[0] == ("u0", "")
+
+        applied_at = t0 + timedelta(days=1)
+        event = ScoreEvent(user_id="u1", group_id="g1", deltas=ScoreDeltas(intimacy=-5.0),
+                           composite_before=62.0, composite_after=57.0, reason="time_decay_batch: x")
+        n = await store.apply_relationship_decays([("u1", "g1", 5.0), ("u0", "", 5.0)], [event], applied_at)
+        assert n == 2
+        assert await self._count_row(store, "u2") == 60.0
+
+        async with store.db.execute(
+            "SELECT intimacy, passion, last_relationship_decay_applied_at FROM persona_user_relationships "
+            "WHERE user_id = 'u1' AND group_id = 'g1'"
+        ) as cursor:
+            assert await cursor.fetchone() == (55.0, 65.0, applied_at.isoformat())
+        async with store.db.execute(
+            "SELECT intimacy FROM persona_user_relationships WHERE user_id = 'u0' AND group_id = ''"
+        ) as cursor:
+            assert (await cursor.fetchone())[0] == 0.0
+        # 缓存条目同步扣减
+        rel = await store.get_relationship("u1", "g1")
+        assert (rel.intimacy, rel.passion, rel.last_relationship_decay_applied_at) == (55.0, 65.0, applied_at)
+        events = await store.get_recent_score_events("u1", "g1")
+        assert [e.reason for e in events] == ["time_decay_batch: x"]
+
+
 class TestObservationCRUD:
     """测试观察记录 CRUD"""
 
@@ -532,6 +642,27 @@ class TestCharacterStateCRUD:
         assert legacy.energy is None  # 旧版纯文本迁移：结构化字段保持 None
 
 
+class TestObservationBufferPersistence:
+    """测试按群持久化的观察缓冲快照"""
+
+    @pytest.mark.asyncio
+    async def test_save_and_get_observation_buffers(self, temp_db):
+        store = temp_db
+        assert await store.get_observation_buffer("g1") is None
+
+        await store.save_observation_buffers({
+            "g1": {"threshold": 20, "messages": []},
+            "g2": {"threshold": 30, "messages": [{"user_id": "u", "content": "x", "ts": "2026-01-01T00:00:00"}]},
+        })
+        assert (await store.get_observation_buffer("g1"))["threshold"] == 20
+        assert len((await store.get_observation_buffer("g2"))["messages"]) == 1
+
+        # 只覆盖传入的群
+        await store.save_observation_buffers({"g1": {"threshold": 25, "messages": []}})
+        assert (await store.get_observation_buffer("g1"))["threshold"] == 25
+        assert (await store.get_observation_buffer("g2"))["threshold"] == 30
+
+
 class TestGroupConversationCRUD:
     """测试群聊共享历史 CRUD (fix-persona-group-history-context)"""
 
@@ -594,6 +725,68 @@ class TestGroupConversationCRUD:
         assert msgs[1].content == "msg3"
         assert msgs[2].content == "msg4"
 
+    @pytest.mark.asyncio
+    async def test_get_group_conversations_since_and_max_rows(self, temp_db):
+        """since / max_rows 限制在 SQL 路径与缓冲路径结果一致"""
+        store = temp_db
+        for i in range(4):
+            await store.add_group_conversation("g1", "u1", "user", f"msg{i}", "A")
+        old_iso = (store._wall_now() - timedelta(hours=5)).isoformat()
+        await store.db.execute(
+            "UPDATE persona_group_conversations SET created_at = ? WHERE content = 'msg0'",
+            (old_iso,),
+        )
+        await store.db.commit()
+        since = store._wall_now() - timedelta(hours=1)
+
+        sql_rows = await store._select_group_conversations("g1", since, 2)
+        assert [m.content for m in sql_rows] == ["msg2", "msg3"]
+
+        cached = await store.get_group_conversations("g1", since=since, max_rows=2)
+        assert [m.content for m in cached] == ["msg2", "msg3"]
+        cached_all = await store.get_group_conversations("g1", since=since)
+        assert [m.content for m in cached_all] == ["msg1", "msg2", "msg3"]
+
+    @pytest.mark.asyncio
+    async def test_group_history_buffer_serves_reads_after_warm(self, temp_db):
+        """预热后的群由环形缓冲提供读取，新写入同步追加并按上限裁剪"""
+        store = temp_db
+        store._group_max_messages = 3
+        await store.add_group_conversation("g1", "u1", "user", "msg0", "A")
+        await store.get_group_conversations("g1")
+        assert store._group_history.is_warm("g1")
+
+        for i in range(1, 5):
+            await store.add_group_conversation("g1", "u1", "user", f"msg{i}", "A")
+
+        async def _fail(*args, **kwargs):
+            raise AssertionError("warm group should not hit SQL")
+
+        store._select_group_conversations = _fail
+        msgs = await store.get_group_conversations("g1")
+        assert [m.content for m in msgs] == ["msg2", "msg3", "msg4"]
+        assert all(m.id is not None for m in msgs)
+        latest = await store.get_group_conversations("g1", limit=1)
+        assert [m.content for m in latest] == ["msg4"]
+
+    @pytest.mark.asyncio
+    async def test_group_conversation_token_estimate_persisted(self, temp_db):
+        """入库时计算 token 估算值，缓冲与 SQL 读取均携带"""
+        store = temp_db
+        await store.add_group_conversation("g1", "u1", "user", "你好 abcd", "A")
+        cached = await store.get_group_conversations("g1")
+        assert cached[0].token_estimate == 3.25
+        rows = await store._select_group_conversations("g1", None, None)
+        assert rows[0].token_estimate == 3.25
+
+    @pytest.mark.asyncio
+    async def test_group_history_buffer_disabled_uses_sql(self, temp_db):
+        store = PersonaDataStore(temp_db.db, group_history_cache_groups=0)
+        await store.add_group_conversation("g1", "u1", "user", "hello", "A")
+        msgs = await store.get_group_conversations("g1")
+        assert [m.content for m in msgs] == ["hello"]
+        assert not store._group_history.is_warm("g1")
+
     @pytest.mark.asyncio
     async def test_search_group_conversations_keyword(self, temp_db):
         """8.3: search with keyword filter"""
@@ -206,3 +206,49 @@ class TestDecayCalculatorEdgeCases:
         d2, reason = calc.calculate_decay(rel, initial_score=30.0, now=now)
         assert abs(d2.intimacy) < 0.01
         assert "无新增可衰减空闲时长" in reason
+
+    def test_batch_decay_matches_per_row(self):
+        """按列批量计算与逐行 should_apply_decay + calculate_decay 结果一致"""
+        import random
+
+        config = DecayConfig(
+            enabled=True,
+            grace_period_hours=8,
+            decay_rate_per_hour=0.5,
+            daily_cap=5.0,
+            floor_offset=20.0,
+        )
+        calc = DecayCalculator(config, timezone_name="UTC")
+        now = datetime(2026, 1, 10, 12, 0, 0)
+        rng = random.Random(7)
+        rels = []
+        for i in range(300):
+            t0 = now - timedelta(hours=rng.uniform(0, 96)) if i % 17 else None
+            ta = None
+            if t0 is not None and rng.random() < 0.5:
+                ta = t0 + timedelta(hours=rng.uniform(-4, 48))
+            score = rng.uniform(30, 100)
+            rels.append(RelationshipState(
+                user_id=f"u{i}", group_id="", intimacy=score, passion=score, trust=score, secureness=score,
+                last_interaction_at=t0, last_relationship_decay_applied_at=ta,
+            ))
+
+        expected = {}
+        for i, rel in enumerate(rels):
+            if not calc.should_apply_decay(rel, now):
+                continue
+            deltas, reason = calc.calculate_decay(rel, 30.0, now)
+            if abs(deltas.intimacy) > 0.01:
+                expected[i] = (-deltas.intimacy, reason)
+
+        results = calc.batch_decay(
+            [r.last_interaction_at for r in rels],
+            [r.last_relationship_decay_applied_at for r in rels],
+            [r.composite_score for r in rels],
+            30.0,
+            now,
+        )
+        assert expected
+        assert {i: (pytest.approx(amount), reason) for i, amount, reason in results} == expected
+        calc.config.enabled = False
+        assert calc.batch_decay([rels[0].last_interaction_at], [None], [80.0], 30.0, now) == []
@@ -0,0 +1,137 @@
+"""
+InteractionQueue 单元测试
+
+测试覆盖:
+- 同 (用户, 群) 任务合并
+- 队列满时拒绝（调用方回退同步）
+- 失败重试与放弃
+- depth / lag 统计
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.plugins.DicePP.module.persona.interaction_queue import (
+    InteractionQueue,
+    InteractionJob,
+)
+
+
+def _job(user_id: str = "u1", group_id: str = "g1", text: str = "hi", at: datetime = None) -> InteractionJob:
+    at = at or datetime(2026, 1, 1, 12, 0, 0)
+    return InteractionJob(
+        user_id=user_id,
+        group_id=group_id,
+        first_at=at,
+        last_at=at,
+        messages=[{"role": "user", "content": text}, {"role": "assistant", "content": "ok"}],
+    )
+
+
+class TestInteractionQueue:
+    @pytest.mark.asyncio
+    async def test_jobs_for_same_key_are_coalesced(self):
+        handled = []
+        gate = asyncio.Event()
+
+        async def handler(job):
+            await gate.wait()
+            handled.append(job)
+
+        queue = InteractionQueue(handler)
+        t0 = datetime(2026, 1, 1, 12, 0, 0)
+        assert queue.submit(_job(text="a", at=t0))
+        await asyncio.sleep(0)  # 第一个任务进入处理
+        assert queue.submit(_job(text="b", at=t0 + timedelta(minutes=1)))
+        assert queue.submit(_job(text="c", at=t0 + timedelta(minutes=2)))
+        assert queue.submit(_job(user_id="u2", text="d", at=t0))
+        assert queue.depth == 3
+
+        gate.set()
+        assert await queue.drain(timeout=2)
+
+        assert len(handled) == 3
+        merged = handled[1]
+        assert [m["content"] for m in merged.messages if m["role"] == "user"] == ["b", "c"]
+        assert merged.first_at == t0 + timedelta(minutes=1)
+        assert merged.last_at == t0 + timedelta(minutes=2)
+        stats = queue.get_stats()
+        assert stats["coalesced"] == 1
+        assert stats["processed"] == 3
+        assert stats["depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_submit_rejected_when_full(self):
+        gate = asyncio.Event()
+
+        async def handler(job):
+            await gate.wait()
+
+        queue = InteractionQueue(handler, max_pending=1)
+        assert queue.submit(_job(user_id="u1"))
+        assert not queue.submit(_job(user_id="u2"))
+        # 同键合并不受上限影响
+        assert queue.submit(_job(user_id="u1"))
+        assert queue.get_stats()["rejected"] == 1
+        gate.set()
+        assert await queue.drain(timeout=2)
+
+    @pytest.mark.asyncio
+    async def test_failed_job_retried_then_succeeds(self):
+        calls = []
+
+        async def handler(job):
+            calls.append(job.attempts)
+            if len(calls) < 2:
+                raise RuntimeError("llm down")
+
+        queue = InteractionQueue(handler, max_retries=2, retry_delay=0.01)
+        queue.submit(_job())
+        assert await queue.drain(timeout=2)
+        assert calls == [0, 1]
+        stats = queue.get_stats()
+        assert stats["retried"] == 1
+        assert stats["processed"] == 1
+        assert stats["failed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_job_dropped_after_max_retries(self):
+        calls = []
+
+        async def handler(job):
+            calls.append(job.attempts)
+            raise RuntimeError("boom")
+
+        queue = InteractionQueue(handler, max_retries=1, retry_delay=0.01)
+        queue.submit(_job())
+        assert await queue.drain(timeout=2)
+        assert calls == [0, 1]
+        assert queue.get_stats()["failed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_merge_into_recorded_job_records_new_part_only(self):
+        job = _job(text="a")
+        job.recorded = True
+        job.messages = []
+        later = _job(text="b", at=datetime(2026, 1, 1, 13, 0, 0))
+        job.merge(later)
+        assert job.recorded is False
+        assert job.first_at == later.first_at
+        assert [m["content"] for m in job.messages if m["role"] == "user"] == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_lag_reports_oldest_pending(self):
+        gate = asyncio.Event()
+
+        async def handler(job):
+            await gate.wait()
+
+        queue = InteractionQueue(handler)
+        job = _job()
+        job.enqueued_at -= 3.0
+        queue.submit(job)
+        assert queue.get_stats()["lag_seconds"] >= 3.0
+        gate.set()
+        assert await queue.drain(timeout=2)
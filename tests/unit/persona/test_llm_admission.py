@@ -0,0 +1,188 @@
+"""
+LLMRouter 准入控制单元测试
+
+覆盖：优先级排队、主/辅助模型独立并发池、排队等待统计、相同辅助请求合并。
+"""
+
+import asyncio
+
+import pytest
+
+from plugins.DicePP.module.persona.llm.admission import (
+    AdmissionPool,
+    PRIORITY_BACKGROUND,
+    PRIORITY_USER,
+)
+from plugins.DicePP.module.persona.llm.router import LLMRouter
+from plugins.DicePP.module.persona.data.models import ModelTier
+
+
+class TestAdmissionPool:
+    @pytest.mark.asyncio
+    async def test_user_priority_admitted_before_background(self):
+        pool = AdmissionPool(1)
+        order = []
+        await pool.acquire(PRIORITY_BACKGROUND)
+
+        async def worker(name, priority):
+            async with pool.slot(priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.create_task(worker("bg1", PRIORITY_BACKGROUND)),
+            asyncio.create_task(worker("bg2", PRIORITY_BACKGROUND)),
+        ]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("user", PRIORITY_USER)))
+        await asyncio.sleep(0)
+        assert pool.waiting == 3
+
+        pool.release()
+        await asyncio.gather(*tasks)
+        assert order == ["user", "bg1", "bg2"]
+        stats = pool.get_stats()
+        assert stats["in_flight"] == 0
+        assert stats["queued"] == 3
+        assert stats["admitted"] == 4
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        pool = AdmissionPool(1)
+        await pool.acquire(PRIORITY_BACKGROUND)
+        waiter = asyncio.create_task(pool.acquire(PRIORITY_USER))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        pool.release()
+        assert pool.in_flight == 0
+        await asyncio.wait_for(pool.acquire(PRIORITY_BACKGROUND), timeout=1)
+        assert pool.in_flight == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_metrics_recorded(self):
+        pool = AdmissionPool(1)
+        await pool.acquire(PRIORITY_BACKGROUND)
+        waiter = asyncio.create_task(pool.acquire(PRIORITY_BACKGROUND))
+        await asyncio.sleep(0.05)
+        pool.release()
+        await waiter
+        assert pool.get_stats()["wait_max_ms"] >= 40
+
+
+def _router(**kwargs) -> LLMRouter:
+    return LLMRouter("fake", "http://localhost", "fake", max_concurrent=1, **kwargs)
+
+
+class TestRouterAdmission:
+    @pytest.mark.asyncio
+    async def test_primary_not_blocked_by_saturated_auxiliary(self):
+        router = _router(auxiliary_max_concurrent=1)
+        release = asyncio.Event()
+
+        async def slow_chat(**kwargs):
+            await release.wait()
+            return "aux", {}
+
+        async def fast_chat(**kwargs):
+            return "primary", {}
+
+        router.auxiliary_client.chat = slow_chat
+        router.primary_client.chat = fast_chat
+
+        aux_tasks = [
+            asyncio.create_task(router.generate(
+                [{"role": "user", "content": f"bg{i}"}], model_tier=ModelTier.AUXILIARY
+            ))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        reply = await asyncio.wait_for(router.generate(
+            [{"role": "user", "content": "hi"}], model_tier=ModelTier.PRIMARY, user_id="u1"
+        ), timeout=1)
+        assert reply == "primary"
+
+        stats = router.get_stats()
+        assert stats["auxiliary"]["queue"]["in_flight"] == 1
+        assert stats["auxiliary"]["queue"]["waiting"] == 2
+        assert stats["primary"]["queue"]["in_flight"] == 0
+
+        release.set()
+        assert await asyncio.gather(*aux_tasks) == ["aux"] * 3
+
+    @pytest.mark.asyncio
+    async def test_identical_auxiliary_requests_coalesced(self):
+        router = _router()
+        calls = 0
+        release = asyncio.Event()
+
+        async def forced_tool(**kwargs):
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "{}", {"tool_name": kwargs["tool_name"]}
+
+        router.auxiliary_client.generate_with_forced_tool = forced_tool
+        messages = [{"role": "user", "content": "score this"}]
+        tools = [{"type": "function", "function": {"name": "score"}}]
+
+        tasks = [
+            asyncio.create_task(router.generate_with_forced_tool(
+                messages, tools, "score", model_tier=ModelTier.AUXILIARY
+            ))
+            for _ in range(3)
+        ]
+        other = asyncio.create_task(router.generate_with_forced_tool(
+            [{"role": "user", "content": "different"}], tools, "score", model_tier=ModelTier.AUXILIARY
+        ))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, other)
+
+        assert calls == 2
+        assert all(r == ("{}", {"tool_name": "score"}) for r in results)
+        stats = router.get_stats()["auxiliary"]
+        assert stats["requests"] == 2
+        assert stats["coalesced"] == 2
+        assert router._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_cancelling_one_coalesced_caller_keeps_others(self):
+        router = _router()
+        release = asyncio.Event()
+
+        async def chat(**kwargs):
+            await release.wait()
+            return "shared", {}
+
+        router.auxiliary_client.chat = chat
+        messages = [{"role": "user", "content": "same"}]
+        first = asyncio.create_task(router.generate(messages, model_tier=ModelTier.AUXILIARY))
+        second = asyncio.create_task(router.generate(messages, model_tier=ModelTier.AUXILIARY))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "shared"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    @pytest.mark.asyncio
+    async def test_primary_requests_not_coalesced(self):
+        router = _router(auxiliary_max_concurrent=2)
+        calls = 0
+
+        async def chat(**kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+            return "ok", {}
+
+        router.primary_client.chat = chat
+        messages = [{"role": "user", "content": "hi"}]
+        await asyncio.gather(
+            router.generate(messages, model_tier=ModelTier.PRIMARY, user_id="u1"),
+            router.generate(messages, model_tier=ModelTier.PRIMARY, user_id="u1"),
+        )
+        assert calls == 2
+        assert router.get_stats()["primary"]["coalesced"] == 0
@@ -0,0 +1,111 @@
+"""
+LLM 客户端注册表单元测试
+
+覆盖：按 (base_url, api_key) 复用、共享连接池、闲置移除、数量上限、关闭与跨事件循环重建。
+"""
+
+import asyncio
+
+import pytest
+
+from plugins.DicePP.module.persona.data.models import ModelTier, UserLLMConfig
+from plugins.DicePP.module.persona.llm.client import LLMClient
+from plugins.DicePP.module.persona.llm.client_registry import ClientRegistry, get_client_registry
+from plugins.DicePP.module.persona.llm.router import LLMRouter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestClientRegistry:
+    @pytest.mark.asyncio
+    async def test_reuse_by_key_and_shared_pool(self):
+        registry = ClientRegistry()
+        a = registry.get("https://api.example/v1", "sk-a")
+        assert registry.get("https://api.example/v1", "sk-a") is a
+        b = registry.get("https://api.example/v1", "sk-b")
+        c = registry.get("https://other.example/v1", "sk-a")
+        assert a is not b and a is not c
+        assert a._client is b._client is c._client
+        stats = registry.get_stats()
+        assert stats["created"] == 3
+        assert stats["reused"] == 1
+        assert stats["clients"] == 3
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_idle_clients_evicted(self):
+        clock = FakeClock()
+        registry = ClientRegistry(idle_ttl=600, clock=clock)
+        user = registry.get("https://api.example/v1", "sk-user")
+        clock.now += 300
+        registry.get("https://api.example/v1", "sk-main")
+        clock.now += 400
+        assert registry.evict_idle() == 1
+        assert registry.get_stats()["clients"] == 1
+        assert registry.get("https://api.example/v1", "sk-user") is not user
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_max_entries_lru(self):
+        registry = ClientRegistry(max_entries=2)
+        first = registry.get("u", "k1")
+        registry.get("u", "k2")
+        registry.get("u", "k1")
+        registry.get("u", "k3")
+        assert registry.get("u", "k1") is first
+        assert registry.get_stats()["evicted"] == 1
+        await registry.aclose()
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_shared_pool(self):
+        registry = ClientRegistry()
+        http_client = registry.get("u", "k")._client
+        await registry.aclose()
+        assert http_client.is_closed
+        assert registry.get_stats()["clients"] == 0
+        # 关闭后再次使用会重建
+        assert not registry.get("u", "k")._client.is_closed
+        await registry.aclose()
+
+    def test_new_event_loop_rebuilds_pool(self):
+        registry = ClientRegistry()
+
+        async def pool():
+            return registry.get("u", "k")._client
+
+        first = asyncio.run(pool())
+        second = asyncio.run(pool())
+        assert first is not second
+        assert registry.get_stats()["pool_resets"] == 1
+
+
+class TestLLMClientUsesRegistry:
+    @pytest.mark.asyncio
+    async def test_tiers_and_user_keys_share_pool(self):
+        router = LLMRouter(
+            "sk-main", "https://api.example/v1", "main-model",
+            auxiliary_model="aux-model", max_concurrent=1,
+        )
+        user_client = router._get_client_for_tier(
+            ModelTier.PRIMARY, UserLLMConfig(user_id="u1", primary_api_key="sk-user")
+        )
+        primary = router.primary_client._get_client()
+        auxiliary = router.auxiliary_client._get_client()
+        assert primary is auxiliary
+        assert user_client._get_client() is not primary
+        assert user_client._get_client()._client is primary._client
+        await router.aclose()
+        assert primary._client.is_closed
+
+    def test_explicit_client_override(self):
+        client = LLMClient("sk", "https://api.example/v1", "m")
+        sentinel = object()
+        client._client = sentinel
+        assert client._get_client() is sentinel
+        assert get_client_registry() is get_client_registry()
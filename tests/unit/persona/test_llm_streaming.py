@@ -0,0 +1,280 @@
+"""
+流式回复单元测试（本地假 OpenAI 服务器）
+
+覆盖：
+- <think> 标签跨分片过滤、句子切分、最小间隔发送与合并
+- LLMClient.chat / chat_with_tools 流式请求：文本回调、工具调用拼装、用量与首段耗时
+- LLMRouter 流式统计、StreamingReply 端到端分段发送
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+
+from plugins.DicePP.module.persona.llm.client import LLMClient
+from plugins.DicePP.module.persona.llm.router import LLMRouter
+from plugins.DicePP.module.persona.llm.streaming import (
+    PacedSender,
+    SentenceSegmenter,
+    StreamingReply,
+    ThinkTagFilter,
+)
+
+
+def _chunk(delta=None, usage=None):
+    body = {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "fake-model",
+        "choices": [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": None}],
+    }
+    if usage is not None:
+        body["usage"] = usage
+    return body
+
+
+def _text_stream(pieces, prompt_tokens=100, cached_tokens=0):
+    chunks = [_chunk({"role": "assistant", "content": ""})]
+    chunks += [_chunk({"content": p}) for p in pieces]
+    chunks.append(_chunk(usage={
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(pieces),
+        "total_tokens": prompt_tokens + len(pieces),
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }))
+    return chunks
+
+
+class _FakeOpenAIServer:
+    """按顺序返回预设的流式响应，分片之间间隔 delay 秒"""
+
+    def __init__(self, streams, delay=0.0):
+        self.streams = list(streams)
+        self.delay = delay
+        self.requests = []
+        self.runner = None
+        self.base_url = ""
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(await request.json())
+        chunks = self.streams.pop(0)
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for chunk in chunks:
+            await resp.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            if self.delay:
+                await asyncio.sleep(self.delay)
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class TestThinkTagFilter:
+    def test_tags_split_across_chunks(self):
+        f = ThinkTagFilter()
+        pieces = ["你好<th", "ink>想一想", "……</thi", "nk>，今天", "天气不错<", "3"]
+        out = "".join(f.feed(p) for p in pieces) + f.flush()
+        assert out == "你好，今天天气不错<3"
+
+    def test_unterminated_think_dropped(self):
+        f = ThinkTagFilter()
+        out = f.feed("回答<think>还没想完") + f.flush()
+        assert out == "回答"
+
+
+class TestSentenceSegmenter:
+    def test_splits_on_sentence_end_and_merges_short(self):
+        seg = SentenceSegmenter(min_chars=6)
+        out = []
+        for piece in ["嗯。今天去了", "图书馆，借了三本书！", "你呢？", "最近在", "读什么"]:
+            out += seg.feed(piece)
+        assert out == ["嗯。今天去了图书馆，借了三本书！"]
+        assert seg.flush() == "你呢？最近在读什么"
+
+    def test_closing_quote_kept_with_sentence(self):
+        seg = SentenceSegmenter(min_chars=1)
+        assert seg.feed("她说：“走吧。") == []
+        assert seg.feed("”然后") == ["她说：“走吧。”"]
+        assert seg.flush() == "然后"
+
+
+class TestPacedSender:
+    @pytest.mark.asyncio
+    async def test_min_gap_and_merging(self):
+        sent = []
+
+        async def send(text):
+            sent.append((time.monotonic(), text))
+
+        sender = PacedSender(send, min_gap=0.1)
+        sender.put("第一句。")
+        await asyncio.sleep(0.01)
+        sender.put("第二句。")
+        sender.put("第三句。")
+        rest = await sender.finish("最后一句。")
+
+        assert [t for _, t in sent] == ["第一句。", "第二句。\n第三句。"]
+        assert sent[1][0] - sent[0][0] >= 0.09
+        assert rest == "最后一句。"
+        assert sender.sent == 2
+
+
+class TestClientStreaming:
+    @pytest.mark.asyncio
+    async def test_chat_stream_filters_think_and_reports_usage(self):
+        pieces = ["<think>先想", "想</think>", "你好呀，", "今天过得怎么样？"]
+        async with _FakeOpenAIServer([_text_stream(pieces, prompt_tokens=200, cached_tokens=150)]) as server:
+            client = LLMClient("sk-test", server.base_url, "fake-model")
+            received = []
+
+            async def on_text(text):
+                received.append(text)
+
+            content, metadata = await client.chat([{"role": "user", "content": "hi"}], on_text=on_text)
+
+        assert content == "你好呀，今天过得怎么样？"
+        assert "".join(received) == content
+        assert len(received) >= 2
+        assert server.requests[0]["stream"] is True
+        assert metadata["tokens_input"] == 200
+        assert metadata["cached_tokens"] == 150
+        assert metadata["first_text_latency"] is not None
+
+    @pytest.mark.asyncio
+    async def test_chat_with_tools_stream_assembles_tool_calls(self):
+        tool_round = [
+            _chunk({"role": "assistant", "tool_calls": [
+                {"index": 0, "id": "call_1", "type": "function", "function": {"name": "search_memory", "arguments": ""}},
+            ]}),
+            _chunk({"tool_calls": [{"index": 0, "function": {"arguments": "{\"query\":"}}]}),
+            _chunk({"tool_calls": [{"index": 0, "function": {"arguments": " \"猫\"}"}}]}),
+        ]
+        final_round = _text_stream(["记得，", "你的猫叫墨墨。"])
+        executed = []
+
+        async def executor(tool_calls):
+            executed.extend(tool_calls)
+            return [{"tool_call_id": tc["id"], "content": "猫叫墨墨"} for tc in tool_calls]
+
+        async with _FakeOpenAIServer([tool_round, final_round]) as server:
+            client = LLMClient("sk-test", server.base_url, "fake-model")
+            received = []
+
+            async def on_text(text):
+                received.append(text)
+
+            content, metadata = await client.chat_with_tools(
+                [{"role": "user", "content": "我的猫叫什么"}],
+                tools=[{"type": "function", "function": {"name": "search_memory", "parameters": {}}}],
+                tool_executor=executor,
+                on_text=on_text,
+            )
+
+        assert executed == [{"id": "call_1", "name": "search_memory", "arguments": "{\"query\": \"猫\"}"}]
+        assert content == "记得，你的猫叫墨墨。"
+        assert "".join(received) == content
+        assert metadata["tool_rounds"] == 1
+        assert metadata["first_text_latency"] is not None
+        assert server.requests[1]["messages"][-1] == {
+            "role": "tool", "tool_call_id": "call_1", "content": "猫叫墨墨",
+        }
+
+    @pytest.mark.asyncio
+    async def test_chat_with_tools_stream_reports_tool_round_preamble(self):
+        tool_round = [
+            _chunk({"role": "assistant", "content": "让我想想。"}),
+            _chunk({"tool_calls": [
+                {"index": 0, "id": "call_1", "type": "function", "function": {"name": "search_memory", "arguments": "{}"}},
+            ]}),
+        ]
+        final_round = _text_stream(["你的猫叫墨墨。"])
+
+        async def executor(tool_calls):
+            return [{"tool_call_id": tc["id"], "content": "猫叫墨墨"} for tc in tool_calls]
+
+        async with _FakeOpenAIServer([tool_round, final_round]) as server:
+            client = LLMClient("sk-test", server.base_url, "fake-model")
+            received = []
+
+            async def on_text(text):
+                received.append(text)
+
+            content, metadata = await client.chat_with_tools(
+                [{"role": "user", "content": "我的猫叫什么"}],
+                tools=[{"type": "function", "function": {"name": "search_memory", "parameters": {}}}],
+                tool_executor=executor,
+                on_text=on_text,
+            )
+
+        assert content == "你的猫叫墨墨。"
+        assert "".join(received) == "让我想想。你的猫叫墨墨。"
+        assert metadata["preamble"] == "让我想想。"
+
+
+class TestStreamingReplyEndToEnd:
+    @pytest.mark.asyncio
+    async def test_sentences_sent_before_completion(self):
+        pieces = ["今天天气很好，", "我们去公园散步吧。", "路上还能买杯奶茶，", "你想喝什么口味的？", "我请客"]
+        async with _FakeOpenAIServer([_text_stream(pieces)], delay=0.05) as server:
+            router = LLMRouter("sk-test", server.base_url, "fake-model", max_concurrent=1)
+            sent = []
+
+            async def send(text):
+                sent.append((time.monotonic(), text))
+
+            reply = StreamingReply(send, min_gap=0.02, min_segment_chars=6)
+            content = await router.generate(
+                [{"role": "user", "content": "周末干嘛"}], user_id="u1", on_text=reply.on_text
+            )
+            completed_at = time.monotonic()
+            tail = await reply.finish(content)
+
+        assert [t for _, t in sent] == ["今天天气很好，我们去公园散步吧。", "路上还能买杯奶茶，你想喝什么口味的？"]
+        assert sent[0][0] < completed_at
+        assert tail == "我请客"
+        assert reply.segments_sent == 2
+        assert reply.first_message_latency < completed_at - reply.started_at
+
+        stats = router.get_stats()["primary"]
+        assert stats["streamed"] == 1
+        assert router.get_first_text_percentiles("primary")["p50"] > 0
+
+    @pytest.mark.asyncio
+    async def test_finish_without_stream_returns_response(self):
+        async def send(text):
+            raise AssertionError("should not send")
+
+        reply = StreamingReply(send)
+        assert await reply.finish("你好") == "你好"
+        assert reply.first_message_latency is not None
+
+    @pytest.mark.asyncio
+    async def test_finish_after_failure_appends_error_reply(self):
+        sent = []
+
+        async def send(text):
+            sent.append(text)
+
+        reply = StreamingReply(send, min_gap=0.0, min_segment_chars=4)
+        await reply.on_text("早上好呀。")
+        await reply.on_text("今天也要")
+        assert await reply.finish("出错了", failed=True) == "今天也要\n出错了"
+        assert sent == ["早上好呀。"]
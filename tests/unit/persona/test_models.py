@@ -61,6 +61,7 @@ class TestRelationshipState:
         )
         # 50*0.3 + 40*0.2 + 60*0.3 + 70*0.2 = 15 + 8 + 18 + 14 = 55
         assert rel.composite_score == 55.0
+        assert RelationshipState.composite_from(50, 40, 60, 70) == rel.composite_score
 
     def test_get_warmth_level(self):
         """测试温暖度等级"""
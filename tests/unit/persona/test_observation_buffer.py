@@ -647,3 +647,37 @@ class TestGetStatus:
         status = buffer.get_status()
 
         assert status["last_trigger"] == "2024-01-15T10:30:00"
+
+
+# ============================================================================
+# 脏标记测试
+# ============================================================================
+
+class TestDirtyTracking:
+    """测试增量持久化所用的脏标记"""
+
+    def test_new_buffer_is_clean(self, buffer: ObservationBuffer):
+        assert buffer.dirty is False
+
+    def test_filtered_message_keeps_clean(self, buffer: ObservationBuffer):
+        buffer.add_message("user_1", "昵称1", ".r 1d20")
+        assert buffer.dirty is False
+
+    def test_accepted_message_and_extraction_mark_dirty(self, buffer: ObservationBuffer):
+        buffer.add_message("user_1", "昵称1", "这是一条测试消息")
+        assert buffer.dirty is True
+        buffer.dirty = False
+        buffer.get_messages_for_extraction()
+        assert buffer.dirty is True
+
+    def test_restored_buffer_is_clean(self):
+        buffer = ObservationBuffer.from_persist_dict(
+            group_id="g",
+            data={"threshold": 20, "messages": []},
+            initial_threshold=20,
+            max_threshold=60,
+            min_threshold=5,
+            max_buffer_size=10,
+            max_records_per_group=30,
+        )
+        assert buffer.dirty is False
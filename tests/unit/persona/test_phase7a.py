@@ -9,7 +9,7 @@ from module.persona.llm.router import LLMRouter
 from module.persona.memory.context_builder import ContextBuilder
 from module.persona.character.models import Character
 from module.persona.data.store import PersonaDataStore
-from module.persona.data.models import LLMTraceRecord
+from module.persona.data.models import LLMTraceRecord, ModelTier
 
 
 @pytest.fixture
@@ -60,6 +60,29 @@ def test_latency_percentiles_per_tier():
     assert ap["p50"] == 60.0
 
 
+@pytest.mark.asyncio
+async def test_cache_hit_ratio_per_tier_and_prefix():
+    router = LLMRouter("fake", "http://localhost", "fake", max_concurrent=1)
+
+    async def chat(**kwargs):
+        return "ok", {"tokens_input": 1000, "tokens_output": 10, "cached_tokens": 800}
+
+    router.primary_client.chat = chat
+    router.auxiliary_client.chat = chat
+    messages = [{"role": "user", "content": "hi"}]
+    await router.generate(messages, prefix_fingerprint="abc")
+    await router.generate(messages, prefix_fingerprint="abc")
+    await router.generate(messages, model_tier=ModelTier.AUXILIARY)
+
+    stats = router.get_stats()
+    assert stats["primary"]["prompt_tokens"] == 2000
+    assert stats["primary"]["cached_tokens"] == 1600
+    assert stats["primary"]["cache_hit_ratio"] == pytest.approx(0.8)
+    assert stats["auxiliary"]["cache_hit_ratio"] == pytest.approx(0.8)
+    assert stats["prefixes"]["abc"]["requests"] == 2
+    assert stats["prefixes"]["abc"]["cache_hit_ratio"] == pytest.approx(0.8)
+
+
 def test_build_debug_info():
     char = Character(name="Test", system_prompt="You are a test character.")
     builder = ContextBuilder(char, max_short_term_chars=100)
@@ -71,6 +94,8 @@ def test_build_debug_info():
     assert info["short_term_chars"] > 0
     assert info["diary_chars"] == 5
     assert info["returned_message_count"] == 2
+    assert info["prefix_fingerprint"] == builder.prefix_fingerprint
+    assert 0 < info["static_prefix_chars"] <= info["system_prompt_chars"]
 
 
 @pytest.mark.asyncio
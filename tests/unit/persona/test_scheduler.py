@@ -352,6 +352,85 @@ class TestProactiveSchedulerMissYou:
         assert result == []
 
 
+    @staticmethod
+    def _rel(user_id: str, last_at: datetime, score: float = 60) -> RelationshipState:
+        return RelationshipState(
+            user_id=user_id, group_id="", intimacy=score, passion=score, trust=score,
+            secureness=score, last_interaction_at=last_at,
+        )
+
+    @pytest.mark.asyncio
+    async def test_miss_only_inspects_due_candidates(self, scheduler, mock_data_store, monkeypatch):
+        clock = {"now": datetime(2024, 1, 4, 10, 0, 0)}
+        monkeypatch.setattr(
+            "plugins.DicePP.module.persona.proactive.scheduler.persona_wall_now",
+            lambda tz: clock["now"],
+        )
+        monkeypatch.setattr("plugins.DicePP.module.persona.proactive.scheduler.random.random", lambda: 0.0)
+        scheduler.config.min_interval_hours = 4
+        now = clock["now"]
+        mock_data_store.list_active_relationships.return_value = [
+            self._rel("due1", now - timedelta(hours=100)),
+            self._rel("due2", now - timedelta(hours=80)),
+            self._rel("later", now - timedelta(hours=71)),
+        ]
+        mock_data_store.is_user_muted.side_effect = lambda uid: uid == "due1"
+        scheduler._create_miss_you_message = AsyncMock(return_value=None)
+
+        assert await scheduler._check_missed_users() == []
+        # 未到期的候选不查询静音；今日事件每次 tick 只查一次
+        assert sorted(c.args[0] for c in mock_data_store.is_user_muted.call_args_list) == ["due1", "due2"]
+        assert mock_data_store.get_daily_events.await_count == 1
+
+        mock_data_store.get_daily_events.return_value = [MagicMock(description="去了海边", reaction="")]
+        scheduler._create_miss_you_message = AsyncMock(side_effect=lambda target, *a: {"user_id": target.user_id})
+        clock["now"] = now + timedelta(minutes=10)
+        mock_data_store.is_user_muted.reset_mock()
+        result = await scheduler._check_missed_users()
+        assert [m["user_id"] for m in result] == ["due2"]
+        # 静音用户在复查间隔内不再查询；候选集合不会每次 tick 重新读取
+        assert [c.args[0] for c in mock_data_store.is_user_muted.call_args_list] == ["due2"]
+        assert mock_data_store.list_active_relationships.await_count == 1
+
+        clock["now"] = now + timedelta(minutes=50)
+        mock_data_store.is_user_muted.reset_mock()
+        result = await scheduler._check_missed_users()
+        assert result == []
+        assert [c.args[0] for c in mock_data_store.is_user_muted.call_args_list] == ["due1"]
+
+        clock["now"] = now + timedelta(minutes=61)
+        result = await scheduler._check_missed_users()
+        assert [m["user_id"] for m in result] == ["later"]
+        assert scheduler.get_status()["miss_candidates"] == 3
+
+    @pytest.mark.asyncio
+    async def test_miss_note_relationship_reschedules(self, scheduler, mock_data_store, monkeypatch):
+        clock = {"now": datetime(2024, 1, 4, 10, 0, 0)}
+        monkeypatch.setattr(
+            "plugins.DicePP.module.persona.proactive.scheduler.persona_wall_now",
+            lambda tz: clock["now"],
+        )
+        monkeypatch.setattr("plugins.DicePP.module.persona.proactive.scheduler.random.random", lambda: 0.0)
+        now = clock["now"]
+        mock_data_store.list_active_relationships.return_value = [self._rel("u1", now - timedelta(hours=100))]
+        mock_data_store.get_daily_events.return_value = [MagicMock(description="去了海边", reaction="")]
+        scheduler._create_miss_you_message = AsyncMock(side_effect=lambda target, *a: {"user_id": target.user_id})
+
+        # 刚刚互动过：推迟到 miss_min_hours 之后
+        await scheduler._check_missed_users()
+        scheduler._last_proactive_time.clear()
+        mock_data_store.list_active_relationships.return_value = [self._rel("u1", now)]
+        scheduler.note_relationship(self._rel("u1", now))
+        clock["now"] = now + timedelta(hours=71)
+        assert await scheduler._check_missed_users() == []
+        clock["now"] = now + timedelta(hours=72)
+        assert [m["user_id"] for m in await scheduler._check_missed_users()] == ["u1"]
+
+        # 好感度降到阈值以下后移出候选
+        scheduler.note_relationship(self._rel("u1", now, score=10))
+        assert scheduler.get_status()["miss_candidates"] == 0
+
+
 class TestProactiveSchedulerMessageCreation:
     """测试消息创建"""
 
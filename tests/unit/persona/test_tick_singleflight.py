@@ -1,8 +1,8 @@
-"""PersonaCommand.tick / tick_daily：事件循环中单槽调度，慢路径不堆积任务。"""
+"""PersonaCommand 主动消息 tick 与 tick_daily：事件循环中单槽调度，慢路径不堆积任务。"""
 
 import asyncio
 
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
@@ -11,37 +11,22 @@ from plugins.DicePP.module.persona.command import PersonaCommand
 
 
 @pytest.mark.asyncio
-async def test_tick_single_flight_does_not_stack_tasks():
+async def test_proactive_tick_only_via_scheduled_job():
+    """主动消息只由注册的周期任务驱动（调度器保证单槽），命令本身不重写 tick"""
+    from core.command import UserCommandBase
+
     bot = MagicMock()
     bot.config.persona_ai = MagicMock()
     bot.config.persona_ai.enabled = True
 
     cmd = PersonaCommand(bot)
+    assert type(cmd).tick is UserCommandBase.tick
+
     cmd.enabled = True
     cmd.orchestrator = MagicMock()
-
-    started = asyncio.Event()
-
-    async def slow_tick():
-        started.set()
-        await asyncio.sleep(0.2)
-        return []
-
-    cmd.orchestrator.tick = slow_tick
-
-    loop = asyncio.get_running_loop()
-    assert loop.is_running()
-
-    cmd.tick()
-    await asyncio.wait_for(started.wait(), timeout=1.0)
-    first = cmd._async_tick_task
-    assert first is not None
-
-    cmd.tick()
-    assert cmd._async_tick_task is first
-
-    await asyncio.wait_for(first, timeout=2.0)
-    assert first.done()
+    cmd.orchestrator.tick = AsyncMock(return_value=[])
+    assert await cmd._scheduled_tick() == []
+    cmd.orchestrator.tick.assert_awaited_once()
 
 
 @pytest.mark.asyncio
@@ -1,8 +1,12 @@
+import os
+import tempfile
 import unittest
 import pytest
 from io import BytesIO
 from pathlib import Path
+from unittest.mock import patch
 from utils.cq_code import get_cq_image, get_cq_reply, get_cq_at
+from utils.cq_code import ImagePayloadCache, mask_base64_images, IMAGE_SEND_FILE
 
 
 @pytest.mark.unit
@@ -53,5 +57,66 @@ class TestGetCqAt(unittest.TestCase):
         self.assertEqual(result, "@username")
 
 
+@pytest.mark.unit
+class TestImagePayloadCache(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.img = Path(self._tmp.name) / "a.png"
+        self.img.write_bytes(b"image-a")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_hit_skips_reading_file(self):
+        cache = ImagePayloadCache()
+        first = cache.get(self.img)
+        self.assertEqual(first, get_cq_image(b"image-a"))
+        with patch.object(Path, "read_bytes", side_effect=AssertionError("应命中缓存")):
+            self.assertEqual(cache.get(self.img), first)
+        self.assertEqual(cache.stats["hit"], 1)
+
+    def test_invalidated_by_mtime(self):
+        cache = ImagePayloadCache()
+        cache.get(self.img)
+        self.img.write_bytes(b"image-b")
+        stat = os.stat(self.img)
+        os.utime(self.img, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(cache.get(self.img), get_cq_image(b"image-b"))
+        self.assertEqual(cache.total_bytes, len(get_cq_image(b"image-b")))
+
+    def test_missing_file(self):
+        self.assertIsNone(ImagePayloadCache().get(Path(self._tmp.name) / "none.png"))
+
+    def test_size_bound_evicts_oldest(self):
+        other = Path(self._tmp.name) / "b.png"
+        other.write_bytes(b"image-b")
+        cache = ImagePayloadCache(max_bytes=len(get_cq_image(b"image-a")) + 1)
+        cache.get(self.img)
+        cache.get(other)
+        self.assertEqual(cache.stats["evict"], 1)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        cache.get(self.img)
+        self.assertEqual(cache.stats["miss"], 3)
+
+    def test_file_send_mode(self):
+        cache = ImagePayloadCache(send_mode=IMAGE_SEND_FILE)
+        with patch.object(Path, "read_bytes", side_effect=AssertionError("file 模式不应读取文件")):
+            result = cache.get(self.img)
+        self.assertIn("file:///", result)
+        self.assertNotIn("base64", result)
+
+
+@pytest.mark.unit
+class TestMaskBase64Images(unittest.TestCase):
+    def test_mask_each_image(self):
+        msg = "前[CQ:image,file=base64://QUJD]中[CQ:image,file=base64://REVG]后[CQ:at,qq=1]"
+        self.assertEqual(mask_base64_images(msg),
+                         "前[CQ:image,file=base64:...]中[CQ:image,file=base64:...]后[CQ:at,qq=1]")
+
+    def test_no_image_or_unterminated(self):
+        self.assertEqual(mask_base64_images("普通消息"), "普通消息")
+        self.assertEqual(mask_base64_images("[CQ:image,file=base64://QUJD"), "[CQ:image,file=base64://QUJD")
+
+
 if __name__ == '__main__':
     unittest.main()
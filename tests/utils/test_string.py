@@ -1,6 +1,6 @@
 import unittest
 import pytest
-from utils.string import to_english_str, match_substring
+from utils.string import to_english_str, match_substring, estimate_tokens, truncate_by_tokens
 
 
 @pytest.mark.unit
@@ -73,5 +73,40 @@ class TestMatchSubstring(unittest.TestCase):
         self.assertEqual(result, ["你好世界", "你好的"])
 
 
+
+def _naive_estimate_tokens(text: str) -> float:
+    cn_chars = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cn_chars + (len(text) - cn_chars) / 4
+
+
+@pytest.mark.unit
+class TestEstimateTokens(unittest.TestCase):
+    def test_matches_per_char_definition(self):
+        for text in ["", "hello", "你好世界", "ｇｏｏｄ！你好 abc", "混合 mixed 文本\n第二行"]:
+            self.assertEqual(estimate_tokens(text), _naive_estimate_tokens(text))
+
+    def test_additive_over_concatenation(self):
+        a, b = "[小明] ", "今天 roll 了 1d20"
+        self.assertEqual(estimate_tokens(a + b), estimate_tokens(a) + estimate_tokens(b))
+
+
+@pytest.mark.unit
+class TestTruncateByTokens(unittest.TestCase):
+    def test_within_budget_unchanged(self):
+        self.assertEqual(truncate_by_tokens("短消息", 10), "短消息")
+
+    def test_longest_prefix_within_budget(self):
+        text = "这是一段abc非常非常长的消息内容" * 20
+        for budget in [1, 3.5, 7, 50]:
+            result = truncate_by_tokens(text, budget)
+            self.assertTrue(text.startswith(result))
+            self.assertLessEqual(estimate_tokens(result), budget)
+            self.assertGreater(estimate_tokens(text[:len(result) + 1]), budget)
+
+    def test_keeps_at_least_one_char(self):
+        self.assertEqual(truncate_by_tokens("你好", 0.5), "你")
+        self.assertEqual(truncate_by_tokens("abcdef", 0), "a")
+
+
 if __name__ == '__main__':
     unittest.main()